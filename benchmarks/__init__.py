@@ -0,0 +1,15 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : __init__.py
+@Desc    : 性能基准测试：生成测试数据、测量加载/滚动/编辑/保存，与基准结果比较
+@Author  : qdu
+@Date    : 2026/10/17 20:10
+"""
+
+# 加载方式
+MODE_SYNC = 'sync'                  # 同步加载
+MODE_BACKGROUND = 'background'      # 后台线程分批加载（界面打开小文件的方式）
+MODE_LAZY = 'lazy'                  # 后台只建立行索引（界面打开大文件的方式）
+MODES = [MODE_SYNC, MODE_BACKGROUND, MODE_LAZY]
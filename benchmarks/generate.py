@@ -0,0 +1,107 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : generate.py
+@Desc    : 生成可复现的测试csv：行数、列数、需要引号的单元格比例、编码可配置
+@Author  : qdu
+@Date    : 2026/10/17 20:10
+"""
+
+import csv
+import os
+import numpy as np
+
+_CHUNK_ROWS = 10000         # 每次生成并写入的行数
+_CATEGORIES = ['北京', 'Shanghai', 'Guangzhou', '深圳', 'Hangzhou', 'Chengdu', 'Wuhan', '西安']
+_WORDS = ['alpha', 'beta', 'gamma', 'delta', '数据', '表格', 'lorem', 'ipsum', 'dolor', 'amet']
+
+
+def parseCount(text) -> int:
+    """
+    解析带单位的行数：10k、1.5M、100000
+    :param text: 字符串
+    :return: int
+    """
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def formatCount(count) -> str:
+    # 10000 -> 10k，用于文件名和结果中的用例名
+    for suffix, scale in (('M', 1000000), ('k', 1000)):
+        if count >= scale and count % scale == 0:
+            return '%d%s' % (count // scale, suffix)
+    return str(count)
+
+
+def datasetName(rows, columns=8, quoteRatio=0.1, encoding='utf-8', seed=0) -> str:
+    """
+    测试数据的文件名，参数相同的数据可以复用
+    :return: 文件名
+    """
+    return 'bench_%s_c%d_q%g_%s_s%d.csv' % (formatCount(rows), columns, quoteRatio, encoding, seed)
+
+
+def generateCsv(path, rows, columns=8, quoteRatio=0.1, encoding='utf-8', seed=0):
+    """
+    生成测试数据：各列依次为整数、小数、日期时间、分类、文本，循环排列
+    文本列中quoteRatio比例的单元格包含分隔符、引号或换行，写出时需要加引号
+    相同的参数总是生成相同的文件
+    :param path: 文件路径
+    :param rows: 数据行数（不含列头）
+    :param columns: 列数
+    :param quoteRatio: 文本列中需要引号的单元格比例
+    :param encoding: 文件编码
+    :param seed: 随机种子
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    header = ['%s%d' % (('id', 'price', 'time', 'city', 'note')[c % 5], c) for c in range(columns)]
+    tmp = path + '.part'
+    with open(tmp, 'w', encoding=encoding, newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for start in range(0, rows, _CHUNK_ROWS):
+            count = min(_CHUNK_ROWS, rows - start)
+            values = [_column(rng, c, start, count, quoteRatio) for c in range(columns)]
+            writer.writerows(zip(*values))
+    os.replace(tmp, path)
+
+
+def _column(rng, column, start, count, quoteRatio):
+    kind = column % 5
+    if kind == 0:
+        return np.arange(start, start + count).astype(str).tolist()
+    if kind == 1:
+        return np.char.mod('%.2f', rng.uniform(0, 10000, count)).tolist()
+    if kind == 2:
+        seconds = rng.integers(1577836800, 1735689600, count).astype('datetime64[s]')
+        return np.char.replace(np.datetime_as_string(seconds), 'T', ' ').tolist()
+    if kind == 3:
+        return [_CATEGORIES[i] for i in rng.integers(0, len(_CATEGORIES), count)]
+    words = rng.integers(0, len(_WORDS), (count, 3))
+    quoted = rng.random(count) < quoteRatio
+    special = rng.integers(0, 3, count)
+    texts = []
+    for i in range(count):
+        text = ' '.join(_WORDS[w] for w in words[i])
+        if quoted[i]:
+            text += (', %d', ' "%d"', '\n%d')[special[i]] % (start + i)
+        texts.append(text)
+    return texts
+
+
+def ensureDataset(directory, rows, columns=8, quoteRatio=0.1, encoding='utf-8', seed=0) -> str:
+    """
+    获取测试数据文件，不存在时生成
+    :param directory: 存放测试数据的目录
+    :return: 文件路径
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, datasetName(rows, columns, quoteRatio, encoding, seed))
+    if not os.path.exists(path):
+        generateCsv(path, rows, columns, quoteRatio, encoding, seed)
+    return path
+
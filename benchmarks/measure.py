@@ -0,0 +1,157 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : measure.py
+@Desc    : 在单独的进程中用offscreen平台打开CsvEditor，测量一个文件的各项指标，结果以JSON打印到标准输出
+@Author  : qdu
+@Date    : 2026/10/17 20:10
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# 必须在导入PySide6之前设置，无显示器的服务器上也能运行
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QCoreApplication
+from csv_editor import CsvEditor
+from csv_parser import ENGINES, ENGINE_PYTHON
+from benchmarks import MODES, MODE_SYNC, MODE_BACKGROUND, MODE_LAZY
+
+_SCROLL_STEPS = 200         # 滚动测量的帧数
+_EDIT_COUNT = 200           # 编辑测量的次数
+_VIEW_SIZE = (1280, 800)    # 表格控件的大小，决定每帧绘制的单元格数
+
+
+def peakRss():
+    """
+    进程的峰值常驻内存
+    :return: 字节数，无法获取时为None
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss)
+
+
+def percentiles(samples):
+    """
+    毫秒为单位的中位数、p95、最大值
+    :param samples: 秒
+    :return: dict
+    """
+    if not samples:
+        return {'median': None, 'p95': None, 'max': None}
+    ms = np.asarray(samples) * 1000
+    return {'median': round(float(np.median(ms)), 3), 'p95': round(float(np.percentile(ms, 95)), 3),
+            'max': round(float(ms.max()), 3)}
+
+
+def measureFile(path, mode=MODE_BACKGROUND, engine=ENGINE_PYTHON, seed=0) -> dict:
+    """
+    测量一个文件：首屏时间、完整加载时间、峰值内存、滚动每帧耗时、单元格编辑耗时、保存吞吐量
+    :param path: csv文件
+    :param mode: 加载方式
+    :param engine: 解析引擎
+    :param seed: 选择滚动位置和编辑单元格的随机种子
+    :return: 指标
+    """
+    app = QApplication.instance() or QApplication([])
+    editor = CsvEditor()
+    editor.resize(*_VIEW_SIZE)
+    editor.show()
+    viewport = editor.table.viewport()
+    model = editor.model
+    rng = np.random.default_rng(seed)
+    result = {'file': os.path.basename(path), 'bytes': os.path.getsize(path), 'mode': mode, 'engine': engine}
+
+    # 1. 加载：首屏为第一批数据绘制完成的时间，同步加载时与完整加载相同
+    start = time.perf_counter()
+    editor.loadFile(path, withHeader=None, background=mode != MODE_SYNC, lazy=mode == MODE_LAZY,
+                    engine=engine)
+    while not model.rowCount() and editor.loading:
+        app.processEvents()
+    viewport.repaint()
+    result['firstPaint'] = time.perf_counter() - start
+    while editor.loading:
+        QCoreApplication.processEvents()
+        time.sleep(0.001)
+    app.processEvents()
+    result['loadTime'] = time.perf_counter() - start
+    result['rows'] = model.rowCount()
+    result['columns'] = model.columnCount()
+
+    # 2. 滚动：跳到随机位置后同步重绘，每次为一帧
+    scrollBar = editor.table.verticalScrollBar()
+    frames = []
+    for value in rng.integers(0, scrollBar.maximum() + 1, _SCROLL_STEPS):
+        frameStart = time.perf_counter()
+        scrollBar.setValue(int(value))
+        viewport.repaint()
+        frames.append(time.perf_counter() - frameStart)
+    result['scroll'] = percentiles(frames)
+
+    # 3. 编辑：修改随机单元格（包括类型列退回为字符串列的开销）并重绘
+    edits = []
+    if model.rowCount() and model.columnCount():
+        rows = rng.integers(0, model.rowCount(), _EDIT_COUNT)
+        columns = rng.integers(0, model.columnCount(), _EDIT_COUNT)
+        for i, (row, column) in enumerate(zip(rows, columns)):
+            index = model.index(int(row), int(column))
+            editStart = time.perf_counter()
+            model.setData(index, 'edit %d' % i)
+            viewport.repaint()
+            edits.append(time.perf_counter() - editStart)
+    result['edit'] = percentiles(edits)
+
+    # 4. 保存到临时文件
+    fd, target = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        saveStart = time.perf_counter()
+        editor.saveFile(target, withHeader=True)
+        seconds = time.perf_counter() - saveStart
+        result['saveTime'] = seconds
+        result['saveMBps'] = os.path.getsize(target) / (1 << 20) / seconds if seconds else None
+    finally:
+        os.remove(target)
+
+    result['peakRss'] = peakRss()
+    editor.closeFile()
+    for key in ('firstPaint', 'loadTime', 'saveTime', 'saveMBps'):
+        if result[key] is not None:
+            result[key] = round(result[key], 4)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='测量一个csv文件，结果以JSON打印到标准输出')
+    parser.add_argument('file')
+    parser.add_argument('--mode', choices=MODES, default=MODE_BACKGROUND)
+    parser.add_argument('--engine', choices=ENGINES, default=ENGINE_PYTHON)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    json.dump(measureFile(args.file, args.mode, args.engine, args.seed), sys.stdout)
+    sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
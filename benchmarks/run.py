@@ -0,0 +1,160 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : run.py
+@Desc    : 运行基准测试并保存为JSON，可以与之前的结果比较，超过阈值的退化以非0退出码返回
+@Author  : qdu
+@Date    : 2026/10/17 20:10
+
+示例：
+    python -m benchmarks.run --rows 10k,100k,1M --output results.json
+    python -m benchmarks.run --rows 10k,100k --baseline results.json --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.generate import ensureDataset, parseCount, formatCount
+from benchmarks import MODES, MODE_BACKGROUND
+from csv_parser import ENGINES, ENGINE_PYTHON
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 比较的指标：(名称, 越小越好)；嵌套的指标用'.'连接
+METRICS = [
+    ('firstPaint', True),
+    ('loadTime', True),
+    ('peakRss', True),
+    ('scroll.p95', True),
+    ('edit.p95', True),
+    ('saveMBps', False),
+]
+
+
+def runCase(path, mode, engine, repeat):
+    """
+    在子进程中测量repeat次（每次都是新进程，峰值内存互不影响），各指标取中位数
+    :return: 指标
+    """
+    runs = []
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.measure', path, '--mode', mode,
+                                 '--engine', engine, '--seed', str(i)],
+                                cwd=_ROOT, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    result = dict(runs[0])
+    for name, _ in METRICS:
+        values = [metricValue(run, name) for run in runs]
+        if None not in values:
+            value = np.median(values)
+            setMetric(result, name, int(value) if isinstance(values[0], int) else round(float(value), 4))
+    result['repeat'] = repeat
+    return result
+
+
+def metricValue(result, name):
+    # 按'a.b'取嵌套的值，不存在时为None
+    for key in name.split('.'):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def setMetric(result, name, value):
+    *parents, key = name.split('.')
+    for parent in parents:
+        result = result[parent]
+    result[key] = value
+
+
+def compare(results, baseline, threshold):
+    """
+    与基准结果比较
+    :param results: 本次结果
+    :param baseline: 基准结果
+    :param threshold: 允许的相对退化（0.1: 10%）
+    :return: 退化列表 [(用例, 指标, 基准值, 本次值, 相对变化)]
+    """
+    regressions = []
+    for case, result in results['cases'].items():
+        old = baseline.get('cases', {}).get(case)
+        if old is None:
+            continue
+        for name, lowerIsBetter in METRICS:
+            before, after = metricValue(old, name), metricValue(result, name)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (change if lowerIsBetter else -change) > threshold:
+                regressions.append((case, name, before, after, change))
+    return regressions
+
+
+def gitCommit():
+    # 当前的提交，用于在不同提交之间比较结果
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='CsvEditor性能基准测试')
+    parser.add_argument('--rows', default='10k,100k', help='数据行数，逗号分隔，例如10k,100k,1M,10M（默认%(default)s）')
+    parser.add_argument('--columns', type=int, default=8, help='列数（默认%(default)s）')
+    parser.add_argument('--quote', type=float, default=0.1, help='文本列中需要引号的单元格比例（默认%(default)s）')
+    parser.add_argument('--encoding', default='utf-8', help='测试数据的编码（默认%(default)s）')
+    parser.add_argument('--mode', choices=MODES, default=MODE_BACKGROUND, help='加载方式（默认%(default)s）')
+    parser.add_argument('--engine', choices=ENGINES, default=ENGINE_PYTHON, help='解析引擎（默认%(default)s）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个用例的测量次数，取中位数（默认%(default)s）')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'csveditor-bench'),
+                        help='测试数据目录，生成的数据会被复用（默认%(default)s）')
+    parser.add_argument('--output', help='保存结果的JSON文件')
+    parser.add_argument('--baseline', help='与之比较的JSON结果')
+    parser.add_argument('--threshold', type=float, default=0.1, help='允许的相对退化（默认%(default)s）')
+    args = parser.parse_args(argv)
+
+    results = {
+        'commit': gitCommit(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'columns': args.columns, 'quote': args.quote, 'encoding': args.encoding,
+                   'mode': args.mode, 'engine': args.engine, 'repeat': args.repeat},
+        'cases': {},
+    }
+    for rows in map(parseCount, args.rows.split(',')):
+        path = ensureDataset(args.data_dir, rows, args.columns, args.quote, args.encoding)
+        case = formatCount(rows)
+        results['cases'][case] = result = runCase(path, args.mode, args.engine, args.repeat)
+        print('%-6s first paint %.3fs  load %.3fs  rss %dMB  scroll p95 %.1fms  edit p95 %.1fms  save %.1fMB/s'
+              % (case, result['firstPaint'], result['loadTime'], (result['peakRss'] or 0) / (1 << 20),
+                 result['scroll']['p95'], result['edit']['p95'], result['saveMBps'] or 0))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for case, name, before, after, change in regressions:
+            print('退化 %s %s: %s -> %s (%+.1f%%)' % (case, name, before, after, change * 100))
+        if regressions:
+            return 1
+        print('与%s相比没有超过%.0f%%的退化' % (baseline.get('commit') or args.baseline, args.threshold * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : bulk_dialog.py
+@Desc    : 批量修改的对话框：查找替换、添加派生列
+@Author  : qdu
+@Date    : 2026/10/17 23:58
+"""
+
+from PySide6.QtWidgets import QDialog, QFormLayout, QLineEdit, QCheckBox, QComboBox, QDialogButtonBox
+from csv_bulk import Expression
+
+SCOPE_SELECTION = -1    # 替换范围：选中区域
+SCOPE_ALL = -2          # 替换范围：所有列
+
+
+class ReplaceDialog(QDialog):
+    """
+    查找替换：范围为选中区域、某一列或所有列（只包括筛选后可见的行）
+    """
+
+    def __init__(self, columnNames, hasSelection, parent=None):
+        """
+        :param columnNames: 各列的名称
+        :param hasSelection: 是否有选中的单元格
+        :param parent:
+        """
+        super().__init__(parent)
+        self.setWindowTitle('查找替换')
+        self.findEdit = QLineEdit()
+        self.replaceEdit = QLineEdit()
+        self.regexCheck = QCheckBox('正则表达式（替换中可以用\\1引用分组）')
+        self.caseCheck = QCheckBox('不区分大小写')
+        self.scopeCombo = QComboBox()
+        if hasSelection:
+            self.scopeCombo.addItem('选中区域', SCOPE_SELECTION)
+        self.scopeCombo.addItem('所有列', SCOPE_ALL)
+        for column, name in enumerate(columnNames):
+            self.scopeCombo.addItem('列 %s' % name, column)
+        _buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        _buttons.accepted.connect(self.accept)
+        _buttons.rejected.connect(self.reject)
+        _layout = QFormLayout(self)
+        _layout.addRow('查找', self.findEdit)
+        _layout.addRow('替换为', self.replaceEdit)
+        _layout.addRow('范围', self.scopeCombo)
+        _layout.addRow(self.regexCheck)
+        _layout.addRow(self.caseCheck)
+        _layout.addRow(_buttons)
+
+    @property
+    def scope(self) -> int:
+        """
+        替换范围
+        :return: SCOPE_SELECTION/SCOPE_ALL/列号
+        """
+        return self.scopeCombo.currentData()
+
+
+class DerivedColumnDialog(QDialog):
+    """
+    添加派生列：输入列名和表达式
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('添加派生列')
+        self.nameEdit = QLineEdit()
+        self.expressionEdit = QLineEdit()
+        self.expressionEdit.setPlaceholderText('例如：price * 1.1、name + "-" + str(id)、upper(col("city name"))')
+        self.expressionEdit.setToolTip(Expression.__doc__.strip())
+        _buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        _buttons.accepted.connect(self.accept)
+        _buttons.rejected.connect(self.reject)
+        _layout = QFormLayout(self)
+        _layout.addRow('列名', self.nameEdit)
+        _layout.addRow('表达式', self.expressionEdit)
+        _layout.addRow(_buttons)
+        self.resize(480, self.sizeHint().height())
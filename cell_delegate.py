@@ -0,0 +1,75 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : cell_delegate.py
+@Desc    : 表格单元格的绘制：只取一次显示值，按列宽省略后的文字缓存在有界的字典中
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+
+# PySide6每次查找Qt的枚举属性要数微秒，paint()每帧调用上千次，只使用这里的常量
+_DISPLAY_ROLE = Qt.DisplayRole
+_BACKGROUND_ROLE = Qt.BackgroundRole
+_ALIGNMENT = Qt.AlignLeft | Qt.AlignVCenter
+_ELIDE_RIGHT = Qt.ElideRight
+_SELECTED = QStyle.State_Selected
+_HAS_FOCUS = QStyle.State_HasFocus
+_FOCUS_RECT = QStyle.PE_FrameFocusRect
+
+
+class CellDelegate(QStyledItemDelegate):
+    """
+    单元格的绘制
+    QStyledItemDelegate每个单元格要调用七八次data()，并对全文排版后省略，长文本的单元格每帧要数毫秒；
+    这里只取显示值和背景色，按列宽省略的结果按(文字, 宽度)缓存，滚动时不再重复排版
+    行的交替背景由视图绘制，编辑器沿用QStyledItemDelegate
+    """
+
+    __margin = 3                # 文字与单元格边框的距离
+    __cacheSize = 1 << 15       # 缓存的省略结果个数，写满后整体清空
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.__elided = {}      # (文字, 宽度) -> 省略后的文字
+
+    def clearCache(self):
+        """
+        字体改变后清空缓存
+        :return: None
+        """
+        self.__elided.clear()
+
+    def paint(self, painter, option, index):
+        text = index.data(_DISPLAY_ROLE)
+        rect = option.rect
+        palette = option.palette
+        background = index.data(_BACKGROUND_ROLE)
+        painter.save()
+        if option.state & _SELECTED:
+            painter.fillRect(rect, palette.highlight())
+            painter.setPen(palette.highlightedText().color())
+        else:
+            if background is not None:
+                painter.fillRect(rect, background)
+            painter.setPen(palette.text().color())
+        if text:
+            width = rect.width() - 2 * self.__margin
+            key = (text, width)
+            elided = self.__elided.get(key)
+            if elided is None:
+                if len(self.__elided) >= self.__cacheSize:
+                    self.__elided.clear()
+                # 每个字符至少1像素，超出宽度的部分不参与排版；多行文本显示在一行中
+                elided = text[:max(width, 0) + 1].replace('\r\n', '↵').replace('\n', '↵')
+                elided = option.fontMetrics.elidedText(elided, _ELIDE_RIGHT, width)
+                self.__elided[key] = elided
+            painter.setFont(option.font)
+            painter.drawText(rect.adjusted(self.__margin, 0, -self.__margin, 0), _ALIGNMENT, elided)
+        painter.restore()
+        if option.state & _HAS_FOCUS:
+            widget = option.widget
+            widget.style().drawPrimitive(_FOCUS_RECT, option, painter, widget)
@@ -0,0 +1,159 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : column_sizer.py
+@Desc    : 按抽样的行和当前可见的单元格估算列宽，滚动时逐步加宽，不测量所有行
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import numpy as np
+from PySide6.QtCore import QObject, QTimer, QEvent, Qt
+from csv_profile import Profiler
+
+
+class ColumnSizer(QObject):
+    """
+    列宽估算
+    1. 数据替换后，每列从均匀抽样的行中取最长的几个值和列头测量宽度（测量次数与行数无关）
+    2. 滚动或改变窗口大小后，测量可见区域中可能超出当前列宽的值，只加宽不收窄
+    文字宽度缓存在有界的字典中；用户手动调整过的列和最后一列（拉伸填满）不自动改变
+    """
+
+    __sampleRows = 256          # 估算时每列抽样的行数
+    __sampleLongest = 4         # 抽样的值中按字符数取最长的几个测量宽度
+    __maxWidth = 400            # 自动调整的最大列宽（像素），更长的内容需要手动加宽
+    __padding = 12              # 单元格内文字两侧的留白
+    __refineDelay = 30          # 滚动停止多久后测量可见单元格（毫秒）
+    __cacheSize = 1 << 15       # 缓存的文字宽度个数
+
+    def __init__(self, view):
+        """
+        :param view: QTableView
+        """
+        super().__init__(view)
+        self.__view = view
+        self.__widths = {}              # 文字 -> 像素宽度
+        self.__userSized = set()        # 用户手动调整过宽度的列
+        self.__resizing = False         # 正在自动调整列宽（区分用户拖动）
+        self.__timer = QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(self.__refineDelay)
+        self.__timer.timeout.connect(self.refine)
+        view.horizontalScrollBar().valueChanged.connect(self.__schedule)
+        view.verticalScrollBar().valueChanged.connect(self.__schedule)
+        view.horizontalHeader().sectionResized.connect(self.__sectionResized)
+        view.viewport().installEventFilter(self)
+        view.model().modelReset.connect(self.__modelReset)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Resize:
+            self.__schedule()
+        return False
+
+    def reset(self):
+        """
+        数据替换后重新估算所有列的宽度
+        :return: None
+        """
+        self.__widths.clear()
+        model = self.__view.model()
+        if model.columnCount() == 0:
+            return
+        with Profiler.span('view.estimateWidths'):
+            rows = self.__sampleDataRows(model)
+            self.__setWidths(model, range(self.__stretchColumn(model)), rows, fit=True)
+        self.__schedule()
+
+    def refine(self):
+        """
+        测量可见区域的单元格，内容更宽的列加宽
+        :return: None
+        """
+        model = self.__view.model()
+        if model.rowCount() == 0 or model.columnCount() == 0:
+            return
+        first = max(self.__view.rowAt(0), 0)
+        last = self.__view.rowAt(self.__view.viewport().height() - 1)
+        last = model.rowCount() - 1 if last < 0 else last
+        header = self.__view.horizontalHeader()
+        left = header.visualIndexAt(0)
+        right = header.visualIndexAt(self.__view.viewport().width() - 1)
+        right = header.count() - 1 if right < 0 else right
+        columns = [header.logicalIndex(i) for i in range(max(left, 0), right + 1)]
+        with Profiler.span('view.refineWidths'):
+            self.__setWidths(model, columns, model.dataRows(first, last + 1), fit=False)
+
+    def __schedule(self):
+        self.__timer.start()
+
+    def __modelReset(self):
+        # 数据替换后列宽恢复默认，手动调整的记录随之失效
+        self.__userSized.clear()
+
+    def __sectionResized(self, column, oldSize, newSize):
+        if not self.__resizing:
+            self.__userSized.add(column)
+
+    def __sampleDataRows(self, model):
+        # 开头一屏的行加上均匀分布的行；延迟加载的数据分散读取要解码很多块，只取开头的行
+        count = model.rowCount()
+        if count <= self.__sampleRows or not model.inMemory:
+            return model.dataRows(0, min(count, self.__sampleRows if model.inMemory else 64))
+        viewRows = np.unique(np.concatenate([np.arange(64), np.linspace(0, count - 1, self.__sampleRows - 64)
+                                             .astype(np.int64)]))
+        return np.array([model.dataRow(row) for row in viewRows.tolist()], dtype=np.int64)
+
+    def __stretchColumn(self, model):
+        return model.columnCount() - 1
+
+    def __setWidths(self, model, columns, rows, fit):
+        """
+        按值的宽度设置列宽
+        :param model: CsvTableModel
+        :param columns: 列号
+        :param rows: 数据行号数组
+        :param fit: True: 按测量结果设置（可以收窄）；False: 只加宽
+        :return: None
+        """
+        store = model.store
+        metrics = self.__view.fontMetrics()
+        headerMetrics = self.__view.horizontalHeader().fontMetrics()
+        maxChar = max(metrics.maxWidth(), 1)
+        stretch = self.__stretchColumn(model)
+        self.__resizing = True
+        try:
+            for column in columns:
+                if column == stretch or column in self.__userSized or column >= store.columnCount:
+                    continue
+                current = self.__view.columnWidth(column)
+                width = 0
+                if fit:
+                    title = str(model.headerData(column, Qt.Horizontal))
+                    width = headerMetrics.horizontalAdvance(title) + self.__padding
+                texts = store.texts(column, rows) if len(rows) else np.zeros(0, dtype=str)
+                if len(texts):
+                    lengths = np.strings.str_len(texts)
+                    if fit:
+                        candidates = np.argsort(lengths)[-self.__sampleLongest:]
+                    else:
+                        # 字符数乘以最宽字符的宽度仍不超过当前列宽的值不需要测量
+                        candidates = np.flatnonzero(lengths * maxChar + self.__padding > current)
+                    if len(candidates):
+                        for text in np.unique(texts[candidates]).tolist():
+                            width = max(width, self.__textWidth(metrics, text) + self.__padding)
+                width = min(width, self.__maxWidth)
+                if (fit and width) or width > current:
+                    self.__view.setColumnWidth(column, width)
+        finally:
+            self.__resizing = False
+
+    def __textWidth(self, metrics, text):
+        width = self.__widths.get(text)
+        if width is None:
+            if len(self.__widths) >= self.__cacheSize:
+                self.__widths.clear()
+            width = metrics.horizontalAdvance(text)
+            self.__widths[text] = width
+        return width
@@ -8,9 +8,10 @@
 @Date    : 2022/1/4 17:01 
 """
 
-from PySide6.QtCore import QSettings, QMutex
+from PySide6.QtCore import QSettings, QMutex, QStandardPaths, QTimer, QThreadPool
 from PySide6.QtWidgets import QApplication, QStyle
 from PySide6.QtGui import QIcon
+from csv_profile import Profiler
 
 
 class Icon(object):
@@ -28,12 +29,22 @@ class Config(object):
     openPath = '.'
     savePath = '.'
     theme = ''
+    engine = 'parallel'     # csv解析引擎：python（单线程）/parallel（多进程）
+    memoryBudget = 1024     # 所有标签页的数据占用内存的上限（MB），超出时把最久未使用的标签页换出到磁盘
+    parseCache = 1          # 是否缓存大文件的解析结果，重新打开没有变化的文件时不再解析
+    parseCacheSize = 4096   # 解析缓存的总大小上限（MB），超出时删除最久未使用的
 
     # 私有属性
     __dir = '.'
     __file = 'config.ini'
     __fullFilePath = __dir + '/' + __file
     __writeMutex = QMutex()
+    __writeDelay = 2000     # 修改后延迟写入的时间（毫秒）
+    __writeTimer = None     # 延迟写入的定时器
+    __writePool = None      # 写配置文件的后台线程
+    __saved = None          # 最近一次读出或写入的配置，相同时不写文件
+    __generation = 0        # 最近一次取出的快照的序号
+    __written = 0           # 已写入文件的快照的序号，后台线程不会用旧的快照覆盖新的
     __icon = Icon()
     __appName = 'CSV Editor'
 
@@ -46,31 +57,49 @@ class Config(object):
     @classmethod
     @property
     def iconOpenFile(cls) -> QIcon:
-        return cls.__icon.OpenFile
+        return cls.__standardIcon('OpenFile', QStyle.SP_DialogOpenButton)
 
     @classmethod
     @property
     def iconCloseFile(cls) -> QIcon:
-        return cls.__icon.CloseFile
+        return cls.__standardIcon('CloseFile', QStyle.SP_DialogCloseButton)
 
     @classmethod
     @property
     def iconSaveFile(cls) -> QIcon:
-        return cls.__icon.SaveFile
+        return cls.__standardIcon('SaveFile', QStyle.SP_DialogSaveButton)
 
     @classmethod
     @property
     def iconSaveAsFile(cls) -> QIcon:
-        return cls.__icon.SaveAsFile
+        return cls.__standardIcon('SaveAsFile', QStyle.SP_FileLinkIcon)
+
+    @classmethod
+    @property
+    def cacheDir(cls) -> str:
+        # 缓存目录（编译后的主题样式表等），可以随时删除
+        return QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+
+    @classmethod
+    def __standardIcon(cls, name, pixmap) -> QIcon:
+        # 图标在第一次使用时才从当前风格中获取
+        icon = getattr(cls.__icon, name)
+        if icon is None:
+            icon = QApplication.style().standardIcon(pixmap)
+            setattr(cls.__icon, name, icon)
+        return icon
 
     @classmethod
     def init(cls, directory, app):
         cls.__dir = directory
         cls.__fullFilePath = "%s/%s" % (cls.__dir, cls.__file)
-        cls.__icon.OpenFile = app.style().standardIcon(QStyle.SP_DialogOpenButton)
-        cls.__icon.SaveFile = app.style().standardIcon(QStyle.SP_DialogSaveButton)
-        cls.__icon.CloseFile = app.style().standardIcon(QStyle.SP_DialogCloseButton)
-        cls.__icon.SaveAsFile = app.style().standardIcon(QStyle.SP_FileLinkIcon)
+        app.setApplicationName('CsvEditor')
+        cls.__writeTimer = QTimer()
+        cls.__writeTimer.setSingleShot(True)
+        cls.__writeTimer.setInterval(cls.__writeDelay)
+        cls.__writeTimer.timeout.connect(cls.__writeLater)
+        cls.__writePool = QThreadPool()
+        cls.__writePool.setMaxThreadCount(1)
 
     @classmethod
     def readConfig(cls):
@@ -96,23 +125,95 @@ class Config(object):
         cls.theme = settings.value('current', cls.theme)
         settings.endGroup()
 
-    @classmethod
-    def writeConfig(cls):
-        cls.__writeMutex.lock()
-        settings = QSettings(cls.__fullFilePath, QSettings.IniFormat)
-        settings.beginGroup('Default')
-        settings.setValue('position', cls.position)
-        settings.setValue('size', cls.size)
-        settings.setValue('maximized', cls.maximized)
+        settings.beginGroup('Parser')
+        cls.engine = settings.value('engine', cls.engine)
         settings.endGroup()
 
-        settings.beginGroup('File-Dialog')
-        settings.setValue('open', cls.openPath)
-        settings.setValue('save', cls.savePath)
+        settings.beginGroup('Memory')
+        cls.memoryBudget = int(settings.value('budget', cls.memoryBudget))
         settings.endGroup()
 
-        settings.beginGroup('Theme')
-        settings.setValue('current', cls.theme)
+        settings.beginGroup('Cache')
+        cls.parseCache = int(settings.value('enabled', cls.parseCache))
+        cls.parseCacheSize = int(settings.value('size', cls.parseCacheSize))
         settings.endGroup()
-        cls.__writeMutex.unlock()
+        cls.__saved = cls.__snapshot()
 
+    @classmethod
+    def changed(cls):
+        """
+        配置项修改后调用：延迟一段时间后在后台线程中写入，期间的多次修改（例如拖动窗口）只写一次
+        :return: None
+        """
+        if cls.__writeTimer is not None:
+            cls.__writeTimer.start()
+
+    @classmethod
+    def writeConfig(cls):
+        """
+        立即在当前线程中写入（退出前调用），并等待后台的写入完成；配置没有变化时不写文件
+        :return: None
+        """
+        if cls.__writeTimer is not None:
+            cls.__writeTimer.stop()
+        cls.__write(*cls.__takeSnapshot())
+        if cls.__writePool is not None:
+            cls.__writePool.waitForDone()
+
+    @classmethod
+    def __snapshot(cls):
+        # 所有可读写配置项的副本，按分组保存
+        return {
+            'Default': {'position': list(cls.position), 'size': list(cls.size), 'maximized': cls.maximized},
+            'File-Dialog': {'open': cls.openPath, 'save': cls.savePath},
+            'Theme': {'current': cls.theme},
+            'Parser': {'engine': cls.engine},
+            'Memory': {'budget': cls.memoryBudget},
+            'Cache': {'enabled': cls.parseCache, 'size': cls.parseCacheSize},
+        }
+
+    @classmethod
+    def __takeSnapshot(cls):
+        """
+        取出需要写入的配置
+        :return: (快照, 序号)，与上次写入的相同时快照为None
+        """
+        snapshot = cls.__snapshot()
+        if snapshot == cls.__saved:
+            return None, 0
+        cls.__saved = snapshot
+        cls.__generation += 1
+        return snapshot, cls.__generation
+
+    @classmethod
+    def __writeLater(cls):
+        # 延迟时间到：在界面线程中取快照，在后台线程中写文件
+        snapshot, generation = cls.__takeSnapshot()
+        if snapshot is not None:
+            cls.__writePool.start(lambda: cls.__write(snapshot, generation))
+
+    @classmethod
+    def __write(cls, snapshot, generation):
+        """
+        把快照写入配置文件，已经写入更新的快照时跳过
+        :param snapshot: 配置的快照，None: 不需要写入
+        :param generation: 快照的序号
+        :return: None
+        """
+        if snapshot is None:
+            return
+        with Profiler.span('config.write'):
+            cls.__writeMutex.lock()
+            try:
+                if generation <= cls.__written:
+                    return
+                settings = QSettings(cls.__fullFilePath, QSettings.IniFormat)
+                for group, values in snapshot.items():
+                    settings.beginGroup(group)
+                    for key, value in values.items():
+                        settings.setValue(key, value)
+                    settings.endGroup()
+                settings.sync()
+                cls.__written = generation
+            finally:
+                cls.__writeMutex.unlock()
@@ -0,0 +1,384 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_arrow.py
+@Desc    : Parquet与Arrow IPC（Feather）的读写：按行组流式读取为列编码的批次，类型列直接写出不经过文本（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import csv
+import json
+import os
+import numpy as np
+from csv_store import ColumnBatch
+from csv_types import IntColumn, FloatColumn, DateTimeColumn, CategoryColumn, \
+    KIND_TEXT, KIND_DATETIME, KIND_CATEGORY
+from csv_writer import atomicOpen
+from csv_profile import Profiler
+
+TABLE_PARQUET = 'parquet'
+TABLE_ARROW = 'arrow'           # Arrow IPC文件格式（Feather V2）
+
+# 文件开头的魔数（读取时按内容判断）
+_MAGICS = [(b'PAR1', TABLE_PARQUET), (b'ARROW1', TABLE_ARROW)]
+# 保存时按扩展名选择格式
+_SUFFIXES = {'.parquet': TABLE_PARQUET, '.pq': TABLE_PARQUET,
+             '.arrow': TABLE_ARROW, '.feather': TABLE_ARROW, '.ipc': TABLE_ARROW}
+
+_ROW_GROUP_ROWS = 1 << 20       # 写入时每个行组（Arrow记录批次）的行数
+_LAZY_ROWS = 100000             # 延迟加载的数据每次转换的行数
+_MAX_CATEGORIES = 1 << 16       # 与CategoryColumn一致，更多不同值的字典列作为字符串列读取
+_FORMAT_KEY = b'csveditor.format'   # 字段元数据中保存类型列的格式（小数位数、日期写法），读回后按原样格式化
+
+
+def detectTableFormat(path):
+    """
+    按文件开头的魔数判断是否为Parquet/Arrow IPC文件
+    :param path: 文件路径
+    :return: TABLE_PARQUET/TABLE_ARROW，其他文件为None
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(6)
+    except OSError:
+        return None
+    for magic, tableFormat in _MAGICS:
+        if head.startswith(magic):
+            return tableFormat
+    return None
+
+
+def tableFormatForPath(path):
+    """
+    按扩展名决定保存的格式
+    :param path: 文件路径
+    :return: TABLE_PARQUET/TABLE_ARROW，按csv保存时为None
+    """
+    return _SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def _pyarrow():
+    # pyarrow是可选依赖，只在读写Parquet/Arrow文件时导入
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise OSError('读写Parquet/Arrow文件需要安装pyarrow（pip install pyarrow）')
+    return pyarrow
+
+
+class TableReader(object):
+    """
+    分批读取Parquet/Arrow IPC文件：Parquet按行组流式解压，Arrow IPC文件映射到内存后按记录批次读取
+    每列直接转换为类型列或utf-8编码的字符串列，不经过csv文本解析
+    接口与ChunkReader一致，列名总是作为列头
+    """
+
+    def __init__(self, path, columns=None):
+        """
+        :param path: 文件路径
+        :param columns: 读取的列号列表（列投影，未读取的列不解压），None: 所有列
+        """
+        self.file = path
+        self.format = detectTableFormat(path)
+        self.header = None      # 列头（在第一批之前读出）
+        self.bytesRead = 0
+        self.rowsParsed = 0
+        self.__columns = None if columns is None else list(columns)
+        self.__names = None
+        self.__size = 0
+        self.__rowCount = 0
+        self.__parquet = None
+        self.__ipc = None
+        self.__source = None
+
+    @property
+    def names(self):
+        """
+        文件中所有列的列名（打开文件读取元数据）
+        :return: 列表
+        """
+        self.__open()
+        return self.__names
+
+    def project(self, columns):
+        """
+        只读取部分列（在读取第一批之前调用）
+        :param columns: 列号列表
+        :return: None
+        """
+        self.__columns = list(columns)
+
+    def batches(self, firstRows=500, maxRows=20000):
+        """
+        分批读取，批大小与ChunkReader一样从firstRows开始逐批翻倍
+        :param firstRows: 第一批的行数
+        :param maxRows: 每批的最大行数
+        :return: 生成器，每次返回一批行（ColumnBatch）
+        """
+        pa = _pyarrow()
+        try:
+            self.__open()
+            self.header = self.__names if self.__columns is None else [self.__names[c] for c in self.__columns]
+            size = firstRows
+            for recordBatch in self.__recordBatches(maxRows):
+                start = 0
+                while start < recordBatch.num_rows:
+                    part = recordBatch.slice(start, size)
+                    start += part.num_rows
+                    size = min(size * 2, maxRows)
+                    with Profiler.span('arrow.convert'):
+                        batch = ColumnBatch(part.num_rows, [_fromArrow(array, _fieldFormat(field))
+                                                            for array, field in zip(part.columns, part.schema)])
+                    self.rowsParsed += batch.rowCount
+                    self.bytesRead = self.__size * self.rowsParsed // max(self.__rowCount, 1)
+                    yield batch
+        except pa.ArrowException as e:
+            # 与csv文件一样作为读取错误报告
+            raise OSError('无法读取 %s：%s' % (self.file, e))
+        self.bytesRead = self.__size
+
+    def close(self):
+        if self.__source is not None:
+            self.__source.close()
+            self.__source = None
+
+    def __open(self):
+        if self.__names is not None:
+            return
+        pa = _pyarrow()
+        self.__size = os.path.getsize(self.file)
+        if self.format == TABLE_PARQUET:
+            self.__parquet = pa.parquet.ParquetFile(self.file)
+            schema = self.__parquet.schema_arrow
+            self.__rowCount = self.__parquet.metadata.num_rows
+        else:
+            self.__source = pa.memory_map(self.file)
+            self.__ipc = pa.ipc.open_file(self.__source)
+            schema = self.__ipc.schema
+            self.__rowCount = sum(self.__ipc.get_batch(i).num_rows for i in range(self.__ipc.num_record_batches))
+        self.__names = list(schema.names)
+
+    def __recordBatches(self, maxRows):
+        if self.format == TABLE_PARQUET:
+            # 按行组流式解压，投影时只解压选中的列
+            columns = None if self.__columns is None else [self.__names[c] for c in self.__columns]
+            yield from self.__parquet.iter_batches(batch_size=maxRows, columns=columns)
+            return
+        for i in range(self.__ipc.num_record_batches):
+            recordBatch = self.__ipc.get_batch(i)
+            yield recordBatch if self.__columns is None else recordBatch.select(self.__columns)
+
+
+def _fieldFormat(field):
+    # 本程序保存时记录的格式，其他程序写的文件没有
+    try:
+        fmt = json.loads(field.metadata[_FORMAT_KEY])
+    except (TypeError, KeyError, ValueError):
+        return None
+    return tuple(fmt) if isinstance(fmt, list) else fmt
+
+
+def _fromArrow(array, fmt=None):
+    """
+    把一列Arrow数组转换为ColumnBatch的列：整数、浮点数、日期时间、字典编码的字符串转换为类型列，
+    其余的值转换为utf-8编码的字符串；null作为空单元格
+    :param array: pyarrow.Array/ChunkedArray
+    :param fmt: 保存时记录的类型列格式，None: 默认格式
+    :return: TypedColumn或(utf-8字节串, 每个值的字节长度数组)
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    t = array.type
+    missing = array.is_null().to_numpy(zero_copy_only=False) if array.null_count else None
+    try:
+        if pa.types.is_integer(t):
+            values = array.cast(pa.int64()).fill_null(0).to_numpy(zero_copy_only=False, writable=True)
+            return IntColumn(values, missing)
+        if pa.types.is_floating(t):
+            values = array.cast(pa.float64()).fill_null(0).to_numpy(zero_copy_only=False, writable=True)
+            return FloatColumn(values, missing, fmt if isinstance(fmt, int) and 0 < fmt <= 15 else None)
+        if pa.types.is_date(t):
+            values = array.cast(pa.date32()).to_numpy(zero_copy_only=False).astype('datetime64[D]')
+            return DateTimeColumn(values, missing, _dateFormat(fmt, 'D', ('D', '-', None)))
+        if pa.types.is_timestamp(t) and t.tz is None:
+            # 只有整秒的时间能原样写回；更精确的时间按文本读取
+            values = array.cast(pa.timestamp('s')).to_numpy(zero_copy_only=False).astype('datetime64[s]')
+            return DateTimeColumn(values, missing, _dateFormat(fmt, 's', ('s', '-', ' ')))
+        if pa.types.is_dictionary(t) and (pa.types.is_string(t.value_type) or pa.types.is_large_string(t.value_type)):
+            if len(array.dictionary) < _MAX_CATEGORIES:
+                categories = [value or '' for value in array.dictionary.to_pylist()]
+                indices = array.indices
+                if missing is not None:
+                    categories.append('')
+                    indices = indices.fill_null(len(categories) - 1)
+                return CategoryColumn(indices.to_numpy(zero_copy_only=False).astype(np.uint32), categories)
+            array = array.cast(t.value_type)
+    except pa.ArrowInvalid:
+        # 超出int64的无符号整数、不是整秒的时间等
+        pass
+    return _encoded(pa, pc, array)
+
+
+def _dateFormat(fmt, unit, default):
+    # 单位一致且写法合法时沿用保存时的格式
+    if isinstance(fmt, tuple) and len(fmt) == 3 and fmt[0] == unit and fmt[1] in ('-', '/') \
+            and fmt[2] in ((None,) if unit == 'D' else ('T', ' ')):
+        return fmt
+    return default
+
+
+def _encoded(pa, pc, array):
+    # 转换为large_string后直接取出utf-8数据和偏移，不逐个创建Python字符串
+    try:
+        array = array.cast(pa.large_string())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        array = pa.array([None if value is None else str(value) for value in array.to_pylist()], pa.large_string())
+    array = pc.fill_null(array, '')
+    _, offsets, data = array.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+    return data.to_pybytes()[offsets[0]:offsets[-1]] if data is not None else b'', np.diff(offsets).astype(np.uint64)
+
+
+def columnNames(store, withHeader=True):
+    """
+    保存时的列名：有列头时使用列头，没有的列为column1、column2...
+    :param store: ColumnStore/LazyStore
+    :param withHeader: 是否使用列头
+    :return: 列名列表
+    """
+    header = store.header if withHeader and store.header is not None else []
+    return [header[c] if c < len(header) else 'column%d' % (c + 1) for c in range(store.columnCount)]
+
+
+def _toArrow(pa, column):
+    """
+    ColumnStore的一列转换为Arrow数组：数值和字符串的数据缓冲区直接引用，不复制
+    :param pa: pyarrow
+    :param column: StringColumn/TypedColumn
+    :return: pyarrow.Array
+    """
+    if column.kind == KIND_TEXT:
+        data, offsets, edits = column.buffers()
+        if edits:
+            return pa.array(column.formatRows(np.arange(len(column))), pa.large_string())
+        return pa.LargeStringArray.from_buffers(len(column), pa.py_buffer(offsets.view(np.int64)), pa.py_buffer(data))
+    if column.kind == KIND_CATEGORY:
+        return pa.DictionaryArray.from_arrays(pa.array(column.values.astype(np.int32)),
+                                              pa.array(column.categories, pa.large_string()))
+    mask = column.missing
+    if column.kind == KIND_DATETIME and column.fmt[0] == 'D':
+        return pa.array(column.values, pa.date32(), mask=mask)
+    return pa.array(column.values, mask=mask)
+
+
+def _tables(pa, store, names):
+    # 完整加载的数据整体转换为一个表；延迟加载的数据按行分段转换，所有列都是字符串
+    if hasattr(store, 'columns'):
+        arrays = [_toArrow(pa, column) for column in store.columns]
+        fields = [pa.field(name, array.type, metadata=None if column.kind in (KIND_TEXT, KIND_CATEGORY)
+                           or column.fmt is None else {_FORMAT_KEY: json.dumps(column.fmt)})
+                  for name, array, column in zip(names, arrays, store.columns)]
+        yield pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+        return
+    rows = []
+    for row in store.iterRows():
+        rows.append(row)
+        if len(rows) == _LAZY_ROWS:
+            yield _textTable(pa, rows, names)
+            rows = []
+    if rows or not store.rowCount:
+        yield _textTable(pa, rows, names)
+
+
+def _textTable(pa, rows, names):
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return pa.Table.from_arrays([pa.array(values, pa.large_string()) for values in columns], names=names)
+
+
+class TableWriter(object):
+    """
+    逐表或逐行写入Parquet/Arrow IPC文件：第一个表的结构作为文件的结构
+    按行写入时（批处理模式）每_LAZY_ROWS行转换为一个表，所有列都是字符串
+    """
+
+    def __init__(self, f, names, tableFormat):
+        """
+        :param f: 二进制文件对象（不关闭）
+        :param names: 列名列表，按行写入时决定列数
+        :param tableFormat: TABLE_PARQUET/TABLE_ARROW
+        """
+        self.__pa = _pyarrow()
+        self.__f = f
+        self.__names = names
+        self.__format = tableFormat
+        self.__writer = None
+        self.__rows = []
+        self.__count = 0
+
+    def writeTable(self, table):
+        """
+        写入一个表
+        :param table: pyarrow.Table
+        :return: None
+        """
+        if self.__writer is None:
+            self.__writer = self.__pa.parquet.ParquetWriter(self.__f, table.schema) \
+                if self.__format == TABLE_PARQUET else self.__pa.ipc.new_file(self.__f, table.schema)
+        if self.__format == TABLE_PARQUET:
+            self.__writer.write_table(table, row_group_size=_ROW_GROUP_ROWS)
+        else:
+            self.__writer.write_table(table, max_chunksize=_ROW_GROUP_ROWS)
+
+    def writerows(self, rows):
+        """
+        写入多行，短行缺少的列为空字符串
+        :param rows: 行（字符串序列）的迭代器
+        :return: None
+        """
+        width = len(self.__names)
+        for row in rows:
+            self.__count += 1
+            if len(row) > width:
+                raise csv.Error('第 %d 行有 %d 个字段，多于列数 %d' % (self.__count, len(row), width))
+            self.__rows.append(tuple(row) + ('',) * (width - len(row)))
+            if len(self.__rows) == _LAZY_ROWS:
+                self.__flush()
+
+    def __flush(self):
+        self.writeTable(_textTable(self.__pa, self.__rows, self.__names))
+        self.__rows = []
+
+    def close(self):
+        """
+        写出剩余的行并结束文件（不关闭文件对象）
+        :return: None
+        """
+        if self.__rows or self.__writer is None:
+            self.__flush()
+        self.__writer.close()
+
+
+def saveTable(store, path, withHeader=True, beforeReplace=None, tableFormat=None):
+    """
+    把表格数据原子地保存为Parquet/Arrow IPC文件
+    :param store: ColumnStore/LazyStore
+    :param path: 目标文件
+    :param withHeader: 是否使用列头作为列名
+    :param beforeReplace: 替换目标文件之前的回调
+    :param tableFormat: TABLE_PARQUET/TABLE_ARROW，None: 按扩展名决定
+    :return: None
+    """
+    pa = _pyarrow()
+    names = columnNames(store, withHeader)
+    with Profiler.span('file.save'), atomicOpen(path, beforeReplace) as f:
+        writer = TableWriter(f, names, tableFormat or tableFormatForPath(path))
+        for table in _tables(pa, store, names):
+            writer.writeTable(table)
+        writer.close()
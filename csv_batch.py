@@ -0,0 +1,263 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_batch.py
+@Desc    : 无界面的批处理模式：流式转换csv（重新编码、更换分隔符、选择列、筛选行、排序、压缩/解压），不依赖Qt
+@Author  : qdu
+@Date    : 2026/10/17 19:30
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+import numpy as np
+from csv_parser import FileFormat, createReader, ENGINE_PYTHON, ENGINES
+from csv_arrow import TableReader, TableWriter, tableFormatForPath
+from csv_store import ColumnStore
+from csv_writer import RowWriter, atomicOpen
+from csv_compress import compressedOutput, compressionForPath
+from csv_query import Query, QueryError, findColumn
+from csv_sort import ExternalSorter, SortError, parseSortKeys
+from csv_types import KIND_TEXT
+from csv_profile import Profiler
+
+_BATCH_ROWS = 20000         # 每批解析的行数，内存占用与之成正比，与文件大小无关
+
+# 退出码
+EXIT_OK = 0
+EXIT_ERROR = 1              # 文件读写、解码或查询错误
+EXIT_USAGE = 2              # 命令行参数错误（与argparse一致）
+
+
+def convertFile(source, target, encoding=None, delimiter=None, columns=None, query=None,
+                withHeader=None, sourceFormat=None, engine=ENGINE_PYTHON, sort=None) -> dict:
+    """
+    流式转换：逐批解析源文件，筛选、选择列后按目标格式写出，内存中只保留一批行
+    排序时每批的行交给外部归并排序（超出内存的部分写入临时文件），全部读完后按顺序写出
+    目标文件先写临时文件再原子替换；target为'-'时写到标准输出
+    目标文件的扩展名为.parquet/.arrow/.feather等时保存为Parquet/Arrow IPC文件（列头作为列名，所有列都是字符串），
+    此时encoding和delimiter不起作用
+    :param source: 源文件
+    :param target: 目标文件，'-': 标准输出
+    :param encoding: 目标编码，None: 与源文件相同
+    :param delimiter: 目标分隔符，None: 与源文件相同
+    :param columns: 输出的列（列名、#n），None: 所有列
+    :param query: 筛选条件（与筛选栏的语法相同），None: 所有行
+    :param withHeader: 源文件是否有列头，None: 自动探测
+    :param sourceFormat: 源文件格式（FileFormat），None: 自动探测
+    :param engine: 解析引擎
+    :param sort: 排序条件（例如"price desc, name"，按源文件的列），None: 保持原来的顺序
+    :return: 统计信息
+    """
+    start = time.perf_counter()
+    fileFormat = sourceFormat or FileFormat.detect(source)
+    if withHeader is not None:
+        fileFormat.hasHeader = withHeader
+    targetFormat = FileFormat(encoding or fileFormat.encoding, delimiter or fileFormat.delimiter,
+                              fileFormat.quotechar, fileFormat.hasHeader)
+    reader = createReader(source, fileFormat.hasHeader, fileFormat, engine)
+    projected = None
+    if isinstance(reader, TableReader) and columns and not query and not sort:
+        # Parquet/Arrow文件的列名在文件元数据中，只输出部分列时其余的列不读取（Parquet按列名投影，不能重复）
+        projected, _, _ = _prepare(reader.names, columns, None)
+        if len(set(projected)) == len(projected):
+            reader.project(projected)
+            columns = None
+        else:
+            projected = None
+    tableFormat = tableFormatForPath(target) if target != '-' else None
+    stats = {'rowsRead': 0, 'rowsWritten': 0}
+    with _openTarget(target, tableFormat) as f:
+        writer = selected = compiled = keys = sorter = None
+        try:
+            for batch in Profiler.timed(reader.batches(_BATCH_ROWS, _BATCH_ROWS), 'load.parse'):
+                store = ColumnStore(fileFormat)
+                store.appendBatch(batch)
+                if writer is None:
+                    # 列头在第一批之前读出，之后才能按列名解析列、查询和排序条件
+                    selected, compiled, keys = _prepare(reader.header, columns, query, sort)
+                    writer = _createWriter(f, targetFormat, tableFormat, reader.header, selected, store.columnCount)
+                    if keys:
+                        sorter = ExternalSorter([descending for _, descending in keys])
+                rows = compiled.evaluate(store) if compiled is not None else np.arange(store.rowCount)
+                if sorter is not None:
+                    sorter.add(list(_project(store, rows, selected)), _keyTexts(store, rows, keys))
+                else:
+                    with Profiler.span('batch.write'):
+                        writer.writerows(_project(store, rows, selected))
+                stats['rowsRead'] += store.rowCount
+                stats['rowsWritten'] += len(rows)
+            if sorter is not None:
+                with Profiler.span('batch.write'):
+                    writer.writerows(sorter)
+        finally:
+            reader.close()
+            if sorter is not None:
+                sorter.close()
+        if writer is None:
+            # 没有数据行：仍然检查参数并写出列头
+            selected, compiled, keys = _prepare(reader.header, columns, query, sort)
+            writer = _createWriter(f, targetFormat, tableFormat, reader.header, selected, 0)
+        if tableFormat is not None:
+            writer.close()
+    seconds = time.perf_counter() - start
+    stats.update({
+        'source': source,
+        'target': target,
+        'engine': engine,
+        'sourceEncoding': fileFormat.encoding,
+        'sourceDelimiter': fileFormat.delimiter,
+        'targetFormat': tableFormat or 'csv',
+        'targetEncoding': targetFormat.encoding if tableFormat is None else None,
+        'targetDelimiter': targetFormat.delimiter if tableFormat is None else None,
+        'header': reader.header is not None,
+        'columns': len(selected) if selected is not None else len(projected) if projected is not None else None,
+        'bytesRead': os.path.getsize(source),
+        'bytesWritten': os.path.getsize(target) if target != '-' else None,
+        'seconds': round(seconds, 3),
+        'rowsPerSecond': round(stats['rowsRead'] / seconds) if seconds else None,
+    })
+    return stats
+
+
+@contextmanager
+def _openTarget(target, tableFormat=None):
+    # 标准输出不能原子替换，直接写入；目标文件按扩展名压缩（Parquet/Arrow文件自己压缩，不再整体压缩）
+    if target == '-':
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+        return
+    compression = compressionForPath(target) if tableFormat is None else None
+    with atomicOpen(target) as f, compressedOutput(f, compression) as out:
+        yield out
+
+
+def _createWriter(f, targetFormat, tableFormat, header, selected, width):
+    """
+    创建目标文件的写入对象：csv先写出列头；Parquet/Arrow文件的列头作为列名，没有的列为column1、column2...
+    :param width: 第一批数据的列数（没有选择列时决定Parquet/Arrow文件的列数）
+    :return: RowWriter/TableWriter
+    """
+    if tableFormat is None:
+        writer = RowWriter(f, targetFormat)
+        _writeHeader(writer, header, selected)
+        return writer
+    header = header or []
+    columns = selected if selected is not None else range(max(len(header), width))
+    names = [header[c] if c < len(header) and header[c] else 'column%d' % (c + 1) for c in columns]
+    return TableWriter(f, names, tableFormat)
+
+
+def _prepare(header, columns, query, sort=None):
+    """
+    按列头解析要输出的列、筛选条件和排序条件
+    :return: (列号列表或None, Query或None, [(列号, 是否降序)]或None)
+    """
+    selected = None
+    if columns:
+        selected = []
+        for name in columns:
+            column = findColumn(name, header or [])
+            if column is None:
+                raise QueryError('找不到列：%s' % name)
+            selected.append(column)
+    compiled = Query(query, header) if query else None
+    if compiled is not None and compiled.empty:
+        compiled = None
+    keys = parseSortKeys(sort, header) if sort else None
+    return selected, compiled, keys
+
+
+def _writeHeader(writer, header, selected):
+    if header is None:
+        return
+    if selected is not None:
+        header = [header[c] if c < len(header) else '' for c in selected]
+    writer.writerows([header])
+
+
+def _project(store, rows, selected):
+    # 按列取出要输出的值再组合成行：类型列向量化格式化，短行缺少的列为空字符串
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = range(store.columnCount) if selected is None else selected
+    values = []
+    for c in columns:
+        if c >= store.columnCount:
+            values.append([''] * len(rows))
+            continue
+        column = store.columns[c]
+        if column.kind == KIND_TEXT:
+            values.append([column.get(r) for r in rows.tolist()])
+        else:
+            values.append(column.formatAll()[rows].tolist())
+    return zip(*values)
+
+
+def _keyTexts(store, rows, keys):
+    # 排序列的文本，短行缺少的列为空字符串
+    return [store.texts(column, rows) if column < store.columnCount else np.full(len(rows), '')
+            for column, _ in keys]
+
+
+def _delimiter(text):
+    # 命令行中的\t、tab表示制表符
+    if text in ('\\t', 'tab', 'TAB'):
+        return '\t'
+    if len(text) != 1:
+        raise argparse.ArgumentTypeError('分隔符必须是一个字符：%s' % text)
+    return text
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(prog='main.py --batch',
+                                     description='流式转换csv文件，完成后在标准输出打印JSON格式的统计信息')
+    parser.add_argument('source', help='源文件，gzip/xz/zstd压缩的文件自动解压，也可以是Parquet/Arrow文件')
+    parser.add_argument('target', help="目标文件，'-'表示标准输出（此时统计信息打印到标准错误）；扩展名为.gz/.xz/.zst时压缩保存，"
+                                       "为.parquet/.arrow/.feather时保存为Parquet/Arrow文件")
+    parser.add_argument('-e', '--encoding', help='目标编码，默认与源文件相同')
+    parser.add_argument('-d', '--delimiter', type=_delimiter, help='目标分隔符（\\t表示制表符），默认与源文件相同')
+    parser.add_argument('-c', '--columns', help='输出的列，用逗号分隔，可以是列名或#n，默认所有列')
+    parser.add_argument('-f', '--filter', dest='query', help='筛选条件，语法与筛选栏相同，例如 "price > 100 && name ~ ^a"')
+    parser.add_argument('-s', '--sort', help='排序条件，用逗号分隔的列名或#n，后面可以跟asc/desc，例如 "price desc,name"；'
+                                               '超出内存的数据用临时文件外部归并排序')
+    parser.add_argument('--input-encoding', help='源文件编码，默认自动探测')
+    parser.add_argument('--input-delimiter', type=_delimiter, help='源文件分隔符，默认自动探测')
+    _group = parser.add_mutually_exclusive_group()
+    _group.add_argument('--header', dest='withHeader', action='store_true', default=None, help='源文件有列头')
+    _group.add_argument('--no-header', dest='withHeader', action='store_false', help='源文件没有列头')
+    parser.add_argument('--engine', choices=ENGINES, default=ENGINE_PYTHON, help='解析引擎，默认%(default)s')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """
+    批处理模式的入口
+    :param argv: 命令行参数（不含--batch），None: sys.argv[1:]
+    :return: 退出码
+    """
+    try:
+        args = parseArgs(sys.argv[1:] if argv is None else argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+    out = sys.stderr if args.target == '-' else sys.stdout
+    try:
+        sourceFormat = FileFormat.detect(args.source)
+        if args.input_encoding:
+            sourceFormat.encoding = args.input_encoding
+        if args.input_delimiter:
+            sourceFormat.delimiter = args.input_delimiter
+        columns = [name.strip() for name in args.columns.split(',')] if args.columns else None
+        stats = convertFile(args.source, args.target, args.encoding, args.delimiter, columns, args.query,
+                            args.withHeader, sourceFormat, args.engine, args.sort)
+    except (OSError, UnicodeError, LookupError, csv.Error, QueryError, SortError) as e:
+        json.dump({'error': str(e)}, out, ensure_ascii=False)
+        out.write('\n')
+        return EXIT_ERROR
+    json.dump(stats, out, ensure_ascii=False)
+    out.write('\n')
+    return EXIT_OK
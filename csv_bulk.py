@@ -0,0 +1,239 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_bulk.py
+@Desc    : 批量修改：查找替换、向下填充、文本变换及由表达式计算的派生列，按列向量化计算（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:55
+"""
+
+import ast
+import re
+import numpy as np
+from csv_query import findColumn
+from csv_types import KIND_INT, KIND_FLOAT
+
+# 文本变换 {名称: 向量化函数}
+TRANSFORMS = {
+    'trim': np.strings.strip,
+    'upper': np.strings.upper,
+    'lower': np.strings.lower,
+    'title': np.strings.title,
+}
+
+
+class BulkError(ValueError):
+    """
+    批量修改的参数错误（例如正则表达式或表达式不合法）
+    """
+    pass
+
+
+def replaceText(texts, pattern, replacement, regex=False, ignoreCase=False):
+    """
+    查找替换：普通文本整列向量化替换；正则表达式对每个不同的值只替换一次
+    :param texts: 字符串数组
+    :param pattern: 查找的文本或正则表达式
+    :param replacement: 替换为（正则表达式时可以用\\1引用分组）
+    :param regex: 是否为正则表达式
+    :param ignoreCase: 是否不区分大小写
+    :return: 替换后的字符串数组
+    """
+    if not pattern:
+        raise BulkError('查找的内容为空')
+    if not regex and not ignoreCase:
+        return np.strings.replace(texts, pattern, replacement)
+    try:
+        compiled = re.compile(pattern if regex else re.escape(pattern), re.IGNORECASE if ignoreCase else 0)
+        if not regex:
+            replacement = replacement.replace('\\', '\\\\')
+        unique, inverse = np.unique(texts, return_inverse=True)
+        replaced = [compiled.sub(replacement, value) for value in unique.tolist()]
+    except (re.error, IndexError) as e:
+        raise BulkError('正则表达式错误：%s' % e)
+    return np.array(replaced, dtype=str)[inverse] if len(unique) else texts
+
+
+def fillDown(texts):
+    """
+    向下填充：空单元格取上方最近的非空值（第一个非空值之前的保持为空）
+    :param texts: 字符串数组（按显示的顺序）
+    :return: 填充后的字符串数组
+    """
+    source = np.where(texts != '', np.arange(len(texts)), 0)
+    np.maximum.accumulate(source, out=source)
+    return texts[source]
+
+
+def transformText(texts, name):
+    """
+    文本变换
+    :param texts: 字符串数组
+    :param name: TRANSFORMS中的名称
+    :return: 变换后的字符串数组
+    """
+    return TRANSFORMS[name](texts)
+
+
+class Expression(object):
+    """
+    派生列的表达式，按列向量化计算，例如：
+      price * 1.1            数值列参与四则运算（+ - * / // % **）
+      name + "-" + str(id)   +的任意一边为文本时为拼接
+      upper(name)            函数：num str len upper lower trim title round abs
+      col("unit price")      列名不是标识符时用col引用，也可以写作col(3)
+    文本列参与+以外的运算时按数值解析，不能解析的值及空单元格的结果为空
+    """
+
+    __binaryOps = {
+        ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide,
+        ast.FloorDiv: np.floor_divide, ast.Mod: np.mod, ast.Pow: np.power,
+    }
+    __unaryOps = {ast.USub: np.negative, ast.UAdd: np.positive}
+
+    def __init__(self, text, header=None):
+        """
+        :param text: 表达式
+        :param header: 列头（用于按名称引用列）
+        """
+        self.text = text
+        self.__header = header or []
+        try:
+            self.__tree = ast.parse(text.strip(), mode='eval').body
+        except SyntaxError as e:
+            raise BulkError('表达式错误：%s' % e.msg)
+        self.columns = set()        # 引用的列
+        self.__check(self.__tree)
+
+    def __check(self, node):
+        # 只允许常量、列、运算符及内置的函数
+        if isinstance(node, ast.BinOp) and type(node.op) in self.__binaryOps:
+            self.__check(node.left)
+            self.__check(node.right)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in self.__unaryOps:
+            self.__check(node.operand)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)) \
+                and not isinstance(node.value, bool):
+            pass
+        elif isinstance(node, ast.Name):
+            self.columns.add(self.__column(node.id))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name == 'col':
+                if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant):
+                    raise BulkError('col的参数应为列名或列号')
+                self.columns.add(self.__column(node.args[0].value))
+            elif name in _FUNCTIONS:
+                for arg in node.args:
+                    self.__check(arg)
+            else:
+                raise BulkError('未知的函数：%s' % name)
+        else:
+            raise BulkError('表达式中不支持：%s' % ast.get_source_segment(self.text.strip(), node))
+
+    def __column(self, name):
+        if isinstance(name, int) and not isinstance(name, bool):
+            column = name - 1 if name > 0 else None
+        else:
+            column = findColumn(str(name), self.__header)
+        if column is None:
+            raise BulkError('找不到列：%s' % name)
+        return column
+
+    def evaluate(self, store, rows):
+        """
+        计算指定行的结果
+        :param store: ColumnStore
+        :param rows: 数据行号数组
+        :return: 字符串数组
+        """
+        for column in self.columns:
+            if column >= store.columnCount:
+                raise BulkError('找不到列：#%d' % (column + 1))
+        with np.errstate(all='ignore'):
+            try:
+                value = self.__evaluate(self.__tree, store, rows)
+            except TypeError as e:
+                raise BulkError('表达式错误：%s' % e)
+        return np.broadcast_to(_text(value), len(rows)).copy()
+
+    def __evaluate(self, node, store, rows):
+        if isinstance(node, ast.BinOp):
+            left = self.__evaluate(node.left, store, rows)
+            right = self.__evaluate(node.right, store, rows)
+            if isinstance(node.op, ast.Add) and (_isText(left) or _isText(right)):
+                return np.strings.add(_text(left), _text(right))
+            return self.__binaryOps[type(node.op)](_number(left), _number(right))
+        if isinstance(node, ast.UnaryOp):
+            return self.__unaryOps[type(node.op)](_number(self.__evaluate(node.operand, store, rows)))
+        if isinstance(node, ast.Constant):
+            return np.str_(node.value) if isinstance(node.value, str) else np.float64(node.value)
+        if isinstance(node, ast.Name):
+            return _columnValues(store, self.__column(node.id), rows)
+        if node.func.id == 'col':
+            return _columnValues(store, self.__column(node.args[0].value), rows)
+        return _FUNCTIONS[node.func.id](*[self.__evaluate(arg, store, rows) for arg in node.args])
+
+
+def _columnValues(store, column, rows):
+    # 整数、浮点数列取数值（空单元格为NaN），其他列取文本
+    typed = store.columns[column]
+    if typed.kind not in (KIND_INT, KIND_FLOAT):
+        return typed.formatRows(rows)
+    values = typed.values[rows].astype(np.float64)
+    if typed.missing is not None:
+        values[typed.missing[rows]] = np.nan
+    return values
+
+
+def _isText(value):
+    return value.dtype.kind == 'U'
+
+
+def _number(value):
+    # 文本按数值解析，不能解析的为NaN（每个不同的值只解析一次）
+    if not _isText(value):
+        return value
+    if value.ndim == 0:
+        return _parseNumber(str(value))
+    unique, inverse = np.unique(value, return_inverse=True)
+    return np.array([_parseNumber(text) for text in unique.tolist()])[inverse] if len(unique) else np.zeros(0)
+
+
+def _parseNumber(text):
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def _text(value):
+    # 数值格式化为最多15位有效数字（整数不带小数点），NaN为空
+    if _isText(value):
+        return value
+    finite = np.isfinite(value)
+    if np.all(~finite | ((value == np.round(value)) & (np.abs(value) < 2 ** 53))):
+        texts = np.where(finite, value, 0).astype(np.int64).astype(str)
+    else:
+        texts = np.char.mod('%.15g', value)
+    if not np.all(finite):
+        texts = np.where(finite, texts, np.where(np.isnan(value), '', np.where(value > 0, 'inf', '-inf')))
+    return texts
+
+
+def _round(value, digits=0):
+    return np.round(_number(value), int(digits))
+
+
+_FUNCTIONS = {
+    'num': _number,
+    'str': _text,
+    'len': lambda value: np.strings.str_len(_text(value)).astype(np.float64),
+    'upper': lambda value: np.strings.upper(_text(value)),
+    'lower': lambda value: np.strings.lower(_text(value)),
+    'trim': lambda value: np.strings.strip(_text(value)),
+    'title': lambda value: np.strings.title(_text(value)),
+    'round': _round,
+    'abs': lambda value: np.abs(_number(value)),
+}
@@ -0,0 +1,431 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_cache.py
+@Desc    : 列存储的磁盘缓存：未修改文件的解析缓存（可以直接mmap的二进制格式）、不活动标签页的换出文件（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 22:20
+
+缓存文件（.csvcache）的格式：
+    文件头: 8字节魔数 | uint32版本 | uint32保留 | uint64元数据偏移 | uint64元数据长度
+    数组区: 每个数组按64字节对齐，原样存放（小端）
+    元数据: utf-8 JSON，包含来源文件的校验信息、列头、格式、列类型及每个数组的(偏移, dtype, 长度)
+读取时整个文件以写时复制方式映射，列直接使用映射的数组，访问到的页才从磁盘读入
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from csv_store import ColumnStore, StringColumn
+from csv_parser import FileFormat
+from csv_lazy import LazyStore
+from csv_profile import Profiler
+from csv_types import IntColumn, FloatColumn, DateTimeColumn, CategoryColumn, KIND_TEXT
+
+_MAGIC = b'CSVCACHE'
+_VERSION = 2                    # 缓存格式变化时递增，旧的缓存自动失效
+_HEADER = struct.Struct('<8sIIQQ')
+_ALIGN = 64                     # 数组的对齐字节数
+_SUFFIX = '.csvcache'
+_MIN_FILE_SIZE = 1 << 20        # 小于该大小的文件解析很快，不缓存
+_HASH_BLOCK = 1 << 16           # 内容抽样哈希每块的字节数
+_HASH_BLOCKS = 16               # 内容抽样哈希的块数
+_KIND_STORE = 'store'           # 解析结果（没有列头）
+_KIND_STORE_HEADER = 'store+header'     # 解析结果（第一行为列头）
+_KIND_INDEX = 'index'           # 延迟加载的行索引
+_TYPED_COLUMNS = {cls.kind: cls for cls in (IntColumn, FloatColumn, DateTimeColumn)}
+
+
+def contentHash(path) -> str:
+    """
+    文件内容的抽样哈希：开头、结尾及均匀分布的若干块，读取量与文件大小无关
+    用于发现大小和修改时间都没有变化的改写（例如保留时间戳的复制）
+    :param path: 文件路径
+    :return: 十六进制字符串
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= _HASH_BLOCK * _HASH_BLOCKS:
+            digest.update(f.read())
+        else:
+            for i in range(_HASH_BLOCKS):
+                f.seek((size - _HASH_BLOCK) * i // (_HASH_BLOCKS - 1))
+                digest.update(f.read(_HASH_BLOCK))
+    return digest.hexdigest()
+
+
+def _writeContainer(path, meta, arrays):
+    """
+    写入缓存文件：先写临时文件再替换，写入中断不会留下不完整的文件
+    :param path: 文件路径
+    :param meta: 可以JSON序列化的元数据
+    :param arrays: {名称: 一维NumPy数组}
+    :return: None
+    """
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(bytes(_HEADER.size))
+            layout = {}
+            for name, values in arrays.items():
+                f.write(bytes(-f.tell() % _ALIGN))
+                values = np.ascontiguousarray(values)
+                layout[name] = [f.tell(), values.dtype.str, len(values)]
+                # 日期等类型不支持缓冲区协议，按字节写出
+                f.write(values.view(np.uint8))
+            data = json.dumps(dict(meta, arrays=layout)).encode('utf-8')
+            offset = f.tell()
+            f.write(data)
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, _VERSION, 0, offset, len(data)))
+        os.replace(tmp, path)
+    except BaseException:
+        _remove(tmp)
+        raise
+
+
+def _readContainer(path):
+    """
+    以写时复制方式映射缓存文件：数组可以修改，修改不会写回文件
+    :param path: 文件路径
+    :return: (元数据, {名称: 映射的NumPy数组})
+    :raise: OSError/ValueError: 文件不存在、已损坏或格式版本不同
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(mm) < _HEADER.size:
+        raise ValueError('缓存文件已损坏')
+    magic, version, _, offset, length = _HEADER.unpack_from(mm)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('缓存格式版本不同')
+    meta = json.loads(mm[offset:offset + length])
+    try:
+        arrays = {name: np.frombuffer(mm, dtype=np.dtype(dtype), count=count, offset=start)
+                  for name, (start, dtype, count) in meta.pop('arrays').items()}
+    except (KeyError, TypeError) as e:
+        raise ValueError('缓存文件已损坏：%s' % e)
+    return meta, arrays
+
+
+def writeStore(store, path, source=None):
+    """
+    把列存储写入缓存文件
+    :param store: ColumnStore
+    :param path: 文件路径
+    :param source: 来源文件的校验信息，读取时比较；None: 不校验（换出文件）
+    :return: None
+    """
+    arrays = {}
+    columns = []
+    for c, column in enumerate(store.columns):
+        meta = {'kind': column.kind}
+        if column.kind == KIND_TEXT:
+            data, offsets, edits = column.buffers()
+            arrays['data%d' % c], arrays['offsets%d' % c] = data, offsets
+            meta['edits'] = [[row, value] for row, value in edits.items()]
+        else:
+            arrays['values%d' % c] = column.values
+            if column.missing is not None:
+                arrays['missing%d' % c] = column.missing
+            if isinstance(column, CategoryColumn):
+                meta['categories'] = column.categories
+            else:
+                meta['fmt'] = column.fmt
+        columns.append(meta)
+    fileFormat = store.format
+    _writeContainer(path, {
+        'source': source,
+        'rowCount': store.rowCount,
+        'header': store.header,
+        'format': None if fileFormat is None else [fileFormat.encoding, fileFormat.delimiter,
+                                                   fileFormat.quotechar, fileFormat.hasHeader],
+        'columns': columns,
+    }, arrays)
+
+
+def readStore(path, source=None):
+    """
+    映射writeStore写入的缓存文件，列直接使用映射的数组（不复制）
+    :param path: 文件路径
+    :param source: 期望的来源文件校验信息，None: 不校验
+    :return: ColumnStore
+    :raise: OSError/ValueError: 文件不存在、已损坏、格式版本不同或与来源文件不一致
+    """
+    meta, arrays = _readContainer(path)
+    if source is not None and meta.get('source') != source:
+        raise ValueError('缓存已过期')
+    columns = []
+    try:
+        for c, column in enumerate(meta['columns']):
+            kind = column['kind']
+            if kind == KIND_TEXT:
+                columns.append(StringColumn.fromParts(arrays['data%d' % c], arrays['offsets%d' % c],
+                                                      {row: value for row, value in column['edits']}))
+                continue
+            values = arrays['values%d' % c]
+            if 'categories' in column:
+                columns.append(CategoryColumn(values, column['categories']))
+                continue
+            fmt = column['fmt']
+            # json把元组读成列表，日期列的格式参数需要与解析结果比较，恢复为元组
+            columns.append(_TYPED_COLUMNS[kind](values, arrays.get('missing%d' % c),
+                                                tuple(fmt) if isinstance(fmt, list) else fmt))
+    except KeyError as e:
+        raise ValueError('缓存文件已损坏：%s' % e)
+    fileFormat = None if meta['format'] is None else FileFormat(*meta['format'])
+    return ColumnStore.fromColumns(columns, meta['rowCount'], meta['header'], fileFormat)
+
+
+def _touch(path):
+    # 修改时间用于淘汰最久未使用的缓存
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class StoreCache(object):
+    """
+    列存储的磁盘缓存，所有写入在一个后台线程中进行，读取时等待对应的写入完成
+    1. 解析缓存：未修改的文件按路径保存解析结果（延迟加载的文件只保存行索引），
+       读取时校验大小、修改时间和内容抽样哈希，一致时直接映射，不再解析；
+       源文件改变时由文件监视器调用invalidate删除；总大小超出上限时删除最久未使用的
+    2. 换出文件：不活动标签页的数据（包括未保存的修改）写入临时目录，重新激活时读回并删除
+    """
+
+    def __init__(self, directory, maxBytes=4 << 30, enabled=True):
+        """
+        :param directory: 解析缓存的目录
+        :param maxBytes: 解析缓存的总大小上限（字节）
+        :param enabled: 是否使用解析缓存（换出文件不受影响）
+        """
+        self.enabled = enabled
+        self.maxBytes = maxBytes
+        self.__dir = directory
+        self.__spillDir = None                  # 换出文件的临时目录，第一次换出时创建
+        self.__pool = ThreadPoolExecutor(max_workers=1)
+        self.__pending = {}                     # 正在写入的文件 {路径: Future}
+        self.__lock = threading.Lock()
+
+    def get(self, csvFile, withHeader):
+        """
+        读取文件的解析缓存
+        :param csvFile: csv文件路径
+        :param withHeader: 是否有列头
+        :return: ColumnStore，没有缓存或文件已改变时为None
+        """
+        path, source = self.__entry(csvFile, _KIND_STORE_HEADER if withHeader else _KIND_STORE)
+        if path is None:
+            return None
+        try:
+            with Profiler.span('cache.read'):
+                store = readStore(path, source)
+        except (OSError, ValueError):
+            return None
+        _touch(path)
+        return store
+
+    def put(self, csvFile, withHeader, store) -> bool:
+        """
+        在后台保存文件的解析缓存（之后不能再修改store）
+        :param csvFile: csv文件路径，其内容与store一致
+        :param withHeader: 是否有列头
+        :param store: ColumnStore
+        :return: 是否已有或将会保存（未启用、文件太小或无法访问时不保存）
+        """
+        path, source = self.__entry(csvFile, _KIND_STORE_HEADER if withHeader else _KIND_STORE)
+        if path is None:
+            return False
+        if self.__valid(path, source):
+            return True
+        self.__submit(path, lambda: writeStore(store, path, source))
+        return True
+
+    def getLazy(self, csvFile, withHeader, fileFormat):
+        """
+        用缓存的行索引打开延迟加载的文件，不需要扫描文件
+        :param csvFile: csv文件路径
+        :param withHeader: 是否有列头
+        :param fileFormat: 文件格式
+        :return: LazyStore，没有缓存或文件已改变时为None
+        """
+        path, source = self.__entry(csvFile, _KIND_INDEX, quotechar=fileFormat.quotechar)
+        if path is None:
+            return None
+        try:
+            with Profiler.span('cache.read'):
+                meta, arrays = _readContainer(path)
+                if meta.get('source') != source:
+                    return None
+                store = LazyStore(csvFile, withHeader, fileFormat, stride=meta['stride'],
+                                  index=(arrays['offsets'], meta['total']))
+        except (OSError, ValueError, KeyError):
+            return None
+        _touch(path)
+        return store
+
+    def putLazy(self, store):
+        """
+        在后台保存延迟加载的文件的行索引
+        :param store: 刚建立索引的LazyStore
+        :return: None
+        """
+        path, source = self.__entry(store.file, _KIND_INDEX, quotechar=store.format.quotechar)
+        if path is None or source['size'] != store.fileSize or self.__valid(path, source):
+            return
+        offsets, total = store.rowIndex
+        self.__submit(path, lambda: _writeContainer(path, {'source': source, 'stride': store.stride, 'total': total},
+                                                    {'offsets': offsets}))
+
+    def invalidate(self, csvFile):
+        """
+        源文件改变后删除其解析缓存
+        :param csvFile: csv文件路径
+        :return: None
+        """
+        for kind in (_KIND_STORE, _KIND_STORE_HEADER, _KIND_INDEX):
+            path = self.__entryPath(csvFile, kind)
+            self.__wait(path)
+            _remove(path)
+
+    def spill(self, store) -> str:
+        """
+        在后台把数据写入换出文件（之后不能再修改store）
+        :param store: ColumnStore
+        :return: 换出文件的路径，用于unspill/discard
+        """
+        if self.__spillDir is None:
+            self.__spillDir = tempfile.mkdtemp(prefix='csveditor-spill-')
+        fd, path = tempfile.mkstemp(suffix=_SUFFIX, dir=self.__spillDir)
+        os.close(fd)
+        self.__submit(path, lambda: writeStore(store, path), fallback=store)
+        return path
+
+    def unspill(self, path):
+        """
+        读回换出的数据并删除换出文件（已映射的数据在删除后仍然有效）
+        :param path: spill返回的路径
+        :return: ColumnStore，换出文件已丢失时为None
+        """
+        store = self.__wait(path)
+        if store is None:
+            try:
+                with Profiler.span('cache.read'):
+                    store = readStore(path)
+            except (OSError, ValueError):
+                store = None
+        _remove(path)
+        return store
+
+    def discard(self, path):
+        """
+        丢弃换出的数据
+        :param path: spill返回的路径
+        :return: None
+        """
+        self.__wait(path)
+        _remove(path)
+
+    def close(self):
+        """
+        等待后台写入完成，删除换出文件的临时目录
+        :return: None
+        """
+        self.__pool.shutdown(wait=True)
+        if self.__spillDir is not None:
+            shutil.rmtree(self.__spillDir, ignore_errors=True)
+            self.__spillDir = None
+
+    def __entryPath(self, csvFile, kind):
+        # 每个文件的每种缓存只有一个缓存文件，文件改变后新的缓存直接替换旧的
+        key = json.dumps([os.path.abspath(csvFile), kind])
+        return os.path.join(self.__dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + _SUFFIX)
+
+    def __entry(self, csvFile, kind, **params):
+        """
+        缓存文件的路径及来源文件的校验信息
+        :return: (路径, 校验信息)，不使用缓存时为(None, None)
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            stat = os.stat(csvFile)
+            if stat.st_size < _MIN_FILE_SIZE:
+                return None, None
+            source = dict(params, path=os.path.abspath(csvFile), size=stat.st_size, mtime=stat.st_mtime_ns,
+                          hash=contentHash(csvFile))
+        except OSError:
+            return None, None
+        path = self.__entryPath(csvFile, kind)
+        self.__wait(path)
+        return path, source
+
+    def __valid(self, path, source) -> bool:
+        # 已有的缓存文件与来源文件一致时不需要重写，只更新修改时间（用于淘汰最久未使用的）
+        try:
+            with open(path, 'rb') as f:
+                magic, version, _, offset, length = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC or version != _VERSION:
+                    return False
+                f.seek(offset)
+                if json.loads(f.read(length)).get('source') != source:
+                    return False
+        except (OSError, ValueError, struct.error):
+            return False
+        _touch(path)
+        return True
+
+    def __submit(self, path, write, fallback=None):
+        with self.__lock:
+            self.__pending[path] = self.__pool.submit(self.__write, path, write, fallback)
+
+    def __write(self, path, write, fallback):
+        """
+        在后台线程中写入
+        :return: None: 写入成功；写入失败时返回fallback（换出的数据），由读取方直接使用，数据不会丢失
+        """
+        try:
+            with Profiler.span('cache.write'):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                write()
+        except OSError:
+            return fallback
+        if fallback is None:
+            self.__trim()
+        return None
+
+    def __wait(self, path):
+        # 等待该文件的写入完成，返回写入失败时保留的数据
+        with self.__lock:
+            future = self.__pending.pop(path, None)
+        return None if future is None else future.result()
+
+    def __trim(self):
+        # 解析缓存超出总大小上限时，删除最久未使用的文件（映射中的文件删除后数据仍然有效）
+        try:
+            stats = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                           for entry in os.scandir(self.__dir) if entry.name.endswith(_SUFFIX))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in stats:
+            if total <= self.maxBytes:
+                break
+            _remove(path)
+            total -= size
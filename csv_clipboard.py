@@ -0,0 +1,101 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_clipboard.py
+@Desc    : 剪贴板：选中区域按列向量化编码为TSV/CSV，粘贴的TSV一次解析为按列的数组（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import csv
+import io
+from itertools import zip_longest
+import numpy as np
+
+MIME_TSV = 'text/tab-separated-values'
+MIME_CSV = 'text/csv'
+_CHUNK_ROWS = 65536         # 每次编码的行数，限制中间数组的大小
+
+
+class ClipboardError(ValueError):
+    """
+    不能复制选中的区域（例如延迟加载的文件中选中的单元格过多）
+    """
+    pass
+
+
+def selectionBlock(ranges):
+    """
+    选中区域涉及的行和列：多个矩形区域时取所有行与所有列组成的表格
+    :param ranges: [(top, bottom, left, right)]（视图行列号，包含两端）
+    :return: (视图行号数组, 列号列表)
+    """
+    if len(ranges) == 1:
+        top, bottom, left, right = ranges[0]
+        return np.arange(top, bottom + 1), list(range(left, right + 1))
+    rows = np.unique(np.concatenate([np.arange(top, bottom + 1) for top, bottom, _, _ in ranges]))
+    columns = sorted(set(column for _, _, left, right in ranges for column in range(left, right + 1)))
+    return rows, columns
+
+
+def encodeBlock(store, rows, columns, canceled=None):
+    """
+    把数据的一块编码为TSV和CSV文本：每列整体取出文本后按列拼接，不为每个单元格创建对象
+    含分隔符、引号或换行的值加引号（与Excel相同）
+    :param store: ColumnStore/LazyStore
+    :param rows: 数据行号数组（按输出的顺序）
+    :param columns: 列号列表
+    :param canceled: 返回True时提前结束的回调
+    :return: (TSV, CSV)，被取消时为None
+    """
+    tsv = []
+    csvParts = []
+    for start in range(0, len(rows), _CHUNK_ROWS):
+        if canceled and canceled():
+            return None
+        chunk = rows[start:start + _CHUNK_ROWS]
+        tsvLines = csvLines = None
+        for column in columns:
+            texts = store.texts(column, chunk)
+            tsvLines = _join(tsvLines, _quote(texts, '\t'), '\t')
+            csvLines = _join(csvLines, _quote(texts, ','), ',')
+        tsv.append('\n'.join(tsvLines.tolist()) + '\n')
+        csvParts.append('\n'.join(csvLines.tolist()) + '\n')
+    return ''.join(tsv), ''.join(csvParts)
+
+
+def _join(lines, texts, delimiter):
+    if lines is None:
+        return texts
+    return np.strings.add(np.strings.add(lines, delimiter), texts)
+
+
+def _quote(texts, delimiter):
+    # 只对需要的值加引号，其余的值不复制
+    special = np.zeros(len(texts), dtype=bool)
+    for char in (delimiter, '"', '\n', '\r'):
+        special |= np.strings.find(texts, char) >= 0
+    if not special.any():
+        return texts
+    quoted = np.strings.add(np.strings.add('"', np.strings.replace(texts[special], '"', '""')), '"')
+    result = texts.astype(quoted.dtype if quoted.dtype.itemsize > texts.dtype.itemsize else texts.dtype)
+    result[special] = quoted
+    return result
+
+
+def parseTsv(text):
+    """
+    解析粘贴的TSV文本（例如从电子表格复制的区域）；没有引号时直接按行和制表符拆分
+    :param text: 剪贴板中的文本
+    :return: 按列的字符串数组列表，短行用空字符串补齐
+    """
+    if text.endswith('\n'):
+        text = text[:-2] if text.endswith('\r\n') else text[:-1]
+    if not text:
+        return []
+    if '"' in text:
+        rows = list(csv.reader(io.StringIO(text), delimiter='\t'))
+    else:
+        rows = [line.split('\t') for line in text.replace('\r\n', '\n').split('\n')]
+    return [np.array(column, dtype=str) for column in zip_longest(*rows, fillvalue='')]
@@ -0,0 +1,466 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_compress.py
+@Desc    : 压缩的csv：gzip/xz/zstd流式解压（后台线程解压，与解析并行）及压缩保存；可随机访问的zstd分帧格式（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import gzip
+import io
+import lzma
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_XZ = 'xz'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_AUTO = 'auto'       # 保存时按扩展名决定
+
+# 文件开头的魔数（读取时按内容判断，不依赖扩展名）
+_MAGICS = [
+    (b'\x1f\x8b', COMPRESSION_GZIP),
+    (b'\xfd7zXZ\x00', COMPRESSION_XZ),
+    (b'\x28\xb5\x2f\xfd', COMPRESSION_ZSTD),
+]
+# 保存时按扩展名选择压缩格式
+_SUFFIXES = {'.gz': COMPRESSION_GZIP, '.gzip': COMPRESSION_GZIP, '.xz': COMPRESSION_XZ, '.zst': COMPRESSION_ZSTD}
+
+_READ_SIZE = 1 << 20        # 后台解压每次读取的字节数
+_READ_AHEAD = 8             # 后台解压最多领先解析的块数
+_GZIP_LEVEL = 6
+_XZ_PRESET = 1               # xz的高压缩级别很慢（20MB需要十几秒），保存时优先速度
+_ZSTD_LEVEL = 3
+_ZSTD_FRAME_SIZE = 4 << 20  # 保存zstd时每帧的解压后大小，帧越小随机访问时解压的数据越少
+_ZSTD_CACHE_FRAMES = 16     # 随机访问时缓存的已解压帧数
+
+# zstd可随机访问格式（seekable format）：文件末尾的跳过帧中记录每帧的压缩前后大小
+_SKIPPABLE_MAGIC = 0x184D2A5E
+_SEEKABLE_MAGIC = 0x8F92EAB1
+_SEEK_FOOTER = struct.Struct('<IBI')   # 帧数, 描述符, 魔数
+
+
+def detectCompression(path):
+    """
+    按文件开头的魔数判断压缩格式
+    :param path: 文件路径
+    :return: COMPRESSION_*，未压缩为None
+    """
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in _MAGICS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def compressionForPath(path):
+    """
+    按扩展名决定保存时的压缩格式
+    :param path: 文件路径
+    :return: COMPRESSION_*，不压缩为None
+    """
+    return _SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def _zstd():
+    # zstandard是可选依赖，只在读写zstd文件时导入
+    try:
+        import zstandard
+    except ImportError:
+        raise OSError('读写zstd文件需要安装zstandard（pip install zstandard）')
+    return zstandard
+
+
+def openInput(path, background=True):
+    """
+    打开文件用于顺序读取，压缩的文件流式解压
+    :param path: 文件路径
+    :param background: 是否在后台线程中解压（解压与解析并行）
+    :return: (二进制文件对象, 已读取的源文件字节数的回调)
+    """
+    compression = detectCompression(path)
+    raw = open(path, 'rb')
+    if compression is None:
+        return raw, raw.tell
+    # 截断或损坏的压缩数据：gzip为EOFError/zlib.error，xz为LZMAError，zstd为ZstdError，读取时统一转换为OSError
+    errors = (EOFError, zlib.error, lzma.LZMAError)
+    try:
+        if compression == COMPRESSION_GZIP:
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif compression == COMPRESSION_XZ:
+            stream = lzma.LZMAFile(raw, 'rb')
+        else:
+            stream = io.BufferedReader(_ZstdReader(raw), _READ_SIZE)
+            errors += (_zstd().ZstdError,)
+    except BaseException:
+        raw.close()
+        raise
+    if background:
+        stream = io.BufferedReader(_PrefetchReader(stream, raw, errors), _READ_SIZE)
+    else:
+        stream = _Closing(stream, raw, errors)
+    return stream, raw.tell
+
+
+def _corrupted(error):
+    # 解压错误转换为OSError，调用者按读文件失败处理（不会把截断前的部分当作完整的数据）
+    return OSError('压缩数据损坏：%s' % error)
+
+
+class _Closing(io.BufferedIOBase):
+    """
+    关闭时同时关闭源文件的解压流（GzipFile等传入文件对象时不会关闭它）
+    """
+
+    def __init__(self, stream, raw, errors):
+        super().__init__()
+        self.__stream = stream
+        self.__raw = raw
+        self.__errors = errors
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        try:
+            return self.__stream.read(size)
+        except self.__errors as e:
+            raise _corrupted(e) from e
+
+    def read1(self, size=-1):
+        return self.read(size)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.__stream.close()
+            self.__raw.close()
+        super().close()
+
+
+class _PrefetchReader(io.RawIOBase):
+    """
+    在后台线程中解压：zlib/lzma/zstd解压时释放GIL，与解析线程并行
+    解压结果按块放入有界队列，解析较慢时后台线程等待
+    """
+
+    def __init__(self, stream, raw, errors):
+        super().__init__()
+        self.__stream = stream
+        self.__raw = raw
+        self.__errors = errors
+        self.__queue = queue.Queue(_READ_AHEAD)
+        self.__pending = b''
+        self.__offset = 0
+        self.__eof = False
+        self.__stop = False
+        self.__thread = threading.Thread(target=self.__run, name='decompress', daemon=True)
+        self.__thread.start()
+
+    def __run(self):
+        try:
+            while not self.__stop:
+                chunk = self.__stream.read(_READ_SIZE)
+                self.__put(chunk)
+                if not chunk:
+                    return
+        except self.__errors as e:
+            self.__put(_corrupted(e))
+        except Exception as e:
+            self.__put(e)
+
+    def __put(self, item):
+        while not self.__stop:
+            try:
+                self.__queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.__offset == len(self.__pending):
+            if self.__eof:
+                return 0
+            item = self.__queue.get()
+            if isinstance(item, Exception):
+                self.__eof = True
+                raise item
+            if not item:
+                self.__eof = True
+                return 0
+            self.__pending = item
+            self.__offset = 0
+        size = min(len(b), len(self.__pending) - self.__offset)
+        b[:size] = self.__pending[self.__offset:self.__offset + size]
+        self.__offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.__stop = True
+            self.__thread.join()
+            self.__stream.close()
+            self.__raw.close()
+        super().close()
+
+
+class _ZstdReader(io.RawIOBase):
+    """
+    逐帧解压zstd流（多个帧依次解压，跳过帧没有输出）；源文件结束时最后一帧不完整则抛出ZstdError
+    （stream_reader遇到截断的数据时只是提前结束，无法区分截断和正常结束）
+    """
+
+    def __init__(self, raw):
+        """
+        :param raw: 源文件对象（不关闭）
+        """
+        super().__init__()
+        self.__raw = raw
+        self.__zstd = _zstd()
+        self.__frame = None     # 当前帧的解压对象，None: 上一帧已结束
+        self.__pending = b''
+        self.__offset = 0
+
+    def readable(self):
+        return True
+
+    def __decompress(self, data):
+        out = []
+        while data:
+            if self.__frame is None:
+                self.__frame = self.__zstd.ZstdDecompressor().decompressobj()
+            out.append(self.__frame.decompress(data))
+            if not self.__frame.eof:
+                break
+            data = self.__frame.unused_data
+            self.__frame = None
+        return b''.join(out)
+
+    def readinto(self, b):
+        while self.__offset == len(self.__pending):
+            data = self.__raw.read(_READ_SIZE)
+            if not data:
+                if self.__frame is not None:
+                    raise self.__zstd.ZstdError('数据不完整，最后一帧被截断')
+                return 0
+            self.__pending = self.__decompress(data)
+            self.__offset = 0
+        size = min(len(b), len(self.__pending) - self.__offset)
+        b[:size] = self.__pending[self.__offset:self.__offset + size]
+        self.__offset += size
+        return size
+
+
+@contextmanager
+def compressedOutput(f, compression):
+    """
+    把写入的内容压缩后写到f（不关闭f）
+    :param f: 二进制文件对象
+    :param compression: COMPRESSION_*，None: 不压缩
+    :return: 二进制文件对象
+    """
+    if compression is None:
+        yield f
+        return
+    if compression == COMPRESSION_GZIP:
+        out = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=_GZIP_LEVEL, mtime=0)
+    elif compression == COMPRESSION_XZ:
+        out = lzma.LZMAFile(f, 'wb', preset=_XZ_PRESET)
+    else:
+        out = SeekableZstdWriter(f)
+    yield out
+    out.close()
+
+
+class SeekableZstdWriter(io.RawIOBase):
+    """
+    按zstd可随机访问格式写入：每_ZSTD_FRAME_SIZE字节压缩为一个独立的帧，最后写入帧大小表
+    普通的zstd工具可以照常解压（帧大小表在跳过帧中）
+    """
+
+    def __init__(self, f, frameSize=_ZSTD_FRAME_SIZE, level=_ZSTD_LEVEL):
+        """
+        :param f: 二进制文件对象（不关闭）
+        :param frameSize: 每帧解压后的大小
+        :param level: 压缩级别
+        """
+        super().__init__()
+        self.__f = f
+        self.__frameSize = frameSize
+        self.__compressor = _zstd().ZstdCompressor(level=level, write_content_size=True)
+        self.__buffer = bytearray()
+        self.__frames = []      # [(压缩后大小, 解压后大小)]
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.__buffer += b
+        while len(self.__buffer) >= self.__frameSize:
+            self.__writeFrame(self.__frameSize)
+        return len(b)
+
+    def __writeFrame(self, size):
+        data = bytes(self.__buffer[:size])
+        del self.__buffer[:size]
+        frame = self.__compressor.compress(data)
+        self.__f.write(frame)
+        self.__frames.append((len(frame), len(data)))
+
+    def close(self):
+        if not self.closed:
+            if self.__buffer or not self.__frames:
+                self.__writeFrame(len(self.__buffer))
+            table = b''.join(struct.pack('<II', *frame) for frame in self.__frames)
+            table += _SEEK_FOOTER.pack(len(self.__frames), 0, _SEEKABLE_MAGIC)
+            self.__f.write(struct.pack('<II', _SKIPPABLE_MAGIC, len(table)) + table)
+        super().close()
+
+
+def readSeekTable(path):
+    """
+    读取zstd可随机访问格式的帧大小表
+    :param path: 文件路径
+    :return: [(压缩后大小, 解压后大小)]，不是该格式时为None
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _SEEK_FOOTER.size + 8:
+            return None
+        f.seek(size - _SEEK_FOOTER.size)
+        count, descriptor, magic = _SEEK_FOOTER.unpack(f.read(_SEEK_FOOTER.size))
+        if magic != _SEEKABLE_MAGIC:
+            return None
+        entrySize = 12 if descriptor & 0x80 else 8
+        tableSize = count * entrySize + _SEEK_FOOTER.size
+        if size < tableSize + 8:
+            return None
+        f.seek(size - tableSize - 8)
+        skippable, frameSize = struct.unpack('<II', f.read(8))
+        if skippable != _SKIPPABLE_MAGIC or frameSize != tableSize:
+            return None
+        table = f.read(count * entrySize)
+    return [struct.unpack_from('<II', table, i * entrySize) for i in range(count)]
+
+
+def canOpenLazy(path) -> bool:
+    """
+    文件能否延迟加载：未压缩，或为zstd可随机访问格式
+    :param path: 文件路径
+    :return:
+    """
+    compression = detectCompression(path)
+    return compression is None or (compression == COMPRESSION_ZSTD and readSeekTable(path) is not None)
+
+
+class SeekableZstdBuffer(object):
+    """
+    把zstd可随机访问格式的文件当作解压后的字节串访问（延迟加载使用）
+    按帧大小表定位，只解压访问到的帧，最近访问的帧放在LRU缓存中
+    """
+
+    def __init__(self, path, frames=None):
+        """
+        :param path: 文件路径
+        :param frames: 帧大小表，None: 从文件读取
+        """
+        frames = frames if frames is not None else readSeekTable(path)
+        if frames is None:
+            raise ValueError('不是可随机访问的zstd文件：%s' % path)
+        self.__f = open(path, 'rb')
+        self.__decompressor = _zstd().ZstdDecompressor()
+        self.__sizes = [size for _, size in frames]
+        self.__starts = [0]          # 每帧解压后的起始位置
+        self.__offsets = [0]         # 每帧在文件中的起始位置
+        for compressed, size in frames:
+            self.__starts.append(self.__starts[-1] + size)
+            self.__offsets.append(self.__offsets[-1] + compressed)
+        self.__cache = OrderedDict()
+        self.__lock = threading.Lock()
+        self.fileSize = os.fstat(self.__f.fileno()).st_size
+
+    def __len__(self):
+        return self.__starts[-1]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            key = key + len(self) if key < 0 else key
+            return self[key:key + 1][0]
+        start, stop, _ = key.indices(len(self))
+        if start >= stop:
+            return b''
+        frame = self.__frameAt(start)
+        parts = []
+        while start < stop:
+            data = self.__frame(frame)
+            begin = start - self.__starts[frame]
+            end = min(stop - self.__starts[frame], len(data))
+            parts.append(data[begin:end])
+            start = self.__starts[frame] + end
+            frame += 1
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def chunks(self, chunkSize):
+        """
+        顺序读出全部内容（建立行索引时使用），不经过缓存
+        :param chunkSize: 每块的大致字节数
+        :return: 生成器 (起始位置, bytes)
+        """
+        pos = 0
+        parts = []
+        for frame in range(len(self.__sizes)):
+            parts.append(self.__read(frame))
+            if sum(map(len, parts)) >= chunkSize or frame == len(self.__sizes) - 1:
+                data = b''.join(parts)
+                yield pos, data
+                pos += len(data)
+                parts = []
+
+    def close(self):
+        self.__cache.clear()
+        self.__f.close()
+
+    def __frameAt(self, pos):
+        # 二分查找位置所在的帧
+        low, high = 0, len(self.__sizes) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.__starts[middle] <= pos:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def __frame(self, frame):
+        with self.__lock:
+            data = self.__cache.get(frame)
+            if data is not None:
+                self.__cache.move_to_end(frame)
+                return data
+        data = self.__read(frame)
+        with self.__lock:
+            self.__cache[frame] = data
+            if len(self.__cache) > _ZSTD_CACHE_FRAMES:
+                self.__cache.popitem(last=False)
+        return data
+
+    def __read(self, frame):
+        with self.__lock:
+            self.__f.seek(self.__offsets[frame])
+            compressed = self.__f.read(self.__offsets[frame + 1] - self.__offsets[frame])
+        return self.__decompressor.decompress(compressed, max_output_size=self.__sizes[frame])
@@ -0,0 +1,48 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_copy.py
+@Desc    : 后台线程编码复制到剪贴板的大块选中区域
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+from PySide6.QtCore import QThread, Signal
+from csv_clipboard import encodeBlock
+from csv_profile import Profiler
+
+
+class CopyWorker(QThread):
+    """
+    在工作线程中把选中的数据编码为TSV/CSV，完成后通过信号把结果交给界面线程写入剪贴板
+    """
+
+    # 信号
+    resultReady = Signal(str, str, 'qint64')    # TSV, CSV, 单元格数
+
+    def __init__(self, store, rows, columns, parent=None):
+        """
+        :param store: ColumnStore
+        :param rows: 数据行号数组
+        :param columns: 列号列表
+        :param parent:
+        """
+        super().__init__(parent)
+        self.__store = store
+        self.__rows = rows
+        self.__columns = columns
+        self.__canceled = False
+
+    def cancel(self):
+        """
+        取消编码，工作线程在处理完当前分段后退出
+        :return: None
+        """
+        self.__canceled = True
+
+    def run(self):
+        with Profiler.span('clipboard.encode'):
+            result = encodeBlock(self.__store, self.__rows, self.__columns, lambda: self.__canceled)
+        if result is not None and not self.__canceled:
+            self.resultReady.emit(result[0], result[1], len(self.__rows) * len(self.__columns))
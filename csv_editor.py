@@ -1,8 +1,53 @@
-import csv
 import enum
-from PySide6.QtWidgets import QWidget, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
-from PySide6.QtCore import Slot, Signal, QFileSystemWatcher, Qt, QFileInfo
-from PySide6.QtGui import QPalette, QDragEnterEvent, QDropEvent
+import os
+import sys
+import time
+import numpy as np
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QTableView, QHeaderView, QLineEdit, QLabel
+from PySide6.QtCore import Slot, Signal, QFileSystemWatcher, Qt, QFileInfo, QTimer, QMimeData, QItemSelection, \
+    QItemSelectionModel, QEvent
+from PySide6.QtGui import QPalette, QDragEnterEvent, QDropEvent, QKeySequence, QShortcut, QGuiApplication
+from csv_model import CsvTableModel
+from csv_store import ColumnStore
+from csv_parser import FileFormat, createReader, ENGINE_PYTHON
+from csv_lazy import LazyStore
+from csv_loader import CsvLoader
+from csv_writer import saveStore, atomicOpen
+from csv_compress import canOpenLazy, compressedOutput, compressionForPath, detectCompression
+from csv_arrow import saveTable, detectTableFormat, tableFormatForPath
+from csv_follow import FollowState
+from csv_query import Query, QueryError
+from csv_filter import FilterWorker
+from csv_stats import ColumnStats, snapshotColumn
+from csv_bulk import BulkError, Expression, replaceText, fillDown, transformText
+from csv_stats_worker import StatsWorker
+from csv_clipboard import ClipboardError, MIME_TSV, MIME_CSV, selectionBlock, encodeBlock, parseTsv
+from csv_copy import CopyWorker
+from csv_sort import SortError, groupRows, groupTable, writeSorted
+from csv_types import KIND_INT, KIND_FLOAT, KIND_TEXT
+from csv_profile import Profiler
+from column_sizer import ColumnSizer
+from cell_delegate import CellDelegate
+
+
+class CsvTableView(QTableView):
+    """
+    表格视图：启用性能统计时记录每帧的绘制耗时和调用data()的次数
+    """
+
+    def changeEvent(self, event):
+        # 字体或样式改变后按列宽省略的文字需要重新计算
+        if event.type() in (QEvent.FontChange, QEvent.StyleChange) and isinstance(self.itemDelegate(), CellDelegate):
+            self.itemDelegate().clearCache()
+        super().changeEvent(event)
+
+    def paintEvent(self, event):
+        if not Profiler.enabled:
+            return super().paintEvent(event)
+        calls = Profiler.counter('model.data')
+        with Profiler.span('view.paint'):
+            super().paintEvent(event)
+        Profiler.record('view.dataPerFrame', Profiler.counter('model.data') - calls)
 
 
 class CsvEditor(QWidget):
@@ -12,61 +57,122 @@ class CsvEditor(QWidget):
 
     class ChangedType(enum.Enum):
         """
-        改变类型：表格内容改变/源文件改变
+        改变类型：表格内容改变/源文件改变/源文件追加
         """
-        Table = 0  # 表格内容改变
-        File = 1   # csv文件改变
+        Table = 0     # 表格内容改变
+        File = 1      # csv文件改变
+        Appended = 2  # csv文件末尾追加的行已加入表格（跟随模式）
 
     # 信号
     dataChanged = Signal(ChangedType)       # 数据改变的信号:表格&文件
     fileDroped = Signal(str)                # 文件拖放的信号
+    loadProgress = Signal('qint64', 'qint64', 'qint64')  # 后台加载进度:已读字节数,文件总字节数,已解析行数
+    loadFinished = Signal(bool)             # 后台加载结束：True成功/False失败
+    loadFailed = Signal(str)                # 后台加载失败，参数为错误信息
+    statsChanged = Signal()                 # 列统计更新
+    selectionSummary = Signal(str)          # 选中区域的计数、求和及平均值
+    copyFinished = Signal('qint64', float)  # 复制到剪贴板完成：单元格数，用时（秒）
 
     # 私有类变量
-    __tableChanged = False                  # 记录表格内容是否改变
     __file = None                           # 保存当前打开的文件
-    __fileWatcher = QFileSystemWatcher()    # 文件监视器
+    __fileWatcher = None                    # 文件监视器（每个编辑器只监视自己的文件）
+    __cache = None                          # 磁盘缓存（StoreCache）：解析缓存及换出文件
+    __evicted = None                        # 已换出到磁盘的数据：(换出文件路径，None为解析缓存, 视图状态)
+    __loader = None                         # 后台加载线程
+    __loadTotal = 0                         # 后台加载的文件大小
+    __loadOk = True                         # 后台加载是否成功
+    __savedStat = None                      # 最近一次保存后的文件状态(大小,修改时间)
+    __withHeader = False                    # 当前文件是否有列头
+    __format = None                         # 当前文件的格式（编码、分隔符等）
+    __compression = None                    # 当前文件的压缩格式，保存到自身时沿用
+    __tableFormat = None                    # 当前文件为Parquet/Arrow时的格式，保存到自身时沿用
+    __engine = ENGINE_PYTHON                # 解析引擎
+    __loadedBytes = 0                       # 已加载到的字节位置
+    __follow = False                        # 是否跟随源文件追加的内容（tail -f）
+    __followState = None                    # 跟随模式下已解析的位置及校验和
+    __batchRows = 10000                     # 同步加载时每次批量写入的行数
+    __filterWorker = None                   # 计算筛选结果的线程
+    __filterStart = 0                       # 开始计算筛选结果的时间
+    __statsEnabled = False                  # 是否计算列统计（显示统计窗口时）
+    __stats = None                          # 各列的统计（ColumnStats列表），统计到各自的rows行
+    __statsStore = None                     # 统计所属的数据，数据被替换后重新统计
+    __statsWorker = None                    # 计算列统计的线程
+    __statsPending = None                   # 统计线程运行期间修改的单元格，结果合并后再更新
+    __statsEvicted = False                  # 换出的数据已有统计，读回后继续使用
+    __statsChunk = 1 << 20                  # 每段统计的行数
+    __selectionParseLimit = 10000           # 选中区域中文本列逐个转换为数值的最大单元格数
+    __copyWorker = None                     # 编码复制内容的线程
+    __copyStart = 0                         # 开始复制的时间
+    __copyAsyncCells = 200000               # 超过该单元格数时在后台线程编码复制的内容
+    __copyLazyCells = 1 << 20               # 延迟加载的文件最多复制的单元格数（逐行读取，不能后台编码）
+    __groups = None                         # 最近一次分组的结果（Groups），用于选中某一组的行
 
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        :param cache: 磁盘缓存（StoreCache），None: 不使用解析缓存，也不能换出
+        """
         super().__init__()
+        self.__cache = cache
         self.__setupUi()
 
     def __setupUi(self):
-        self.table = QTableWidget()
-        self.layout = QHBoxLayout(self)
+        self.model = CsvTableModel(self)
+        self.table = CsvTableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegate(CellDelegate(self.table))
+        self.__setupFilterBar()
+        self.layout = QVBoxLayout(self)
+        self.layout.addWidget(self.filterBar)
         self.layout.addWidget(self.table)
         self.table.setAlternatingRowColors(True)
         self.table.setPalette(QPalette(Qt.lightGray))
         self.table.setVisible(False)
+        # 行高固定，避免视图为计算行高而遍历所有行；列宽按抽样的行估算，滚动时按可见的单元格加宽
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.sizer = ColumnSizer(self.table)
 
+        self.model.dataChanged.connect(self.tableChanged)
+        self.model.rowsEdited.connect(self.tableChanged)
+        self.__setupStats()
+        self.__fileWatcher = QFileSystemWatcher(self)
         self.__fileWatcher.fileChanged.connect(self.fileChanged)
         self.setAcceptDrops(True)
 
-    def __setHeader(self, header):
-        """
-        设置表头
-        :param header: 列表
-        :return: None
-        """
-        self.table.setColumnCount(len(header))
-        self.table.setHorizontalHeaderLabels(header)
+    def __setupFilterBar(self):
+        # 筛选栏：输入停顿后在后台线程中计算，Esc关闭并取消筛选
+        self.filterEdit = QLineEdit()
+        self.filterEdit.setPlaceholderText('筛选：文本、/正则表达式/、列名 > 100、列名 ~ 正则，多个条件用 && 连接')
+        self.filterEdit.setClearButtonEnabled(True)
+        self.filterLabel = QLabel()
+        self.filterBar = QWidget()
+        _layout = QHBoxLayout(self.filterBar)
+        _layout.setContentsMargins(0, 0, 0, 0)
+        _layout.addWidget(self.filterEdit)
+        _layout.addWidget(self.filterLabel)
+        self.filterBar.setVisible(False)
 
-    def __appendRow(self, row):
-        """
-        添加一行数据
-        :param row: 列表
-        :return: None
-        """
-        # 如果当前行的列数超过了之前的列数，则重新设置列数
-        item_count = len(row)
-        column_count = self.table.columnCount()
-        if item_count > column_count:
-            self.table.setColumnCount(item_count)
+        self.__filterTimer = QTimer(self)
+        self.__filterTimer.setSingleShot(True)
+        self.__filterTimer.setInterval(200)
+        self.__filterTimer.timeout.connect(self.__applyFilter)
+        self.filterEdit.textChanged.connect(lambda text: self.__filterTimer.start())
+        self.filterEdit.returnPressed.connect(self.__applyFilter)
+        QShortcut(QKeySequence(Qt.Key_Escape), self.filterEdit, self.hideFilterBar, context=Qt.WidgetShortcut)
 
-        # 插入新行
-        row_count = self.table.rowCount()
-        self.table.insertRow(row_count)
-        for i, item in enumerate(row):
-            self.table.setItem(row_count, i, QTableWidgetItem(item))
+    def __setupStats(self):
+        # 列统计：数据追加、替换后停顿一会儿再在后台统计新增的行；修改单元格时增量更新
+        self.__stats = []
+        self.__statsPending = []
+        self.__statsTimer = QTimer(self)
+        self.__statsTimer.setSingleShot(True)
+        self.__statsTimer.setInterval(300)
+        self.__statsTimer.timeout.connect(self.__updateStats)
+        self.model.rowsInserted.connect(self.__scheduleStats)
+        self.model.columnsInserted.connect(self.__scheduleStats)
+        self.model.modelReset.connect(self.__scheduleStats)
+        self.model.valuesEdited.connect(self.__statsEdited)
+        self.model.columnsEdited.connect(self.__statsColumnsEdited)
+        self.table.selectionModel().selectionChanged.connect(self.__selectionChanged)
 
     @Slot()
     def fileChanged(self, file):
@@ -76,17 +182,731 @@ class CsvEditor(QWidget):
         :return:
         """
         if file == self.__file:
+            # 文件被替换后需要重新监视
+            if file not in self.__fileWatcher.files() and QFileInfo(file).isFile():
+                self.__fileWatcher.addPath(file)
+            # 自身保存触发的通知
+            if self.__savedStat is not None and self.__fileStat(file) == self.__savedStat:
+                return
+            # 源文件的解析缓存已过期
+            if self.__cache is not None:
+                self.__cache.invalidate(file)
+            # 跟随模式下只加载追加的行
+            if self.__follow and self.__followFile():
+                return
+            # 延迟加载的文件变短后不能再访问mmap，先清空表格，等待重新加载
+            if isinstance(self.model.store, LazyStore) and self.model.store.truncated():
+                self.model.clear()
             self.dataChanged.emit(CsvEditor.ChangedType.File)
 
     @Slot()
     def tableChanged(self):
         """
-        表格内容改变
+        表格内容改变（修改记录在模型的EditJournal中）
         :return:
         """
-        self.__tableChanged = True
         self.dataChanged.emit(CsvEditor.ChangedType.Table)
 
+    @property
+    def modified(self) -> bool:
+        """
+        与上次加载/保存相比表格内容是否有修改（改回原值的单元格不算修改）
+        :return:
+        """
+        return not self.model.journal.clean
+
+    @property
+    def modifiedCount(self) -> int:
+        """
+        修改过的单元格数
+        :return:
+        """
+        return self.model.journal.modifiedCount
+
+    def undo(self) -> bool:
+        """
+        撤销一步修改
+        :return: 是否有可撤销的修改
+        """
+        return self.model.undo()
+
+    def redo(self) -> bool:
+        """
+        重做一步修改
+        :return: 是否有可重做的修改
+        """
+        return self.model.redo()
+
+    @property
+    def follow(self) -> bool:
+        return self.__follow
+
+    def setFollow(self, follow):
+        """
+        跟随模式：源文件末尾追加数据时只解析新增的行并滚动到末尾，
+        只有已加载的部分被改写时才完整重新加载
+        :param follow: bool
+        :return: None
+        """
+        self.__follow = follow
+        self.__followState = None
+        if follow and self.__file and not self.loading:
+            self.__startFollow()
+            self.__followFile()
+
+    def __startFollow(self):
+        # 从已加载到的位置开始跟随；压缩的文件和Parquet/Arrow文件不能按字节位置读取追加的数据，变化时完整重新加载
+        if self.__compression is not None or self.__tableFormat is not None:
+            self.__followState = None
+            return
+        try:
+            self.__followState = FollowState(self.__file, self.__loadedBytes)
+        except OSError:
+            self.__followState = None
+
+    def __followFile(self) -> bool:
+        """
+        处理跟随模式下源文件的变化
+        :return: True: 已处理；False: 需要提示用户重新加载
+        """
+        # 加载过程中的变化由加载结束时统一处理
+        if self.loading or self.__followState is None:
+            return self.loading
+        status = self.__followState.status()
+        # utf-16等编码不能按字节查找行边界，追加的内容也完整重新加载
+        if status == FollowState.Appended and not self.__format.byteSplittable:
+            status = FollowState.Rewritten
+        if status == FollowState.Rewritten:
+            # 有未保存的修改时交给用户决定，否则直接重新加载
+            if self.modified:
+                return False
+            self.loadFile(self.__file, self.__withHeader, background=True, lazy=self.lazy, engine=self.__engine)
+            return True
+        if status == FollowState.Appended:
+            _bar = self.table.verticalScrollBar()
+            _atBottom = _bar.value() == _bar.maximum()
+            if self.lazy:
+                self.model.appendFromSource()
+                self.__followState.advance(self.model.store.size)
+            else:
+                self.model.appendRows(self.__followState.readAppended(self.__format))
+            self.__loadedBytes = self.__followState.offset
+            if _atBottom:
+                self.table.scrollToBottom()
+            self.dataChanged.emit(CsvEditor.ChangedType.Appended)
+        return True
+
+    def setHighlightModified(self, highlight):
+        """
+        是否标记修改过的单元格
+        :param highlight: bool
+        :return: None
+        """
+        self.model.setHighlightModified(highlight)
+
+    def showFilterBar(self):
+        """
+        显示筛选栏并把焦点移到输入框
+        :return: None
+        """
+        self.filterBar.setVisible(True)
+        self.filterEdit.setFocus()
+        self.filterEdit.selectAll()
+
+    @Slot()
+    def hideFilterBar(self):
+        """
+        关闭筛选栏并显示所有行
+        :return: None
+        """
+        self.filterEdit.clear()
+        self.__applyFilter()
+        self.filterBar.setVisible(False)
+        self.table.setFocus()
+
+    @Slot()
+    def __applyFilter(self):
+        """
+        按输入框的内容筛选：细化上次的查询时只在上次的结果中查找
+        :return: None
+        """
+        self.__filterTimer.stop()
+        self.__stopFilter()
+        text = self.filterEdit.text()
+        if not text.strip():
+            if self.model.query is not None:
+                self.model.setFilter(None)
+            self.filterLabel.setText('')
+            return
+        if not self.__file or self.loading:
+            self.filterLabel.setText('加载完成后筛选')
+            return
+        if not self.model.inMemory:
+            self.filterLabel.setText('延迟加载的文件不支持筛选')
+            return
+        try:
+            query = Query(text, self.model.store.header)
+        except QueryError as e:
+            self.filterLabel.setText(str(e))
+            return
+        rows = self.model.filteredRows if query.refines(self.model.query) else None
+        self.filterLabel.setText('筛选中...')
+        self.__filterStart = time.perf_counter()
+        self.__filterWorker = FilterWorker(self.model.store, query, rows, self)
+        self.__filterWorker.resultReady.connect(self.__filterResult)
+        self.__filterWorker.failed.connect(self.__filterFailed)
+        self.__filterWorker.finished.connect(self.__filterFinished)
+        self.__filterWorker.start()
+
+    def __stopFilter(self):
+        # 取消正在计算的筛选，已经投递的结果在槽函数中通过sender()过滤掉
+        if self.__filterWorker is None:
+            return
+        worker = self.__filterWorker
+        self.__filterWorker = None
+        worker.cancel()
+        worker.wait()
+        worker.deleteLater()
+
+    @Slot(object, object, 'qint64')
+    def __filterResult(self, rows, query, rowCount):
+        if self.sender() is not self.__filterWorker:
+            return
+        self.model.setFilter(rows, query, rowCount)
+        self.filterLabel.setText('%d / %d 行（%d ms）' % (self.model.rowCount(), self.model.store.rowCount,
+                                                        (time.perf_counter() - self.__filterStart) * 1000))
+
+    @Slot(str)
+    def __filterFailed(self, message):
+        if self.sender() is self.__filterWorker:
+            self.filterLabel.setText(message)
+
+    @Slot()
+    def __filterFinished(self):
+        if self.sender() is self.__filterWorker:
+            self.__filterWorker.deleteLater()
+            self.__filterWorker = None
+
+    @property
+    def statsEnabled(self) -> bool:
+        return self.__statsEnabled
+
+    def setStatsEnabled(self, enabled):
+        """
+        是否计算列统计：启用后在后台统计已加载的数据，之后随追加的行和修改的单元格更新
+        :param enabled: bool
+        :return: None
+        """
+        self.__statsEnabled = enabled
+        if enabled:
+            self.__updateStats()
+        else:
+            self.__stopStats()
+            self.__stats = []
+            self.__statsStore = None
+
+    @property
+    def statsBusy(self) -> bool:
+        """
+        是否还有未统计的行
+        :return:
+        """
+        if self.__statsWorker is not None:
+            return True
+        return self.model.inMemory and any(stats.rows < self.model.store.rowCount for stats in self.__stats)
+
+    def columnStats(self):
+        """
+        各列的统计结果
+        :return: [(列名, ColumnStats.summary的结果)]，延迟加载的数据及未启用统计时为空
+        """
+        store = self.model.store
+        if store is not self.__statsStore:
+            return []
+        result = []
+        for column, stats in enumerate(self.__stats):
+            if stats.kind != store.columnKind(column):
+                continue
+            if stats.boundsStale:
+                stats.refreshBounds(store.columns[column])
+            _header = store.headerValue(column)
+            result.append((str(column + 1) if _header is None else _header, stats.summary(store.columns[column])))
+        return result
+
+    @Slot()
+    def __scheduleStats(self):
+        if self.__statsEnabled:
+            self.__statsTimer.start()
+
+    @Slot()
+    def __updateStats(self):
+        """
+        在后台统计各列新增的行（类型改变的列重新统计）；已换出或延迟加载的数据不统计
+        :return: None
+        """
+        self.__statsTimer.stop()
+        if not self.__statsEnabled or self.__statsWorker is not None or self.__evicted is not None:
+            return
+        store = self.model.store
+        if not self.model.inMemory:
+            if self.__stats:
+                self.__stats = []
+                self.__statsStore = None
+                self.statsChanged.emit()
+            return
+        if store is not self.__statsStore:
+            self.__statsStore = store
+            self.__stats = []
+            self.statsChanged.emit()
+        parts = []
+        for column in range(store.columnCount):
+            kind = store.columnKind(column)
+            if column == len(self.__stats):
+                self.__stats.append(ColumnStats(kind))
+            elif self.__stats[column].kind != kind:
+                self.__stats[column] = ColumnStats(kind)
+            for start in range(self.__stats[column].rows, store.rowCount, self.__statsChunk):
+                stop = min(start + self.__statsChunk, store.rowCount)
+                parts.append((column, start, snapshotColumn(store.columns[column], start, stop)))
+        if not parts:
+            return
+        self.__statsWorker = StatsWorker(store, parts, self)
+        self.__statsWorker.resultReady.connect(self.__statsResult)
+        self.__statsWorker.finished.connect(self.__statsFinished)
+        self.__statsWorker.start()
+
+    def __stopStats(self):
+        # 取消正在进行的统计，已经投递的结果在槽函数中通过sender()过滤掉
+        self.__statsTimer.stop()
+        if self.__statsWorker is None:
+            return
+        worker = self.__statsWorker
+        self.__statsWorker = None
+        worker.cancel()
+        worker.wait()
+        worker.deleteLater()
+        # 丢弃了统计结果，统计期间修改的单元格中已统计的行直接更新
+        pending = self.__statsPending
+        self.__statsPending = []
+        self.__statsEdited(pending)
+
+    @Slot(object, object)
+    def __statsResult(self, store, result):
+        """
+        合并后台统计的结果，再补上统计期间修改的单元格
+        :param store: 统计的数据
+        :param result: {列号: ColumnStats}
+        :return: None
+        """
+        if self.sender() is not self.__statsWorker or store is not self.__statsStore:
+            return
+        for column, stats in result.items():
+            # 统计期间该列的类型改变时丢弃，稍后重新统计
+            current = self.__stats[column]
+            if stats.kind == current.kind and stats.start == current.rows:
+                current.merge(stats)
+        pending = self.__statsPending
+        self.__statsPending = []
+        self.__statsEdited(pending)
+
+    @Slot()
+    def __statsFinished(self):
+        if self.sender() is not self.__statsWorker:
+            return
+        self.__statsWorker.deleteLater()
+        self.__statsWorker = None
+        self.statsChanged.emit()
+        # 统计期间追加的行
+        self.__updateStats()
+
+    @Slot(object)
+    def __statsEdited(self, edits):
+        """
+        修改单元格后增量更新统计，只更新已统计的行；后台统计期间先记录下来
+        :param edits: [(数据行, 列, 原值, 新值)]
+        :return: None
+        """
+        store = self.model.store
+        if not edits or store is not self.__statsStore:
+            return
+        if self.__statsWorker is not None:
+            self.__statsPending.extend(edits)
+            return
+        for row, column, old, new in edits:
+            stats = self.__stats[column] if column < len(self.__stats) else None
+            if stats is None or row >= stats.rows:
+                continue
+            kind = store.columnKind(column)
+            if kind == stats.kind:
+                stats.edit(store.columns[column], old, new)
+            else:
+                # 修改的值不符合列的类型，该列已退回为字符串列，重新统计
+                self.__stats[column] = ColumnStats(kind)
+                self.__scheduleStats()
+        self.statsChanged.emit()
+
+    @Slot(object)
+    def __statsColumnsEdited(self, columns):
+        # 批量修改的列不逐个单元格更新，在后台重新统计
+        if self.model.store is not self.__statsStore:
+            return
+        self.__stopStats()
+        for column in set(columns):
+            if column < len(self.__stats):
+                self.__stats[column] = ColumnStats(self.model.store.columnKind(column))
+        self.__updateStats()
+
+    @Slot()
+    def __selectionChanged(self):
+        self.selectionSummary.emit(self.__selectionSummary())
+
+    def __selectionSummary(self) -> str:
+        """
+        选中区域的单元格数，以及其中数值的个数、总和与平均值（类型列向量化计算）
+        :return: 显示的文本，没有选中时为空
+        """
+        ranges = self.table.selectionModel().selection()
+        if ranges.isEmpty() or not self.model.inMemory:
+            return ''
+        store = self.model.store
+        cells = count = 0
+        total = 0.0
+        for selected in ranges:
+            rows = self.model.dataRows(selected.top(), selected.bottom() + 1)
+            for column in range(selected.left(), selected.right() + 1):
+                cells += len(rows)
+                _column = store.columns[column]
+                if _column.kind in (KIND_INT, KIND_FLOAT):
+                    values = _column.values[rows]
+                    if _column.missing is not None:
+                        values = values[~_column.missing[rows]]
+                elif _column.kind == KIND_TEXT and len(rows) <= self.__selectionParseLimit:
+                    values = self.__parseNumbers(_column.get(row) for row in rows.tolist())
+                else:
+                    continue
+                count += len(values)
+                total += float(values.sum())
+        if not count:
+            return '选中 %d 个单元格' % cells
+        return '选中 %d 个单元格  数值 %d 个  求和 %.10g  平均 %.10g' % (cells, count, total, total / count)
+
+    @staticmethod
+    def __parseNumbers(texts):
+        # 文本列中能转换为数值的值
+        values = []
+        for text in texts:
+            try:
+                values.append(float(text))
+            except ValueError:
+                pass
+        return np.array(values)
+
+    @property
+    def hasSelection(self) -> bool:
+        return self.table.selectionModel().hasSelection()
+
+    def __checkBulk(self):
+        # 批量修改只支持完整加载在内存中的数据
+        if not self.__file or self.loading:
+            raise BulkError('文件加载完成后才能批量修改')
+        if not self.model.inMemory:
+            raise BulkError('延迟加载的文件不支持批量修改')
+
+    def __bulkRanges(self, columns=None):
+        """
+        批量修改的范围
+        :param columns: 列号列表（其中所有可见的行），None: 选中区域
+        :return: [(列, 按显示顺序排列的数据行数组)]
+        """
+        if columns is not None:
+            rows = self.model.dataRows(0, self.model.rowCount())
+            return [(column, rows) for column in columns]
+        ranges = []
+        for selected in self.table.selectionModel().selection():
+            rows = self.model.dataRows(selected.top(), selected.bottom() + 1)
+            ranges.extend((column, rows) for column in range(selected.left(), selected.right() + 1))
+        return ranges
+
+    def __bulkEdit(self, columns, function) -> int:
+        """
+        对每个范围的文本整体计算新值，作为一步修改写入
+        :param columns: 见__bulkRanges
+        :param function: 旧值数组 -> 新值数组
+        :return: 修改的单元格数
+        """
+        self.__checkBulk()
+        store = self.model.store
+        with Profiler.span('bulk.compute'):
+            edits = [(column, rows, function(store.texts(column, rows)))
+                     for column, rows in self.__bulkRanges(columns)]
+        return self.model.setValues(edits)
+
+    def replaceText(self, pattern, replacement, regex=False, ignoreCase=False, columns=None) -> int:
+        """
+        查找替换，作为一步修改（可以一次撤销）
+        :param pattern: 查找的文本或正则表达式
+        :param replacement: 替换为
+        :param regex: 是否为正则表达式
+        :param ignoreCase: 是否不区分大小写
+        :param columns: 列号列表（其中所有可见的行），None: 选中区域
+        :return: 修改的单元格数
+        """
+        return self.__bulkEdit(columns, lambda texts: replaceText(texts, pattern, replacement, regex, ignoreCase))
+
+    def fillDown(self) -> int:
+        """
+        选中区域中的空单元格按显示的顺序填充上方最近的非空值
+        :return: 修改的单元格数
+        """
+        return self.__bulkEdit(None, fillDown)
+
+    def transformText(self, name, columns=None) -> int:
+        """
+        文本变换（去除首尾空白、大小写）
+        :param name: csv_bulk.TRANSFORMS中的名称
+        :param columns: 列号列表（其中所有可见的行），None: 选中区域
+        :return: 修改的单元格数
+        """
+        return self.__bulkEdit(columns, lambda texts: transformText(texts, name))
+
+    def addDerivedColumn(self, name, expression) -> int:
+        """
+        在最后添加一列，值由表达式按行计算（所有行，包括筛选隐藏的行）
+        :param name: 列头
+        :param expression: 表达式（见csv_bulk.Expression）
+        :return: 非空的单元格数
+        """
+        self.__checkBulk()
+        store = self.model.store
+        rows = np.arange(store.rowCount)
+        with Profiler.span('bulk.compute'):
+            values = Expression(expression, store.header).evaluate(store, rows)
+        column = self.model.addColumn(name)
+        self.__resizeSections()
+        return self.model.setValues([(column, rows, values)])
+
+    def __checkRows(self):
+        # 插入/删除行只支持延迟加载的数据（修改保存在片段表中，不移动数据）
+        if not self.__file or self.loading:
+            raise BulkError('文件加载完成后才能插入或删除行')
+        if not self.model.rowsEditable:
+            raise BulkError('只有延迟加载的文件支持插入和删除行')
+
+    def insertRows(self, count=1) -> int:
+        """
+        在当前行之前插入空行（没有当前行时追加在末尾）
+        :param count: 行数
+        :return: 插入的行数
+        """
+        self.__checkRows()
+        current = self.table.currentIndex()
+        row = current.row() if current.isValid() else self.model.rowCount()
+        if not self.model.insertRows(row, count):
+            return 0
+        self.table.setCurrentIndex(self.model.index(row, max(current.column(), 0)))
+        return count
+
+    def deleteRows(self) -> int:
+        """
+        删除选中区域涉及的所有行，作为一步修改（只按选中区域的上下边界计算，不遍历选中的单元格）
+        :return: 删除的行数
+        """
+        self.__checkRows()
+        ranges = self.table.selectionModel().selection()
+        spans = []
+        for top, bottom in sorted((selected.top(), selected.bottom()) for selected in ranges):
+            if spans and top <= spans[-1][1] + 1:
+                spans[-1][1] = max(spans[-1][1], bottom)
+            else:
+                spans.append([top, bottom])
+        if not spans or not self.model.removeRanges([(top, bottom - top + 1) for top, bottom in spans]):
+            return 0
+        return sum(bottom - top + 1 for top, bottom in spans)
+
+    def copySelection(self) -> int:
+        """
+        复制选中区域到剪贴板（纯文本及TSV为制表符分隔，另有CSV格式），多个区域时复制它们的行和列组成的表格
+        单元格较多时在后台线程编码，完成后写入剪贴板；完成时发出copyFinished
+        :return: 复制的单元格数
+        """
+        ranges = [(selected.top(), selected.bottom(), selected.left(), selected.right())
+                  for selected in self.table.selectionModel().selection()]
+        if not ranges:
+            return 0
+        self.__stopCopy()
+        viewRows, columns = selectionBlock(ranges)
+        first = int(viewRows[0])
+        rows = self.model.dataRows(first, int(viewRows[-1]) + 1)[viewRows - first]
+        cells = len(rows) * len(columns)
+        store = self.model.store
+        self.__copyStart = time.perf_counter()
+        if not self.model.inMemory and cells > self.__copyLazyCells:
+            raise ClipboardError('延迟加载的文件最多复制 %d 个单元格' % self.__copyLazyCells)
+        if cells <= self.__copyAsyncCells or not self.model.inMemory:
+            with Profiler.span('clipboard.encode'):
+                tsv, csv = encodeBlock(store, rows, columns)
+            self.__setClipboard(tsv, csv, cells)
+            return cells
+        self.__copyWorker = CopyWorker(store, rows, columns, self)
+        self.__copyWorker.resultReady.connect(self.__copyResult)
+        self.__copyWorker.finished.connect(self.__copyFinished)
+        self.__copyWorker.start()
+        return cells
+
+    @property
+    def copyBusy(self) -> bool:
+        return self.__copyWorker is not None
+
+    def __setClipboard(self, tsv, csv, cells):
+        mime = QMimeData()
+        mime.setText(tsv)
+        mime.setData(MIME_TSV, tsv.encode('utf-8'))
+        mime.setData(MIME_CSV, csv.encode('utf-8'))
+        QGuiApplication.clipboard().setMimeData(mime)
+        self.copyFinished.emit(cells, time.perf_counter() - self.__copyStart)
+
+    def __stopCopy(self):
+        if self.__copyWorker is not None:
+            self.__copyWorker.cancel()
+            self.__copyWorker.wait()
+            self.__copyWorker.deleteLater()
+            self.__copyWorker = None
+
+    @Slot(str, str, 'qint64')
+    def __copyResult(self, tsv, csv, cells):
+        if self.sender() is self.__copyWorker:
+            self.__setClipboard(tsv, csv, cells)
+
+    @Slot()
+    def __copyFinished(self):
+        if self.sender() is self.__copyWorker:
+            self.__copyWorker.deleteLater()
+            self.__copyWorker = None
+
+    def paste(self) -> int:
+        """
+        粘贴剪贴板中的TSV：一次解析后从选中区域的左上角起整列写入，作为一步修改（可以一次撤销）
+        超出表格的行和列忽略；剪贴板中只有一个值时填充整个选中区域
+        :return: 修改的单元格数
+        """
+        self.__checkBulk()
+        mime = QGuiApplication.clipboard().mimeData()
+        if mime is None or not mime.hasText():
+            return 0
+        with Profiler.span('clipboard.parse'):
+            block = parseTsv(mime.text())
+        selection = self.table.selectionModel().selection()
+        if selection.isEmpty():
+            current = self.table.currentIndex()
+            if not block or not current.isValid():
+                return 0
+            top, left = current.row(), current.column()
+        else:
+            if not block:
+                return 0
+            top = min(selected.top() for selected in selection)
+            left = min(selected.left() for selected in selection)
+        if len(block) == 1 and len(block[0]) == 1 and not selection.isEmpty():
+            value = block[0][0]
+            return self.model.setValues([(column, rows, np.full(len(rows), value))
+                                         for column, rows in self.__bulkRanges()])
+        count = min(len(block[0]), self.model.rowCount() - top)
+        rows = self.model.dataRows(top, top + count)
+        return self.model.setValues([(left + offset, rows, values[:count])
+                                     for offset, values in enumerate(block[:self.model.columnCount() - left])])
+
+    def __checkSort(self):
+        # 视图排序、分组只支持完整加载在内存中的数据
+        if not self.__file or self.loading:
+            raise SortError('文件加载完成后才能排序')
+        if not self.model.inMemory:
+            raise SortError('延迟加载的文件不能在表格中排序，可以排序后另存为')
+
+    def sortBy(self, keys):
+        """
+        多列排序（只改变显示的顺序），列头显示第一个排序列
+        :param keys: [(列号, 是否降序)]，空列表时恢复原始顺序
+        :return: None
+        """
+        self.__checkSort()
+        self.model.sortBy(keys)
+        # 只更新列头的排序标记，不触发按单列重新排序
+        _header = self.table.horizontalHeader()
+        _header.blockSignals(True)
+        _header.setSortIndicator(keys[0][0] if keys else -1,
+                                 Qt.DescendingOrder if keys and keys[0][1] else Qt.AscendingOrder)
+        _header.blockSignals(False)
+        _header.viewport().update()
+
+    def groupBy(self, columns, aggregates):
+        """
+        按列分组汇总：视图按分组的列排序使各组的行相邻，再对可见的行计算每组的汇总值
+        :param columns: 分组的列
+        :param aggregates: [(列号, csv_sort.AGGREGATES中的名称)]
+        :return: (列头, 各列的字符串数组)，每组一行
+        """
+        self.sortBy([(column, False) for column in columns])
+        store = self.model.store
+        self.__groups = groupRows(store, columns, self.model.dataRows(0, self.model.rowCount()))
+        return groupTable(store, self.__groups, aggregates)
+
+    def selectGroup(self, group) -> bool:
+        """
+        选中最近一次分组中某一组的行并滚动到该组
+        :param group: 组号
+        :return: 视图的顺序已改变（重新排序、筛选或修改）时返回False
+        """
+        groups = self.__groups
+        if groups is None or group >= len(groups) or self.model.rowCount() != len(groups.order):
+            return False
+        start = int(groups.starts[group])
+        stop = start + int(groups.counts[group])
+        if not np.array_equal(self.model.dataRows(start, stop), groups.order[start:stop]):
+            return False
+        _last = self.model.index(stop - 1, self.model.columnCount() - 1)
+        _selection = QItemSelection(self.model.index(start, 0), _last)
+        self.table.selectionModel().select(_selection, QItemSelectionModel.ClearAndSelect)
+        self.table.scrollTo(self.model.index(start, 0), QTableView.PositionAtTop)
+        return True
+
+    def showCell(self, row, column) -> bool:
+        """
+        选中一个数据单元格并滚动到该处（视图排序后按数据行号定位）
+        :param row: 数据行号
+        :param column: 列号，None: 选中整行
+        :return: 该行不存在或被筛选掉时返回False
+        """
+        if not 0 <= row < self.model.store.rowCount:
+            return False
+        _row = self.model.viewRow(row)
+        if _row < 0:
+            return False
+        if column is None or not 0 <= column < self.model.columnCount():
+            self.table.selectRow(_row)
+            self.table.scrollTo(self.model.index(_row, 0), QTableView.PositionAtCenter)
+        else:
+            _index = self.model.index(_row, column)
+            self.table.setCurrentIndex(_index)
+            self.table.scrollTo(_index, QTableView.PositionAtCenter)
+        return True
+
+    def saveSorted(self, csvFile, keys, withHeader=False):
+        """
+        把数据按排序条件另存为一个文件（不改变当前文件和显示的顺序）
+        完整加载的数据按行的排列逐行写出，延迟加载的数据用临时文件外部归并排序后流式写出
+        :param csvFile: 保存到的文件名
+        :param keys: [(列号, 是否降序)]
+        :param withHeader: 是否保存列头
+        :return: None
+        """
+        self.restore()
+        if self.loading:
+            raise SortError('文件加载完成后才能排序')
+        store = self.model.store
+        with Profiler.span('file.saveSorted'), atomicOpen(csvFile) as f, \
+                compressedOutput(f, compressionForPath(csvFile)) as out:
+            writeSorted(store, out, keys, withHeader)
+
     @property
     def file(self):
         """
@@ -106,43 +926,187 @@ class CsvEditor(QWidget):
         else:
             return False
 
-    def loadFile(self, csvFile, withHeader=False):
+    @property
+    def loading(self) -> bool:
+        """
+        是否正在后台加载
+        :return:
+        """
+        return self.__loader is not None
+
+    @property
+    def lazy(self) -> bool:
+        """
+        当前文件是否为延迟加载
+        :return:
+        """
+        return isinstance(self.model.store, LazyStore)
+
+    @property
+    def withHeader(self) -> bool:
+        """
+        当前文件的第一行是否为列头
+        :return:
+        """
+        return self.__withHeader
+
+    @property
+    def format(self):
+        """
+        当前文件的格式
+        :return: FileFormat，没有打开文件时为None
+        """
+        return self.__format
+
+    @property
+    def memoryUsage(self) -> int:
+        """
+        数据占用的内存（估算），已换出时为0
+        :return: 字节数
+        """
+        return self.model.store.nbytes()
+
+    @property
+    def evicted(self) -> bool:
+        """
+        数据是否已换出到磁盘
+        :return:
+        """
+        return self.__evicted is not None
+
+    def evict(self) -> bool:
+        """
+        把数据换出到磁盘并释放内存（标签页不活动时）：未修改的文件写入解析缓存，
+        有修改的写入换出文件；修改记录、排序和筛选保留，restore后恢复
+        正在加载、跟随、筛选的文件及延迟加载的文件不换出
+        :return: 是否已换出
+        """
+        if self.__cache is None or self.__evicted is not None or not self.__file or self.loading \
+                or self.__follow or self.__filterWorker is not None or self.__copyWorker is not None \
+                or not self.model.inMemory:
+            return False
+        _bar = self.table.verticalScrollBar()
+        self.__stopStats()
+        store, state = self.model.detach()
+        # 统计保留，但不能引用换出的数据，否则内存不能释放
+        self.__statsEvicted = self.__statsStore is store
+        self.__statsStore = None
+        path = None
+        if self.modified or not self.__loadOk or self.__fileStat(self.__file) != self.__savedStat \
+                or not self.__cache.put(self.__file, self.__withHeader, store):
+            path = self.__cache.spill(store)
+        self.__evicted = (path, (state, _bar.value(), self.table.horizontalScrollBar().value()))
+        return True
+
+    def restore(self) -> bool:
+        """
+        读回换出的数据；没有修改的文件的解析缓存已失效（例如源文件已改变）时重新加载
+        有修改的数据无法读回（换出文件丢失或损坏）时不重新加载，否则会丢弃未保存的修改：
+        抛出OSError，数据保持换出状态，由调用者决定是否放弃修改
+        :return: 之前是否已换出
+        """
+        if self.__evicted is None:
+            return False
+        path, (state, top, left) = self.__evicted
+        store = self.__cache.unspill(path) if path else self.__cache.get(self.__file, self.__withHeader)
+        if store is None and path and self.modified:
+            raise OSError('换出到磁盘的数据无法读回，未保存的修改（%d 处）已丢失' % self.modifiedCount)
+        self.__evicted = None
+        if self.__statsEvicted and store is not None:
+            self.__statsStore = store
+        self.__statsEvicted = False
+        if store is None:
+            self.loadFile(self.__file, self.__withHeader, background=True, engine=self.__engine)
+            return True
+        store.format = self.__format
+        self.model.attach(store, state)
+        self.__resizeSections()
+        self.table.verticalScrollBar().setValue(top)
+        self.table.horizontalScrollBar().setValue(left)
+        return True
+
+    def __discardEvicted(self):
+        # 关闭文件时丢弃换出的数据
+        if self.__evicted is not None:
+            path = self.__evicted[0]
+            self.__evicted = None
+            if path:
+                self.__cache.discard(path)
+
+    def loadFile(self, csvFile, withHeader=False, background=False, lazy=False, engine=ENGINE_PYTHON):
         """
         加载csv文件
         :param csvFile: csv文件路径
-        :param withHeader: 是否有列头
+        :param withHeader: 是否有列头。None: 自动判断
+        :param background: 是否在后台线程中分批加载（进度通过loadProgress信号通知）
+        :param lazy: 是否延迟加载：只建立行索引，按需解析可见的行
+        :param engine: 解析引擎（ENGINE_PYTHON/ENGINE_PARALLEL）
         :return: None
         """
-        # 清楚表格
+        # 清楚表格（同时取消正在进行的加载）
         self.closeFile()
 
-        # 读文件，并填充表格
-        with open(csvFile, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            row_index = 0
-            for row in reader:
-                if withHeader and row_index == 0:
-                    # 设置header
-                    self.__setHeader(row)
-                else:
-                    # 添加一行
-                    self.__appendRow(row)
-                row_index += 1
+        # 探测编码、分隔符及是否有列头；utf-16等编码不能按字节建立行索引，不使用延迟加载
+        # 压缩的文件只有zstd可随机访问格式能延迟加载，其余流式解压后完整加载；Parquet/Arrow文件按列完整加载
+        fileFormat = FileFormat.detect(csvFile)
+        if withHeader is None:
+            withHeader = fileFormat.hasHeader
+        self.__format = fileFormat
+        self.__compression = detectCompression(csvFile)
+        self.__tableFormat = detectTableFormat(csvFile)
+        lazy = lazy and fileFormat.byteSplittable and self.__tableFormat is None and canOpenLazy(csvFile)
+        self.__engine = engine
+        self.__withHeader = withHeader
+        self.__loadedBytes = 0
+        self.__loadOk = True
+        # 未改变的文件直接映射解析缓存（延迟加载的文件为行索引）
+        cached = None
+        if self.__cache is not None:
+            cached = self.__cache.getLazy(csvFile, withHeader, fileFormat) if lazy \
+                else self.__cache.get(csvFile, withHeader)
+        if cached is not None:
+            cached.format = fileFormat
+            self.model.setStore(cached)
+            self.__loadedBytes = QFileInfo(csvFile).size()
+            self.__resizeSections()
+        elif background:
+            self.__startLoader(csvFile, withHeader, lazy)
+        elif lazy:
+            self.model.setStore(LazyStore(csvFile, withHeader, fileFormat))
+            self.__loadedBytes = self.model.store.fileSize
+            if self.__cache is not None:
+                self.__cache.putLazy(self.model.store)
+            self.__resizeSections()
+        else:
+            # 读文件，按批写入列存储，最后一次性交给模型
+            reader = createReader(csvFile, withHeader, fileFormat, engine)
+            store = ColumnStore(fileFormat)
+            try:
+                for batch in Profiler.timed(reader.batches(self.__batchRows, self.__batchRows), 'load.parse'):
+                    with Profiler.span('model.append'):
+                        store.appendBatch(batch)
+            finally:
+                reader.close()
+            if reader.header is not None:
+                store.setHeader(reader.header)
+            self.model.setStore(store)
+            self.__loadedBytes = reader.bytesRead
+            self.__resizeSections()
 
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
-        self.table.horizontalHeader().setSectionResizeMode(self.table.columnCount() - 1, QHeaderView.Stretch)
-
-        # 记录状态
-        # 1. 清除表格内容改变的状态
-        # 2. 保存当前文件
-        # 3. 显示该控件
-        # 4. 连接信号槽
-        # 5. 监视该文件
-        self.__tableChanged = False
+        # 记录状态（表格修改记录在模型替换数据时已清空）
+        # 1. 保存当前文件及其状态
+        # 2. 显示该控件
+        # 3. 监视该文件
         self.__file = csvFile
+        self.__savedStat = self.__fileStat(csvFile)
         self.table.setVisible(True)
-        self.table.itemChanged.connect(self.tableChanged)
+        self.__updateSorting()
+        self.__applyFilter()
         self.__fileWatcher.addPath(csvFile)
+        if self.__follow and not self.loading:
+            self.__startFollow()
+        if cached is not None:
+            self.loadFinished.emit(True)
 
     def closeFile(self):
         """
@@ -150,77 +1114,220 @@ class CsvEditor(QWidget):
         :return:
         """
         # 清除状态
+        # 0. 丢弃换出的数据，未修改的文件写入解析缓存
         # 1. 移除监视该文件
-        # 2. 断开信号槽
-        # 3. 隐藏该控件
-        # 4. 清除当前文件
-        # 5. 清空表格
-        # 6. 清除记录表格内容改变的状态位
+        # 2. 隐藏该控件
+        # 3. 清除当前文件
+        # 4. 清空表格（同时清空修改记录）
+        self.__stopLoader()
+        self.__stopFilter()
+        self.__stopStats()
+        self.__stopCopy()
+        self.__discardEvicted()
         if self.__file:
+            self.__cacheParsed()
             self.__fileWatcher.removePath(self.__file)
-            self.table.itemChanged.disconnect(self.tableChanged)
             self.table.setVisible(False)
             self.__file = None
-            self.table.clear()
-            self.table.setColumnCount(0)
-            self.table.setRowCount(0)
-            self.__tableChanged = False
+            self.__format = None
+            self.__followState = None
+            self.model.clear()
+            self.__updateSorting()
 
     def saveFile(self, csvFile=None, withHeader=False):
         """
         保存文件
         :param csvFile: 保存到的文件名。None: 保存到当前文件
         :param withHeader: 是否保存列头
-        :return:
+        :return: 是否已保存（没有修改而不需要重写时也为True）；没有文件或正在加载时为False
         """
         # csvFile为空，则使用当前文件
         if not csvFile:
             csvFile = self.__file
         if not csvFile:
-            return
+            return False
+        # 换出的数据先读回（无法读回时抛出OSError）；解析缓存失效而重新加载时不能保存
+        self.restore()
+        if self.loading:
+            return False
+        # 没有修改且源文件未变时，保存到自身不需要重写文件
+        store = self.model.store
+        if csvFile == self.__file and not self.modified and (withHeader or store.header is None) \
+                and self.__fileStat(csvFile) == self.__savedStat:
+            return True
 
-        # 将表格数据写入到文件
-        with open(csvFile, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            row_count = self.table.rowCount()
-            column_count = self.table.columnCount()
-
-            # 写header
-            if withHeader:
-                header = []
-                for i in range(0, column_count):
-                    item = self.table.horizontalHeaderItem(i).text()
-                    header.append(item)
-                writer.writerow(header)
-
-            rows = []
-            for row_idx in range(0, row_count):
-                # 获取当前行的数据
-                row = []
-                for column_idx in range(0, column_count):
-                    item = self.table.item(row_idx, column_idx).text()
-                    row.append(item)
-                rows.append(row)
-
-                # 防止内存开销过大，因此指定行数写入一次
-                if len(rows) == 1000:
-                    writer.writerows(rows)
-                    rows = []
-
-            # 写入剩余数据
-            if len(rows):
-                writer.writerows(rows)
-
-        # 另存为时，更新状态
-        # 1. 清除表格内容改变的标志位
-        # 2. 移除监视的旧文件
-        # 3. 监视新文件
+        # 将表格数据写入临时文件，完成后原子替换目标文件
+        # 1. 延迟加载的文件保存到自身时，Linux下旧的映射仍指向原文件内容，与保存结果一致，可以继续使用
+        # 2. Windows下被映射的文件不能替换，需要先释放映射，保存后重新建立索引
+        # 3. 延迟加载的文件另存为时，重新在新文件上建立索引，不再依赖不被监视的旧文件
+        # 4. 跟随模式下延迟加载的文件也重新建立索引，保证索引与新文件的字节位置一致
+        # 5. 保存到自身时沿用原来的压缩格式（或Parquet/Arrow格式），另存为时按扩展名决定；
+        #    保存为不能延迟加载的格式时，继续使用原来的索引（内容与保存结果一致）
+        lazy = isinstance(store, LazyStore)
+        if csvFile == self.__file:
+            compression, tableFormat = self.__compression, self.__tableFormat
+        else:
+            compression, tableFormat = compressionForPath(csvFile), tableFormatForPath(csvFile)
+        releaseFirst = lazy and sys.platform == 'win32' and csvFile == self.__file
+        try:
+            if tableFormat is not None:
+                saveTable(store, csvFile, withHeader, beforeReplace=store.close if releaseFirst else None,
+                          tableFormat=tableFormat)
+            else:
+                saveStore(store, csvFile, withHeader, beforeReplace=store.close if releaseFirst else None,
+                          compression=compression)
+        except OSError:
+            # 替换失败时原文件保持不变，重新映射后继续使用（修改仍在）
+            if releaseFirst and store.closed:
+                store.reopen()
+            raise
+        if lazy and (releaseFirst or csvFile != self.__file or self.__follow) and tableFormat is None \
+                and canOpenLazy(csvFile):
+            # 新文件的行与保存前一一对应，单元格的修改记录保留；插入/删除行的步骤中的行布局引用旧文件的物理行，
+            # 在新文件上无法恢复，有这样的步骤时清空撤销记录
+            self.model.setStore(LazyStore(csvFile, withHeader and store.header is not None, store.format),
+                                keepJournal=not self.model.journal.hasRowEdits)
+            self.__resizeSections()
+            self.__updateSorting()
+            self.__applyFilter()
+
+        # 更新状态
+        # 1. 当前值成为新的原始值（撤销记录保留，重新建立索引时见上）
+        # 2. 移除监视的旧文件（文件被替换后需要重新监视）
+        # 3. 监视新文件，并记录保存后的文件状态，用于忽略自身保存触发的通知
         # 4. 更新当前文件
-        self.__tableChanged = False
-        if self.__file != csvFile:
-            self.__fileWatcher.removePath(self.__file)
-            self.__fileWatcher.addPath(csvFile)
-            self.__file = csvFile
+        self.model.markSaved()
+        if self.__cache is not None:
+            self.__cache.invalidate(csvFile)
+        self.__fileWatcher.removePath(self.__file)
+        self.__fileWatcher.addPath(csvFile)
+        self.__savedStat = self.__fileStat(csvFile)
+        self.__file = csvFile
+        self.__compression = compression
+        self.__tableFormat = tableFormat
+        self.__withHeader = withHeader and store.header is not None
+        self.__loadedBytes = self.__savedStat[0] if self.__savedStat else 0
+        if self.__follow:
+            self.__startFollow()
+        return True
+
+    def __cacheParsed(self):
+        # 关闭没有修改的文件时把解析结果写入缓存，下次打开时不需要重新解析；加载失败时只有部分数据，不写入
+        if self.__cache is not None and self.model.inMemory and not self.loading and self.__loadOk \
+                and not self.modified and self.model.store.rowCount \
+                and self.__fileStat(self.__file) == self.__savedStat:
+            store, _ = self.model.detach()
+            self.__cache.put(self.__file, self.__withHeader, store)
+
+    @staticmethod
+    def __fileStat(file):
+        try:
+            _stat = os.stat(file)
+        except OSError:
+            return None
+        return _stat.st_size, _stat.st_mtime_ns
+
+    def __updateSorting(self):
+        # 数据完整加载后才允许点击列头排序；延迟加载的数据不支持排序
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(self.model.inMemory and not self.loading and self.__file is not None)
+
+    def __resizeSections(self):
+        # 最后一列拉伸填满，其余列可手动调整，初始宽度按内容估算（不测量所有行）
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        if self.model.columnCount() > 0:
+            self.table.horizontalHeader().setSectionResizeMode(self.model.columnCount() - 1, QHeaderView.Stretch)
+        self.sizer.reset()
+
+    def __startLoader(self, csvFile, withHeader, lazy):
+        """
+        启动后台加载线程
+        :param csvFile: csv文件路径
+        :param withHeader: 是否有列头
+        :param lazy: 是否延迟加载
+        :return: None
+        """
+        self.__loadTotal = QFileInfo(csvFile).size()
+        self.__loadOk = True
+        self.__loader = CsvLoader(csvFile, withHeader, lazy, self.__format, self.__engine, self)
+        # 后台加载的数据写入与文件格式一致的列存储，保存时沿用原编码和分隔符
+        if not lazy:
+            self.model.setStore(ColumnStore(self.__format))
+        self.__loader.headerParsed.connect(self.__loaderHeaderParsed)
+        self.__loader.rowsParsed.connect(self.__loaderRowsParsed)
+        self.__loader.storeParsed.connect(self.__loaderStoreParsed)
+        self.__loader.progress.connect(self.__loaderProgress)
+        self.__loader.failed.connect(self.__loaderFailed)
+        self.__loader.finished.connect(self.__loaderFinished)
+        self.__loader.start()
+
+    def __stopLoader(self):
+        """
+        取消后台加载，并等待线程退出
+        已经投递到界面线程的信号会在槽函数中通过sender()过滤掉
+        :return: None
+        """
+        if self.__loader is None:
+            return
+        loader = self.__loader
+        self.__loader = None
+        loader.cancel()
+        loader.wait()
+        loader.deleteLater()
+
+    def __isCurrentLoader(self) -> bool:
+        # 忽略已取消的加载线程发来的信号
+        return self.__loader is not None and self.sender() is self.__loader
+
+    @Slot(object)
+    def __loaderHeaderParsed(self, header):
+        if self.__isCurrentLoader():
+            self.model.setHeader(header)
+
+    @Slot(object)
+    def __loaderRowsParsed(self, batch):
+        if self.__isCurrentLoader():
+            first = self.model.rowCount() == 0
+            self.model.appendBatch(batch)
+            # 第一批数据显示时就按内容估算列宽，加载完成后再按全部数据估算一次
+            if first:
+                self.__resizeSections()
+
+    @Slot(object)
+    def __loaderStoreParsed(self, store):
+        if self.__isCurrentLoader():
+            self.model.setStore(store)
+            if self.__cache is not None:
+                self.__cache.putLazy(store)
+        else:
+            store.close()
+
+    @Slot('qint64', 'qint64')
+    def __loaderProgress(self, bytesRead, rowsParsed):
+        if self.__isCurrentLoader():
+            self.__loadedBytes = bytesRead
+            self.loadProgress.emit(bytesRead, self.__loadTotal, rowsParsed)
+
+    @Slot(str)
+    def __loaderFailed(self, message):
+        if self.__isCurrentLoader():
+            self.__loadOk = False
+            self.loadFailed.emit(message)
+
+    @Slot()
+    def __loaderFinished(self):
+        if not self.__isCurrentLoader():
+            return
+        self.__loader.deleteLater()
+        self.__loader = None
+        self.__resizeSections()
+        self.__updateSorting()
+        self.__applyFilter()
+        self.loadFinished.emit(self.__loadOk)
+        # 加载期间追加的数据在这里补上
+        if self.__follow and self.__loadOk and self.__file:
+            self.__startFollow()
+            self.__followFile()
 
     def dragEnterEvent(self, event: QDragEnterEvent) -> None:
         if event.mimeData().hasUrls():
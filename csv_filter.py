@@ -0,0 +1,53 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_filter.py
+@Desc    : 后台线程计算筛选结果
+@Author  : qdu
+@Date    : 2026/10/17 18:40
+"""
+
+from PySide6.QtCore import QThread, Signal
+from csv_query import QueryError
+
+
+class FilterWorker(QThread):
+    """
+    在工作线程中计算满足查询条件的行，完成后通过信号把结果交给界面线程
+    """
+
+    # 信号
+    resultReady = Signal(object, object, 'qint64')     # 满足条件的数据行, 查询, 计算时的数据行数
+    failed = Signal(str)                                # 查询失败，参数为错误信息
+
+    def __init__(self, store, query, rows=None, parent=None):
+        """
+        :param store: ColumnStore
+        :param query: Query
+        :param rows: 候选行（细化上次的查询时为上次的结果），None: 所有行
+        :param parent:
+        """
+        super().__init__(parent)
+        self.__store = store
+        self.__query = query
+        self.__rows = rows
+        self.__canceled = False
+
+    def cancel(self):
+        """
+        取消计算，工作线程在处理完当前条件后退出
+        :return: None
+        """
+        self.__canceled = True
+
+    def run(self):
+        rowCount = self.__store.rowCount
+        try:
+            rows = self.__query.evaluate(self.__store, self.__rows, lambda: self.__canceled, rowCount)
+        except QueryError as e:
+            if not self.__canceled:
+                self.failed.emit(str(e))
+            return
+        if rows is not None and not self.__canceled:
+            self.resultReady.emit(rows, self.__query, rowCount)
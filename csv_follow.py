@@ -0,0 +1,117 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_follow.py
+@Desc    : 跟踪文件追加的内容（类似tail -f，不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 15:20
+"""
+
+import csv
+import io
+import os
+import zlib
+
+_HEAD_SIZE = 64 * 1024      # 校验和包含的文件开头字节数
+_SAMPLE_SIZE = 4096         # 其余每个采样块的字节数
+_SAMPLES = 8                # 采样块个数
+
+
+def prefixChecksum(f, length):
+    """
+    对文件前length个字节采样计算校验和：开头64KB、均匀分布的若干块以及末尾一块
+    :param f: 二进制文件对象
+    :param length: 前缀长度
+    :return: int
+    """
+    positions = [0] if length <= _HEAD_SIZE else \
+        [0] + [_HEAD_SIZE + (length - _HEAD_SIZE) * i // _SAMPLES for i in range(_SAMPLES)] + [length - _SAMPLE_SIZE]
+    checksum = 0
+    for pos in positions:
+        f.seek(pos)
+        size = _HEAD_SIZE if pos == 0 else _SAMPLE_SIZE
+        checksum = zlib.crc32(f.read(min(size, length - pos)), checksum)
+    return checksum
+
+
+def completeLength(data, quotechar='"') -> int:
+    """
+    数据中完整行的长度：最后一个不在引号内的换行符之后的部分是未写完的行
+    :param data: bytes（起点在行边界上）
+    :param quotechar: 引号字符
+    :return: 字节数
+    """
+    quote = quotechar.encode('ascii')
+    pos = data.rfind(b'\n')
+    while pos >= 0 and data.count(quote, 0, pos) % 2:
+        pos = data.rfind(b'\n', 0, pos)
+    return pos + 1
+
+
+class FollowState(object):
+    """
+    记录已解析到的字节位置、文件大小、修改时间以及前缀校验和
+    文件变化时据此判断是只在末尾追加了数据，还是前面的内容被改写
+    """
+
+    Unchanged = 0       # 没有新的完整行
+    Appended = 1        # 末尾追加了数据
+    Rewritten = 2       # 已解析的部分被修改（或文件变短/被删除），需要完整重新加载
+
+    def __init__(self, path, offset):
+        """
+        :param path: 文件路径
+        :param offset: 已解析到的字节位置（行边界）
+        """
+        self.path = path
+        self.offset = 0
+        self.size = 0
+        self.mtime = 0
+        self.checksum = 0
+        self.advance(offset)
+
+    def advance(self, offset):
+        """
+        更新已解析到的位置
+        :param offset: 字节位置
+        :return: None
+        """
+        with open(self.path, 'rb') as f:
+            _stat = os.fstat(f.fileno())
+            self.offset = offset
+            self.size = _stat.st_size
+            self.mtime = _stat.st_mtime_ns
+            self.checksum = prefixChecksum(f, offset)
+
+    def status(self) -> int:
+        """
+        检查文件的变化
+        :return: Unchanged/Appended/Rewritten
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                _stat = os.fstat(f.fileno())
+                if _stat.st_size < self.offset or prefixChecksum(f, self.offset) != self.checksum:
+                    return FollowState.Rewritten
+        except OSError:
+            return FollowState.Rewritten
+        if _stat.st_size == self.size and _stat.st_mtime_ns == self.mtime:
+            return FollowState.Unchanged
+        return FollowState.Appended
+
+    def readAppended(self, fileFormat):
+        """
+        解析追加的完整行，并更新已解析到的位置
+        :param fileFormat: 文件格式（FileFormat，编码必须能按字节查找换行符）
+        :return: 二维列表
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        length = completeLength(data, fileFormat.quotechar)
+        # utf-8-sig只在文件开头有BOM，按utf-8解码
+        encoding = 'utf-8' if fileFormat.encoding == 'utf-8-sig' else fileFormat.encoding
+        rows = list(csv.reader(io.StringIO(data[:length].decode(encoding), newline=''), **fileFormat.readerArgs()))
+        self.advance(self.offset + length)
+        return rows
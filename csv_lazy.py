@@ -0,0 +1,532 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_lazy.py
+@Desc    : 基于mmap的大文件延迟解析，zstd可随机访问格式的压缩文件按帧解压（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 11:10
+"""
+
+import csv
+import io
+import mmap
+import os
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate, islice
+import numpy as np
+from csv_writer import RowWriter
+from csv_follow import completeLength
+from csv_parser import FileFormat
+from csv_compress import SeekableZstdBuffer, detectCompression
+
+_NEWLINE = ord('\n')
+
+
+def buildRowIndex(buf, stride=64, chunkSize=16 << 20, progress=None, canceled=None, firstRow=0, quotechar='"'):
+    """
+    扫描一遍文件内容，记录每stride行的起始偏移（引号内的换行不作为行边界）
+    :param buf: 支持缓冲区协议的对象（mmap/bytes）或SeekableZstdBuffer
+    :param stride: 每隔多少行记录一次偏移
+    :param chunkSize: 每次扫描的字节数
+    :param progress: 进度回调 progress(已扫描字节数)
+    :param canceled: 取消检查 canceled() -> bool
+    :param firstRow: buf中第一行的行号（索引追加的数据时使用）
+    :param quotechar: 引号字符
+    :return: (偏移数组np.uint64, 总行数)，取消时返回None
+    """
+    size = len(buf)
+    if size == 0:
+        return np.zeros(0, np.uint64), 0
+    quote = ord(quotechar)
+    starts = [np.zeros(1 if firstRow % stride == 0 else 0, np.uint64)]     # 第一行从0开始
+    count = 0                           # 已找到的行结束符个数
+    inQuote = 0                         # 上一块结束时是否在引号内
+    for pos, chunk in _chunks(buf, chunkSize):
+        if canceled and canceled():
+            return None
+        newlines = np.flatnonzero(chunk == _NEWLINE)
+        quotes = np.flatnonzero(chunk == quote)
+        if len(quotes):
+            # 换行符之前的引号个数为奇数，说明该换行在引号内
+            parity = (np.searchsorted(quotes, newlines) + inQuote) & 1
+            newlines = newlines[parity == 0]
+            inQuote = (inQuote + len(quotes)) & 1
+        # 第count+1+i行从newlines[i]+1开始，只保留行号是stride倍数的
+        rowNumbers = np.arange(firstRow + count + 1, firstRow + count + 1 + len(newlines))
+        starts.append((newlines[rowNumbers % stride == 0] + (pos + 1)).astype(np.uint64))
+        count += len(newlines)
+        if progress:
+            progress(min(pos + len(chunk), size))
+    offsets = np.concatenate(starts)
+    # 文件以换行结尾时，最后一个换行之后没有数据行
+    total = count + 1
+    if buf[size - 1] == _NEWLINE and not inQuote:
+        total = count
+        if len(offsets) and offsets[-1] == size:
+            offsets = offsets[:-1]
+    return offsets, total
+
+
+def _chunks(buf, chunkSize):
+    # mmap/bytes直接按缓冲区切片；压缩文件（SeekableZstdBuffer）逐帧解压
+    if hasattr(buf, 'chunks'):
+        for pos, data in buf.chunks(chunkSize):
+            yield pos, np.frombuffer(data, dtype=np.uint8)
+        return
+    data = np.frombuffer(buf, dtype=np.uint8)
+    for pos in range(0, len(buf), chunkSize):
+        yield pos, data[pos:pos + chunkSize]
+
+
+class LazyStore(object):
+    """
+    延迟解析的表格数据
+    文件通过mmap映射，只保存稀疏的行偏移索引；按块（stride行）解码，
+    解码后的块放在LRU缓存中，内存占用与文件大小基本无关
+    修改过的单元格保存在稀疏字典中，保存时未修改的块按字节原样复制
+    插入/删除行时不移动数据：行的顺序由片段表描述，每个片段是源文件中连续的物理行或连续的插入行，
+    片段个数只与插入/删除的次数有关，按行号二分查找片段
+    接口与ColumnStore一致
+    """
+
+    def __init__(self, csvFile, withHeader=False, fileFormat=None, stride=64, cacheBlocks=256,
+                 progress=None, canceled=None, index=None):
+        """
+        :param csvFile: csv文件路径
+        :param withHeader: 是否有列头
+        :param fileFormat: 文件格式（FileFormat，编码必须能按字节查找换行符）
+        :param stride: 索引间隔（行）
+        :param cacheBlocks: 缓存的块数
+        :param progress: 建索引的进度回调 progress(已扫描字节数)
+        :param canceled: 取消检查 canceled() -> bool
+        :param index: 已有的行索引(偏移数组, 总行数)，例如来自磁盘缓存；None: 扫描文件建立
+        """
+        self.file = csvFile
+        self.format = fileFormat or FileFormat()
+        self.header = None
+        self.canceled = False
+        self.__stride = stride
+        self.__cacheBlocks = cacheBlocks
+        self.__cache = OrderedDict()    # 已解码的块 {块号: 行列表}
+        self.__edits = {}               # 修改过的单元格 {物理行号: {列号: 值}}
+        self.__pending = None           # scanAppended索引的追加数据
+        self.__pieces = None            # 行的片段表 [(是否插入的行, 起始物理行号/插入行序号, 行数)]，None: 未插入/删除行
+        self.__starts = None            # 各片段起始的行号，最后一个元素为总行数
+        self.__added = []               # 插入的行（修改直接写入行中）
+        self.__f = open(csvFile, 'rb')
+        _stat = os.fstat(self.__f.fileno())
+        self.fileSize = _stat.st_size   # 磁盘上的文件大小
+        self.compressed = detectCompression(csvFile) is not None
+        if self.compressed:
+            # zstd可随机访问格式：按帧解压，self.size是解压后的大小
+            self.__mm = SeekableZstdBuffer(csvFile)
+            if progress and len(self.__mm):
+                progress = self.__scaleProgress(progress)
+        else:
+            self.__mm = mmap.mmap(self.__f.fileno(), 0, access=mmap.ACCESS_READ) if self.fileSize else b''
+        self.size = len(self.__mm)      # 内容的字节数
+
+        if index is None:
+            index = buildRowIndex(self.__mm, stride, progress=progress, canceled=canceled,
+                                  quotechar=self.format.quotechar)
+        if index is None:
+            self.canceled = True
+            index = np.zeros(0, np.uint64), 0
+        self.__offsets, self.__total = index
+
+        # 修改过的行按原文件的行结束符写回
+        _head = self.__mm[:int(self.__offsets[1])] if len(self.__offsets) > 1 else self.__mm[:1 << 20]
+        _newline = _head.find(b'\n')
+        self.lineTerminator = '\r\n' if _newline > 0 and _head[_newline - 1] == ord('\r') else '\n'
+
+        # 第一行作为列头时，数据行号整体偏移1
+        self.__first = 0
+        if withHeader and self.__total:
+            self.header = self.__physicalRow(0)
+            self.__first = 1
+
+        # 列数由列头和开头的若干行决定（更宽的行在保存时仍然完整保留）
+        _widths = [len(self.header)] if self.header else [0]
+        for r in range(min(self.rowCount, 1000)):
+            _widths.append(len(self.__physicalRow(r + self.__first)))
+        self.__columnCount = max(_widths)
+
+    def __scaleProgress(self, progress):
+        # 进度按磁盘上的文件大小计算，与加载未压缩的文件一致
+        return lambda n: progress(n * self.fileSize // self.size)
+
+    @property
+    def rowCount(self) -> int:
+        return self.__total - self.__first if self.__pieces is None else self.__starts[-1]
+
+    @property
+    def stride(self) -> int:
+        return self.__stride
+
+    @property
+    def rowIndex(self):
+        """
+        行索引，可以保存到磁盘缓存，下次打开时传给构造函数
+        :return: (偏移数组np.uint64, 总行数)
+        """
+        return self.__offsets, self.__total
+
+    @property
+    def columnCount(self) -> int:
+        return self.__columnCount
+
+    def headerValue(self, column):
+        if self.header and column < len(self.header):
+            return self.header[column]
+        return None
+
+    def value(self, row, column) -> str:
+        _row = self.__row(row)
+        return _row[column] if column < len(_row) else ''
+
+    def setValue(self, row, column, value):
+        added, _physical = self.__locate(row)
+        if added:
+            _row = self.__added[_physical]
+            if column >= len(_row):
+                _row.extend([''] * (column + 1 - len(_row)))
+            _row[column] = value
+            return
+        self.__edits.setdefault(_physical, {})[column] = value
+        # 直接修改缓存中的行，缓存淘汰后由__decodeBlock重新应用修改
+        block = _physical // self.__stride
+        if block in self.__cache:
+            self.__applyEdits(block, self.__cache[block])
+
+    def row(self, row):
+        _row = self.__row(row)
+        return _row + [''] * (self.__columnCount - len(_row))
+
+    def texts(self, column, rows):
+        """
+        一列中指定行的值（逐行从缓存或文件中读取）
+        :param column: 列号
+        :param rows: 行号数组
+        :return: 字符串的NumPy数组
+        """
+        return np.array([self.value(row, column) for row in rows.tolist()], dtype=str)
+
+    def iterRows(self):
+        # 顺序遍历时逐块解码，不经过缓存
+        for added, start, count in self.__pieceList():
+            rows = self.__added[start:start + count] if added else self.__physicalRows(start, start + count)
+            for _row in rows:
+                yield _row + [''] * (self.__columnCount - len(_row))
+
+    def writeTo(self, f, withHeader=False):
+        """
+        写入二进制文件：未修改的连续块按字节原样复制，修改过的块、只保留部分行的块重新编码
+        :param f: 二进制文件对象
+        :param withHeader: 是否写列头
+        :return: None
+        """
+        writer = RowWriter(f, self.format, self.lineTerminator)
+        _editedBlocks = set(row // self.__stride for row in self.__edits)
+        pieces = self.__pieceList()
+        if withHeader and self.__first:
+            pieces = self.__merge([(False, 0, 1)] + pieces)
+        _copyStart = None       # 待复制的连续字节范围的起点
+        _copyEnd = None
+        _written = False        # 已经写入了内容（之后不能再复制文件开头的BOM）
+        _unterminated = False   # 复制的内容到源文件末尾且最后一行没有换行符，之后还有行时先补上
+        for added, start, count in pieces:
+            if added:
+                if _copyStart is not None:
+                    _unterminated = self.__copyRange(f, writer, _copyStart, _copyEnd)
+                    _copyStart = None
+                if _unterminated:
+                    f.write(self.lineTerminator.encode('ascii'))
+                    _unterminated = False
+                writer.writerows(_row + [''] * (self.__columnCount - len(_row))
+                                 for _row in self.__added[start:start + count])
+                _written = True
+                continue
+            stop = start + count
+            for block in range(start // self.__stride, (stop - 1) // self.__stride + 1):
+                blockStart, blockEnd = self.__blockRange(block)
+                first = block * self.__stride
+                whole = start <= first and min(first + self.__stride, self.__total) <= stop
+                if whole and block not in _editedBlocks and not (blockStart == 0 and _written):
+                    if _copyStart is not None and _copyEnd != blockStart:
+                        _unterminated = self.__copyRange(f, writer, _copyStart, _copyEnd)
+                        _copyStart = None
+                    if _unterminated:
+                        f.write(self.lineTerminator.encode('ascii'))
+                        _unterminated = False
+                    if _copyStart is None:
+                        _copyStart = blockStart
+                    _copyEnd = blockEnd
+                    _written = True
+                    continue
+                if _copyStart is not None:
+                    _unterminated = self.__copyRange(f, writer, _copyStart, _copyEnd)
+                    _copyStart = None
+                if _unterminated:
+                    f.write(self.lineTerminator.encode('ascii'))
+                    _unterminated = False
+                writer.writerows(self.__decodeBlock(block)[max(start - first, 0):stop - first])
+                _written = True
+        if _copyStart is not None:
+            self.__copyRange(f, writer, _copyStart, _copyEnd)
+
+    def truncated(self) -> bool:
+        """
+        源文件是否变短（mmap中超出新文件末尾的部分不能再访问）
+        :return:
+        """
+        try:
+            return os.stat(self.file).st_size < self.fileSize
+        except OSError:
+            return True
+
+    def ensureColumns(self, count):
+        self.__columnCount = max(self.__columnCount, count)
+
+    def insertRows(self, row, count):
+        """
+        在第row行之前插入count个空行（row等于行数时追加在末尾）
+        :param row: 行号
+        :param count: 行数
+        :return: None
+        """
+        pieces, i = self.__cut(self.__pieceList(), row)
+        pieces.insert(i, (True, len(self.__added), count))
+        self.__added.extend([] for _ in range(count))
+        self.__setPieces(pieces)
+
+    def deleteRows(self, row, count):
+        """
+        删除[row, row + count)行：只从片段表中去掉，源文件中的行保存时跳过
+        :param row: 起始行号
+        :param count: 行数
+        :return: None
+        """
+        pieces, i = self.__cut(self.__pieceList(), row)
+        pieces, j = self.__cut(pieces, row + count)
+        del pieces[i:j]
+        self.__setPieces(pieces)
+
+    @property
+    def layout(self):
+        """
+        当前的行布局，用于撤销/重做插入和删除行（插入的行不会释放，恢复布局后内容不变）
+        :return: (片段元组或None, 源文件的总行数)
+        """
+        return None if self.__pieces is None else tuple(self.__pieces), self.__total
+
+    def setLayout(self, layout):
+        """
+        恢复layout返回的行布局；之后由跟随模式追加的行保留在末尾
+        :param layout: layout的返回值
+        :return: None
+        """
+        pieces, total = layout
+        pieces = [(False, self.__first, total - self.__first)] if pieces is None else list(pieces)
+        if total < self.__total:
+            pieces.append((False, total, self.__total - total))
+        self.__setPieces(pieces)
+
+    def scanAppended(self):
+        """
+        索引源文件末尾追加的完整行，暂不生效，调用commitAppended后才能访问
+        :return: (新增的行数, 新增行的最大列数)
+        """
+        self.__pending = None
+        if self.compressed:
+            # 压缩的文件不能按字节追加
+            return 0, 0
+        f = open(self.file, 'rb')
+        size = os.fstat(f.fileno()).st_size
+        if size <= self.size:
+            f.close()
+            return 0, 0
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = mm[self.size:size]
+        length = completeLength(data, self.format.quotechar)
+        if length == 0:
+            mm.close()
+            f.close()
+            return 0, 0
+        data = data[:length]
+        offsets, count = buildRowIndex(data, self.__stride, firstRow=self.__total, quotechar=self.format.quotechar)
+        self.__pending = (f, mm, self.size + length, offsets + np.uint64(self.size), count)
+        # 与建索引时一样，只用开头的若干行估计列数
+        _text = data[:1 << 20].decode(self.format.encoding, errors='replace')
+        _reader = csv.reader(io.StringIO(_text, newline=''), **self.format.readerArgs())
+        _widths = [len(_row) for _row in islice(_reader, 1000)]
+        return count, max(_widths, default=0)
+
+    def commitAppended(self):
+        """
+        使scanAppended索引的行生效
+        :return: None
+        """
+        if not self.__pending:
+            return
+        f, mm, size, offsets, count = self.__pending
+        self.__pending = None
+        # 原来的最后一块可能不满stride行，追加后内容变化，不能再使用缓存
+        self.__cache.pop(len(self.__offsets) - 1, None)
+        if isinstance(self.__mm, mmap.mmap):
+            self.__mm.close()
+        self.__f.close()
+        self.__f, self.__mm, self.size = f, mm, size
+        self.fileSize = size
+        self.__offsets = np.concatenate([self.__offsets, offsets])
+        self.__total += count
+        if self.__pieces is not None:
+            self.__setPieces(self.__pieces + [(False, self.__total - count, count)])
+
+    def nbytes(self) -> int:
+        _rows = sum(len(rows) for rows in self.__cache.values()) + len(self.__added)
+        return self.__offsets.nbytes + _rows * self.__columnCount * 64
+
+    def close(self):
+        """
+        释放mmap和文件句柄
+        :return: None
+        """
+        self.__cache.clear()
+        if isinstance(self.__mm, (mmap.mmap, SeekableZstdBuffer)):
+            self.__mm.close()
+        self.__f.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.__f.closed
+
+    def reopen(self):
+        """
+        close之后重新映射同一个文件（文件未被替换，例如保存失败），行索引和修改保留
+        :return: None
+        """
+        self.__f = open(self.file, 'rb')
+        if self.compressed:
+            self.__mm = SeekableZstdBuffer(self.file)
+        else:
+            self.__mm = mmap.mmap(self.__f.fileno(), 0, access=mmap.ACCESS_READ) if self.fileSize else b''
+
+    def __locate(self, row):
+        """
+        行号 -> 行所在的位置
+        :param row: 行号
+        :return: (是否插入的行, 物理行号/插入行序号)
+        """
+        if self.__pieces is None:
+            return False, row + self.__first
+        i = bisect_right(self.__starts, row) - 1
+        added, start, _ = self.__pieces[i]
+        return added, start + row - self.__starts[i]
+
+    def __row(self, row):
+        added, _physical = self.__locate(row)
+        return self.__added[_physical] if added else self.__physicalRow(_physical)
+
+    def __pieceList(self):
+        # 当前的片段表（副本）
+        if self.__pieces is not None:
+            return list(self.__pieces)
+        return [(False, self.__first, self.__total - self.__first)] if self.__total > self.__first else []
+
+    @staticmethod
+    def __cut(pieces, row):
+        """
+        在行号row处把片段切开
+        :param pieces: 片段表（原地修改）
+        :param row: 行号
+        :return: (片段表, row之前的片段个数)
+        """
+        starts = list(accumulate((count for _, _, count in pieces), initial=0))
+        i = bisect_right(starts, row) - 1
+        if i >= len(pieces) or starts[i] == row:
+            return pieces, min(i, len(pieces))
+        added, start, count = pieces[i]
+        offset = row - starts[i]
+        pieces[i:i + 1] = [(added, start, offset), (added, start + offset, count - offset)]
+        return pieces, i + 1
+
+    @staticmethod
+    def __merge(pieces):
+        # 合并首尾相接的片段
+        merged = []
+        for piece in pieces:
+            if merged and merged[-1][0] == piece[0] and merged[-1][1] + merged[-1][2] == piece[1]:
+                merged[-1] = (piece[0], merged[-1][1], merged[-1][2] + piece[2])
+            elif piece[2]:
+                merged.append(piece)
+        return merged
+
+    def __setPieces(self, pieces):
+        # 合并后与源文件的行完全一致时不再使用片段表
+        pieces = self.__merge(pieces)
+        if pieces == ([(False, self.__first, self.__total - self.__first)] if self.__total > self.__first else []):
+            self.__pieces = self.__starts = None
+            return
+        self.__pieces = pieces
+        self.__starts = list(accumulate((count for _, _, count in pieces), initial=0))
+
+    def __physicalRows(self, start, stop):
+        # 顺序解码物理行[start, stop)，不经过缓存
+        for block in range(start // self.__stride, (stop - 1) // self.__stride + 1):
+            first = block * self.__stride
+            yield from self.__decodeBlock(block)[max(start - first, 0):stop - first]
+
+    def __physicalRow(self, row):
+        # 行号 -> 所在块（带LRU缓存）
+        block = row // self.__stride
+        rows = self.__cache.get(block)
+        if rows is None:
+            rows = self.__decodeBlock(block)
+            self.__cache[block] = rows
+            if len(self.__cache) > self.__cacheBlocks:
+                self.__cache.popitem(last=False)
+        else:
+            self.__cache.move_to_end(block)
+        # 引号不配对的文件块内行数可能不足
+        _i = row % self.__stride
+        return rows[_i] if _i < len(rows) else []
+
+    def __blockRange(self, block):
+        # 块的字节范围[start, end)
+        start = int(self.__offsets[block])
+        end = int(self.__offsets[block + 1]) if block + 1 < len(self.__offsets) else self.size
+        return start, end
+
+    def __copyRange(self, f, writer, start, end, chunkSize=16 << 20):
+        # 通过memoryview直接写出mmap中的字节，不产生中间副本
+        # 原样复制的第一块已经包含BOM，之后重新编码的块不能再写BOM
+        # 返回复制的内容是否到源文件末尾且没有以换行符结束（编码能按字节查找换行符，换行符是单字节）
+        if start == 0:
+            writer.skipBom()
+        if self.compressed:
+            for pos in range(start, end, chunkSize):
+                f.write(self.__mm[pos:min(pos + chunkSize, end)])
+        else:
+            with memoryview(self.__mm) as view:
+                for pos in range(start, end, chunkSize):
+                    f.write(view[pos:min(pos + chunkSize, end)])
+        return start < end == self.size and self.__mm[end - 1:end] not in (b'\n', b'\r')
+
+    def __decodeBlock(self, block):
+        # 解析一个块的字节范围，并应用修改
+        start, end = self.__blockRange(block)
+        text = self.__mm[start:end].decode(self.format.encoding, errors='replace')
+        rows = list(csv.reader(io.StringIO(text, newline=''), **self.format.readerArgs()))
+        if self.__edits:
+            self.__applyEdits(block, rows)
+        return rows
+
+    def __applyEdits(self, block, rows):
+        first = block * self.__stride
+        for i, _row in enumerate(rows):
+            for column, value in self.__edits.get(first + i, {}).items():
+                if column >= len(_row):
+                    _row.extend([''] * (column + 1 - len(_row)))
+                _row[column] = value
@@ -0,0 +1,580 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_lint.py
+@Desc    : csv文件的结构校验：字段数、引号、编码、重复列头、列类型、重复键，按行边界切分后多进程并行检查（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import argparse
+import codecs
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+import numpy as np
+from csv_parser import FileFormat, splitRanges
+from csv_compress import detectCompression, openInput
+from csv_arrow import detectTableFormat
+from csv_query import findColumn
+from csv_types import inferColumn, KIND_INT, KIND_FLOAT, KIND_DATETIME, KIND_TEXT
+from csv_profile import Profiler
+
+# 问题的类型
+ISSUE_RAGGED = 'ragged'                 # 字段数与列头（或大多数行）不同
+ISSUE_QUOTING = 'quoting'               # 引号不配对、引号后缺少分隔符
+ISSUE_ENCODING = 'encoding'             # 不能按文件的编码解码
+ISSUE_HEADER = 'duplicateHeader'        # 列头重复
+ISSUE_TYPE = 'type'                     # 值不符合列的类型（推断或指定）
+ISSUE_DUPLICATE = 'duplicateKey'        # 键列的值与之前的行相同
+ISSUES = [ISSUE_RAGGED, ISSUE_QUOTING, ISSUE_ENCODING, ISSUE_HEADER, ISSUE_TYPE, ISSUE_DUPLICATE]
+
+# 可以指定的列类型
+TYPES = {'int': KIND_INT, 'float': KIND_FLOAT, 'datetime': KIND_DATETIME, 'text': KIND_TEXT}
+_TYPE_NAMES = {KIND_INT: '整数', KIND_FLOAT: '数值', KIND_DATETIME: '日期时间'}
+
+_SAMPLE_ROWS = 1000         # 读取列头、推断列类型和字段数的样本行数
+_BATCH_ROWS = 50000         # 每批检查的行数（类型和键按批向量化检查）
+_NO_KEY = np.uint64(0)      # 无法解析的行没有键
+
+# 退出码（与批处理模式一致，另外发现问题时返回EXIT_ISSUES）
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_ISSUES = 3
+
+
+class LintError(ValueError):
+    """
+    校验参数错误（找不到列、未知的类型）或文件格式不支持
+    """
+
+
+class Issue(object):
+    """
+    一个问题：行号为数据行号（从0开始，不含列头，与表格的数据行一致），列头的问题行号为None
+    """
+
+    __slots__ = ('kind', 'row', 'column', 'message')
+
+    def __init__(self, kind, row, column, message):
+        self.kind = kind
+        self.row = row
+        self.column = column
+        self.message = message
+
+    def toDict(self):
+        # JSON中的行号、列号从1开始，与表格的行号一致
+        return {'kind': self.kind,
+                'row': None if self.row is None else self.row + 1,
+                'column': None if self.column is None else self.column + 1,
+                'message': self.message}
+
+
+class LintReport(object):
+    """
+    校验结果：每类问题的个数，以及每类最多maxIssues个问题（按行号排列）
+    """
+
+    def __init__(self, file, header, width, types, keys):
+        self.file = file
+        self.header = header        # 列头，没有列头时为None
+        self.width = width          # 每行应有的字段数
+        self.types = types          # 检查类型的列 {列号: 类型}
+        self.keys = keys            # 键列的列号
+        self.rows = 0               # 数据行数
+        self.counts = Counter()     # {问题类型: 个数}
+        self.issues = []
+        self.truncated = False      # 问题太多，只保留了一部分
+        self.workers = 1
+        self.seconds = 0.0
+
+    @property
+    def issueCount(self) -> int:
+        return sum(self.counts.values())
+
+    def toDict(self):
+        return {
+            'source': self.file,
+            'rows': self.rows,
+            'columns': self.width,
+            'header': self.header is not None,
+            'types': {str(column + 1): kind for column, kind in sorted(self.types.items())},
+            'keys': [column + 1 for column in self.keys],
+            'counts': {kind: self.counts.get(kind, 0) for kind in ISSUES},
+            'truncated': self.truncated,
+            'workers': self.workers,
+            'bytesRead': os.path.getsize(self.file),
+            'seconds': round(self.seconds, 3),
+            'issues': [issue.toDict() for issue in self.issues],
+        }
+
+
+def parseTypes(text, header):
+    """
+    解析指定的列类型，例如"price=float, date=datetime, #3=int"
+    :param text: 逗号分隔的"列=类型"
+    :param header: 列头（没有列头时为空列表）
+    :return: {列号: 类型}
+    """
+    types = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, kind = part.rpartition('=')
+        column = findColumn(name.strip(), header or [])
+        if column is None:
+            raise LintError('找不到列：%s' % name.strip())
+        if kind.strip().lower() not in TYPES:
+            raise LintError('未知的类型：%s（可以是%s）' % (kind.strip(), '、'.join(TYPES)))
+        types[column] = TYPES[kind.strip().lower()]
+    return types
+
+
+def parseKeys(text, header):
+    """
+    解析键列，例如"id"或"date, #2"
+    :param text: 逗号分隔的列名或#n
+    :param header: 列头
+    :return: 列号列表
+    """
+    keys = []
+    for name in text.split(','):
+        if not name.strip():
+            continue
+        column = findColumn(name.strip(), header or [])
+        if column is None:
+            raise LintError('找不到列：%s' % name.strip())
+        keys.append(column)
+    return keys
+
+
+def lintFile(path, fileFormat=None, withHeader=None, types=None, keys=None, maxIssues=1000, workers=None,
+             progress=None, canceled=None) -> LintReport:
+    """
+    校验文件
+    未压缩且换行符可以按字节查找的文件按行边界切分，在进程池中并行检查；其余文件流式解压后在当前进程中检查
+    重复键按每行键值的64位摘要比较，每行只占8字节内存
+    :param path: 文件路径
+    :param fileFormat: 文件格式（FileFormat），None: 自动探测
+    :param withHeader: 是否有列头，None: 与fileFormat一致
+    :param types: 指定的列类型 {列号: 类型}，其余的列按样本推断；None: 全部推断
+    :param keys: 键列的列号列表，None: 不检查重复键
+    :param maxIssues: 每类问题最多保留的个数（个数总是完整统计）
+    :param workers: 进程数，None: CPU个数
+    :param progress: 进度回调 progress(已检查的字节数, 文件大小)
+    :param canceled: 取消检查 canceled() -> bool，取消后返回None
+    :return: LintReport
+    """
+    start = time.perf_counter()
+    if detectTableFormat(path) is not None:
+        raise LintError('Parquet/Arrow文件按列存储，不需要结构校验')
+    fileFormat = fileFormat or FileFormat.detect(path)
+    withHeader = fileFormat.hasHeader if withHeader is None else withHeader
+    with Profiler.span('lint.sample'):
+        header, width, inferred = _sample(path, fileFormat, withHeader)
+    types = {**inferred, **(types or {})}
+    types = {column: kind for column, kind in types.items() if kind in _TYPE_NAMES}
+    keys = list(keys or [])
+    outside = [column for column in keys + list(types) if column >= width]
+    if outside:
+        raise LintError('文件中没有第 %d 列' % (min(outside) + 1))
+    report = LintReport(path, header, width, types, keys)
+    if header is not None:
+        _checkHeader(report, header)
+    settings = (width, types, keys, maxIssues)
+
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    parallel = workers > 1 and fileFormat.byteSplittable and detectCompression(path) is None and size > 0
+    with Profiler.span('lint.check'):
+        if parallel:
+            results = _lintParallel(path, size, fileFormat, withHeader, settings, workers, report, progress, canceled)
+        else:
+            results = _lintStream(path, size, fileFormat, withHeader, settings, progress, canceled)
+        hashes = []
+        for result in results:
+            if canceled and canceled():
+                results.close()
+                return None
+            rows, issues, counts, keyHashes = result
+            for issue in issues:
+                issue.row += report.rows
+            report.issues.extend(issues)
+            report.counts.update(counts)
+            if keyHashes is not None:
+                hashes.append(keyHashes)
+            report.rows += rows
+    if keys:
+        with Profiler.span('lint.keys'):
+            _checkDuplicates(report, np.concatenate(hashes) if hashes else np.zeros(0, np.uint64), maxIssues)
+    # 每类问题只保留前maxIssues个（并行检查时每段各自截断）
+    kept = Counter()
+    issues = []
+    for issue in sorted(report.issues, key=lambda issue: (-1 if issue.row is None else issue.row,
+                                                           -1 if issue.column is None else issue.column)):
+        kept[issue.kind] += 1
+        if kept[issue.kind] <= maxIssues:
+            issues.append(issue)
+    report.issues = issues
+    report.truncated = any(count > maxIssues for count in report.counts.values())
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _sample(path, fileFormat, withHeader):
+    """
+    读取开头的若干行：列头、每行应有的字段数（没有列头时取样本中最常见的字段数）、按样本推断的列类型
+    :return: (列头或None, 字段数, {列号: 类型})
+    """
+    stream, _ = openInput(path, background=False)
+    with io.TextIOWrapper(stream, encoding=fileFormat.encoding, errors='replace', newline='') as f:
+        reader = csv.reader(f, **fileFormat.readerArgs())
+        try:
+            header = next(reader, None) if withHeader else None
+            rows = list(islice(reader, _SAMPLE_ROWS))
+        except csv.Error:
+            header, rows = None, []
+    if header is not None:
+        width = len(header)
+    else:
+        width = Counter(map(len, rows)).most_common(1)[0][0] if rows else 0
+    types = {}
+    for column in range(width):
+        values = [row[column] for row in rows if len(row) == width]
+        typed = inferColumn(values) if values else None
+        if typed is not None and typed.kind in _TYPE_NAMES:
+            types[column] = typed.kind
+    return header, width, types
+
+
+def _checkHeader(report, header):
+    first = {}
+    for column, name in enumerate(header):
+        if name == '':
+            continue
+        if name in first:
+            report.counts[ISSUE_HEADER] += 1
+            report.issues.append(Issue(ISSUE_HEADER, None, column,
+                                       '列头重复：%s（与第 %d 列相同）' % (name, first[name] + 1)))
+        else:
+            first[name] = column
+
+
+def _checkDuplicates(report, hashes, maxIssues):
+    """
+    按键的摘要查找重复的行：稳定排序后相邻相等的为重复，记录与之相同的第一行
+    :param report: LintReport
+    :param hashes: 每行键的摘要（uint64），无法解析的行为_NO_KEY
+    :param maxIssues: 最多记录的问题个数
+    :return: None
+    """
+    order = np.argsort(hashes, kind='stable')
+    ordered = hashes[order]
+    same = np.flatnonzero((ordered[1:] == ordered[:-1]) & (ordered[1:] != _NO_KEY)) + 1
+    if not len(same):
+        return
+    # 每组的第一行：相等的一段中最早出现的行
+    groupStart = np.maximum.accumulate(np.where(np.r_[True, ordered[1:] != ordered[:-1]],
+                                                np.arange(len(ordered)), 0))
+    rows = order[same]
+    firsts = order[groupStart[same]]
+    report.counts[ISSUE_DUPLICATE] += len(rows)
+    column = report.keys[0]
+    for position in np.argsort(rows, kind='stable')[:maxIssues].tolist():
+        report.issues.append(Issue(ISSUE_DUPLICATE, int(rows[position]), column,
+                                   '键重复：与第 %d 行相同' % (int(firsts[position]) + 1)))
+
+
+def _lintParallel(path, size, fileFormat, withHeader, settings, workers, report, progress, canceled):
+    # 按行边界切分，第一段在当前进程中检查，不等待进程池启动；结果按文件顺序返回
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ranges = splitRanges(mm, fileFormat.quotechar)
+    tasks = [(path, start, end, fileFormat.encoding, fileFormat.delimiter, fileFormat.quotechar,
+              withHeader and start == 0, settings) for start, end in ranges]
+    *result, end = _lintRange(tasks[0])
+    if progress:
+        progress(end, size)
+    yield result
+    if len(tasks) == 1:
+        return
+    report.workers = min(workers, len(tasks) - 1)
+    executor = ProcessPoolExecutor(max_workers=report.workers)
+    try:
+        for *result, end in executor.map(_lintRange, tasks[1:]):
+            if progress:
+                progress(end, size)
+            yield result
+            if canceled and canceled():
+                return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _countReplace(error):
+    # 与errors='replace'相同，另外统计解码错误的次数
+    _decodeErrors[0] += 1
+    return '\ufffd', error.end
+
+
+_decodeErrors = [0]
+_REPLACE_ERRORS = 'csvlint.replace'
+codecs.register_error(_REPLACE_ERRORS, _countReplace)
+
+
+def _lintStream(path, size, fileFormat, withHeader, settings, progress, canceled):
+    # 压缩或utf-16的文件：流式解码后按批检查，无法解码的字节替换为U+FFFD
+    stream, position = openInput(path)
+    errors = _decodeErrors[0]
+    with io.TextIOWrapper(stream, encoding=fileFormat.encoding, errors=_REPLACE_ERRORS, newline='') as f:
+        # 出现过解码错误之后才在每批中查找U+FFFD
+        linter = _Linter(*settings, replaced=lambda: _decodeErrors[0] != errors)
+        for result in linter.run(f, fileFormat.readerArgs(), withHeader):
+            if progress:
+                progress(position(), size)
+            yield result
+            if canceled and canceled():
+                return
+
+
+def _lintRange(task):
+    """
+    检查文件的一个字节范围（在子进程中执行）
+    :param task: (文件路径, start, end, 编码, 分隔符, 引号字符, 第一行是否为列头, 检查参数)
+    :return: (行数, 问题列表, {问题类型: 个数}, 键的摘要数组或None, end)
+    """
+    path, start, end, encoding, delimiter, quotechar, withHeader, settings = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # utf-8-sig只在文件开头有BOM
+    if start and encoding == 'utf-8-sig':
+        encoding = 'utf-8'
+    try:
+        text = data.decode(encoding)
+        replaced = None
+    except UnicodeDecodeError:
+        text = data.decode(encoding, errors='replace')
+        replaced = lambda: True
+    del data
+    linter = _Linter(*settings, replaced=replaced)
+    rows = 0
+    issues = []
+    counts = Counter()
+    hashes = []
+    for count, batchIssues, batchCounts, batchHashes in linter.run(
+            io.StringIO(text, newline=''), {'delimiter': delimiter, 'quotechar': quotechar}, withHeader):
+        for issue in batchIssues:
+            issue.row += rows
+        issues.extend(batchIssues)
+        counts.update(batchCounts)
+        if batchHashes is not None:
+            hashes.append(batchHashes)
+        rows += count
+    return rows, issues, counts, np.concatenate(hashes) if hashes else None, end
+
+
+class _Linter(object):
+    """
+    严格模式的csv.reader按批读取行（出错后从下一行继续，出错的行也计为一行，行号与编辑器宽松解析的结果一致），
+    字段数、类型按批检查，并计算每行键的摘要
+    """
+
+    def __init__(self, width, types, keys, maxIssues, replaced=None):
+        """
+        :param width: 每行应有的字段数
+        :param types: {列号: 类型}
+        :param keys: 键列的列号列表
+        :param maxIssues: 每类问题最多记录的个数
+        :param replaced: replaced() -> 文本中是否有解码失败替换的U+FFFD，None: 没有
+        """
+        self.__width = width
+        self.__types = types
+        self.__keys = keys
+        self.__maxIssues = maxIssues
+        self.__replaced = replaced
+        self.__issues = []
+        self.__counts = Counter()
+
+    def run(self, f, readerArgs, withHeader):
+        """
+        检查文本
+        :param f: 文本文件对象
+        :param readerArgs: csv.reader的格式参数
+        :param withHeader: 第一行是否为列头（跳过）
+        :return: 生成器，每批返回(行数, 问题列表, {问题类型: 个数}, 键的摘要数组或None)，行号相对于该批的第一行
+        """
+        reader = csv.reader(f, strict=True, **readerArgs)
+        if withHeader:
+            try:
+                next(reader, None)
+            except csv.Error:
+                pass
+        while True:
+            rows = []
+            bad = []        # 出错的行在本批中的位置（以空行占位）
+            while len(rows) < _BATCH_ROWS:
+                # extend在出错时保留已经读出的行
+                try:
+                    rows.extend(islice(reader, _BATCH_ROWS - len(rows)))
+                    break
+                except csv.Error as e:
+                    self.__add(ISSUE_QUOTING, len(rows), None, '引号错误：%s' % e)
+                    bad.append(len(rows))
+                    rows.append([])
+            yield self.__flush(rows, bad)
+            if len(rows) < _BATCH_ROWS:
+                return
+
+    def __add(self, kind, row, column, message):
+        self.__counts[kind] += 1
+        if self.__counts[kind] <= self.__maxIssues:
+            self.__issues.append(Issue(kind, row, column, message))
+
+    def __flush(self, rows, bad):
+        """
+        检查一批行的字段数、编码、类型，计算键的摘要
+        :param rows: 行列表
+        :param bad: 出错的行的位置
+        :return: (行数, 问题列表, {问题类型: 个数}, 键的摘要数组或None)
+        """
+        width = self.__width
+        widths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        ragged = widths != width
+        ragged[bad] = False
+        for i in np.flatnonzero(ragged).tolist():
+            self.__add(ISSUE_RAGGED, i, None, '应有 %d 个字段，实际 %d 个' % (width, len(rows[i])))
+        if self.__replaced is not None and self.__replaced():
+            for i, row in enumerate(rows):
+                if any('\ufffd' in value for value in row):
+                    self.__add(ISSUE_ENCODING, i, None, '包含无法解码的字节')
+        # 所有行的字段数都正确时按列转置，否则逐行取值（短行为空字符串）
+        needed = set(self.__types) | set(self.__keys)
+        if not ragged.any() and not bad and width:
+            columns = dict(zip(range(width), zip(*rows))) if rows else {}
+            columns = {column: columns.get(column, ()) for column in needed}
+        else:
+            columns = {column: [row[column] if column < len(row) else '' for row in rows] for column in needed}
+        for column, kind in sorted(self.__types.items()):
+            values = columns[column]
+            for i in _invalid(kind, values):
+                self.__add(ISSUE_TYPE, i, column, '不是有效的%s：%s' % (_TYPE_NAMES[kind], _clip(values[i])))
+        hashes = None
+        if self.__keys:
+            hashes = np.fromiter(map(_keyHash, zip(*[columns[column] for column in self.__keys])),
+                                 dtype=np.uint64, count=len(rows))
+            hashes[bad] = _NO_KEY
+        result = (len(rows), self.__issues, self.__counts, hashes)
+        self.__issues = []
+        self.__counts = Counter()
+        return result
+
+
+def _keyHash(values):
+    # 键的64位摘要（各进程一致，不受字符串hash随机化影响）
+    digest = hashlib.blake2b('\x1f'.join(values).encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def _clip(text, limit=40):
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def _parseDatetime(text):
+    return datetime.fromisoformat(text.replace('/', '-'))
+
+
+# 类型的检查函数：比类型列的推断宽松，不要求能按原样格式化回原文本
+_PARSERS = {KIND_INT: int, KIND_FLOAT: float, KIND_DATETIME: _parseDatetime}
+
+
+def _valid(parse, values) -> bool:
+    try:
+        deque(map(parse, values), maxlen=0)
+    except (ValueError, OverflowError):
+        return False
+    return True
+
+
+def _invalid(kind, values):
+    """
+    不能转换为该类型的非空值的位置：整体转换成功时不逐个检查，失败时二分查找，转换次数与不合格的值的个数成正比
+    :param kind: 类型
+    :param values: 字符串序列
+    :return: 位置列表
+    """
+    parse = _PARSERS[kind]
+    if _valid(parse, filter(None, values)):
+        return []
+    filled = [i for i, value in enumerate(values) if value]
+    invalid = []
+    pending = [(0, len(filled))]
+    while pending:
+        start, stop = pending.pop()
+        if _valid(parse, (values[i] for i in filled[start:stop])):
+            continue
+        if stop - start == 1:
+            invalid.append(filled[start])
+            continue
+        middle = (start + stop) // 2
+        pending.extend([(middle, stop), (start, middle)])
+    return sorted(invalid)
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(prog='main.py --lint',
+                                     description='校验csv文件的结构，在标准输出打印JSON格式的报告；发现问题时退出码为%d'
+                                                 % EXIT_ISSUES)
+    parser.add_argument('source', help='要校验的文件，gzip/xz/zstd压缩的文件自动解压')
+    parser.add_argument('-k', '--keys', help='键列，用逗号分隔的列名或#n；键值相同的行报告为重复')
+    parser.add_argument('-t', '--types', help='指定列类型，例如 "price=float,date=datetime,#1=int"；'
+                                               '其余的列按开头的%d行推断' % _SAMPLE_ROWS)
+    parser.add_argument('-n', '--max-issues', type=int, default=1000, help='每类问题最多列出的个数，默认%(default)s')
+    parser.add_argument('-j', '--workers', type=int, help='进程数，默认CPU个数')
+    parser.add_argument('--input-encoding', help='源文件编码，默认自动探测')
+    parser.add_argument('--input-delimiter', help='源文件分隔符，默认自动探测')
+    _group = parser.add_mutually_exclusive_group()
+    _group.add_argument('--header', dest='withHeader', action='store_true', default=None, help='源文件有列头')
+    _group.add_argument('--no-header', dest='withHeader', action='store_false', help='源文件没有列头')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """
+    校验模式的入口
+    :param argv: 命令行参数（不含--lint），None: sys.argv[1:]
+    :return: 退出码
+    """
+    try:
+        args = parseArgs(sys.argv[1:] if argv is None else argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+    try:
+        fileFormat = FileFormat.detect(args.source)
+        if args.input_encoding:
+            codecs.lookup(args.input_encoding)
+            fileFormat.encoding = args.input_encoding
+        if args.input_delimiter:
+            fileFormat.delimiter = '\t' if args.input_delimiter in ('\\t', 'tab', 'TAB') else args.input_delimiter
+        withHeader = fileFormat.hasHeader if args.withHeader is None else args.withHeader
+        header, _, _ = _sample(args.source, fileFormat, withHeader) if args.keys or args.types else (None, 0, {})
+        types = parseTypes(args.types, header) if args.types else None
+        keys = parseKeys(args.keys, header) if args.keys else None
+        report = lintFile(args.source, fileFormat, withHeader, types, keys, args.max_issues, args.workers)
+    except (OSError, UnicodeError, LookupError, csv.Error, LintError) as e:
+        json.dump({'error': str(e)}, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return EXIT_ERROR
+    json.dump(report.toDict(), sys.stdout, ensure_ascii=False)
+    sys.stdout.write('\n')
+    return EXIT_ISSUES if report.issueCount else EXIT_OK
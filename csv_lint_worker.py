@@ -0,0 +1,61 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_lint_worker.py
+@Desc    : 后台线程校验文件（大文件在进程池中分段并行检查）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+from PySide6.QtCore import QThread, Signal
+from csv_lint import lintFile, LintError
+from csv_profile import Profiler
+
+
+class LintWorker(QThread):
+    """
+    在工作线程中校验磁盘上的文件，完成后通过信号把LintReport交给界面线程
+    """
+
+    # 信号
+    progress = Signal('qint64', 'qint64')   # 已检查的字节数, 文件大小
+    resultReady = Signal(object)            # LintReport
+    failed = Signal(str)                    # 校验失败，参数为错误信息
+
+    def __init__(self, file, fileFormat, withHeader, keys, types=None, parent=None):
+        """
+        :param file: 文件路径
+        :param fileFormat: 文件格式（FileFormat）
+        :param withHeader: 第一行是否为列头
+        :param keys: 键列的列号列表
+        :param types: 指定的列类型 {列号: 类型}，其余的列按样本推断
+        :param parent:
+        """
+        super().__init__(parent)
+        self.__file = file
+        self.__format = fileFormat
+        self.__withHeader = withHeader
+        self.__keys = keys
+        self.__types = types
+        self.__canceled = False
+
+    def cancel(self):
+        """
+        取消校验，正在检查的分段完成后退出
+        :return: None
+        """
+        self.__canceled = True
+
+    def run(self):
+        try:
+            with Profiler.span('lint.file'):
+                report = lintFile(self.__file, self.__format, self.__withHeader, self.__types, self.__keys,
+                                  progress=lambda done, size: self.progress.emit(done, size),
+                                  canceled=lambda: self.__canceled)
+        except (LintError, OSError, UnicodeDecodeError) as e:
+            if not self.__canceled:
+                self.failed.emit(str(e))
+            return
+        if report is not None and not self.__canceled:
+            self.resultReady.emit(report)
@@ -0,0 +1,89 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_loader.py
+@Desc    : 后台线程加载csv文件
+@Author  : qdu
+@Date    : 2026/10/17 10:20
+"""
+
+import csv
+from PySide6.QtCore import QThread, Signal
+from csv_parser import createReader, ENGINE_PYTHON
+from csv_lazy import LazyStore
+from csv_profile import Profiler
+
+
+class CsvLoader(QThread):
+    """
+    在工作线程中分批解析csv文件，通过信号把每批数据交给界面线程
+    延迟加载模式下只建立行索引，完成后把LazyStore交给界面线程
+    """
+
+    # 信号
+    headerParsed = Signal(object)           # 列头（列表）
+    rowsParsed = Signal(object)             # 一批数据（ColumnBatch）
+    storeParsed = Signal(object)            # 延迟加载的数据（LazyStore）
+    progress = Signal('qint64', 'qint64')   # 已读字节数, 已解析行数
+    failed = Signal(str)                    # 加载失败，参数为错误信息
+
+    def __init__(self, csvFile, withHeader=False, lazy=False, fileFormat=None, engine=ENGINE_PYTHON, parent=None):
+        super().__init__(parent)
+        self.__file = csvFile
+        self.__withHeader = withHeader
+        self.__lazy = lazy
+        self.__format = fileFormat
+        self.__reader = createReader(csvFile, withHeader, fileFormat, engine)
+        self.__canceled = False
+
+    def cancel(self):
+        """
+        取消加载，工作线程在处理完当前批次后退出
+        :return: None
+        """
+        self.__canceled = True
+
+    @property
+    def canceled(self) -> bool:
+        return self.__canceled
+
+    def run(self):
+        try:
+            if self.__lazy:
+                self.__runLazy()
+            else:
+                self.__runChunks()
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            if not self.__canceled:
+                self.failed.emit(str(e))
+        finally:
+            self.__reader.close()
+
+    def __runLazy(self):
+        with Profiler.span('load.index'):
+            store = LazyStore(self.__file, self.__withHeader, self.__format,
+                              progress=lambda n: self.progress.emit(n, 0),
+                              canceled=lambda: self.__canceled)
+        if store.canceled:
+            store.close()
+            return
+        self.storeParsed.emit(store)
+        self.progress.emit(store.fileSize, store.rowCount)
+
+    def __runChunks(self):
+        # 列头在第一批数据之前读出，先于数据发出
+        headerSent = False
+        for batch in Profiler.timed(self.__reader.batches(), 'load.parse'):
+            if self.__canceled:
+                return
+            if not headerSent:
+                headerSent = True
+                if self.__reader.header is not None:
+                    self.headerParsed.emit(self.__reader.header)
+            self.rowsParsed.emit(batch)
+            self.progress.emit(self.__reader.bytesRead, self.__reader.rowsParsed)
+        # 只有列头的文件
+        if not headerSent and self.__reader.header is not None:
+            self.headerParsed.emit(self.__reader.header)
+        self.progress.emit(self.__reader.bytesRead, self.__reader.rowsParsed)
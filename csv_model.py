@@ -0,0 +1,571 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_model.py
+@Desc    : csv表格的虚拟数据模型，只在data()中为可见单元格生成显示值
+@Author  : qdu
+@Date    : 2026/10/17 09:30
+"""
+
+import numpy as np
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QColor
+from csv_store import ColumnStore, ColumnBatch
+from csv_lazy import LazyStore
+from edit_journal import EditJournal, ColumnEdit, RowEdit
+from csv_sort import sortRows
+from csv_profile import Profiler
+
+# PySide6每次查找Qt的枚举属性要数微秒，data()/flags()/headerData()每帧调用数千次，只使用这里的常量
+_DISPLAY_ROLE = Qt.DisplayRole
+_EDIT_ROLE = Qt.EditRole
+_BACKGROUND_ROLE = Qt.BackgroundRole
+_TOOLTIP_ROLE = Qt.ToolTipRole
+_HORIZONTAL = Qt.Horizontal
+_CELL_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+_NO_FLAGS = Qt.NoItemFlags
+
+
+class CsvTableModel(QAbstractTableModel):
+    """
+    基于ColumnStore（或延迟加载的LazyStore）的表格模型
+    所有修改都记录在EditJournal中，用于撤销/重做和标记修改过的单元格
+    排序和筛选不移动数据，只维护视图行到数据行的映射；修改记录使用数据行号
+    """
+
+    __modifiedColor = QColor(255, 230, 150)     # 修改过的单元格的背景色
+    __displayCacheSize = 1 << 16                # 缓存的显示字符串个数（可见单元格每帧重复取值）
+
+    # 信号
+    valuesEdited = Signal(object)               # 单元格的值被修改（编辑/撤销/重做），参数为[(数据行, 列, 原值, 新值)]
+    columnsEdited = Signal(object)              # 批量修改（包括撤销/重做）涉及的列，参数为列号列表
+    rowsEdited = Signal()                       # 插入/删除了行（包括撤销/重做）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.__store = ColumnStore()
+        self.__journal = EditJournal()
+        self.__highlightModified = False
+        self.__order = None         # 排序后的数据行顺序（None: 未排序）
+        self.__sortKeys = []        # 排序条件 [(列号, 是否降序)]
+        self.__filter = None        # 满足筛选条件的数据行（升序数组，None: 未筛选）
+        self.__query = None         # 筛选条件（Query），用于判断追加的行
+        self.__visible = None       # 视图第i行对应的数据行（None: 未排序且未筛选）
+        self.__position = None      # 数据行在视图中的位置，不可见为-1（__visible的逆映射）
+        self.__display = {}         # 显示字符串的缓存 {(数据行, 列): 字符串}，写满后整体清空
+        # 数据或行列的映射改变时缓存失效（修改都会发出这些信号，先于视图的刷新）
+        for signal in (self.dataChanged, self.valuesEdited, self.columnsEdited, self.modelReset,
+                       self.layoutChanged, self.columnsInserted, self.rowsInserted, self.rowsRemoved):
+            signal.connect(self.__clearDisplay)
+
+    @property
+    def store(self):
+        return self.__store
+
+    @property
+    def journal(self) -> EditJournal:
+        return self.__journal
+
+    def setHighlightModified(self, highlight):
+        """
+        是否用背景色标记修改过的单元格
+        :param highlight: bool
+        :return: None
+        """
+        self.__highlightModified = highlight
+        self.__refreshBackground()
+
+    def markSaved(self):
+        """
+        保存后清除单元格的修改标记
+        :return: None
+        """
+        self.__journal.markSaved()
+        if self.__highlightModified:
+            self.__refreshBackground()
+
+    def __refreshBackground(self):
+        if self.rowCount() and self.columnCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1),
+                                  [Qt.BackgroundRole])
+
+    def undo(self) -> bool:
+        return self.__applyValues(self.__journal.undo())
+
+    def redo(self) -> bool:
+        return self.__applyValues(self.__journal.redo())
+
+    def __applyValues(self, values) -> bool:
+        """
+        把撤销/重做的值写入数据，并对涉及的矩形区域发出一次dataChanged
+        :param values: [(row, column, value)、ColumnEdit或RowEdit, ...]
+        :return: 是否有修改
+        """
+        if not values:
+            return False
+        edited = []
+        bulk = []
+        structure = False
+        for value in values:
+            if isinstance(value, RowEdit):
+                self.__applyRows(value)
+                structure = True
+                continue
+            if isinstance(value, ColumnEdit):
+                self.__store.setValues(value.column, value.rows, value.new)
+                bulk.append(value.column)
+                continue
+            row, column, value = value
+            edited.append((row, column, self.__store.value(row, column), value))
+            self.__store.setValue(row, column, value)
+        if edited:
+            self.valuesEdited.emit(edited)
+        if bulk:
+            self.columnsEdited.emit(bulk)
+            self.__columnsChanged(bulk)
+        if structure:
+            self.rowsEdited.emit()
+        rows = [self.viewRow(row) for row, _, _, _ in edited if self.viewRow(row) >= 0]
+        columns = [column for _, column, _, _ in edited]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), min(columns)), self.index(max(rows), max(columns)),
+                                  [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def setValues(self, edits) -> int:
+        """
+        批量修改（查找替换、向下填充、派生列等）：整列向量化写入，作为一步修改记录，只发出一次dataChanged
+        :param edits: [(列, 数据行数组, 新值数组), ...]，同一列的行号不重复
+        :return: 修改的单元格数
+        """
+        changes = []
+        with Profiler.span('model.setValues'):
+            for column, rows, values in edits:
+                old = self.__store.texts(column, rows)
+                changed = old != values
+                if not changed.any():
+                    continue
+                change = ColumnEdit(column, rows[changed], old[changed], values[changed])
+                self.__store.setValues(column, change.rows, change.new)
+                changes.append(change)
+            if not changes:
+                return 0
+            self.__journal.record(changes)
+        columns = [change.column for change in changes]
+        self.columnsEdited.emit(columns)
+        self.__columnsChanged(columns)
+        return sum(map(len, changes))
+
+    @property
+    def rowsEditable(self) -> bool:
+        """
+        是否支持插入/删除行（延迟加载的数据：行的顺序由片段表描述，不移动数据）
+        :return:
+        """
+        return isinstance(self.__store, LazyStore)
+
+    def insertRows(self, row, count, parent=QModelIndex()) -> bool:
+        """
+        在第row行之前插入count个空行，作为一步修改记录
+        :param row: 行号（等于行数时追加在末尾）
+        :param count: 行数
+        :param parent:
+        :return: 是否插入
+        """
+        if parent.isValid() or count <= 0 or not self.rowsEditable or not 0 <= row <= self.rowCount():
+            return False
+        change = RowEdit(row, count, True, self.__store.layout, None)
+        self.__applyRows(change)
+        change.new = self.__store.layout
+        self.__journal.record([change])
+        self.rowsEdited.emit()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return self.removeRanges([(row, count)])
+
+    def removeRanges(self, ranges) -> bool:
+        """
+        删除多段连续的行，作为一步修改记录（从后往前删除，各段的行号不受影响）
+        :param ranges: [(起始行, 行数)]，互不重叠
+        :return: 是否删除
+        """
+        ranges = [(row, count) for row, count in ranges if count > 0]
+        if not ranges or not self.rowsEditable \
+                or any(row < 0 or row + count > self.rowCount() for row, count in ranges):
+            return False
+        changes = []
+        for row, count in sorted(ranges, reverse=True):
+            change = RowEdit(row, count, False, self.__store.layout, None)
+            self.__applyRows(change)
+            change.new = self.__store.layout
+            changes.append(change)
+        self.__journal.record(changes)
+        self.rowsEdited.emit()
+        return True
+
+    def __applyRows(self, change):
+        """
+        插入/删除行：change.new为None时修改数据，否则恢复到change.new的行布局（撤销/重做）
+        :param change: RowEdit
+        :return: None
+        """
+        last = change.row + change.count - 1
+        if change.inserted:
+            self.beginInsertRows(QModelIndex(), change.row, last)
+        else:
+            self.beginRemoveRows(QModelIndex(), change.row, last)
+        if change.new is not None:
+            self.__store.setLayout(change.new)
+        elif change.inserted:
+            self.__store.insertRows(change.row, change.count)
+        else:
+            self.__store.deleteRows(change.row, change.count)
+        if change.inserted:
+            self.endInsertRows()
+        else:
+            self.endRemoveRows()
+
+    def __columnsChanged(self, columns):
+        # 批量修改后整列刷新
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, min(columns)), self.index(self.rowCount() - 1, max(columns)),
+                                  [Qt.DisplayRole, Qt.EditRole])
+
+    def addColumn(self, name=None) -> int:
+        """
+        在最后追加一个空列（派生列）
+        :param name: 列头
+        :return: 新列的列号
+        """
+        column = self.__store.columnCount
+        self.beginInsertColumns(QModelIndex(), column, column)
+        self.__store.appendColumn(name)
+        self.endInsertColumns()
+        return column
+
+    def setStore(self, store: ColumnStore, keepJournal=False):
+        """
+        替换数据
+        :param store: ColumnStore/LazyStore
+        :param keepJournal: 保留修改记录（新数据与原数据的行一一对应，例如保存后在新文件上重新建立索引）
+        :return: None
+        """
+        self.beginResetModel()
+        self.__store.close()
+        self.__store = store
+        if not keepJournal:
+            self.__journal.clear()
+        self.__order = None
+        self.__sortKeys = []
+        self.__filter = None
+        self.__query = None
+        self.__updateMapping()
+        self.endResetModel()
+
+    def clear(self):
+        self.setStore(ColumnStore())
+
+    def detach(self):
+        """
+        取出数据（标签页不活动时换出到磁盘），模型变为空表；修改记录保留，attach后可以继续撤销
+        :return: (数据, 视图状态)
+        """
+        state = (self.__order, self.__sortKeys, self.__filter, self.__query)
+        self.beginResetModel()
+        store = self.__store
+        self.__store = ColumnStore()
+        self.__order = None
+        self.__sortKeys = []
+        self.__filter = None
+        self.__query = None
+        self.__updateMapping()
+        self.endResetModel()
+        return store, state
+
+    def attach(self, store, state):
+        """
+        放回detach取出的数据，恢复排序和筛选
+        :param store: ColumnStore
+        :param state: detach返回的视图状态
+        :return: None
+        """
+        self.beginResetModel()
+        self.__store = store
+        self.__order, self.__sortKeys, self.__filter, self.__query = state
+        self.__updateMapping()
+        self.endResetModel()
+
+    def setHeader(self, header):
+        """
+        设置列头
+        :param header: 列表
+        :return: None
+        """
+        self.__insertColumns(len(header))
+        self.__store.setHeader(header)
+        self.headerDataChanged.emit(Qt.Horizontal, 0, max(self.__store.columnCount - 1, 0))
+
+    def appendRows(self, rows):
+        """
+        在末尾追加多行，视图只需要处理新增的行
+        :param rows: 二维列表
+        :return: None
+        """
+        if rows:
+            self.appendBatch(ColumnBatch.fromRows(rows))
+
+    def appendBatch(self, batch):
+        """
+        在末尾追加一批按列编码好的行（解析线程/进程已完成编码，界面线程只拼接字节）
+        :param batch: ColumnBatch
+        :return: None
+        """
+        if not batch.rowCount:
+            return
+        with Profiler.span('model.append'):
+            self.__insertColumns(len(batch.columns))
+            self.__appendRows(batch.rowCount, lambda: self.__store.appendBatch(batch))
+
+    def appendFromSource(self) -> int:
+        """
+        延迟加载的数据：把源文件末尾追加的行加入表格
+        :return: 新增的行数
+        """
+        count, width = self.__store.scanAppended()
+        if not count:
+            return 0
+        self.__insertColumns(width)
+        self.__appendRows(count, self.__store.commitAppended)
+        return count
+
+    def __appendRows(self, count, append):
+        """
+        在数据末尾追加行：排序后追加的行显示在末尾，筛选时只显示满足条件的新行
+        :param count: 追加的行数
+        :param append: 把行写入数据的函数
+        :return: None
+        """
+        first = self.__store.rowCount
+        if self.__visible is None:
+            self.beginInsertRows(QModelIndex(), first, first + count - 1)
+            append()
+            self.endInsertRows()
+            return
+        # 视图行数由映射决定，先写入数据再计算新增的可见行
+        append()
+        rows = np.arange(first, first + count)
+        if self.__order is not None:
+            self.__order = np.concatenate([self.__order, rows])
+        if self.__filter is not None:
+            rows = self.__query.evaluate(self.__store, rows)
+            self.__filter = np.concatenate([self.__filter, rows])
+        self.__position = np.concatenate([self.__position, np.full(count, -1, dtype=np.int64)])
+        if not len(rows):
+            return
+        viewFirst = len(self.__visible)
+        self.beginInsertRows(QModelIndex(), viewFirst, viewFirst + len(rows) - 1)
+        self.__visible = np.concatenate([self.__visible, rows])
+        self.__position[rows] = np.arange(viewFirst, viewFirst + len(rows))
+        self.endInsertRows()
+
+    def __updateMapping(self):
+        # 由排序顺序和筛选结果计算视图行与数据行的映射
+        if self.__order is None and self.__filter is None:
+            self.__visible = None
+            self.__position = None
+            return
+        rows = self.__order if self.__order is not None else np.arange(self.__store.rowCount)
+        if self.__filter is not None:
+            mask = np.zeros(self.__store.rowCount, dtype=bool)
+            mask[self.__filter] = True
+            rows = rows[mask[rows]]
+        self.__visible = rows
+        self.__position = np.full(self.__store.rowCount, -1, dtype=np.int64)
+        self.__position[rows] = np.arange(len(rows))
+
+    def dataRow(self, row) -> int:
+        """
+        视图行号 -> 数据行号
+        :param row: 视图行号
+        :return: 数据行号
+        """
+        return row if self.__visible is None else int(self.__visible[row])
+
+    def dataRows(self, start, stop):
+        """
+        视图行[start, stop) -> 数据行
+        :param start: 起始视图行号
+        :param stop: 结束视图行号
+        :return: 数据行号数组
+        """
+        return np.arange(start, stop) if self.__visible is None else self.__visible[start:stop]
+
+    def viewRow(self, row) -> int:
+        """
+        数据行号 -> 视图行号
+        :param row: 数据行号
+        :return: 视图行号，被筛选掉的行为-1
+        """
+        return row if self.__position is None else int(self.__position[row])
+
+    @property
+    def inMemory(self) -> bool:
+        """
+        数据是否完整加载在内存中（延迟加载的数据需要完整解析才能排序/筛选，不支持）
+        :return:
+        """
+        return isinstance(self.__store, ColumnStore)
+
+    @property
+    def query(self):
+        """
+        当前的筛选条件
+        :return: Query，未筛选时为None
+        """
+        return self.__query
+
+    @property
+    def filteredRows(self):
+        """
+        满足筛选条件的数据行
+        :return: 升序数组，未筛选时为None
+        """
+        return self.__filter
+
+    def setFilter(self, rows, query=None, rowCount=None):
+        """
+        只显示指定的数据行（筛选结果），保持当前的排序
+        计算结果之后追加的行由query判断
+        :param rows: 满足条件的数据行（升序数组），None: 取消筛选
+        :param query: 筛选条件（Query）
+        :param rowCount: 计算结果时的数据行数，None: 当前行数
+        :return: None
+        """
+        with Profiler.span('model.filter'):
+            self.__setFilter(rows, query, rowCount)
+
+    def __setFilter(self, rows, query, rowCount):
+        self.beginResetModel()
+        self.__filter = None if rows is None else np.asarray(rows, dtype=np.int64)
+        self.__query = None if rows is None else query
+        if self.__filter is not None and rowCount is not None and rowCount < self.__store.rowCount:
+            rest = query.evaluate(self.__store, np.arange(rowCount, self.__store.rowCount))
+            self.__filter = np.concatenate([self.__filter, rest])
+        self.__updateMapping()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        按列排序（点击列头）
+        :param column: 列号，小于0时恢复原始顺序
+        :param order: Qt.AscendingOrder/Qt.DescendingOrder
+        :return: None
+        """
+        self.sortBy([] if column < 0 else [(column, order == Qt.DescendingOrder)])
+
+    def sortBy(self, keys):
+        """
+        多列稳定排序：由csv_sort计算行的排列，不移动数据，空单元格总在最后
+        :param keys: [(列号, 是否降序)]，依次比较；空列表时恢复原始顺序
+        :return: None
+        """
+        if not self.inMemory or any(column >= self.columnCount() for column, _ in keys):
+            return
+        with Profiler.span('model.sort'):
+            self.__sort(keys)
+
+    @property
+    def sortKeys(self):
+        """
+        当前的排序条件
+        :return: [(列号, 是否降序)]，未排序时为空列表
+        """
+        return list(self.__sortKeys)
+
+    def __sort(self, keys):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        # 记录持久索引（选择、当前单元格）对应的数据行，排序后换算到新位置
+        rows = [self.dataRow(index.row()) for index in persistent]
+        self.__order = sortRows(self.__store, keys) if keys else None
+        self.__sortKeys = list(keys)
+        self.__updateMapping()
+        self.changePersistentIndexList(persistent, [self.index(self.viewRow(row), index.column())
+                                                    for row, index in zip(rows, persistent)])
+        self.layoutChanged.emit()
+
+    def __insertColumns(self, count):
+        # 列数不足时通知视图插入新列
+        columns = self.__store.columnCount
+        if count > columns:
+            self.beginInsertColumns(QModelIndex(), columns, count - 1)
+            self.__store.ensureColumns(count)
+            self.endInsertColumns()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self.__store.rowCount if self.__visible is None else len(self.__visible)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self.__store.columnCount
+
+    def data(self, index, role=_DISPLAY_ROLE):
+        if not index.isValid():
+            return None
+        if Profiler.enabled:
+            Profiler.count('model.data')
+        if role == _DISPLAY_ROLE or role == _EDIT_ROLE:
+            key = (self.dataRow(index.row()), index.column())
+            value = self.__display.get(key)
+            if value is None:
+                if len(self.__display) >= self.__displayCacheSize:
+                    self.__display.clear()
+                value = self.__display[key] = self.__store.value(*key)
+            return value
+        if role == _BACKGROUND_ROLE and self.__highlightModified:
+            if self.__journal.modified(self.dataRow(index.row()), index.column()):
+                return self.__modifiedColor
+        return None
+
+    def __clearDisplay(self, *args):
+        self.__display.clear()
+
+    def setData(self, index, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row = self.dataRow(index.row())
+        old = self.__store.value(row, index.column())
+        if old == value:
+            return False
+        self.__store.setValue(row, index.column(), value)
+        self.__journal.record([(row, index.column(), old, value)])
+        self.valuesEdited.emit([(row, index.column(), old, value)])
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return _NO_FLAGS
+        return _CELL_FLAGS
+
+    def headerData(self, section, orientation, role=_DISPLAY_ROLE):
+        # 列头的提示显示列的存储类型
+        if role == _TOOLTIP_ROLE and orientation == _HORIZONTAL and self.inMemory \
+                and section < self.__store.columnCount:
+            return self.__store.columnKind(section)
+        if role != _DISPLAY_ROLE:
+            return None
+        if orientation == _HORIZONTAL:
+            _header = self.__store.headerValue(section)
+            if _header is not None:
+                return _header
+            return str(section + 1)
+        # 行号显示数据在文件中的行号，排序后也不变
+        return str(self.dataRow(section) + 1)
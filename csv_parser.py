@@ -0,0 +1,336 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_parser.py
+@Desc    : csv解析：编码/格式探测，单线程与多进程两种解析引擎，压缩的文件流式解压（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 10:20
+"""
+
+import codecs
+import csv
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from csv_store import ColumnBatch
+from csv_compress import detectCompression, openInput
+from csv_arrow import TableReader, detectTableFormat
+
+# 解析引擎
+ENGINE_PYTHON = 'python'        # 标准库csv单线程解析
+ENGINE_PARALLEL = 'parallel'    # 按行边界切分文件，多进程并行解析
+ENGINES = [ENGINE_PYTHON, ENGINE_PARALLEL]
+
+_SAMPLE_SIZE = 64 * 1024                # 探测编码时读取的字节数
+_SNIFF_SIZE = 16 * 1024                 # 探测分隔符的文本长度（Sniffer的耗时随长度超线性增长）
+_DELIMITERS = ',;\t|'                   # 可能的分隔符
+_FALLBACK_ENCODINGS = ['gb18030', 'latin-1']    # utf-8解码失败后依次尝试的编码（gb18030兼容gbk）
+
+
+class FileFormat(object):
+    """
+    csv文件格式：编码、分隔符、引号字符、是否有列头
+    """
+
+    def __init__(self, encoding='utf-8', delimiter=',', quotechar='"', hasHeader=True):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.hasHeader = hasHeader
+
+    @property
+    def byteSplittable(self) -> bool:
+        """
+        换行符和引号在该编码中是否只以单字节出现（可以直接在字节流中查找行边界）
+        :return:
+        """
+        return not codecs.lookup(self.encoding).name.startswith('utf-16')
+
+    def readerArgs(self):
+        """
+        csv.reader/csv.writer的格式参数
+        :return: dict
+        """
+        return {'delimiter': self.delimiter, 'quotechar': self.quotechar}
+
+    @classmethod
+    def detect(cls, path):
+        """
+        从文件开头的样本探测格式
+        :param path: 文件路径
+        :return: FileFormat
+        """
+        # Parquet/Arrow文件总是有列名，另存为csv时使用默认格式
+        if detectTableFormat(path) is not None:
+            return cls(hasHeader=True)
+        f, _ = openInput(path, background=False)
+        with f:
+            sample = f.read(_SAMPLE_SIZE)
+        encoding = detectEncoding(sample)
+        text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample)
+        # 最后一行可能不完整，不参与探测
+        cut = text.rfind('\n', 0, _SNIFF_SIZE)
+        if cut > 0 and (len(text) > _SNIFF_SIZE or len(sample) == _SAMPLE_SIZE):
+            text = text[:cut + 1]
+        delimiter, quotechar = sniffDialect(text)
+        return cls(encoding, delimiter, quotechar, sniffHeader(text, delimiter, quotechar))
+
+
+def detectEncoding(sample) -> str:
+    """
+    探测编码：BOM -> utf-16特征 -> utf-8 -> gb18030 -> latin-1
+    :param sample: 文件开头的字节
+    :return: 编码名
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    # 没有BOM的utf-16：ASCII字符的高字节为0
+    if len(sample) >= 2:
+        evenZeros = sample[0::2].count(0)
+        oddZeros = sample[1::2].count(0)
+        if oddZeros > len(sample) // 4 and evenZeros == 0:
+            return 'utf-16-le'
+        if evenZeros > len(sample) // 4 and oddZeros == 0:
+            return 'utf-16-be'
+    for encoding in ['utf-8'] + _FALLBACK_ENCODINGS:
+        try:
+            # 样本末尾可能截断了多字节字符，使用增量解码器忽略不完整的结尾
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def sniffDialect(text):
+    """
+    探测分隔符和引号字符
+    :param text: 样本文本
+    :return: (delimiter, quotechar)
+    """
+    # Sniffer的正则表达式只识别\n换行
+    text = text.replace('\r\n', '\n')
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=_DELIMITERS)
+        return dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        # 无法判断时取第一行中出现最多的分隔符
+        first = text.split('\n', 1)[0]
+        counts = [(first.count(d), d) for d in _DELIMITERS]
+        count, delimiter = max(counts)
+        return (delimiter if count else ','), '"'
+
+
+def sniffHeader(text, delimiter=',', quotechar='"') -> bool:
+    """
+    判断第一行是否为列头：列头一般不包含数值，且至少有一个非空单元格
+    （标准库Sniffer.has_header对全部为文本的表格几乎总是判断为没有列头，这里更倾向于有列头）
+    :param text: 样本文本
+    :param delimiter: 分隔符
+    :param quotechar: 引号字符
+    :return: bool
+    """
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, quotechar=quotechar)
+    first = next(reader, None)
+    if not first or not any(cell.strip() for cell in first):
+        return False
+    for cell in first:
+        try:
+            float(cell)
+            return False
+        except ValueError:
+            continue
+    return True
+
+
+class ChunkReader(object):
+    """
+    标准库csv单线程解析，分批读取
+    批大小从firstRows开始逐批翻倍，直到maxRows；第一批很小，保证界面能尽快显示第一屏数据
+    """
+
+    def __init__(self, csvFile, withHeader=False, fileFormat=None):
+        self.file = csvFile
+        self.withHeader = withHeader
+        self.format = fileFormat or FileFormat()
+        self.header = None      # 列头（withHeader为True时在第一批之前读出）
+        self.bytesRead = 0      # 已读取的字节数
+        self.rowsParsed = 0     # 已解析的行数（不含列头）
+        self.__position = None
+
+    def batches(self, firstRows=500, maxRows=20000):
+        """
+        分批读取
+        :param firstRows: 第一批的行数
+        :param maxRows: 每批的最大行数
+        :return: 生成器，每次返回一批行（ColumnBatch）
+        """
+        # 压缩的文件在后台线程中解压，已读字节数为压缩文件中的位置
+        stream, self.__position = openInput(self.file)
+        with io.TextIOWrapper(stream, encoding=self.format.encoding, newline='') as f:
+            reader = csv.reader(f, **self.format.readerArgs())
+            if self.withHeader:
+                self.header = next(reader, None)
+            size = firstRows
+            rows = []
+            for row in reader:
+                rows.append(row)
+                if len(rows) == size:
+                    yield self.__batch(f, rows)
+                    rows = []
+                    size = min(size * 2, maxRows)
+            if rows:
+                yield self.__batch(f, rows)
+            self.bytesRead = self.__position()
+
+    def close(self):
+        pass
+
+    def __batch(self, f, rows):
+        # 文本文件迭代时不能调用tell()，底层文件的位置可以作为已读字节数
+        self.bytesRead = self.__position()
+        self.rowsParsed += len(rows)
+        return ColumnBatch.fromRows(rows)
+
+
+def splitRanges(buf, quotechar='"', firstSize=256 * 1024, chunkSize=8 << 20):
+    """
+    把文件切分成若干字节范围，切分点都在行边界上（不在引号内）
+    第一个范围较小，用于尽快显示第一屏数据
+    :param buf: 支持缓冲区协议的对象（mmap/bytes）
+    :param quotechar: 引号字符
+    :param firstSize: 第一个范围的大致大小
+    :param chunkSize: 其余范围的大致大小
+    :return: [(start, end), ...]
+    """
+    size = len(buf)
+    if size == 0:
+        return []
+    data = np.frombuffer(buf, dtype=np.uint8)
+    quote = ord(quotechar)
+    ranges = []
+    start = 0
+    target = firstSize
+    while target < size:
+        # start处不在引号内，统计[start, target)内的引号得到target处的状态
+        parity = int(np.count_nonzero(data[start:target] == quote)) & 1
+        cut = None
+        pos = target
+        while pos < size and cut is None:
+            chunk = data[pos:pos + (1 << 20)]
+            quotes = np.flatnonzero(chunk == quote)
+            newlines = np.flatnonzero(chunk == 10)
+            outside = newlines[((np.searchsorted(quotes, newlines) + parity) & 1) == 0]
+            if len(outside):
+                cut = pos + int(outside[0]) + 1
+            parity = (parity + len(quotes)) & 1
+            pos += len(chunk)
+        if cut is None or cut >= size:
+            break
+        ranges.append((start, cut))
+        start = cut
+        target = cut + chunkSize
+    del data
+    ranges.append((start, size))
+    return ranges
+
+
+def parseRange(task):
+    """
+    解析文件的一个字节范围（在子进程中执行）
+    :param task: (文件路径, start, end, 编码, 分隔符, 引号字符, 第一行是否为列头)
+    :return: (列头, ColumnBatch, end)，没有列头时列头为None
+    """
+    path, start, end, encoding, delimiter, quotechar, withHeader = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # utf-8-sig只在文件开头有BOM
+    if start and encoding == 'utf-8-sig':
+        encoding = 'utf-8'
+    text = data.decode(encoding)
+    rows = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter, quotechar=quotechar))
+    header = rows.pop(0) if withHeader and rows else None
+    return header, ColumnBatch.fromRows(rows), end
+
+
+class ParallelReader(object):
+    """
+    多进程解析：按行边界把文件切分成多个范围，在进程池中并行解析，按顺序返回列编码的批次
+    第一个范围在当前进程中解析，不等待进程池启动
+    接口与ChunkReader一致
+    """
+
+    def __init__(self, csvFile, withHeader=False, fileFormat=None, workers=None):
+        self.file = csvFile
+        self.withHeader = withHeader
+        self.format = fileFormat or FileFormat()
+        self.workers = workers or os.cpu_count() or 1
+        self.header = None
+        self.bytesRead = 0
+        self.rowsParsed = 0
+        self.__executor = None
+
+    def batches(self, firstRows=None, maxRows=None):
+        """
+        按文件顺序返回解析结果
+        :param firstRows: 与ChunkReader接口一致，不使用（批大小由切分的字节范围决定）
+        :param maxRows: 同上
+        :return: 生成器，每次返回一批行（ColumnBatch）
+        """
+        with open(self.file, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                ranges = splitRanges(mm, self.format.quotechar)
+        tasks = [(self.file, start, end, self.format.encoding, self.format.delimiter, self.format.quotechar,
+                  self.withHeader and start == 0) for start, end in ranges]
+
+        self.header, batch, self.bytesRead = parseRange(tasks[0])
+        self.rowsParsed += batch.rowCount
+        yield batch
+        if len(tasks) == 1:
+            return
+
+        self.__executor = ProcessPoolExecutor(max_workers=min(self.workers, len(tasks) - 1))
+        try:
+            for _, batch, self.bytesRead in self.__executor.map(parseRange, tasks[1:]):
+                self.rowsParsed += batch.rowCount
+                yield batch
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        停止进程池，未开始的任务被取消
+        :return: None
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+
+def createReader(csvFile, withHeader=False, fileFormat=None, engine=ENGINE_PYTHON):
+    """
+    创建解析器
+    Parquet/Arrow文件按列读取，不经过文本解析
+    并行引擎只用于换行符可以按字节查找的编码、未压缩的文件且有多个CPU的情况，其余情况使用标准库引擎
+    :param csvFile: 文件路径
+    :param withHeader: 是否有列头
+    :param fileFormat: 文件格式
+    :param engine: ENGINE_PYTHON/ENGINE_PARALLEL
+    :return: ChunkReader/ParallelReader/TableReader
+    """
+    if detectTableFormat(csvFile) is not None:
+        return TableReader(csvFile)
+    fileFormat = fileFormat or FileFormat()
+    if engine == ENGINE_PARALLEL and fileFormat.byteSplittable and (os.cpu_count() or 1) > 1 \
+            and detectCompression(csvFile) is None:
+        return ParallelReader(csvFile, withHeader, fileFormat)
+    return ChunkReader(csvFile, withHeader, fileFormat)
@@ -0,0 +1,231 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_profile.py
+@Desc    : 可选的性能统计：热点路径计时、计数、直方图，导出Chrome trace或cProfile（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 20:50
+"""
+
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+
+ENV_PROFILE = 'CSVEDITOR_PROFILE'   # 1: 启用统计；以.json/.prof结尾的路径: 启用并在退出时导出到该文件
+_SAMPLES = 1024                     # 每项保留的最近样本数，用于计算分位数
+_TRACE_EVENTS = 200000              # 保留的trace事件数
+_NULL = nullcontext()               # 未启用时span()返回的空上下文
+
+
+class Stat(object):
+    """
+    一项统计：次数、总和、最大值及最近的样本
+    """
+
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=_SAMPLES)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+
+class _Span(object):
+    # 计时的上下文，退出时记录耗时（毫秒）和trace事件
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        Profiler.addSpan(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Profiler(object):
+    """
+    全局的性能统计
+    未启用时span()返回共享的空上下文，count()/record()只判断一次enabled，开销可以忽略
+    所有方法都可以在工作线程中调用
+    """
+
+    enabled = False
+
+    __stats = {}                                    # 名称 -> Stat
+    __counters = {}                                 # 名称 -> 次数
+    __trace = deque(maxlen=_TRACE_EVENTS)           # Chrome trace事件
+    __origin = time.perf_counter()                  # trace的时间起点
+    __lock = threading.Lock()
+    __cProfile = None
+
+    @classmethod
+    def setEnabled(cls, enabled, withCProfile=False):
+        """
+        启用/停止统计
+        :param enabled: bool
+        :param withCProfile: 同时在界面线程中运行cProfile（开销较大，只用于定位问题）
+        :return: None
+        """
+        cls.enabled = enabled
+        if withCProfile and cls.__cProfile is None:
+            cls.__cProfile = cProfile.Profile()
+        if cls.__cProfile is not None:
+            if enabled:
+                cls.__cProfile.enable()
+            else:
+                cls.__cProfile.disable()
+
+    @classmethod
+    def reset(cls):
+        """
+        清空已有的统计
+        :return: None
+        """
+        with cls.__lock:
+            cls.__stats.clear()
+            cls.__counters.clear()
+            cls.__trace.clear()
+
+    @classmethod
+    def span(cls, name):
+        """
+        计时的上下文：with Profiler.span('file.save'): ...
+        :param name: 名称
+        :return: 上下文
+        """
+        return _Span(name) if cls.enabled else _NULL
+
+    @classmethod
+    def timed(cls, iterable, name):
+        """
+        对迭代器每次取下一项计时（例如解析器每产生一批数据的耗时）
+        :param iterable: 可迭代对象
+        :param name: 名称
+        :return: 生成器
+        """
+        if not cls.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            cls.addSpan(name, start, time.perf_counter())
+            yield item
+
+    @classmethod
+    def addSpan(cls, name, start, end):
+        with cls.__lock:
+            cls.__stat(name).add((end - start) * 1000)
+            cls.__trace.append((name, start, end, threading.get_ident()))
+
+    @classmethod
+    def count(cls, name, n=1):
+        """
+        计数（例如data()的调用次数）
+        :param name: 名称
+        :param n: 增加的次数
+        :return: None
+        """
+        if cls.enabled:
+            cls.__counters[name] = cls.__counters.get(name, 0) + n
+
+    @classmethod
+    def counter(cls, name) -> int:
+        return cls.__counters.get(name, 0)
+
+    @classmethod
+    def record(cls, name, value):
+        """
+        记录一个样本（例如每帧调用data()的次数）
+        :param name: 名称
+        :param value: 数值
+        :return: None
+        """
+        if cls.enabled:
+            with cls.__lock:
+                cls.__stat(name).add(value)
+
+    @classmethod
+    def __stat(cls, name):
+        stat = cls.__stats.get(name)
+        if stat is None:
+            stat = cls.__stats[name] = Stat()
+        return stat
+
+    @classmethod
+    def snapshot(cls):
+        """
+        当前的统计结果
+        :return: ([(名称, 次数, 总和, 平均, p50, p95, 最大值)], {计数器名称: 次数})
+        """
+        with cls.__lock:
+            stats = [(name, stat.count, stat.total, stat.max, list(stat.samples))
+                     for name, stat in sorted(cls.__stats.items())]
+            counters = dict(cls.__counters)
+        rows = []
+        for name, count, total, maximum, samples in stats:
+            p50, p95 = np.percentile(samples, [50, 95]) if samples else (0.0, 0.0)
+            rows.append((name, count, total, total / count if count else 0.0, float(p50), float(p95), maximum))
+        return rows, counters
+
+    @classmethod
+    def dump(cls, path):
+        """
+        导出本次会话的统计：.prof为cProfile的结果（可用snakeviz等查看），其他为Chrome trace JSON
+        （可在chrome://tracing或Perfetto中打开）
+        :param path: 文件路径
+        :return: None
+        """
+        if path.endswith('.prof'):
+            if cls.__cProfile is None:
+                raise ValueError('cProfile未启用，请设置%s=文件名.prof后启动' % ENV_PROFILE)
+            cls.__cProfile.dump_stats(path)
+            return
+        pid = os.getpid()
+        with cls.__lock:
+            events = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                       'ts': (start - cls.__origin) * 1e6, 'dur': (end - start) * 1e6}
+                      for name, start, end, tid in cls.__trace]
+            counters = dict(cls.__counters)
+        events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0,
+                       'ts': (time.perf_counter() - cls.__origin) * 1e6, 'args': counters})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def enableFromEnvironment():
+    """
+    按环境变量CSVEDITOR_PROFILE启用统计；值为文件路径时在退出时导出
+    :return: 是否启用
+    """
+    value = os.environ.get(ENV_PROFILE, '')
+    if value in ('', '0'):
+        return False
+    isPath = value.endswith(('.json', '.prof'))
+    Profiler.setEnabled(True, withCProfile=value.endswith('.prof'))
+    if isPath:
+        atexit.register(Profiler.dump, value)
+    return True
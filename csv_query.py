@@ -0,0 +1,415 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_query.py
+@Desc    : 表格筛选：子字符串、正则表达式、列条件（例如price > 100），按列向量化计算（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 18:10
+"""
+
+import re
+import weakref
+import numpy as np
+from csv_profile import Profiler
+from csv_types import KIND_TEXT, KIND_INT, KIND_FLOAT, KIND_DATETIME, KIND_CATEGORY
+
+_TERM_SEPARATOR = '&&'                          # 多个条件同时满足
+_COMPARE = re.compile(r'^(?P<column>"[^"]+"|#\d+|[^\s=!<>~]+)\s*(?P<op>==|!=|>=|<=|>|<|~)\s*(?P<value>.*)$')
+_SUBSET_RATIO = 64                              # 候选行少于总行数的1/64时逐行检查，否则整列扫描
+
+
+class QueryError(ValueError):
+    """
+    查询语句错误（例如正则表达式不合法）
+    """
+    pass
+
+
+class ColumnIndex(object):
+    """
+    一列的检索索引：ASCII字母转为小写的utf-8字节数组及行偏移，首次查询时建立
+    数值列另外缓存按数值解析的结果；列被修改或追加后自动重建
+    """
+
+    __cache = weakref.WeakKeyDictionary()   # {列: ColumnIndex}
+
+    def __init__(self, column):
+        self.key = self.__key(column)
+        if column.kind == KIND_TEXT:
+            data, offsets, self.edits = column.snapshot()
+        else:
+            texts = column.formatAll()
+            data = ''.join(texts.tolist()).encode('utf-8')
+            offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+            np.cumsum(np.strings.str_len(texts), out=offsets[1:])
+            self.edits = {}
+        self.data = np.frombuffer(data.lower(), dtype=np.uint8)
+        self.offsets = offsets
+        self.__numbers = None
+
+    @classmethod
+    def get(cls, column):
+        """
+        获取（必要时建立）列的检索索引
+        :param column: StringColumn/TypedColumn
+        :return: ColumnIndex
+        """
+        index = cls.__cache.get(column)
+        if index is None or index.key != cls.__key(column):
+            index = ColumnIndex(column)
+            cls.__cache[column] = index
+        return index
+
+    @staticmethod
+    def __key(column):
+        return len(column), column.version
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def find(self, needle, rows):
+        """
+        查找包含needle的行（不含编辑过的单元格，由调用者另外检查）
+        :param needle: ASCII字母已转为小写的utf-8字节串
+        :param rows: 候选行（升序数组），None: 所有行
+        :return: 与候选行对应的bool数组
+        """
+        count = len(self) if rows is None else len(rows)
+        if not needle:
+            return np.ones(count, dtype=bool)
+        if rows is not None and len(rows) * _SUBSET_RATIO < len(self):
+            data = self.data
+            offsets = self.offsets
+            return np.fromiter((needle in data[offsets[r]:offsets[r + 1]].tobytes() for r in rows),
+                               dtype=bool, count=count)
+        # 先找第一个字节的位置，再逐个字节过滤，代价与数据量和候选位置数成正比
+        size = len(self.data) - len(needle) + 1
+        positions = np.flatnonzero(self.data[:max(size, 0)] == needle[0])
+        for i in range(1, len(needle)):
+            positions = positions[self.data[positions + i] == needle[i]]
+        owners = np.searchsorted(self.offsets, positions, side='right') - 1
+        owners = owners[positions + len(needle) <= self.offsets[owners + 1]]
+        mask = np.zeros(len(self), dtype=bool)
+        mask[owners] = True
+        return mask if rows is None else mask[rows]
+
+    def numbers(self):
+        """
+        按数值解析的值（不能解析的为NaN），用于字符串列上的数值比较
+        :return: float64数组
+        """
+        if self.__numbers is None:
+            numbers = np.full(len(self), np.nan)
+            data = self.data.tobytes()
+            for r in range(len(self)):
+                try:
+                    numbers[r] = float(data[self.offsets[r]:self.offsets[r + 1]])
+                except ValueError:
+                    pass
+            self.__numbers = numbers
+        return self.__numbers
+
+
+class Term(object):
+    """
+    一个条件
+    column为None时任意一列满足即可
+    """
+
+    def __init__(self, text, column=None):
+        self.text = text
+        self.column = column
+
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def matchValue(self, value) -> bool:
+        """
+        单个值是否满足条件（用于编辑过的单元格）
+        :param value: 字符串
+        :return: bool
+        """
+        raise NotImplementedError
+
+    def matchColumn(self, column, rows):
+        """
+        一列在候选行上的结果
+        :param column: StringColumn/TypedColumn
+        :param rows: 候选行（升序数组），None: 所有行
+        :return: bool数组
+        """
+        raise NotImplementedError
+
+    def refines(self, previous) -> bool:
+        """
+        满足本条件的行是否一定满足previous（可以只在previous的结果中查找）
+        :param previous: Term
+        :return: bool
+        """
+        return self == previous
+
+    def evaluate(self, store, rows, count):
+        """
+        在候选行上计算条件
+        :param store: ColumnStore
+        :param rows: 候选行（升序数组），None: 前count行
+        :param count: rows为None时的行数（计算期间追加的行不参与计算）
+        :return: bool数组
+        """
+        columns = range(store.columnCount) if self.column is None else [self.column]
+        mask = np.zeros(count if rows is None else len(rows), dtype=bool)
+        for c in columns:
+            column = store.columns[c]
+            if column.kind == KIND_CATEGORY:
+                # 只对不同的值计算一次，再按编码展开
+                matched = np.fromiter(map(self.matchValue, column.categories), dtype=bool,
+                                      count=len(column.categories))
+                codes = column.values[:count] if rows is None else column.values[rows]
+                mask |= matched[codes]
+            else:
+                mask |= self.matchColumn(column, rows)[:len(mask)]
+        return mask
+
+    def _checkEdits(self, index, rows, mask):
+        # 字符串列中编辑过的单元格不在索引中，单独判断
+        if not index.edits:
+            return mask
+        for row, value in index.edits.items():
+            if rows is None:
+                mask[row] = self.matchValue(value)
+            else:
+                position = np.searchsorted(rows, row)
+                if position < len(rows) and rows[position] == row:
+                    mask[position] = self.matchValue(value)
+        return mask
+
+
+class SubstringTerm(Term):
+    """
+    包含子字符串（ASCII字母不区分大小写）
+    """
+
+    def __init__(self, text, column=None):
+        super().__init__(text, column)
+        self.needle = text.encode('utf-8').lower()
+
+    def matchValue(self, value) -> bool:
+        return self.needle in value.encode('utf-8').lower()
+
+    def matchColumn(self, column, rows):
+        index = ColumnIndex.get(column)
+        return self._checkEdits(index, rows, index.find(self.needle, rows))
+
+    def refines(self, previous) -> bool:
+        # 更长的子字符串只会出现在包含原子字符串的行中
+        return type(previous) is SubstringTerm and previous.column == self.column and previous.needle in self.needle
+
+
+class RegexTerm(Term):
+    """
+    正则表达式（re.search，区分大小写）
+    """
+
+    def __init__(self, text, column=None):
+        super().__init__(text, column)
+        try:
+            self.pattern = re.compile(text)
+        except re.error as e:
+            raise QueryError('正则表达式错误：%s' % e)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and (self.text, self.column) == (other.text, other.column)
+
+    def matchValue(self, value) -> bool:
+        return self.pattern.search(value) is not None
+
+    def matchColumn(self, column, rows):
+        search = self.pattern.search
+        rows = range(len(column)) if rows is None else rows
+        return np.fromiter((search(column.get(r)) is not None for r in rows), dtype=bool, count=len(rows))
+
+
+class CompareTerm(Term):
+    """
+    列条件：== != 按字符串比较（数值列同时按数值比较），> >= < <= 按数值或日期比较，~ 为正则表达式
+    """
+
+    __ops = {
+        '==': np.equal, '!=': np.not_equal,
+        '>': np.greater, '>=': np.greater_equal,
+        '<': np.less, '<=': np.less_equal,
+    }
+
+    def __init__(self, text, column, op, value):
+        super().__init__(text, column)
+        self.op = op
+        self.value = value
+        if not value and op not in ('==', '!='):
+            raise QueryError('缺少比较的值：%s' % text)
+        try:
+            self.number = float(value)
+        except ValueError:
+            self.number = None
+
+    def matchValue(self, value) -> bool:
+        if self.op in ('==', '!=') and self.number is None:
+            return (value == self.value) == (self.op == '==')
+        try:
+            return bool(self.__ops[self.op](float(value), self.number))
+        except (ValueError, TypeError):
+            return False
+
+    def matchColumn(self, column, rows):
+        op = self.__ops[self.op]
+        if column.kind in (KIND_INT, KIND_FLOAT):
+            if self.number is None:
+                return np.full(len(column) if rows is None else len(rows), self.op == '!=')
+            values = column.values if rows is None else column.values[rows]
+            mask = op(values, self.number)
+            missing = column.missing
+            if missing is not None:
+                mask &= ~(missing if rows is None else missing[rows])
+            return mask
+        if column.kind == KIND_DATETIME:
+            try:
+                value = np.datetime64(self.value.replace('/', '-').replace(' ', 'T'))
+            except ValueError:
+                raise QueryError('无法解析日期：%s' % self.value)
+            values = column.values if rows is None else column.values[rows]
+            mask = op(values, value)
+            missing = column.missing
+            if missing is not None:
+                mask &= ~(missing if rows is None else missing[rows])
+            return mask
+        index = ColumnIndex.get(column)
+        if self.number is not None:
+            numbers = index.numbers()
+            mask = op(numbers if rows is None else numbers[rows], self.number)
+        elif self.op not in ('==', '!='):
+            # 文本列只能按数值比较大小，与matchValue一致
+            mask = np.zeros(len(column) if rows is None else len(rows), dtype=bool)
+        else:
+            # 字符串相等：先按小写字节查找，再逐个确认原始值
+            rows = np.arange(len(column)) if rows is None else rows
+            lengths = index.offsets[rows + 1] - index.offsets[rows]
+            needle = self.value.encode('utf-8')
+            candidates = rows[lengths == len(needle)]
+            equal = np.zeros(len(rows), dtype=bool)
+            if len(candidates):
+                hits = index.find(needle.lower(), candidates)
+                for r in candidates[hits]:
+                    equal[np.searchsorted(rows, r)] = column.get(r) == self.value
+            mask = equal if self.op == '==' else ~equal
+        return self._checkEdits(index, rows, mask)
+
+    def refines(self, previous) -> bool:
+        if self == previous:
+            return True
+        # 同一列上更严格的范围
+        if type(previous) is not CompareTerm or previous.column != self.column \
+                or self.number is None or previous.number is None:
+            return False
+        if self.op in ('>', '>=') and previous.op in ('>', '>='):
+            return self.number > previous.number or (self.number == previous.number and self.op == previous.op)
+        if self.op in ('<', '<=') and previous.op in ('<', '<='):
+            return self.number < previous.number or (self.number == previous.number and self.op == previous.op)
+        return False
+
+
+class Query(object):
+    """
+    查询语句：多个条件用&&连接
+    每个条件可以是：
+      列名 运算符 值     例如 price > 100、name == "张三"、city ~ ^北（列名也可以写作#1、#2……）
+      /正则表达式/       任意一列匹配
+      其他文本           任意一列包含该文本（ASCII字母不区分大小写）
+    """
+
+    def __init__(self, text, header=None):
+        """
+        :param text: 查询语句
+        :param header: 列头（用于按名称引用列），None: 只能用#n引用列
+        """
+        self.text = text
+        self.terms = [self.__parseTerm(term.strip(), header or [])
+                      for term in text.split(_TERM_SEPARATOR) if term.strip()]
+
+    @property
+    def empty(self) -> bool:
+        return not self.terms
+
+    def refines(self, previous) -> bool:
+        """
+        本查询的结果是否一定包含在previous的结果中（可以只扫描上次的结果）
+        :param previous: Query
+        :return: bool
+        """
+        if previous is None or previous.empty:
+            return False
+        # 上次的每个条件都被本次的某个条件细化
+        return all(any(term.refines(old) for term in self.terms) for old in previous.terms)
+
+    def evaluate(self, store, rows=None, canceled=None, count=None):
+        """
+        计算满足条件的行
+        :param store: ColumnStore
+        :param rows: 候选行（升序数组），None: 前count行
+        :param canceled: 返回True时提前结束的回调
+        :param count: rows为None时参与计算的行数，None: 当前行数
+        :return: 满足条件的行号（升序数组），被取消时为None
+        """
+        with Profiler.span('query.evaluate'):
+            return self.__evaluate(store, rows, canceled, count)
+
+    def __evaluate(self, store, rows, canceled, count):
+        count = store.rowCount if count is None else count
+        # 第一个条件扫描整列，之后的条件只检查剩下的行
+        for term in self.terms:
+            if canceled and canceled():
+                return None
+            if term.column is not None and term.column >= store.columnCount:
+                return np.zeros(0, dtype=np.int64)
+            if rows is None:
+                rows = np.flatnonzero(term.evaluate(store, None, count))
+            else:
+                rows = np.asarray(rows, dtype=np.int64)
+                rows = rows[term.evaluate(store, rows, count)]
+        return np.arange(count) if rows is None else rows
+
+    @staticmethod
+    def __parseTerm(text, header):
+        match = _COMPARE.match(text)
+        if match:
+            column = findColumn(match.group('column'), header)
+            if column is not None:
+                value = match.group('value').strip()
+                if len(value) >= 2 and value[0] == value[-1] == '"':
+                    value = value[1:-1]
+                if match.group('op') == '~':
+                    return RegexTerm(value, column)
+                return CompareTerm(text, column, match.group('op'), value)
+        if len(text) > 2 and text[0] == text[-1] == '/':
+            return RegexTerm(text[1:-1])
+        if len(text) >= 2 and text[0] == text[-1] == '"':
+            text = text[1:-1]
+        return SubstringTerm(text)
+
+
+def findColumn(name, header):
+    """
+    按名称查找列：列名（区分大小写优先）、带引号的列名或#n
+    :param name: 列的名称
+    :param header: 列头
+    :return: 列号，找不到时为None
+    """
+    if name.startswith('#') and name[1:].isdigit():
+        return int(name[1:]) - 1 if int(name[1:]) > 0 else None
+    if len(name) >= 2 and name[0] == name[-1] == '"':
+        name = name[1:-1]
+    if name in header:
+        return header.index(name)
+    lowered = [value.lower() for value in header]
+    if name.lower() in lowered:
+        return lowered.index(name.lower())
+    return None
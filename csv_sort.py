@@ -0,0 +1,385 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_sort.py
+@Desc    : 排序与分组：多列稳定排序、分组汇总只计算行的排列，不复制数据；超出内存的数据用临时文件外部归并排序（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import heapq
+import pickle
+import tempfile
+from itertools import islice
+from operator import itemgetter
+import numpy as np
+from csv_query import findColumn
+from csv_types import textRanks, parseNumbers, KIND_INT, KIND_FLOAT
+from csv_store import ColumnStore
+from csv_writer import RowWriter
+from csv_profile import Profiler
+
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+_RUN_ROWS = 200000          # 外部排序每个临时文件的行数，内存占用与之成正比
+_MAX_RUNS = 64              # 同时归并的临时文件数，超过时先合并为一个
+_PICKLE_ROWS = 10000        # 临时文件中每次序列化的行数
+
+
+class SortError(ValueError):
+    """
+    排序或分组的参数错误（例如找不到列）
+    """
+    pass
+
+
+def parseSortKeys(text, header=None):
+    """
+    解析排序条件，例如"price desc, name"：逗号分隔的列名或#n，后面可以跟asc/desc
+    :param text: 排序条件
+    :param header: 列头
+    :return: [(列号, 是否降序)]
+    """
+    keys = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, direction = item.rpartition(' ')
+        if direction.lower() not in ('asc', 'desc') or not name.strip():
+            name, direction = item, 'asc'
+        column = findColumn(name.strip(), header or [])
+        if column is None:
+            raise SortError('找不到列：%s' % name.strip())
+        keys.append((column, direction.lower() == 'desc'))
+    return keys
+
+
+def sortRows(store, keys, rows=None):
+    """
+    多列稳定排序：依次按各列比较，相等的行保持原来的顺序；空单元格无论升序降序总在最后
+    文本列中能解析为数值的值在前按数值比较，其余的值按字符串比较
+    :param store: ColumnStore
+    :param keys: [(列号, 是否降序)]
+    :param rows: 参与排序的数据行数组，None: 所有行
+    :return: 排序后的数据行数组
+    """
+    with Profiler.span('sort.rows'):
+        order = _lexOrder([_sortKey(store, column, rows, descending) for column, descending in keys], store, rows)
+        return order if rows is None else np.asarray(rows)[order]
+
+
+def _sortKey(store, column, rows, descending):
+    # (键数组, 空单元格掩码或None)，降序时键取反
+    key, missing = store.sortKeys(column)
+    if rows is not None:
+        key = key[rows]
+        missing = None if missing is None else missing[rows]
+    if descending:
+        if key.dtype.kind == 'M':
+            key = key.view(np.int64)
+        key = -key if key.dtype.kind in 'if' else -key.astype(np.int64)
+    return key, missing
+
+
+def _lexOrder(sortKeys, store, rows):
+    # 第一个键优先，lexsort以最后一个键为主键；空单元格掩码优先于键
+    lexKeys = []
+    for key, missing in reversed(sortKeys):
+        lexKeys.append(key)
+        if missing is not None:
+            lexKeys.append(missing)
+    if not lexKeys:
+        return np.arange(store.rowCount if rows is None else len(rows))
+    return np.lexsort(lexKeys)
+
+
+class Groups(object):
+    """
+    分组的结果：order中同一组的行连续排列（组内保持原来的顺序），starts为各组的起始位置
+    """
+
+    def __init__(self, columns, order, starts):
+        """
+        :param columns: 分组的列
+        :param order: 按分组排列的数据行数组
+        :param starts: 各组在order中的起始位置
+        """
+        self.columns = columns
+        self.order = order
+        self.starts = starts
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def counts(self):
+        """
+        各组的行数
+        :return: int64数组
+        """
+        return np.diff(np.append(self.starts, len(self.order)))
+
+
+def groupRows(store, columns, rows=None) -> Groups:
+    """
+    按列分组：先按分组的列升序排序，值相同的相邻行为一组（空单元格为一组，排在最后）
+    :param store: ColumnStore
+    :param columns: 分组的列
+    :param rows: 参与分组的数据行数组（例如筛选后可见的行），None: 所有行
+    :return: Groups
+    """
+    with Profiler.span('sort.group'):
+        sortKeys = [_sortKey(store, column, rows, False) for column in columns]
+        order = _lexOrder(sortKeys, store, rows)
+        boundary = np.zeros(len(order), dtype=bool)
+        boundary[:1] = True
+        for key, missing in sortKeys:
+            key = key[order]
+            changed = key[1:] != key[:-1]
+            if missing is not None:
+                missing = missing[order]
+                changed = np.where(missing[1:] & missing[:-1], False, changed | (missing[1:] != missing[:-1]))
+            boundary[1:] |= changed
+        if rows is not None:
+            order = np.asarray(rows)[order]
+    return Groups(list(columns), order, np.flatnonzero(boundary))
+
+
+def aggregate(store, groups, column, function):
+    """
+    对每组计算一列的汇总值：count为非空单元格数，其余按数值计算（不能解析为数值的值忽略）
+    :param store: ColumnStore
+    :param groups: Groups
+    :param column: 列号
+    :param function: AGGREGATES中的名称
+    :return: 数组，没有数值的组为NaN
+    """
+    if function not in AGGREGATES:
+        raise SortError('不支持的汇总：%s' % function)
+    if not len(groups):
+        return np.zeros(0)
+    starts = groups.starts
+    if function == 'count':
+        return np.add.reduceat((store.texts(column, groups.order) != '').astype(np.int64), starts)
+    values = _numbers(store, column, groups.order)
+    valid = ~np.isnan(values)
+    if function in ('sum', 'mean'):
+        sums = np.add.reduceat(np.where(valid, values, 0), starts)
+        if function == 'sum':
+            return sums
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(all='ignore'):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    reduce = np.fmin if function == 'min' else np.fmax
+    return reduce.reduceat(values, starts)
+
+
+def _numbers(store, column, rows):
+    # 整数、浮点数列直接取数值，其他列解析文本（每个不同的值只解析一次）；空单元格为NaN
+    typed = store.columns[column]
+    if typed.kind in (KIND_INT, KIND_FLOAT):
+        values = typed.values[rows].astype(np.float64)
+        if typed.missing is not None:
+            values[typed.missing[rows]] = np.nan
+        return values
+    unique, inverse = np.unique(store.texts(column, rows), return_inverse=True)
+    return parseNumbers(unique)[inverse.reshape(-1)]
+
+
+def groupTable(store, groups, aggregates):
+    """
+    分组汇总的结果表
+    :param store: ColumnStore
+    :param groups: Groups
+    :param aggregates: [(列号, 汇总名称)]
+    :return: (列头, 各列的字符串数组)
+    """
+    header = [store.headerValue(column) or '#%d' % (column + 1) for column in groups.columns] + ['rows']
+    first = groups.order[groups.starts]
+    columns = [store.texts(column, first) for column in groups.columns] + [groups.counts.astype(str)]
+    with Profiler.span('sort.aggregate'):
+        for column, function in aggregates:
+            header.append('%s(%s)' % (function, store.headerValue(column) or '#%d' % (column + 1)))
+            columns.append(_format(aggregate(store, groups, column, function)))
+    return header, columns
+
+
+def _format(values):
+    # 整数不带小数点，其余最多15位有效数字，NaN为空
+    if values.dtype.kind == 'i':
+        return values.astype(str)
+    finite = np.isfinite(values)
+    if np.all(~finite | ((values == np.round(values)) & (np.abs(values) < 2 ** 53))):
+        texts = np.where(finite, values, 0).astype(np.int64).astype(str)
+    else:
+        texts = np.char.mod('%.15g', values)
+    return np.where(np.isnan(values), '', texts)
+
+
+class _Descending(object):
+    """
+    降序比较的字符串（外部排序归并时使用）
+    """
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __lt__(self, other):
+        return other.text < self.text
+
+    def __eq__(self, other):
+        return self.text == other.text
+
+    def __reduce__(self):
+        return _Descending, (self.text,)
+
+
+class ExternalSorter(object):
+    """
+    外部归并排序：每积累runRows行在内存中排序后写入一个临时文件，最后多路归并输出
+    比较规则与sortRows对文本列的规则相同；排序是稳定的
+    """
+
+    def __init__(self, descending, runRows=_RUN_ROWS, tempDir=None):
+        """
+        :param descending: 各排序键是否降序
+        :param runRows: 每个临时文件的行数
+        :param tempDir: 临时文件的目录，None: 系统临时目录
+        """
+        self.__descending = list(descending)
+        self.__runRows = runRows
+        self.__tempDir = tempDir
+        self.__rows = []
+        self.__keys = [[] for _ in self.__descending]
+        self.__runs = []
+        self.rowCount = 0
+
+    def add(self, rows, keyTexts):
+        """
+        添加多行
+        :param rows: 行的列表
+        :param keyTexts: 每个排序键一个字符串数组，与rows一一对应
+        :return: None
+        """
+        self.__rows.extend(rows)
+        for keys, texts in zip(self.__keys, keyTexts):
+            keys.append(np.asarray(texts, dtype=str))
+        self.rowCount += len(rows)
+        if len(self.__rows) >= self.__runRows:
+            self.__flush()
+
+    def __iter__(self):
+        """
+        按顺序输出所有行，输出后删除临时文件
+        :return: 生成器
+        """
+        if not self.__runs:
+            # 只有一批，不需要临时文件
+            for _, row in self.__sortBuffer():
+                yield row
+            return
+        self.__flush()
+        try:
+            for _, row in heapq.merge(*[_readRun(run) for run in self.__runs], key=itemgetter(0)):
+                yield row
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        删除临时文件
+        :return: None
+        """
+        for run in self.__runs:
+            run.close()
+        self.__runs = []
+        self.__rows = []
+
+    def __sortBuffer(self):
+        # 在内存中排序积累的行，返回[(比较键, 行)]
+        keyTexts = [np.concatenate(keys) if keys else np.zeros(0, dtype=str) for keys in self.__keys]
+        rows = self.__rows
+        self.__rows = []
+        self.__keys = [[] for _ in self.__descending]
+        if not rows:
+            return []
+        lexKeys = []
+        parts = []
+        for texts, descending in zip(reversed(keyTexts), reversed(self.__descending)):
+            ranks = textRanks(texts)
+            lexKeys.extend([-ranks if descending else ranks, texts == ''])
+        order = np.lexsort(lexKeys) if lexKeys else np.arange(len(rows))
+        for texts, descending in zip(keyTexts, self.__descending):
+            texts = texts[order]
+            numbers = parseNumbers(texts)
+            isText = np.isnan(numbers)
+            numbers[isText] = 0
+            missing = texts == ''
+            if descending:
+                parts.extend([missing.tolist(), (~isText).tolist(), (-numbers).tolist(),
+                              [_Descending(text) for text in texts.tolist()]])
+            else:
+                parts.extend([missing.tolist(), isText.tolist(), numbers.tolist(), texts.tolist()])
+        return list(zip(zip(*parts) if parts else [()] * len(rows), [rows[i] for i in order.tolist()]))
+
+    def __flush(self):
+        with Profiler.span('sort.run'):
+            items = self.__sortBuffer()
+            if items:
+                self.__runs.append(self.__writeRun(items))
+            if len(self.__runs) > _MAX_RUNS:
+                # 临时文件过多时先合并为一个，避免同时打开过多的文件
+                runs = self.__runs
+                self.__runs = [self.__writeRun(heapq.merge(*[_readRun(run) for run in runs], key=itemgetter(0)))]
+                for run in runs:
+                    run.close()
+
+    def __writeRun(self, items):
+        run = tempfile.TemporaryFile(dir=self.__tempDir)
+        items = iter(items)
+        while True:
+            batch = list(islice(items, _PICKLE_ROWS))
+            if not batch:
+                break
+            pickle.dump(batch, run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+        return run
+
+
+def _readRun(run):
+    # 逐批读出临时文件中的行
+    while True:
+        try:
+            batch = pickle.load(run)
+        except EOFError:
+            return
+        yield from batch
+
+
+def writeSorted(store, f, keys, withHeader=False, tempDir=None):
+    """
+    按排序条件流式写出数据：完整加载在内存中的数据按排列逐行写出，延迟加载的数据用外部归并排序
+    :param store: ColumnStore/LazyStore
+    :param f: 二进制文件对象
+    :param keys: [(列号, 是否降序)]
+    :param withHeader: 是否写列头
+    :param tempDir: 外部排序临时文件的目录
+    :return: None
+    """
+    if isinstance(store, ColumnStore):
+        store.writeTo(f, withHeader, sortRows(store, keys))
+        return
+    writer = RowWriter(f, store.format)
+    if withHeader and store.header is not None:
+        writer.writerows([store.header])
+    sorter = ExternalSorter([descending for _, descending in keys], tempDir=tempDir)
+    rows = store.iterRows()
+    while True:
+        batch = list(islice(rows, _PICKLE_ROWS))
+        if not batch:
+            break
+        sorter.add(batch, [[row[column] if column < len(row) else '' for row in batch] for column, _ in keys])
+    writer.writerows(sorter)
@@ -0,0 +1,454 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_stats.py
+@Desc    : 列统计：计数、空值、不同值估算（HyperLogLog）、最值、平均值、分位数（t-digest）、常见值，
+           按列向量化计算，可以分段计算后合并，单元格修改时增量更新（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 23:10
+"""
+
+import heapq
+import numpy as np
+from csv_types import KIND_TEXT, KIND_INT, KIND_FLOAT, KIND_DATETIME, KIND_CATEGORY
+
+_NUMERIC_KINDS = (KIND_INT, KIND_FLOAT, KIND_DATETIME)
+_HASH_PRIME = np.uint64(0x100000001B3)                      # 多项式哈希的基数（奇数，模2^64可逆）
+_HASH_PRIME_INVERSE = np.uint64(pow(0x100000001B3, -1, 1 << 64))
+_HASH_CHUNK = 1 << 20                                       # 文本哈希每次处理的字节数
+_QUANTILES = (0.25, 0.5, 0.75)
+_TOP_COUNT = 5                                              # 显示的常见值个数
+
+
+def mix64(values):
+    """
+    splitmix64：把64位整数打散为均匀分布的哈希值
+    :param values: uint64数组
+    :return: uint64数组
+    """
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def textHashes(data, offsets):
+    """
+    每个值的64位哈希：模2^64的多项式哈希，用前缀和对所有值一次计算，不逐个创建字符串
+    :param data: 所有值的utf-8编码（uint8数组）
+    :param offsets: 第i个值为data[offsets[i]:offsets[i+1]]（int64数组）
+    :return: uint64数组
+    """
+    count = len(offsets) - 1
+    hashes = np.empty(count, dtype=np.uint64)
+    first = 0
+    while first < count:
+        # 按字节数分段，限制中间数组的大小
+        last = max(int(np.searchsorted(offsets, offsets[first] + _HASH_CHUNK, 'right')) - 1, first + 1)
+        last = min(last, count)
+        base = offsets[first]
+        chunk = data[base:offsets[last]].astype(np.uint64) + np.uint64(1)
+        powers = np.full(len(chunk) + 1, _HASH_PRIME, dtype=np.uint64)
+        powers[0] = 1
+        np.cumprod(powers, out=powers)
+        inverses = np.full(len(chunk) + 1, _HASH_PRIME_INVERSE, dtype=np.uint64)
+        inverses[0] = 1
+        np.cumprod(inverses, out=inverses)
+        prefix = np.zeros(len(chunk) + 1, dtype=np.uint64)
+        np.cumsum(chunk * powers[:-1], out=prefix[1:])
+        starts = offsets[first:last] - base
+        ends = offsets[first + 1:last + 1] - base
+        # 前缀和之差除以起点的幂（乘以逆元），与值在数据中的位置无关；再混入长度
+        hashes[first:last] = mix64((prefix[ends] - prefix[starts]) * inverses[starts]
+                                   ^ (ends - starts).astype(np.uint64))
+        first = last
+    return hashes
+
+
+def textHash(value) -> int:
+    """
+    单个字符串的哈希，与textHashes的结果一致
+    :param value: 字符串
+    :return: int
+    """
+    data = np.frombuffer(value.encode('utf-8'), dtype=np.uint8)
+    return int(textHashes(data, np.array([0, len(data)], dtype=np.int64))[0])
+
+
+class HyperLogLog(object):
+    """
+    不同值个数的估算：2^p个寄存器，标准误差约1.04/sqrt(2^p)
+    """
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes):
+        """
+        加入一批哈希值
+        :param hashes: uint64数组（已均匀分布）
+        :return: None
+        """
+        if not len(hashes):
+            return
+        bits = 64 - self.p
+        index = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # 剩余位中第一个1的位置：bits - 有效位数 + 1（转换为浮点数取指数，全0时有效位数为0）
+        ranks = (bits + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, ranks)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # 基数较小时用线性计数修正
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class TDigest(object):
+    """
+    分位数估算（合并式t-digest）：按k1尺度函数分组，每组跨度不超过1，质心数不超过compression
+    加入一批值时整体排序后用累计权重分组，完全向量化
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+
+    def add(self, values, weights=None):
+        """
+        加入一批值
+        :param values: 浮点数数组
+        :param weights: 权重数组，None: 都为1
+        :return: None
+        """
+        if not len(values):
+            return
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values)) if weights is None else weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+        # 每个点左端的分位数映射到k尺度，k的整数部分相同的点合并为一个质心
+        q = (cumulative - weights) / total
+        k = np.floor(self.compression * (np.arcsin(2 * q - 1) / np.pi + 0.5))
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def merge(self, other):
+        self.add(other.means, other.weights)
+
+    def quantile(self, q):
+        """
+        :param q: 0~1
+        :return: 估算的分位数，没有数据时为None
+        """
+        if not len(self.means):
+            return None
+        # 质心的权重中点之间线性插值
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), centers, self.means))
+
+
+class TopK(object):
+    """
+    常见值：每段精确计数后合并，只保留计数最多的capacity个（合并后的计数为下限的近似）
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.counts = {}        # {键: 次数}
+        self.labels = {}        # {键: 显示的值}（文本的键为哈希值）
+
+    def add(self, keys, counts, labels=None):
+        """
+        合并一段的计数
+        :param keys: 键数组
+        :param counts: 次数数组
+        :param labels: 键对应的显示值，None: 键本身
+        :return: None
+        """
+        if len(keys) > self.capacity:
+            top = np.argpartition(counts, -self.capacity)[-self.capacity:]
+            keys, counts = keys[top], counts[top]
+            labels = None if labels is None else [labels[i] for i in top]
+        for i, (key, count) in enumerate(zip(keys.tolist(), counts.tolist())):
+            self.counts[key] = self.counts.get(key, 0) + count
+            if labels is not None and key not in self.labels:
+                self.labels[key] = labels[i]
+        self.__truncate()
+
+    def increment(self, key, label, n=1):
+        count = self.counts.get(key, 0) + n
+        if count > 0:
+            self.counts[key] = count
+            self.labels.setdefault(key, label)
+        elif key in self.counts:
+            del self.counts[key]
+            self.labels.pop(key, None)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+            if key in other.labels:
+                self.labels.setdefault(key, other.labels[key])
+        self.__truncate()
+
+    def most(self, n):
+        """
+        :param n: 个数
+        :return: [(显示值, 次数)]
+        """
+        return [(self.labels.get(key, key), count)
+                for key, count in heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])]
+
+    def __truncate(self):
+        if len(self.counts) > 2 * self.capacity:
+            keep = heapq.nlargest(self.capacity, self.counts.items(), key=lambda item: item[1])
+            self.counts = dict(keep)
+            self.labels = {key: self.labels[key] for key in self.counts if key in self.labels}
+
+
+def snapshotColumn(column, start, stop):
+    """
+    复制一列中[start, stop)行的数据，在其他线程中统计（之后的修改和追加不影响副本）
+    :param column: StringColumn/TypedColumn
+    :param start: 起始行
+    :param stop: 结束行
+    :return: 副本
+    """
+    if column.kind == KIND_TEXT:
+        data, offsets, edits = column.encodedRange(start, stop)
+        return column.kind, (np.frombuffer(data, dtype=np.uint8), offsets, edits)
+    if column.kind == KIND_CATEGORY:
+        return column.kind, (column.values[start:stop].copy(), list(column.categories))
+    missing = column.missing
+    return column.kind, (column.values[start:stop].copy(), None if missing is None else missing[start:stop].copy())
+
+
+class ColumnStats(object):
+    """
+    一列的统计，可以分段计算后按行的顺序合并
+    数值列（整数、浮点数、日期时间）按float64统计最值、总和及分位数，日期时间为自1970年起的单位数
+    修改单元格时增量更新：计数、空值、总和、常见值精确；最值在删除的是当前最值时需要重新计算（refreshBounds）；
+    不同值和分位数只加入新值、不能删除旧值，修改较多后为近似值
+    """
+
+    def __init__(self, kind, start=0):
+        """
+        :param kind: 列类型
+        :param start: 统计的第一行
+        """
+        self.kind = kind
+        self.start = start
+        self.rows = start           # 统计到的行（不含）
+        self.nulls = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.boundsStale = False    # 删除了最值，最值需要重新计算
+        self.distinct = HyperLogLog()
+        self.digest = TDigest() if kind in _NUMERIC_KINDS else None
+        self.top = TopK()
+
+    @property
+    def numeric(self) -> bool:
+        return self.digest is not None
+
+    @property
+    def count(self) -> int:
+        # 非空单元格数
+        return self.rows - self.nulls
+
+    @classmethod
+    def compute(cls, snapshot, start):
+        """
+        统计snapshotColumn复制的数据（在工作线程中调用）
+        :param snapshot: snapshotColumn的结果
+        :param start: 副本的第一行在列中的行号
+        :return: ColumnStats
+        """
+        kind, data = snapshot
+        stats = cls(kind, start)
+        if kind == KIND_TEXT:
+            stats.__addText(*data)
+        elif kind == KIND_CATEGORY:
+            stats.__addCategories(*data)
+        else:
+            stats.__addNumbers(*data)
+        return stats
+
+    def __addNumbers(self, values, missing):
+        self.rows += len(values)
+        if missing is not None:
+            self.nulls += int(np.count_nonzero(missing))
+            values = values[~missing]
+        if not len(values):
+            return
+        self.distinct.add(mix64(values.view(np.uint64)))
+        keys, counts = np.unique(values, return_counts=True)
+        self.top.add(keys.view(np.int64) if self.kind == KIND_DATETIME else keys, counts)
+        numbers = values.astype(np.int64).astype(np.float64) if self.kind == KIND_DATETIME else values.astype(np.float64)
+        self.total += float(numbers.sum())
+        self.min, self.max = float(numbers.min()), float(numbers.max())
+        self.digest.add(numbers)
+
+    def __addCategories(self, codes, categories):
+        # 字典编码：按编码计数，再换算为字符串
+        self.rows += len(codes)
+        counts = np.bincount(codes, minlength=len(categories))
+        used = np.flatnonzero(counts)
+        encoded = [categories[code].encode('utf-8') for code in used]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        hashes = textHashes(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+        empty = [categories[code] == '' for code in used]
+        if any(empty):
+            self.nulls += int(counts[used[empty.index(True)]])
+        keep = ~np.array(empty, dtype=bool)
+        self.distinct.add(hashes[keep])
+        self.top.add(hashes[keep], counts[used][keep], [categories[code] for code in used[keep]])
+
+    def __addText(self, data, offsets, edits):
+        self.rows += len(offsets) - 1
+        hashes = textHashes(data, offsets)
+        empty = offsets[1:] == offsets[:-1]
+        # 编辑过的单元格按编辑后的值统计
+        for row, value in edits.items():
+            hashes[row] = textHash(value)
+            empty[row] = value == ''
+        self.nulls += int(np.count_nonzero(empty))
+        hashes = hashes[~empty]
+        rows = np.flatnonzero(~empty)
+        self.distinct.add(hashes)
+        keys, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+        if len(keys) > self.top.capacity:
+            top = np.argpartition(counts, -self.top.capacity)[-self.top.capacity:]
+            keys, first, counts = keys[top], first[top], counts[top]
+        labels = []
+        for row in rows[first].tolist():
+            labels.append(edits[row] if row in edits else
+                          bytes(data[offsets[row]:offsets[row + 1]]).decode('utf-8', errors='replace'))
+        self.top.add(keys, counts, labels)
+
+    def merge(self, other):
+        """
+        合并紧接在后面的一段的统计
+        :param other: ColumnStats（other.start == self.rows）
+        :return: None
+        """
+        self.rows = other.rows
+        self.nulls += other.nulls
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.distinct.merge(other.distinct)
+        if self.numeric:
+            self.digest.merge(other.digest)
+        self.top.merge(other.top)
+
+    def edit(self, column, old, new):
+        """
+        单元格从old改为new后增量更新
+        :param column: 修改后的列（用于解析数值）
+        :param old: 原来的值
+        :param new: 新的值
+        :return: None
+        """
+        for value, sign in ((old, -1), (new, 1)):
+            if value == '':
+                self.nulls -= sign
+                continue
+            if not self.numeric:
+                key = textHash(value)
+                self.top.increment(key, value, sign)
+                if sign > 0:
+                    self.distinct.add(np.array([key], dtype=np.uint64))
+                continue
+            parsed = column.parse(np.array([value]), column.fmt)
+            if parsed is None:
+                self.boundsStale = True
+                continue
+            key = parsed.view(np.int64)[0] if self.kind == KIND_DATETIME else parsed[0]
+            number = float(key)
+            self.top.increment(key.item(), None, sign)
+            self.total += sign * number
+            if sign < 0:
+                # 删除的是当前的最值时，最值需要重新计算
+                if number == self.min or number == self.max:
+                    self.boundsStale = True
+                continue
+            self.distinct.add(mix64(parsed.view(np.uint64)))
+            self.digest.add(np.array([number]))
+            if self.min is None or number < self.min:
+                self.min = number
+            if self.max is None or number > self.max:
+                self.max = number
+
+    def refreshBounds(self, column):
+        """
+        重新计算最值（只需要对数值数组做一次向量化的min/max）
+        :param column: TypedColumn
+        :return: None
+        """
+        self.boundsStale = False
+        values = column.values[:self.rows]
+        missing = column.missing
+        if missing is not None:
+            values = values[~missing[:self.rows]]
+        if not len(values):
+            self.min = self.max = None
+            return
+        if self.kind == KIND_DATETIME:
+            values = values.view(np.int64)
+        self.min, self.max = float(values.min()), float(values.max())
+
+    def summary(self, column):
+        """
+        显示用的统计结果
+        :param column: 当前的列（用于按列的格式显示数值）
+        :return: {名称: 字符串}
+        """
+        result = {
+            'kind': self.kind,
+            'count': str(self.count),
+            'nulls': str(self.nulls),
+            'distinct': '~%d' % min(self.distinct.estimate(), self.count),
+        }
+        if self.numeric and self.count:
+            result['min'] = self.__format(column, self.min, True)
+            result['max'] = self.__format(column, self.max, True)
+            result['mean'] = self.__format(column, self.total / self.count)
+            for q in _QUANTILES:
+                result['p%d' % (q * 100)] = self.__format(column, self.digest.quantile(q))
+        top = []
+        for key, count in self.top.most(_TOP_COUNT):
+            label = self.__format(column, key, True) if self.numeric else key
+            top.append('%s (%d)' % (label, count))
+        result['top'] = ', '.join(top)
+        return result
+
+    def __format(self, column, value, exact=False):
+        # 最值和常见值按列的格式显示；平均值、分位数为近似值，保留6位有效数字
+        if value is None:
+            return ''
+        if self.kind == KIND_DATETIME:
+            return str(column.format(np.array([round(value)], dtype=np.int64).view(column.values.dtype)[0]))
+        if exact and self.kind == KIND_INT:
+            return str(int(value))
+        if exact:
+            return column.format(np.float64(value))
+        return '%.6g' % value
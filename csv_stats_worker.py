@@ -0,0 +1,65 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_stats_worker.py
+@Desc    : 后台线程池计算列统计
+@Author  : qdu
+@Date    : 2026/10/17 23:20
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QThread, Signal
+from csv_stats import ColumnStats
+from csv_profile import Profiler
+
+_pool = None        # 所有编辑器共用的线程池（NumPy的排序、累加等运算释放GIL，各段可以并行）
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix='stats')
+    return _pool
+
+
+class StatsWorker(QThread):
+    """
+    把各列新增行的副本分段交给线程池统计，按行的顺序合并后通过信号把结果交给界面线程
+    """
+
+    # 信号
+    resultReady = Signal(object, object)    # 统计的数据（ColumnStore）, {列号: ColumnStats}
+
+    def __init__(self, store, parts, parent=None):
+        """
+        :param store: 统计的数据（只用于界面线程判断结果是否过期，工作线程不访问）
+        :param parts: [(列号, 起始行, snapshotColumn的副本)]，同一列的各段按行的顺序排列
+        :param parent:
+        """
+        super().__init__(parent)
+        self.__store = store
+        self.__parts = parts
+        self.__canceled = False
+
+    def cancel(self):
+        """
+        取消计算，已提交的分段计算完成后丢弃结果
+        :return: None
+        """
+        self.__canceled = True
+
+    def run(self):
+        with Profiler.span('stats.compute'):
+            futures = [(column, _executor().submit(ColumnStats.compute, snapshot, start))
+                       for column, start, snapshot in self.__parts]
+            result = {}
+            for column, future in futures:
+                stats = future.result()
+                if column in result:
+                    result[column].merge(stats)
+                else:
+                    result[column] = stats
+        if not self.__canceled:
+            self.resultReady.emit(self.__store, result)
@@ -0,0 +1,431 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_store.py
+@Desc    : 按列存储的csv数据（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 09:30
+"""
+
+from array import array
+from itertools import accumulate, islice
+import numpy as np
+from csv_writer import RowWriter
+from csv_types import inferColumn, textRanks, KIND_TEXT
+
+_GATHER_LIMIT = 64 * 1024 * 1024     # 批量读取文本时按定长数组收集的最大字节数
+
+
+class ColumnBatch(object):
+    """
+    按列编码好的一批行：每列为推断出类型的TypedColumn，或(utf-8字节串, 每个值的字节长度数组)
+    Parquet/Arrow文件的批次由csv_arrow直接按列转换得到
+    可以在进程之间传递，追加到ColumnStore时不需要再逐个单元格编码
+    """
+
+    __slots__ = ('rowCount', 'columns')
+
+    def __init__(self, rowCount, columns):
+        self.rowCount = rowCount
+        self.columns = columns
+
+    @classmethod
+    def fromRows(cls, rows):
+        """
+        把行转换为列编码，短行用空字符串补齐
+        类型推断在这里完成（解析线程/子进程中），界面线程只需拼接数组
+        :param rows: 二维列表
+        :return: ColumnBatch
+        """
+        width = max(map(len, rows), default=0)
+        if rows and min(map(len, rows)) == width:
+            columnValues = list(map(list, zip(*rows)))
+        else:
+            columnValues = [[row[c] if c < len(row) else '' for row in rows] for c in range(width)]
+        columns = []
+        for values in columnValues:
+            typed = inferColumn(values)
+            if typed is not None:
+                columns.append(typed)
+                continue
+            encoded = [value.encode('utf-8') for value in values]
+            columns.append((b''.join(encoded), array('Q', map(len, encoded))))
+        return cls(len(rows), columns)
+
+
+class StringColumn(object):
+    """
+    紧凑的字符串列
+    所有单元格以utf-8编码连续存放在一个bytearray中，用偏移数组索引，
+    不为每个单元格创建Python对象；编辑过的单元格保存在稀疏字典中
+    """
+
+    kind = KIND_TEXT
+
+    def __init__(self, rowCount=0):
+        self.__data = bytearray()
+        self.__offsets = array('Q', bytes(8 * (rowCount + 1)))  # 第i行的值为data[offsets[i]:offsets[i+1]]
+        self.__edits = {}                                       # 编辑过的单元格 {row: str}
+        self.version = 0                                        # 每次修改/追加后递增，用于判断检索索引是否过期
+
+    @classmethod
+    def fromParts(cls, data, offsets, edits):
+        """
+        由buffers()的内容重建（读取磁盘缓存时使用）
+        数据不复制：可以直接使用映射自缓存文件的数组，第一次追加时才复制到内存
+        :param data: utf-8字节（uint8数组）
+        :param offsets: 偏移数组（uint64数组）
+        :param edits: 编辑过的单元格{row: str}
+        :return: StringColumn
+        """
+        column = cls()
+        column.__data = memoryview(data)
+        column.__offsets = memoryview(offsets)
+        column.__edits = dict(edits)
+        return column
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    def get(self, row) -> str:
+        """
+        获取单元格的值
+        :param row: 行号
+        :return: 字符串
+        """
+        if row in self.__edits:
+            return self.__edits[row]
+        return str(self.__data[self.__offsets[row]:self.__offsets[row + 1]], 'utf-8')
+
+    def set(self, row, value):
+        """
+        修改单元格的值
+        :param row: 行号
+        :param value: 字符串
+        :return: True（任何值都可以保存）
+        """
+        self.__edits[row] = value
+        self.version += 1
+        return True
+
+    def setMany(self, rows, values):
+        """
+        批量修改
+        :param rows: 行号数组
+        :param values: 字符串数组
+        :return: True
+        """
+        self.__edits.update(zip(rows.tolist(), values.tolist()))
+        self.version += 1
+        return True
+
+    def formatRows(self, rows):
+        """
+        指定行的值：ASCII文本按字节整体收集为定长数组后一次转换，其他情况逐个解码
+        :param rows: 行号数组
+        :return: 字符串的NumPy数组
+        """
+        offsets = np.frombuffer(self.__offsets, dtype=np.uint64)
+        starts = offsets[rows].astype(np.int64)
+        lengths = offsets[rows + 1].astype(np.int64) - starts
+        width = max(int(lengths.max()) if len(rows) else 0, 1)
+        if width * len(rows) > _GATHER_LIMIT:
+            return np.array([self.get(row) for row in rows.tolist()], dtype=str)
+        positions = np.arange(width)
+        mask = positions < lengths[:, None]
+        values = np.frombuffer(self.__data, dtype=np.uint8)[(starts[:, None] + positions)[mask]]
+        # 定长字节串会去掉末尾的\0，含\0或非ASCII字符时逐个解码
+        if len(values) and (values.max() >= 128 or not values.min()):
+            return np.array([self.get(row) for row in rows.tolist()], dtype=str)
+        gathered = np.zeros((len(rows), width), dtype=np.uint8)
+        gathered[mask] = values
+        texts = gathered.view('S%d' % width).ravel().astype('U%d' % width)
+        if self.__edits:
+            hits = np.flatnonzero(np.isin(rows, np.fromiter(self.__edits, dtype=np.int64, count=len(self.__edits))))
+            if len(hits):
+                edited = [self.__edits[row] for row in rows[hits].tolist()]
+                texts = texts.astype('U%d' % max(width, max(map(len, edited))))
+                texts[hits] = edited
+        return texts
+
+    def extend(self, other) -> bool:
+        """
+        追加另一列（类型列退回为字符串时使用）
+        :param other: StringColumn/TypedColumn
+        :return: True
+        """
+        encoded = [other.get(row).encode('utf-8') for row in range(len(other))]
+        self.extendEncoded(b''.join(encoded), map(len, encoded))
+        return True
+
+    def extendEncoded(self, data, lengths):
+        """
+        追加已经编码的值
+        :param data: 所有值的utf-8编码拼接成的字节串
+        :param lengths: 每个值的字节长度（可迭代对象或uint64数组）
+        :return: None
+        """
+        self.__own()
+        self.__data += data
+        self.version += 1
+        if isinstance(lengths, np.ndarray):
+            self.__offsets.frombytes((np.cumsum(lengths, dtype=np.uint64) + np.uint64(self.__offsets[-1])).tobytes())
+            return
+        # accumulate的第一个值为initial本身，已经在偏移数组中，跳过
+        self.__offsets.extend(islice(accumulate(lengths, initial=self.__offsets[-1]), 1, None))
+
+    def extendEmpty(self, count):
+        """
+        追加count个空值
+        :param count: 个数
+        :return: True
+        """
+        self.__own()
+        self.__offsets.extend([self.__offsets[-1]] * count)
+        self.version += 1
+        return True
+
+    def __own(self):
+        # 映射自缓存文件的数据是只读视图，追加前复制为可以增长的数组
+        if isinstance(self.__data, memoryview):
+            self.__data = bytearray(self.__data)
+            self.__offsets = array('Q', self.__offsets.tobytes())
+
+    def snapshot(self):
+        """
+        当前数据的副本，用于在其他线程中建立检索索引（之后的追加/修改不影响副本）
+        :return: (utf-8字节串, 偏移数组, 编辑过的单元格{row: str})
+        """
+        return bytes(self.__data), np.array(self.__offsets, dtype=np.int64), dict(self.__edits)
+
+    def encodedRange(self, start, stop):
+        """
+        [start, stop)行数据的副本，用于在其他线程中统计
+        :param start: 起始行
+        :param stop: 结束行
+        :return: (utf-8字节串, 相对于副本的偏移数组, 范围内编辑过的单元格{相对行号: str})
+        """
+        offsets = np.array(self.__offsets[start:stop + 1], dtype=np.int64)
+        data = bytes(self.__data[offsets[0]:offsets[-1]])
+        edits = {row - start: value for row, value in self.__edits.items() if start <= row < stop}
+        return data, offsets - offsets[0], edits
+
+    def buffers(self):
+        """
+        不复制的数据视图，用于写入磁盘缓存（持有视图期间不能追加数据）
+        :return: (uint8数组, uint64偏移数组, 编辑过的单元格{row: str})
+        """
+        return np.frombuffer(self.__data, dtype=np.uint8), np.frombuffer(self.__offsets, dtype=np.uint64), self.__edits
+
+    def sortKeys(self):
+        """
+        排序用的键：能解析为数值的值在前按数值排序，其余的值按字符串排序
+        :return: (名次数组, 空单元格掩码)
+        """
+        texts = self.formatRows(np.arange(len(self)))
+        return textRanks(texts), texts == ''
+
+    def nbytes(self) -> int:
+        """
+        占用的内存（估算）
+        :return: 字节数
+        """
+        return len(self.__data) + self.__offsets.itemsize * len(self.__offsets) + 64 * len(self.__edits)
+
+
+class ColumnStore(object):
+    """
+    按列存储的表格数据
+    短行用空字符串补齐，长行会自动增加列
+    """
+
+    def __init__(self, fileFormat=None):
+        """
+        :param fileFormat: 源文件的格式（FileFormat，保存时沿用），None: utf-8逗号分隔
+        """
+        self.header = None      # 列头（None: 没有列头）
+        self.columns = []       # 列数据 [StringColumn]
+        self.format = fileFormat
+        self.__rowCount = 0
+
+    @classmethod
+    def fromColumns(cls, columns, rowCount, header=None, fileFormat=None):
+        """
+        由已有的列构建（读取磁盘缓存时使用）
+        :param columns: 列数据，长度都为rowCount
+        :param rowCount: 行数
+        :param header: 列头
+        :param fileFormat: 源文件的格式
+        :return: ColumnStore
+        """
+        store = cls(fileFormat)
+        store.header = None if header is None else list(header)
+        store.columns = list(columns)
+        store.__rowCount = rowCount
+        return store
+
+    @property
+    def rowCount(self) -> int:
+        return self.__rowCount
+
+    @property
+    def columnCount(self) -> int:
+        return len(self.columns)
+
+    def setHeader(self, header):
+        """
+        设置列头
+        :param header: 列表
+        :return: None
+        """
+        self.header = list(header)
+        self.ensureColumns(len(self.header))
+
+    def headerValue(self, column):
+        """
+        获取列头
+        :param column: 列号
+        :return: 字符串，没有该列头则返回None
+        """
+        if self.header and column < len(self.header):
+            return self.header[column]
+        return None
+
+    def appendRows(self, rows):
+        """
+        追加多行数据
+        :param rows: 二维列表
+        :return: None
+        """
+        if rows:
+            self.appendBatch(ColumnBatch.fromRows(rows))
+
+    def appendBatch(self, batch):
+        """
+        追加一批按列编码好的行
+        空列直接采用这一批推断出的类型；之后类型或格式不一致的批次使该列退回为字符串列
+        :param batch: ColumnBatch
+        :return: None
+        """
+        self.ensureColumns(len(batch.columns))
+        for c, column in enumerate(self.columns):
+            part = batch.columns[c] if c < len(batch.columns) else None
+            if part is None:
+                if not column.extendEmpty(batch.rowCount):
+                    self.__toText(c).extendEmpty(batch.rowCount)
+            elif isinstance(part, tuple):
+                self.__toText(c).extendEncoded(*part)
+            elif len(column) == 0:
+                self.columns[c] = part
+            elif not column.extend(part):
+                self.__toText(c).extend(part)
+        self.__rowCount += batch.rowCount
+
+    def value(self, row, column) -> str:
+        return self.columns[column].get(row)
+
+    def setValue(self, row, column, value):
+        # 值与列的类型不符时该列退回为字符串列
+        if not self.columns[column].set(row, value):
+            self.__toText(column).set(row, value)
+
+    def texts(self, column, rows):
+        """
+        一列中指定行的值
+        :param column: 列号
+        :param rows: 行号数组
+        :return: 字符串的NumPy数组
+        """
+        return self.columns[column].formatRows(rows)
+
+    def setValues(self, column, rows, values):
+        """
+        批量修改一列中的多个单元格，值与列的类型不符时该列退回为字符串列
+        :param column: 列号
+        :param rows: 行号数组（不重复）
+        :param values: 字符串数组
+        :return: None
+        """
+        if not self.columns[column].setMany(rows, values):
+            self.__toText(column).setMany(rows, values)
+
+    def appendColumn(self, name=None):
+        """
+        在最后追加一个空列
+        :param name: 列头，没有列头时忽略
+        :return: 新列的列号
+        """
+        if self.header is not None:
+            self.header += [''] * (len(self.columns) - len(self.header)) + [name or '']
+        self.columns.append(StringColumn(self.__rowCount))
+        return len(self.columns) - 1
+
+    def columnKind(self, column) -> str:
+        """
+        列的存储类型
+        :param column: 列号
+        :return: KIND_TEXT/KIND_INT/...
+        """
+        return self.columns[column].kind
+
+    def sortKeys(self, column):
+        """
+        排序用的键
+        :param column: 列号
+        :return: (键数组, 空单元格掩码或None)
+        """
+        return self.columns[column].sortKeys()
+
+    def row(self, row):
+        """
+        获取一行数据
+        :param row: 行号
+        :return: 列表
+        """
+        return [column.get(row) for column in self.columns]
+
+    def iterRows(self):
+        """
+        逐行遍历
+        :return: 生成器
+        """
+        for r in range(self.__rowCount):
+            yield self.row(r)
+
+    def writeTo(self, f, withHeader=False, rows=None):
+        """
+        按源文件的格式逐行写入二进制文件
+        :param f: 二进制文件对象
+        :param withHeader: 是否写列头（没有列头时不写）
+        :param rows: 按顺序写出的数据行数组（例如排序后的排列），None: 所有行
+        :return: None
+        """
+        writer = RowWriter(f, self.format)
+        if withHeader and self.header is not None:
+            writer.writerows([self.header])
+        writer.writerows(self.iterRows() if rows is None else map(self.row, rows.tolist()))
+
+    def nbytes(self) -> int:
+        return sum(column.nbytes() for column in self.columns)
+
+    def close(self):
+        pass
+
+    def ensureColumns(self, count):
+        """
+        列数不足时追加新列，新列中已有的行为空字符串
+        :param count: 最少列数
+        :return: None
+        """
+        while len(self.columns) < count:
+            self.columns.append(StringColumn(self.__rowCount))
+
+    def __toText(self, column):
+        # 把类型列转换为字符串列
+        current = self.columns[column]
+        if current.kind != KIND_TEXT:
+            text = StringColumn()
+            text.extend(current)
+            self.columns[column] = text
+        return self.columns[column]
@@ -0,0 +1,486 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_types.py
+@Desc    : 列类型推断及NumPy类型列：整数、浮点数、日期时间、字典编码的字符串（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 16:40
+"""
+
+import numpy as np
+
+# 列类型
+KIND_TEXT = 'text'
+KIND_INT = 'int64'
+KIND_FLOAT = 'float64'
+KIND_DATETIME = 'datetime'
+KIND_CATEGORY = 'category'
+
+_MAX_VALUE_LENGTH = 32          # 数值/日期的最大字符数，更长的值不尝试转换
+_MAX_CATEGORIES = 1 << 16       # 字典编码的最大不同值个数
+_MIN_CATEGORIES = 16            # 不同值不超过该个数时总是使用字典编码
+_SAMPLE_SIZE = 256              # 先用开头的少量值排除不可能的类型，避免对整列做失败的转换
+_POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+
+class TypedColumn(object):
+    """
+    NumPy数组存放的类型列，空单元格记录在missing掩码中
+    只有能按原样格式化回原文本的列才会转换为类型列，保存时内容不变；
+    编辑的值无法转换时set返回False，由ColumnStore把该列退回为字符串列
+    """
+
+    kind = None
+
+    def __init__(self, values, missing=None, fmt=None):
+        """
+        :param values: NumPy数组
+        :param missing: 空单元格掩码（bool数组），None: 没有空单元格
+        :param fmt: 格式化参数（各子类自定义）
+        """
+        self.fmt = fmt
+        self.version = 0        # 每次修改/追加后递增，用于判断检索索引是否过期
+        self.__count = len(values)
+        self.__values = values
+        self.__missing = missing
+
+    def __len__(self):
+        return self.__count
+
+    @property
+    def values(self):
+        return self.__values[:self.__count]
+
+    @property
+    def missing(self):
+        return None if self.__missing is None else self.__missing[:self.__count]
+
+    def get(self, row) -> str:
+        if self.__missing is not None and self.__missing[row]:
+            return ''
+        return self.format(self.__values[row])
+
+    def set(self, row, value) -> bool:
+        """
+        修改单元格的值
+        :param row: 行号
+        :param value: 字符串
+        :return: 值能否以该类型保存
+        """
+        if value == '':
+            self.__ensureMissing()
+            self.__missing[row] = True
+            self.version += 1
+            return True
+        parsed = self.parse(np.array([value]), self.fmt)
+        if parsed is None:
+            return False
+        self.version += 1
+        self.__values[row] = parsed[0]
+        if self.__missing is not None:
+            self.__missing[row] = False
+        return True
+
+    def setMany(self, rows, values) -> bool:
+        """
+        批量修改（向量化解析）
+        :param rows: 行号数组（不重复）
+        :param values: 字符串数组
+        :return: 值能否都以该类型保存（不能时不修改数据）
+        """
+        empty = values == ''
+        parsed = None
+        if not empty.all():
+            parsed = self.parse(values[~empty], self.fmt)
+            if parsed is None:
+                return False
+        if empty.any():
+            self.__ensureMissing()
+            self.__missing[rows[empty]] = True
+        if parsed is not None:
+            self.__values[rows[~empty]] = parsed
+            if self.__missing is not None:
+                self.__missing[rows[~empty]] = False
+        self.version += 1
+        return True
+
+    def extend(self, other) -> bool:
+        """
+        追加同类型、同格式的列
+        :param other: TypedColumn
+        :return: 是否追加成功（类型不同时返回False，不修改数据）
+        """
+        if type(other) is not type(self) or other.fmt != self.fmt:
+            return False
+        values = self.convert(other)
+        if values is None:
+            return False
+        first = self.__count
+        self.__reserve(first + len(other))
+        self.__values[first:first + len(other)] = values
+        if other.missing is not None:
+            self.__ensureMissing()
+        if self.__missing is not None:
+            self.__missing[first:first + len(other)] = False if other.missing is None else other.missing
+        self.__count += len(other)
+        self.version += 1
+        return True
+
+    def extendEmpty(self, count) -> bool:
+        first = self.__count
+        self.__reserve(first + count)
+        self.__ensureMissing()
+        self.__missing[first:first + count] = True
+        self.__count += count
+        self.version += 1
+        return True
+
+    def sortKeys(self):
+        """
+        排序用的键
+        :return: (键数组, 空单元格掩码或None)
+        """
+        return self.values, self.missing
+
+    def formatAll(self):
+        """
+        所有单元格的文本（向量化格式化，用于建立检索索引）
+        :return: 字符串的NumPy数组
+        """
+        texts = self.formatArray(self.values)
+        if self.missing is not None:
+            texts = np.where(self.missing, '', texts)
+        return texts
+
+    def formatRows(self, rows):
+        """
+        指定行的文本（向量化格式化，用于批量修改）
+        :param rows: 行号数组
+        :return: 字符串的NumPy数组
+        """
+        texts = self.formatArray(self.values[rows])
+        if self.missing is not None:
+            texts = np.where(self.missing[rows], '', texts)
+        return texts
+
+    def formatArray(self, values):
+        return values.astype(str)
+
+    def nbytes(self) -> int:
+        return self.__values.nbytes + (0 if self.__missing is None else self.__missing.nbytes)
+
+    def convert(self, other):
+        # 把同类型列的值转换为本列的表示（字典编码需要重新映射编码）
+        return other.values
+
+    def format(self, value) -> str:
+        raise NotImplementedError
+
+    @classmethod
+    def parse(cls, texts, fmt):
+        """
+        把字符串数组转换为该类型的值，并校验能否按fmt格式化回原文本
+        :param texts: 非空字符串的NumPy数组
+        :param fmt: 格式化参数
+        :return: 值数组，不能转换时为None
+        """
+        raise NotImplementedError
+
+    def __reserve(self, count):
+        # 容量按倍数增长，追加的摊还代价为O(1)
+        if count <= len(self.__values):
+            return
+        capacity = max(count, 2 * len(self.__values), 1024)
+        values = np.empty(capacity, dtype=self.__values.dtype)
+        values[:self.__count] = self.__values[:self.__count]
+        self.__values = values
+        if self.__missing is not None:
+            missing = np.zeros(capacity, dtype=bool)
+            missing[:self.__count] = self.__missing[:self.__count]
+            self.__missing = missing
+
+    def __ensureMissing(self):
+        if self.__missing is None:
+            self.__missing = np.zeros(len(self.__values), dtype=bool)
+
+
+class IntColumn(TypedColumn):
+    kind = KIND_INT
+
+    def format(self, value) -> str:
+        return str(int(value))
+
+    @classmethod
+    def parse(cls, texts, fmt):
+        try:
+            values = texts.astype(np.int64)
+        except (ValueError, OverflowError):
+            return None
+        # 排除前导零、正号、空格等不能原样写回的写法
+        if not np.array_equal(_canonicalLength(values), np.strings.str_len(texts)):
+            return None
+        return values
+
+
+class FloatColumn(TypedColumn):
+    """
+    fmt: None: 最短表示（repr）；整数: 固定的小数位数（例如金额1.50）
+    """
+
+    kind = KIND_FLOAT
+
+    def format(self, value) -> str:
+        if self.fmt is None:
+            return str(value)
+        return '%.*f' % (self.fmt, value)
+
+    def formatArray(self, values):
+        if self.fmt is None:
+            return values.astype(str)
+        return np.char.mod('%%.%df' % self.fmt, values)
+
+    @classmethod
+    def parse(cls, texts, fmt):
+        if fmt is None:
+            try:
+                values = texts.astype(np.float64)
+            except (ValueError, OverflowError):
+                return None
+            if not np.array_equal(values.astype(str), texts):
+                return None
+            return values
+        # 固定小数位数：去掉小数点后按整数解析，整数除以10^fmt与直接解析的结果相同（都是正确舍入）
+        # 小数点位置和总长度一致才能按'%.nf'原样写回
+        if not 0 < fmt <= 15 or not (np.strings.find(texts, '.') == np.strings.str_len(texts) - fmt - 1).all():
+            return None
+        try:
+            scaled = np.strings.replace(texts, '.', '', 1).astype(np.int64)
+        except (ValueError, OverflowError):
+            return None
+        if (np.abs(scaled) >= 10 ** 15).any():
+            return None
+        lengths = np.maximum(_canonicalLength(np.abs(scaled)), fmt + 1) + 1 + (scaled < 0)
+        if not np.array_equal(lengths, np.strings.str_len(texts)):
+            return None
+        return scaled / 10.0 ** fmt
+
+
+class DateTimeColumn(TypedColumn):
+    """
+    fmt: (单位'D'/'s', 日期分隔符'-'/'/', 日期与时间的分隔符'T'/' '/None)
+    """
+
+    kind = KIND_DATETIME
+
+    def format(self, value) -> str:
+        unit, dateSep, timeSep = self.fmt
+        text = np.datetime_as_string(value, unit=unit)
+        if timeSep == ' ':
+            text = text.replace('T', ' ')
+        if dateSep == '/':
+            text = text.replace('-', '/')
+        return text
+
+    def formatArray(self, values):
+        unit, dateSep, timeSep = self.fmt
+        texts = np.datetime_as_string(values, unit=unit)
+        if timeSep == ' ':
+            texts = np.strings.replace(texts, 'T', ' ')
+        if dateSep == '/':
+            texts = np.strings.replace(texts, '-', '/')
+        return texts
+
+    @classmethod
+    def parse(cls, texts, fmt):
+        unit, dateSep, timeSep = fmt
+        iso = texts
+        if dateSep == '/':
+            iso = np.char.replace(iso, '/', '-')
+        if timeSep == ' ':
+            iso = np.char.replace(iso, ' ', 'T')
+        try:
+            values = iso.astype('datetime64[%s]' % unit)
+        except (ValueError, OverflowError):
+            return None
+        if not np.array_equal(np.datetime_as_string(values, unit=unit), iso):
+            return None
+        return values
+
+    @staticmethod
+    def detectFormat(text):
+        """
+        从一个值判断日期时间的写法：YYYY-MM-DD、YYYY/MM/DD，可带HH:MM:SS
+        :param text: 字符串
+        :return: fmt，不是日期时返回None
+        """
+        if len(text) not in (10, 19) or text[4] not in '-/' or text[7] != text[4]:
+            return None
+        if len(text) == 10:
+            return 'D', text[4], None
+        if text[10] in 'T ':
+            return 's', text[4], text[10]
+        return None
+
+
+class CategoryColumn(TypedColumn):
+    """
+    字典编码的字符串列：每个单元格只存放uint32编码，不同的值只保存一份
+    空字符串作为普通的值编码
+    """
+
+    kind = KIND_CATEGORY
+
+    def __init__(self, values, categories):
+        """
+        :param values: 编码数组
+        :param categories: 编码对应的字符串列表
+        """
+        super().__init__(values)
+        self.categories = categories
+        self.__codes = {category: code for code, category in enumerate(categories)}
+
+    def get(self, row) -> str:
+        return self.categories[self.values[row]]
+
+    def set(self, row, value) -> bool:
+        code = self.__code(value)
+        if code is None:
+            return False
+        self.values[row] = code
+        self.version += 1
+        return True
+
+    def setMany(self, rows, values) -> bool:
+        # 每个不同的值只查找一次编码
+        unique, inverse = np.unique(values, return_inverse=True)
+        codes = [self.__code(value) for value in unique.tolist()]
+        if None in codes:
+            return False
+        self.values[rows] = np.array(codes, dtype=np.uint32)[inverse]
+        self.version += 1
+        return True
+
+    def extendEmpty(self, count) -> bool:
+        return self.extend(CategoryColumn(np.zeros(count, dtype=np.uint32), ['']))
+
+    def formatAll(self):
+        return np.array(self.categories)[self.values]
+
+    def formatRows(self, rows):
+        return np.array(self.categories)[self.values[rows]]
+
+    def convert(self, other):
+        mapping = [self.__code(category) for category in other.categories]
+        if None in mapping:
+            return None
+        return np.array(mapping, dtype=np.uint32)[other.values]
+
+    def sortKeys(self):
+        # 按文本的排序规则给编码排名，排序只比较整数
+        keys = textRanks(np.array(self.categories, dtype=str))[self.values]
+        code = self.__codes.get('')
+        return keys, (None if code is None else self.values == code)
+
+    def nbytes(self) -> int:
+        return super().nbytes() + sum(64 + len(category) for category in self.categories)
+
+    def __code(self, value):
+        code = self.__codes.get(value)
+        if code is None:
+            if len(self.categories) >= _MAX_CATEGORIES:
+                return None
+            code = len(self.categories)
+            self.categories.append(value)
+            self.__codes[value] = code
+        return code
+
+
+def inferColumn(values):
+    """
+    推断一列值的类型：int64 -> float64 -> 日期时间 -> 字典编码的字符串
+    :param values: 字符串列表
+    :return: TypedColumn，只能按普通字符串保存时返回None
+    """
+    if not values:
+        return None
+    nonEmpty = [value for value in values if value != '']
+    if nonEmpty and max(map(len, nonEmpty)) <= _MAX_VALUE_LENGTH:
+        sample = np.array(nonEmpty[:_SAMPLE_SIZE])
+        first = nonEmpty[0]
+        candidates = [(IntColumn, None), (FloatColumn, None)]
+        if '.' in first:
+            candidates.append((FloatColumn, len(first) - first.index('.') - 1))
+        fmt = DateTimeColumn.detectFormat(first)
+        if fmt is not None:
+            candidates.append((DateTimeColumn, fmt))
+        for cls, fmt in candidates:
+            if cls.parse(sample, fmt) is None:
+                continue
+            parsed = cls.parse(np.array(nonEmpty), fmt)
+            if parsed is not None:
+                missing = None
+                if len(nonEmpty) < len(values):
+                    missing = np.fromiter((value == '' for value in values), dtype=bool, count=len(values))
+                return cls(_fill(parsed, missing), missing, fmt)
+    limit = min(max(_MIN_CATEGORIES, len(values) // 2), _MAX_CATEGORIES)
+    if len(set(values[:_SAMPLE_SIZE])) > max(_MIN_CATEGORIES, _SAMPLE_SIZE // 2):
+        return None
+    categories = list(dict.fromkeys(values))
+    if len(categories) <= limit:
+        codes = {category: code for code, category in enumerate(categories)}
+        return CategoryColumn(np.fromiter(map(codes.__getitem__, values), dtype=np.uint32, count=len(values)),
+                              categories)
+    return None
+
+
+def textRanks(texts):
+    """
+    文本的排序名次：能解析为数值的值在前，按数值比较（相等时按字符串），其余的值按字符串比较
+    每个不同的值只解析一次
+    :param texts: 字符串数组
+    :return: 名次数组（int64），相等的值名次相同
+    """
+    unique, inverse = np.unique(texts, return_inverse=True)
+    numbers = parseNumbers(unique)
+    isText = np.isnan(numbers)
+    numbers[isText] = 0
+    # unique已按字符串排序，位置即字符串的名次
+    ranks = np.empty(len(unique), dtype=np.int64)
+    ranks[np.lexsort((np.arange(len(unique)), numbers, isText))] = np.arange(len(unique))
+    return ranks[inverse.reshape(-1)]
+
+
+def parseNumbers(texts):
+    """
+    把文本解析为浮点数，不能解析的为NaN；只逐个尝试以数字、符号或小数点开头的值
+    :param texts: 字符串数组
+    :return: float64数组
+    """
+    try:
+        return texts.astype(np.float64)
+    except ValueError:
+        pass
+    numbers = np.full(len(texts), np.nan)
+    first = np.strings.lstrip(texts).astype('U1')
+    for i in np.flatnonzero(np.isin(first, list('0123456789+-.'))).tolist():
+        try:
+            numbers[i] = float(texts[i])
+        except ValueError:
+            pass
+    return numbers
+
+
+def _canonicalLength(values):
+    # 整数的标准写法（无前导零、无正号）的字符数
+    digits = np.maximum(np.searchsorted(_POWERS_OF_TEN, np.abs(values), side='right'), 1)
+    return digits + (values < 0)
+
+
+def _fill(parsed, missing):
+    # 把非空单元格的值放回完整的行数组中
+    if missing is None:
+        return parsed
+    values = np.zeros(len(missing), dtype=parsed.dtype)
+    values[~missing] = parsed
+    return values
@@ -0,0 +1,122 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : csv_writer.py
+@Desc    : csv写入：先写临时文件，fsync后原子替换目标文件（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 13:40
+"""
+
+import codecs
+import csv
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from csv_profile import Profiler
+from csv_compress import COMPRESSION_AUTO, compressedOutput, compressionForPath
+
+_BUFFER_SIZE = 1 << 20      # 写文件的缓冲区大小
+_BATCH_ROWS = 10000         # 每次编码写入的行数
+
+
+@contextmanager
+def atomicOpen(path, beforeReplace=None):
+    """
+    以二进制方式打开一个与目标文件同目录的临时文件，退出时fsync并原子替换目标文件
+    写入过程中出现异常时删除临时文件，目标文件保持不变
+    :param path: 目标文件
+    :param beforeReplace: 替换之前的回调（例如释放目标文件的句柄）
+    :return: 文件对象
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.%s.' % os.path.basename(path), suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb', buffering=_BUFFER_SIZE) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp创建的文件只有属主可读写，保持与原文件（或普通新文件）一致的权限
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        else:
+            _umask = os.umask(0)
+            os.umask(_umask)
+            os.chmod(tmp, 0o666 & ~_umask)
+        if beforeReplace:
+            beforeReplace()
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class RowWriter(object):
+    """
+    按文件格式把行编码后分批写入二进制文件
+    使用增量编码器，带BOM的编码（utf-8-sig/utf-16）只在文件开头写一次BOM
+    """
+
+    def __init__(self, f, fileFormat=None, lineterminator='\r\n'):
+        """
+        :param f: 二进制文件对象
+        :param fileFormat: 文件格式（FileFormat），None: utf-8逗号分隔
+        :param lineterminator: 行结束符
+        """
+        self.__f = f
+        self.__encoder = codecs.getincrementalencoder(fileFormat.encoding if fileFormat else 'utf-8')()
+        self.__buffer = io.StringIO()
+        if fileFormat:
+            self.__writer = csv.writer(self.__buffer, delimiter=fileFormat.delimiter,
+                                       quotechar=fileFormat.quotechar, lineterminator=lineterminator)
+        else:
+            self.__writer = csv.writer(self.__buffer, lineterminator=lineterminator)
+
+    def skipBom(self):
+        """
+        文件开头已经有BOM（例如原样复制的数据），之后写入的内容不再带BOM
+        :return: None
+        """
+        self.__encoder.encode('')
+
+    def writerows(self, rows):
+        """
+        写入多行
+        :param rows: 可迭代的行
+        :return: None
+        """
+        count = 0
+        for row in rows:
+            self.__writer.writerow(row)
+            count += 1
+            if count == _BATCH_ROWS:
+                self.__flush()
+                count = 0
+        if count:
+            self.__flush()
+
+    def __flush(self):
+        self.__f.write(self.__encoder.encode(self.__buffer.getvalue()))
+        self.__buffer.seek(0)
+        self.__buffer.truncate()
+
+
+def saveStore(store, path, withHeader=False, beforeReplace=None, compression=COMPRESSION_AUTO):
+    """
+    把表格数据原子地保存到文件
+    :param store: ColumnStore/LazyStore
+    :param path: 目标文件
+    :param withHeader: 是否保存列头
+    :param beforeReplace: 替换目标文件之前的回调
+    :param compression: 压缩格式（COMPRESSION_*），None: 不压缩，COMPRESSION_AUTO: 按扩展名决定
+    :return: None
+    """
+    if compression == COMPRESSION_AUTO:
+        compression = compressionForPath(path)
+    with Profiler.span('file.save'), atomicOpen(path, beforeReplace) as f, compressedOutput(f, compression) as out:
+        store.writeTo(out, withHeader)
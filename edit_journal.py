@@ -0,0 +1,236 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : edit_journal.py
+@Desc    : 修改日志：记录修改过的单元格和插入/删除的行，支持多级撤销/重做（不依赖Qt）
+@Author  : qdu
+@Date    : 2026/10/17 14:30
+"""
+
+
+class ColumnEdit(object):
+    """
+    批量修改中一列的修改：行号数组及对应的原值、新值数组（行号不重复）
+    整步只保存几个数组，撤销/重做时整列向量化写回
+    """
+
+    __slots__ = ('column', 'rows', 'old', 'new')
+
+    def __init__(self, column, rows, old, new):
+        self.column = column
+        self.rows = rows
+        self.old = old
+        self.new = new
+
+    def __len__(self):
+        return len(self.rows)
+
+    def reverted(self):
+        return ColumnEdit(self.column, self.rows, self.new, self.old)
+
+    def cells(self):
+        """
+        各单元格的原值和新值
+        :return: {row: (old, new)}
+        """
+        return dict(zip(self.rows.tolist(), zip(self.old.tolist(), self.new.tolist())))
+
+
+class RowEdit(object):
+    """
+    插入或删除连续的行：位置、行数，以及修改前后数据的行布局（由数据对象解释，例如LazyStore.layout）
+    删除的行中修改过的单元格暂存在cells中（与撤销后的RowEdit共用），撤销删除时恢复修改标记
+    """
+
+    __slots__ = ('row', 'count', 'inserted', 'old', 'new', 'cells')
+
+    def __init__(self, row, count, inserted, old, new, cells=None):
+        self.row = row
+        self.count = count
+        self.inserted = inserted
+        self.old = old
+        self.new = new
+        self.cells = {} if cells is None else cells     # {column: {相对行号: (原始值, 当前值)}}
+
+    def __len__(self):
+        return self.count
+
+    def reverted(self):
+        return RowEdit(self.row, self.count, not self.inserted, self.new, self.old, self.cells)
+
+
+class EditJournal(object):
+    """
+    修改日志
+    每一步修改是一组(row, column, old, new)、批量修改的ColumnEdit或插入/删除行的RowEdit，撤销/重做以步为单位；
+    另外记录每个修改过的单元格相对于上次保存时的原始值（插入/删除行后随之移动），以及行布局是否改变，
+    内存只与修改次数有关，与表格大小无关
+    """
+
+    def __init__(self, limit=1000):
+        """
+        :param limit: 最多保留的撤销步数
+        """
+        self.__limit = limit
+        self.__cells = {}       # 相对于上次保存修改过的单元格 {column: {row: (原始值, 当前值)}}
+        self.__undo = []        # 撤销栈 [[(row, column, old, new), ...], ...]
+        self.__redo = []        # 重做栈
+        self.__layout = None        # 当前的行布局（RowEdit.new），None: 未插入/删除过行
+        self.__savedLayout = None   # 上次保存时的行布局
+
+    @property
+    def clean(self) -> bool:
+        """
+        与上次保存（或加载）时相比是否没有修改
+        :return:
+        """
+        return not self.__cells and self.__layout == self.__savedLayout
+
+    @property
+    def modifiedCount(self) -> int:
+        """
+        修改过的单元格数
+        :return:
+        """
+        return sum(map(len, self.__cells.values()))
+
+    @property
+    def canUndo(self) -> bool:
+        return bool(self.__undo)
+
+    @property
+    def canRedo(self) -> bool:
+        return bool(self.__redo)
+
+    def record(self, changes):
+        """
+        记录一步修改（修改已经写入数据）
+        :param changes: [(row, column, old, new)、ColumnEdit或RowEdit, ...]
+        :return: None
+        """
+        if not changes:
+            return
+        self.__undo.append(list(changes))
+        if len(self.__undo) > self.__limit:
+            del self.__undo[0]
+        self.__redo.clear()
+        self.__track(changes)
+
+    def undo(self):
+        """
+        撤销一步
+        :return: 需要写入数据的值 [(row, column, value)、ColumnEdit（写入new）或RowEdit（恢复new）, ...]，没有可撤销的步骤时为空列表
+        """
+        if not self.__undo:
+            return []
+        changes = self.__undo.pop()
+        self.__redo.append(changes)
+        reverted = [change.reverted() if isinstance(change, (ColumnEdit, RowEdit))
+                    else (change[0], change[1], change[3], change[2]) for change in reversed(changes)]
+        self.__track(reverted)
+        return self.__values(reverted)
+
+    def redo(self):
+        """
+        重做一步
+        :return: 需要写入数据的值 [(row, column, value)、ColumnEdit（写入new）或RowEdit（恢复new）, ...]，没有可重做的步骤时为空列表
+        """
+        if not self.__redo:
+            return []
+        changes = self.__redo.pop()
+        self.__undo.append(changes)
+        self.__track(changes)
+        return self.__values(changes)
+
+    @property
+    def hasRowEdits(self) -> bool:
+        """
+        撤销/重做栈中是否有插入/删除行的步骤（其中的行布局只对当时的数据对象有效）
+        :return:
+        """
+        return any(isinstance(change, RowEdit) for changes in self.__undo + self.__redo for change in changes)
+
+    def modified(self, row, column) -> bool:
+        cells = self.__cells.get(column)
+        return cells is not None and row in cells
+
+    def modifiedCells(self):
+        """
+        修改过的单元格
+        :return: {(row, column): (原始值, 当前值)}
+        """
+        return {(row, column): value for column, cells in self.__cells.items() for row, value in cells.items()}
+
+    def modifiedRows(self):
+        return set().union(*self.__cells.values())
+
+    def markSaved(self):
+        """
+        保存后当前值成为新的原始值，撤销栈保留
+        :return: None
+        """
+        self.__cells.clear()
+        self.__savedLayout = self.__layout
+
+    def clear(self):
+        self.__cells.clear()
+        self.__layout = self.__savedLayout = None
+        self.__undo.clear()
+        self.__redo.clear()
+
+    @staticmethod
+    def __values(changes):
+        return [change if isinstance(change, (ColumnEdit, RowEdit)) else (change[0], change[1], change[3])
+                for change in changes]
+
+    def __track(self, changes):
+        # 更新单元格相对于原始值的状态，改回原始值的单元格不再算作修改
+        for change in changes:
+            if isinstance(change, RowEdit):
+                self.__trackRows(change)
+                continue
+            if isinstance(change, ColumnEdit):
+                column = change.column
+                edited = change.cells()
+            else:
+                row, column, old, new = change
+                edited = {row: (old, new)}
+            cells = self.__cells.setdefault(column, {})
+            # 只需逐个检查之前已经修改过的单元格（遍历两者中较小的一个）
+            common = [row for row in edited if row in cells] if len(edited) <= len(cells) \
+                else [row for row in cells if row in edited]
+            for row in common:
+                edited[row] = (cells[row][0], edited[row][1])
+            cells.update(edited)
+            for row in [row for row, (original, new) in edited.items() if original == new]:
+                del cells[row]
+            if not cells:
+                del self.__cells[column]
+
+    def __trackRows(self, change):
+        """
+        插入/删除行后移动修改过的单元格的行号，删除的行中的修改暂存到change.cells，撤销删除时恢复
+        :param change: RowEdit
+        :return: None
+        """
+        if self.__layout is None and self.__savedLayout is None:
+            self.__savedLayout = change.old
+        self.__layout = change.new
+        row, count = change.row, change.count
+        stashed = change.cells
+        for column in set(self.__cells) | set(stashed):
+            cells = self.__cells.get(column, {})
+            if change.inserted:
+                moved = {r + count if r >= row else r: value for r, value in cells.items()}
+                moved.update((row + r, value) for r, value in stashed.pop(column, {}).items())
+            else:
+                removed = {r - row: value for r, value in cells.items() if row <= r < row + count}
+                if removed:
+                    stashed[column] = removed
+                moved = {r - count if r >= row + count else r: value for r, value in cells.items()
+                         if not row <= r < row + count}
+            if moved:
+                self.__cells[column] = moved
+            else:
+                self.__cells.pop(column, None)
@@ -0,0 +1,219 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : lint_dock.py
+@Desc    : 文件校验：选择键列和列类型的对话框，以及显示问题列表的停靠窗口（双击定位到单元格）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+from PySide6.QtWidgets import QDockWidget, QWidget, QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, \
+    QTableWidgetItem, QHeaderView, QLabel, QLineEdit, QListWidget, QListWidgetItem, QDialogButtonBox, QPushButton, \
+    QMessageBox
+from PySide6.QtCore import Qt, Signal, Slot
+from csv_lint import parseTypes, LintError, ISSUES, ISSUE_RAGGED, ISSUE_QUOTING, ISSUE_ENCODING, ISSUE_HEADER, \
+    ISSUE_TYPE, ISSUE_DUPLICATE
+from csv_lint_worker import LintWorker
+
+_KIND_NAMES = {ISSUE_RAGGED: '字段数', ISSUE_QUOTING: '引号', ISSUE_ENCODING: '编码', ISSUE_HEADER: '列头重复',
+               ISSUE_TYPE: '类型', ISSUE_DUPLICATE: '键重复'}
+
+
+class LintDialog(QDialog):
+    """
+    校验设置：检查重复的键列，以及指定类型的列（其余的列按开头的行推断）
+    """
+
+    def __init__(self, columnNames, header, parent=None):
+        """
+        :param columnNames: 各列的名称
+        :param header: 列头（没有列头时为None，只能按#n指定列）
+        :param parent:
+        """
+        super().__init__(parent)
+        self.setWindowTitle('校验文件')
+        self.__header = header
+        self.keyList = QListWidget()
+        for column, name in enumerate(columnNames):
+            _item = QListWidgetItem(name, self.keyList)
+            _item.setData(Qt.UserRole, column)
+            _item.setCheckState(Qt.Unchecked)
+        self.typesEdit = QLineEdit()
+        self.typesEdit.setPlaceholderText('例如 price=float, date=datetime, #1=int')
+        _buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        _buttons.accepted.connect(self.accept)
+        _buttons.rejected.connect(self.reject)
+        _layout = QVBoxLayout(self)
+        _layout.addWidget(QLabel('键列（检查重复）'))
+        _layout.addWidget(self.keyList)
+        _layout.addWidget(QLabel('指定列类型（int/float/datetime/text，其余的列自动推断）'))
+        _layout.addWidget(self.typesEdit)
+        _layout.addWidget(_buttons)
+
+    @property
+    def keys(self):
+        """
+        键列
+        :return: 列号列表
+        """
+        return [self.keyList.item(i).data(Qt.UserRole) for i in range(self.keyList.count())
+                if self.keyList.item(i).checkState() == Qt.Checked]
+
+    @property
+    def types(self):
+        """
+        指定的列类型
+        :return: {列号: 类型}
+        """
+        return parseTypes(self.typesEdit.text(), self.__header)
+
+    def accept(self):
+        try:
+            self.types
+        except LintError as e:
+            QMessageBox.warning(self, '校验文件', str(e))
+            return
+        super().accept()
+
+
+class LintDock(QDockWidget):
+    """
+    在后台校验编辑器打开的文件（磁盘上的内容），显示问题列表；双击一个问题时发出issueActivated
+    """
+
+    # 信号
+    issueActivated = Signal(object, int, int)   # 编辑器, 数据行号, 列号（-1: 整行）
+
+    __headers = ['行', '列', '类型', '说明']
+
+    def __init__(self, parent=None):
+        super().__init__('校验结果', parent)
+        self.setObjectName('lintDock')
+        self.__worker = None
+        self.__editor = None        # 校验的文件所在的编辑器
+        self.__modified = False     # 开始校验时编辑器有未保存的修改
+        self.__setupUi()
+
+    def __setupUi(self):
+        self.table = QTableWidget(0, len(self.__headers))
+        self.table.setHorizontalHeaderLabels(self.__headers)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setToolTip('双击定位到表格中的单元格（行号为数据行号，不含列头）')
+        self.table.cellDoubleClicked.connect(self.__cellDoubleClicked)
+        self.statusLabel = QLabel()
+        self.statusLabel.setWordWrap(True)
+        self.cancelButton = QPushButton('取消')
+        self.cancelButton.clicked.connect(self.stop)
+        self.cancelButton.setVisible(False)
+        _status = QHBoxLayout()
+        _status.addWidget(self.statusLabel, 1)
+        _status.addWidget(self.cancelButton)
+        _widget = QWidget()
+        _layout = QVBoxLayout(_widget)
+        _layout.setContentsMargins(0, 0, 0, 0)
+        _layout.addWidget(self.table)
+        _layout.addLayout(_status)
+        self.setWidget(_widget)
+
+    @property
+    def busy(self) -> bool:
+        return self.__worker is not None
+
+    def start(self, editor, keys, types):
+        """
+        开始校验编辑器打开的文件，取消正在进行的校验
+        :param editor: CsvEditor
+        :param keys: 键列的列号列表
+        :param types: 指定的列类型 {列号: 类型}
+        :return: None
+        """
+        self.stop()
+        self.table.setRowCount(0)
+        self.__editor = editor
+        self.__modified = editor.modified
+        self.__worker = LintWorker(editor.file, editor.format, editor.withHeader, keys, types, self)
+        self.__worker.progress.connect(self.__progress)
+        self.__worker.resultReady.connect(self.__result)
+        self.__worker.failed.connect(self.__failed)
+        self.__worker.finished.connect(self.__finished)
+        self.__worker.start()
+        self.statusLabel.setText('正在校验 ...')
+        self.cancelButton.setVisible(True)
+
+    @Slot()
+    def stop(self):
+        """
+        取消正在进行的校验
+        :return: None
+        """
+        if self.__worker is not None:
+            self.__worker.cancel()
+            self.__worker.wait()
+            self.__worker.deleteLater()
+            self.__worker = None
+            self.cancelButton.setVisible(False)
+            self.statusLabel.setText('已取消')
+
+    def forgetEditor(self, editor):
+        """
+        编辑器关闭后问题列表不再能定位，正在校验该编辑器的文件时取消
+        :param editor: CsvEditor
+        :return: None
+        """
+        if editor is self.__editor:
+            self.stop()
+            self.__editor = None
+
+    @Slot('qint64', 'qint64')
+    def __progress(self, done, size):
+        if self.sender() is self.__worker and size:
+            self.statusLabel.setText('正在校验 ... %d%%' % (done * 100 // size))
+
+    @Slot(object)
+    def __result(self, report):
+        if self.sender() is not self.__worker:
+            return
+        self.table.setRowCount(len(report.issues))
+        for r, issue in enumerate(report.issues):
+            _rowItem = QTableWidgetItem('' if issue.row is None else str(issue.row + 1))
+            _rowItem.setData(Qt.UserRole, (issue.row, issue.column))
+            _rowItem.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            _columnItem = QTableWidgetItem('' if issue.column is None else str(issue.column + 1))
+            _columnItem.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.table.setItem(r, 0, _rowItem)
+            self.table.setItem(r, 1, _columnItem)
+            self.table.setItem(r, 2, QTableWidgetItem(_KIND_NAMES[issue.kind]))
+            self.table.setItem(r, 3, QTableWidgetItem(issue.message))
+        _counts = '，'.join('%s %d' % (_KIND_NAMES[kind], report.counts[kind]) for kind in ISSUES
+                           if report.counts[kind])
+        _text = '共 %d 行，%s（%d 个进程，%.1f 秒）' % (
+            report.rows, ('发现问题：' + _counts) if _counts else '没有发现问题', report.workers, report.seconds)
+        if report.truncated:
+            _text += '；问题太多，每类只列出一部分'
+        if self.__modified:
+            _text += '；编辑器中有未保存的修改，结果对应磁盘上的文件'
+        self.statusLabel.setText(_text)
+
+    @Slot(str)
+    def __failed(self, message):
+        if self.sender() is self.__worker:
+            self.statusLabel.setText('校验失败：%s' % message)
+
+    @Slot()
+    def __finished(self):
+        if self.sender() is self.__worker:
+            self.__worker.deleteLater()
+            self.__worker = None
+            self.cancelButton.setVisible(False)
+
+    @Slot(int, int)
+    def __cellDoubleClicked(self, row, column):
+        _row, _column = self.table.item(row, 0).data(Qt.UserRole)
+        if self.__editor is None or _row is None:
+            return
+        self.issueActivated.emit(self.__editor, _row, -1 if _column is None else _column)
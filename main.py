@@ -1,12 +1,20 @@
 # This is a sample Python script.
+import time
+_START = time.perf_counter()    # 统计启动用时的起点
+
+import multiprocessing
 import os
 import sys
-import main_form
-from PySide6 import QtWidgets
-from config import Config
-from qt_material import apply_stylesheet
 
-if __name__ == '__main__':
+
+def runGui():
+    # 界面相关的模块只在界面模式下导入，批处理模式不依赖PySide6的界面库
+    # qt_material在打开主题菜单或缓存失效时才导入
+    import main_form
+    from PySide6 import QtWidgets
+    from config import Config
+    from theme import applyTheme
+
     app = QtWidgets.QApplication([])
 
     # 读配置文件
@@ -19,13 +27,11 @@ if __name__ == '__main__':
     Config.init(_iniDir, app)
     Config.readConfig()
 
-    # 主界面
-    widget = main_form.MainForm()
+    # 主界面（入参指定的文件在创建时开始后台加载）
+    widget = main_form.MainForm(_START)
 
-    # 设置主题风格
-    if Config.theme != 'None':
-        _theme = '%s.xml' % Config.theme
-        apply_stylesheet(app, theme=_theme)
+    # 设置主题风格：使用缓存的样式表
+    applyTheme(app, Config.theme, Config.cacheDir)
 
     # 显示主界面
     if Config.maximized == 1:
@@ -34,4 +40,25 @@ if __name__ == '__main__':
         widget.setGeometry(Config.position[0], Config.position[1], Config.size[0], Config.size[1])
         widget.show()
 
-    sys.exit(app.exec())
+    return app.exec()
+
+
+if __name__ == '__main__':
+    # 打包后的exe中并行解析的子进程需要
+    multiprocessing.freeze_support()
+
+    # 环境变量CSVEDITOR_PROFILE启用性能统计（界面和批处理模式都适用）
+    from csv_profile import enableFromEnvironment
+    enableFromEnvironment()
+
+    # 批处理模式：python main.py --batch 源文件 目标文件 [选项]
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        import csv_batch
+        sys.exit(csv_batch.main(sys.argv[2:]))
+
+    # 校验模式：python main.py --lint 文件 [选项]，在标准输出打印JSON格式的报告
+    if len(sys.argv) > 1 and sys.argv[1] == '--lint':
+        import csv_lint
+        sys.exit(csv_lint.main(sys.argv[2:]))
+
+    sys.exit(runGui())
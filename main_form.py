@@ -1,41 +1,70 @@
+import os
 import sys
+import time
 from PySide6 import QtWidgets, QtCore, QtGui
 from PySide6.QtWidgets import QFileDialog, QStyle, QMessageBox
 from PySide6.QtCore import QEvent, Qt, QFileInfo
 from csv_editor import CsvEditor
+from csv_cache import StoreCache
+from csv_parser import ENGINES
 from config import Config
-from qt_material import list_themes
-from qt_material import apply_stylesheet
+from csv_profile import Profiler
+from profile_dock import ProfileDock
+from stats_dock import StatsDock
+from bulk_dialog import ReplaceDialog, DerivedColumnDialog, SCOPE_SELECTION, SCOPE_ALL
+from csv_bulk import BulkError
+from csv_clipboard import ClipboardError
+from csv_sort import SortError
+from csv_arrow import tableFormatForPath
+from sort_dialog import SortDialog, GroupByDialog, GroupResultDialog
+from lint_dock import LintDialog, LintDock
+from theme import listThemes, applyTheme
 
 
 class MainForm(QtWidgets.QMainWindow):
-    __csvChanged = False      # csv文件是否改变
-    __tableChanged = False    # 表格数据是否改变
     __focusIn = True
     __withHeader = True
+    __highlightModified = False     # 是否标记修改过的单元格（所有标签页相同）
+    __lazyFileSize = 512 * 1024 * 1024     # 超过该大小的文件延迟加载
+    __fileFilter = 'CSV File (*.csv *.csv.gz *.csv.zst *.csv.xz);;All Files (*)'     # 压缩的文件按扩展名压缩保存
+    __openFilter = 'Data File (*.csv *.csv.gz *.csv.zst *.csv.xz *.parquet *.arrow *.feather);;All Files (*)'
+    __saveAsFilter = 'CSV File (*.csv *.csv.gz *.csv.zst *.csv.xz);;Parquet (*.parquet);;' \
+                     'Arrow IPC / Feather (*.arrow *.feather)'
+    __saveSuffixes = {'Parquet (*.parquet)': '.parquet', 'Arrow IPC / Feather (*.arrow *.feather)': '.arrow'}
 
-    def __init__(self):
+    __startTime = None          # 进程启动的时间（perf_counter），显示第一屏后统计启动用时
+    profileDock = None          # 性能统计停靠窗口，第一次启用性能统计时创建
+    statsDock = None            # 列统计停靠窗口，第一次显示列统计时创建
+    lintDock = None             # 校验结果停靠窗口，第一次校验时创建
+    __showStats = False         # 是否显示列统计（所有标签页相同）
+
+    def __init__(self, startTime=None):
         super().__init__()
+        self.__startTime = startTime
+        self.__changedEditors = set()   # 源文件已改变、等待提示重新加载的编辑器
+        self.__recent = []              # 按激活顺序排列的编辑器，最久未使用的在前
+        self.__cache = StoreCache(os.path.join(Config.cacheDir, 'parse'), Config.parseCacheSize * 1024 * 1024,
+                                  bool(Config.parseCache))
 
         self.__setupUi()
         self.__setTitle()
 
-        # 定时器更新配置到文件
-        self.config_timer = QtCore.QTimer()
-        self.config_timer.setInterval(10000)  # 10s
-        self.config_timer.timeout.connect(self.writeConfigTimer)
-        self.config_timer.start()
+        # 如果有入参，则先在后台开始加载入参指定的文件（每个文件一个标签页），再完成其余的初始化
+        _files = [file for file in sys.argv[1:] if QFileInfo(file).isFile()]
+        for file in _files:
+            self.__openFile(file)
+        if _files:
+            self.tabs.setCurrentIndex(0)
+        else:
+            QtCore.QTimer.singleShot(0, self.__reportStartup)
 
         self.setFocusPolicy(Qt.StrongFocus)
-
-        # 如果有入参，则打开入参指定的文件
-        if len(sys.argv) > 1 and QFileInfo(sys.argv[1]).isFile():
-            self.csv_editor.loadFile(sys.argv[1], withHeader=self.__withHeader)
-            self.__setTitle(sys.argv[1])
-            Config.openPath = QFileInfo(sys.argv[1]).path()
+        if Profiler.enabled:
+            self.__showProfileDock(True)
 
     def __setupUi(self):
         self.__createMenuAndToolBar()
+        self.__createStatusBar()
         self.__createCentral()
 
     def __createCentral(self):
@@ -44,14 +73,97 @@ class MainForm(QtWidgets.QMainWindow):
         self.layout = QtWidgets.QVBoxLayout(self.central_widget)
         self.layout.setContentsMargins(0, 0, 0, 0)
 
-        self.csv_editor = CsvEditor()
+        # 每个文件一个标签页，只有一个标签页时不显示标签栏
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.setTabBarAutoHide(True)
+        self.tabs.tabCloseRequested.connect(self.closeTab)
+        self.tabs.currentChanged.connect(self.__currentChanged)
+        self.__newEditor()
         self.layout.addSpacing(5)
-        self.layout.addWidget(self.csv_editor)
+        self.layout.addWidget(self.tabs)
         self.setCentralWidget(self.central_widget)
 
+    @property
+    def csv_editor(self) -> CsvEditor:
+        """
+        当前标签页的编辑器
+        :return:
+        """
+        return self.tabs.currentWidget()
+
+    def __editors(self):
+        return [self.tabs.widget(i) for i in range(self.tabs.count())]
+
+    def __newEditor(self) -> CsvEditor:
+        """
+        新建一个标签页
+        :return: 新的编辑器
+        """
+        _editor = CsvEditor(self.__cache)
+        _editor.setHighlightModified(self.__highlightModified)
+        _editor.setStatsEnabled(self.__showStats)
         # 信号槽
-        self.csv_editor.dataChanged.connect(self.changed)
-        self.csv_editor.fileDroped.connect(self.fileDroped)
+        _editor.dataChanged.connect(self.changed)
+        _editor.fileDroped.connect(self.fileDroped)
+        _editor.loadProgress.connect(self.loadProgress)
+        _editor.loadFinished.connect(self.loadFinished)
+        _editor.loadFailed.connect(self.loadFailed)
+        _editor.selectionSummary.connect(self.selectionSummary)
+        _editor.copyFinished.connect(self.copyFinished)
+        self.__recent.append(_editor)
+        self.tabs.addTab(_editor, '')
+        self.__updateTab(_editor)
+        return _editor
+
+    def __createStatusBar(self):
+        """
+        状态栏：显示后台加载进度
+        :return:
+        """
+        self.selectionLabel = QtWidgets.QLabel()
+        self.loadLabel = QtWidgets.QLabel()
+        self.loadProgressBar = QtWidgets.QProgressBar()
+        self.loadProgressBar.setRange(0, 1000)      # 千分比，避免大文件字节数溢出
+        self.loadProgressBar.setMaximumWidth(200)
+        self.loadProgressBar.setVisible(False)
+        self.statusBar().addPermanentWidget(self.selectionLabel)
+        self.statusBar().addPermanentWidget(self.loadLabel)
+        self.statusBar().addPermanentWidget(self.loadProgressBar)
+
+    def __showProfileDock(self, visible):
+        """
+        显示/隐藏性能统计停靠窗口，由显示菜单的Profiling开关控制
+        :param visible: bool
+        :return:
+        """
+        if self.profileDock is None:
+            if not visible:
+                return
+            self.profileDock = ProfileDock(self)
+            self.profileDock.setFeatures(ProfileDock.DockWidgetMovable | ProfileDock.DockWidgetFloatable)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.profileDock)
+        self.profileDock.setVisible(visible)
+
+    def __showStatsDock(self, visible):
+        """
+        显示/隐藏列统计停靠窗口，由显示菜单的Column Statistics开关控制；隐藏时各标签页停止统计
+        :param visible: bool
+        :return:
+        """
+        self.__showStats = visible
+        for editor in self.__editors():
+            editor.setStatsEnabled(visible)
+        if self.statsDock is None:
+            if not visible:
+                return
+            self.statsDock = StatsDock(self)
+            self.statsDock.setFeatures(StatsDock.DockWidgetMovable | StatsDock.DockWidgetFloatable)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.statsDock)
+        self.statsDock.setVisible(visible)
+        self.statsDock.setEditor(self.csv_editor if visible else None)
 
     def __createMenuAndToolBar(self):
         """
@@ -62,7 +174,7 @@ class MainForm(QtWidgets.QMainWindow):
         _fileMenuList = [
             # icon, text, callback, shortcut
             [Config.iconOpenFile, '&Open', self.openFile, QtGui.QKeySequence("Ctrl+O")],
-            [Config.iconCloseFile, '&Close', self.closeFile, QtGui.QKeySequence("Ctrl+C")],
+            [Config.iconCloseFile, '&Close', self.closeFile, QtGui.QKeySequence("Ctrl+W")],
             [Config.iconSaveFile, '&Save', self.saveFile, QtGui.QKeySequence("Ctrl+S")],
             [Config.iconSaveAsFile, 'Save As ...', self.saveAsFile, QtGui.QKeySequence("")],
         ]
@@ -73,21 +185,199 @@ class MainForm(QtWidgets.QMainWindow):
             action.setIcon(icon)
             self.fileToolBar.addAction(action)
 
+        # >> 编辑菜单
+        self.editMenu = self.menuBar().addMenu('&Edit')
+        self.editMenu.addAction('&Undo', self.undo, QtGui.QKeySequence(QtGui.QKeySequence.Undo))
+        self.editMenu.addAction('&Redo', self.redo, QtGui.QKeySequence(QtGui.QKeySequence.Redo))
+        self.editMenu.addSeparator()
+        self.editMenu.addAction('&Copy', self.copy, QtGui.QKeySequence(QtGui.QKeySequence.Copy))
+        self.editMenu.addAction('&Paste', self.paste, QtGui.QKeySequence(QtGui.QKeySequence.Paste))
+        self.editMenu.addSeparator()
+        self.editMenu.addAction('&Find / Filter', self.findFilter, QtGui.QKeySequence(QtGui.QKeySequence.Find))
+        # 批量修改：每次操作作为一步，可以一次撤销
+        self.editMenu.addAction('R&eplace ...', self.replaceText, QtGui.QKeySequence("Ctrl+H"))
+        self.editMenu.addAction('Fill &Down', self.fillDown, QtGui.QKeySequence("Ctrl+D"))
+        _transformMenu = self.editMenu.addMenu('&Transform')
+        for txt, name in [('&Trim', 'trim'), ('&UPPER CASE', 'upper'), ('&lower case', 'lower'),
+                          ('Title &Case', 'title')]:
+            _action = _transformMenu.addAction(txt, self.transformText)
+            _action.setData(name)
+        self.editMenu.addAction('Derived &Column ...', self.addDerivedColumn)
+        self.editMenu.addSeparator()
+        self.editMenu.addAction('&Insert Row', self.insertRow, QtGui.QKeySequence("Ctrl+I"))
+        self.editMenu.addAction('De&lete Rows', self.deleteRows, QtGui.QKeySequence("Ctrl+-"))
+
+        # >> 数据菜单：排序、分组只计算行的排列，不改变数据
+        self.dataMenu = self.menuBar().addMenu('&Data')
+        self.dataMenu.addAction('&Sort ...', self.sortRows)
+        self.dataMenu.addAction('&Group By ...', self.groupBy)
+        self.dataMenu.addSeparator()
+        self.dataMenu.addAction('Save S&orted As ...', self.saveSorted)
+        self.dataMenu.addSeparator()
+        # 校验磁盘上的文件：字段数、引号、编码、列头、类型及重复键
+        self.dataMenu.addAction('&Validate ...', self.validateFile)
+
         # >> 显示菜单
         self.viewMenu = self.menuBar().addMenu('&View')
-        # 主题
+        # 标记修改过的单元格
+        _action = self.viewMenu.addAction('Show &Modified Cells', self.showModified)
+        _action.setCheckable(True)
+        # 跟随源文件追加的内容（每个标签页单独设置，切换标签页时更新勾选状态）
+        self.followAction = self.viewMenu.addAction('&Follow File (tail -f)', self.followFile)
+        self.followAction.setCheckable(True)
+        # 列统计
+        _action = self.viewMenu.addAction('Column &Statistics', self.columnStats)
+        _action.setCheckable(True)
+        # 性能统计（也可以通过环境变量CSVEDITOR_PROFILE在启动时启用）
+        _action = self.viewMenu.addAction('&Profiling', self.profiling)
+        _action.setCheckable(True)
+        _action.setChecked(Profiler.enabled)
+        # 缓存大文件的解析结果
+        _action = self.viewMenu.addAction('Parse &Cache', self.parseCache)
+        _action.setCheckable(True)
+        _action.setChecked(bool(Config.parseCache))
+        # 解析引擎
+        self.engineActionGroup = QtGui.QActionGroup(self)
+        self.engineActionGroup.setExclusionPolicy(QtGui.QActionGroup.ExclusionPolicy.Exclusive)
+        self.engineMenu = self.viewMenu.addMenu('Parser &Engine')
+        for engine in ENGINES:
+            _action = self.engineMenu.addAction(engine, self.setEngine)
+            _action.setCheckable(True)
+            self.engineActionGroup.addAction(_action)
+            if engine == Config.engine:
+                _action.setChecked(True)
+        # 主题：第一次打开菜单时才导入qt_material列出主题
         self.themeActionGroup = QtGui.QActionGroup(self)
         self.themeActionGroup.setExclusionPolicy(QtGui.QActionGroup.ExclusionPolicy.Exclusive)
         self.themeMenu = self.viewMenu.addMenu('&Theme')
-        _themeList = list_themes()
-        _themeList.insert(0, 'None.xml')
-        for theme in _themeList:
-            _action = self.themeMenu.addAction(theme[:-4], self.setTheme)
+        self.themeMenu.aboutToShow.connect(self.__fillThemeMenu)
+
+    @QtCore.Slot()
+    def __fillThemeMenu(self):
+        if self.themeMenu.actions():
+            return
+        for theme in listThemes():
+            _action = self.themeMenu.addAction(theme, self.setTheme)
             _action.setCheckable(True)
             self.themeActionGroup.addAction(_action)
-            if theme[:-4] == Config.theme:
+            if theme == Config.theme:
                 _action.setChecked(True)
 
+    def __loadFile(self, file, editor):
+        """
+        在后台加载文件，大文件只建立行索引；编码、分隔符及是否有列头自动探测
+        :param file: 文件路径
+        :param editor: 加载到的编辑器
+        :return:
+        """
+        _lazy = QFileInfo(file).size() > self.__lazyFileSize
+        editor.loadFile(file, withHeader=None, background=True, lazy=_lazy, engine=Config.engine)
+        self.__updateTab(editor)
+
+    def __openFile(self, file):
+        """
+        打开文件：已经打开的文件切换到其标签页，否则在新标签页中打开（当前标签页为空时直接使用）
+        :param file: 文件路径
+        :return:
+        """
+        _path = os.path.abspath(file)
+        for editor in self.__editors():
+            if editor.file and os.path.abspath(editor.file) == _path:
+                self.tabs.setCurrentWidget(editor)
+                return
+        _editor = self.csv_editor
+        if _editor.opened:
+            _editor = self.__newEditor()
+        self.__loadFile(file, _editor)
+        self.tabs.setCurrentWidget(_editor)
+        Config.openPath = QFileInfo(file).path()
+        Config.changed()
+
+    def __updateTab(self, editor):
+        """
+        更新标签页的标题（有修改时加*），当前标签页同时更新窗口标题
+        :param editor: 编辑器
+        :return:
+        """
+        _index = self.tabs.indexOf(editor)
+        if _index < 0:
+            return
+        _name = QFileInfo(editor.file).fileName() if editor.file else '(无文件)'
+        self.tabs.setTabText(_index, ('*%s' % _name) if editor.modified else _name)
+        self.tabs.setTabToolTip(_index, editor.file or '')
+        if editor is self.csv_editor:
+            self.__setTitle(editor.file, editor.modified)
+
+    def __updateStatus(self):
+        # 状态栏显示当前标签页的行数或加载状态
+        _editor = self.csv_editor
+        self.loadProgressBar.setVisible(_editor.loading)
+        if _editor.loading:
+            self.loadLabel.setText('正在加载')
+        elif _editor.lazy:
+            self.loadLabel.setText('共 %d 行（延迟加载）' % _editor.model.rowCount())
+        elif _editor.opened:
+            self.loadLabel.setText('共 %d 行' % _editor.model.rowCount())
+        else:
+            self.loadLabel.setText('')
+
+    @QtCore.Slot(int)
+    def __currentChanged(self, index):
+        """
+        切换标签页：读回换出的数据，更新标题、状态栏和菜单，提示重新加载期间改变的源文件
+        :param index: 标签页序号
+        :return:
+        """
+        _editor = self.tabs.widget(index)
+        if _editor is None:
+            return
+        self.__recent.remove(_editor)
+        self.__recent.append(_editor)
+        try:
+            _editor.restore()
+        except OSError as e:
+            self.__restoreFailed(_editor, e)
+        self.__updateTab(_editor)
+        self.__updateStatus()
+        self.followAction.setChecked(_editor.follow)
+        self.selectionLabel.setText('')
+        if self.__showStats:
+            self.statsDock.setEditor(_editor)
+        if _editor in self.__changedEditors and self.__focusIn:
+            self.__changedEditors.discard(_editor)
+            # 换出的数据因源文件改变已重新加载，不需要再提示
+            if not _editor.loading:
+                self.__promptReload(_editor)
+        self.__enforceBudget()
+
+    def __restoreFailed(self, editor, error):
+        """
+        换出的修改无法读回：由用户决定是否放弃修改重新加载源文件；不重新加载时标签页保持为空，不能保存
+        :param editor: 编辑器
+        :param error: 错误
+        :return:
+        """
+        btn = QMessageBox.warning(self, '读回数据', '%s：%s\n是否重新打开文件？'
+                                  % (QFileInfo(editor.file).fileName(), error), QMessageBox.Ok | QMessageBox.No)
+        if btn == QMessageBox.Ok:
+            self.__loadFile(editor.file, editor)
+
+    def __enforceBudget(self):
+        """
+        所有标签页的数据超过内存预算时，从最久未使用的标签页开始换出到磁盘（当前标签页不换出）
+        :return:
+        """
+        _budget = Config.memoryBudget * 1024 * 1024
+        _total = sum(editor.memoryUsage for editor in self.__editors())
+        for editor in list(self.__recent):
+            if _total <= _budget:
+                break
+            if editor is self.csv_editor:
+                continue
+            _usage = editor.memoryUsage
+            if _usage and editor.evict():
+                _total -= _usage
+
     def __setTitle(self, csv_file=None, modified=False):
         _file = csv_file
         # 如果没有文件，则只显示程序名
@@ -101,93 +391,437 @@ class MainForm(QtWidgets.QMainWindow):
 
     @QtCore.Slot()
     def openFile(self):
-        # 判断当前是否有文件打开
-        if self.csv_editor.opened:
-            btn = QMessageBox.warning(self, '打开文件', '是否关闭当前文件？', QMessageBox.Ok | QMessageBox.No)
-            if btn == QMessageBox.Ok:
-                self.closeFile()
-            else:
-                return
-
-        # 打开文件
-        file_name_list = QFileDialog.getOpenFileName(self, '打开文件', Config.openPath, filter='CSV File (*.csv)')
+        # 在新标签页中打开文件
+        file_name_list = QFileDialog.getOpenFileName(self, '打开文件', Config.openPath, filter=self.__openFilter)
         if file_name_list and len(file_name_list) > 0 and len(file_name_list[0]) > 0:
-            self.csv_editor.loadFile(file_name_list[0], withHeader=self.__withHeader)
-            self.__setTitle(file_name_list[0])
-            Config.openPath = QtCore.QFileInfo(file_name_list[0]).path()
+            self.__openFile(file_name_list[0])
 
     @QtCore.Slot()
     def closeFile(self):
-        if self.__tableChanged:
-            btn = QMessageBox.warning(self, '保存', '表格内容发生修改，是否保存文件？', QMessageBox.Ok | QMessageBox.No)
-            if btn == QMessageBox.Ok:
-                self.csv_editor.saveFile(self.csv_editor.file, withHeader=self.__withHeader)
-        self.csv_editor.closeFile()
-        self.__setTitle()
-        self.__tableChanged = False
+        self.closeTab(self.tabs.currentIndex())
+
+    @QtCore.Slot(int)
+    def closeTab(self, index):
+        """
+        关闭标签页，有修改时提示保存；最后一个标签页只关闭文件
+        :param index: 标签页序号
+        :return:
+        """
+        _editor = self.tabs.widget(index)
+        if _editor is None:
+            return
+        if not self.__confirmClose(_editor):
+            return
+        _editor.closeFile()
+        if self.lintDock is not None:
+            self.lintDock.forgetEditor(_editor)
+        self.__changedEditors.discard(_editor)
+        if self.tabs.count() > 1:
+            self.__recent.remove(_editor)
+            self.tabs.removeTab(index)
+            _editor.deleteLater()
+        else:
+            self.__updateTab(_editor)
+            self.__updateStatus()
+
+    def __confirmClose(self, editor) -> bool:
+        """
+        关闭有修改的文件（包括换出到磁盘的）前提示保存
+        :param editor: 编辑器
+        :return: False: 取消关闭，或保存失败（修改保留在标签页中）
+        """
+        if not editor.modified:
+            return True
+        btn = QMessageBox.warning(self, '保存', '%s 的内容发生修改（%d 处），是否保存文件？'
+                                  % (QFileInfo(editor.file).fileName(), editor.modifiedCount),
+                                  QMessageBox.Ok | QMessageBox.No | QMessageBox.Cancel)
+        if btn == QMessageBox.Cancel:
+            return False
+        if btn == QMessageBox.Ok:
+            try:
+                _saved = editor.saveFile(editor.file, withHeader=self.__withHeader)
+            except OSError as e:
+                QMessageBox.warning(self, '保存', '保存失败，未关闭文件：%s' % e)
+                return False
+            if not _saved:
+                QMessageBox.warning(self, '保存', '文件正在加载，没有保存，未关闭文件')
+                return False
+        return True
+
+    def __checkLoading(self, title) -> bool:
+        """
+        正在后台加载时不能保存，否则只会写入已加载的部分
+        :param title: 提示框标题
+        :return: True: 正在加载
+        """
+        if self.csv_editor.loading:
+            QMessageBox.warning(self, title, '文件正在加载，请稍后再保存')
+            return True
+        return False
 
     @QtCore.Slot()
     def saveFile(self):
-        self.csv_editor.saveFile(withHeader=True)
-        self.__setTitle(self.csv_editor.file, False)
-        self.__tableChanged = False
+        if self.__checkLoading('保存'):
+            return
+        try:
+            _saved = self.csv_editor.saveFile(withHeader=True)
+        except OSError as e:
+            QMessageBox.warning(self, '保存', str(e))
+            return
+        if not _saved:
+            QMessageBox.warning(self, '保存', '文件正在加载，没有保存，请稍后再保存')
+            return
+        self.__updateTab(self.csv_editor)
         QMessageBox.information(self, '保存', '保存成功')
 
     @QtCore.Slot()
     def saveAsFile(self):
-        file_name_list = QFileDialog.getSaveFileName(self, '保存文件', Config.savePath, filter='CSV File (*.csv)')
+        if self.__checkLoading('另保存'):
+            return
+        file_name_list = QFileDialog.getSaveFileName(self, '保存文件', Config.savePath, filter=self.__saveAsFilter)
         if file_name_list and len(file_name_list) > 0 and len(file_name_list[0]) > 0:
-            self.csv_editor.saveFile(file_name_list[0], withHeader=True)
-            Config.savePath = QtCore.QFileInfo(file_name_list[0]).path()
-            self.__setTitle(self.csv_editor.file, False)
-            self.__tableChanged = False
+            # 选择Parquet/Arrow格式而文件名没有对应的扩展名时补上，保存的格式由扩展名决定
+            _file = file_name_list[0]
+            _suffix = self.__saveSuffixes.get(file_name_list[1])
+            if _suffix and tableFormatForPath(_file) is None:
+                _file += _suffix
+            try:
+                _saved = self.csv_editor.saveFile(_file, withHeader=True)
+            except OSError as e:
+                QMessageBox.warning(self, '另保存', str(e))
+                return
+            if not _saved:
+                QMessageBox.warning(self, '另保存', '文件正在加载，没有保存，请稍后再保存')
+                return
+            Config.savePath = QtCore.QFileInfo(_file).path()
+            Config.changed()
+            self.__updateTab(self.csv_editor)
             QMessageBox.information(self, '另保存', '保存成功')
 
     @QtCore.Slot()
     def changed(self, type):
         """
         1. 表格内容改变
-        2. 源文件内容改变
+        2. 源文件追加了数据（跟随模式，已自动加载）
+        3. 源文件内容改变
         :param type:
         :return:
         """
+        _editor = self.sender()
         if type == CsvEditor.ChangedType.Table:
-            self.__tableChanged = True
-            self.__setTitle(self.csv_editor.file, True)
+            # 撤销到原始内容时不再显示修改标记
+            self.__updateTab(_editor)
+        elif type == CsvEditor.ChangedType.Appended:
+            if _editor is self.csv_editor:
+                self.__updateStatus()
         else:
-            # 窗口在激活状态，则提示重新加载，否则只记录状态
-            if self.__focusIn and not self.__csvChanged:
-                btn = QMessageBox.warning(self, '重新加载', '源文件内容改变，是否重新打开文件？', QMessageBox.Ok | QMessageBox.No)
-                if btn == QMessageBox.Ok:
-                    self.csv_editor.loadFile(self.csv_editor.file, withHeader=True)
+            # 当前标签页且窗口在激活状态，则提示重新加载，否则只记录状态
+            if self.__focusIn and _editor is self.csv_editor and _editor not in self.__changedEditors:
+                self.__promptReload(_editor)
             else:
-                self.__csvChanged = True
+                self.__changedEditors.add(_editor)
+
+    def __promptReload(self, editor):
+        """
+        源文件改变后提示重新加载
+        :param editor: 编辑器
+        :return:
+        """
+        if editor.modified:
+            _message = '%s 的内容改变，是否重新打开文件？（将丢弃 %d 处修改）' \
+                       % (QFileInfo(editor.file).fileName(), editor.modifiedCount)
+        else:
+            _message = '%s 的内容改变，是否重新打开文件？' % QFileInfo(editor.file).fileName()
+        btn = QMessageBox.warning(self, '重新加载', _message, QMessageBox.Ok | QMessageBox.No)
+        if btn == QMessageBox.Ok:
+            self.__loadFile(editor.file, editor)
+
+    @QtCore.Slot()
+    def undo(self):
+        self.csv_editor.undo()
+
+    @QtCore.Slot()
+    def redo(self):
+        self.csv_editor.redo()
+
+    @QtCore.Slot()
+    def findFilter(self):
+        self.csv_editor.showFilterBar()
+
+    @QtCore.Slot()
+    def copy(self):
+        try:
+            _cells = self.csv_editor.copySelection()
+        except ClipboardError as e:
+            QMessageBox.warning(self, '复制', str(e))
+            return
+        if self.csv_editor.copyBusy:
+            self.statusBar().showMessage('正在复制 %d 个单元格 ...' % _cells)
+
+    @QtCore.Slot('qint64', float)
+    def copyFinished(self, cells, elapsed):
+        self.statusBar().showMessage('已复制 %d 个单元格（%d ms）' % (cells, elapsed * 1000), 5000)
+
+    @QtCore.Slot()
+    def paste(self):
+        self.__bulkEdit('粘贴', self.csv_editor.paste)
+
+    def __bulkEdit(self, title, edit):
+        """
+        执行批量修改，在状态栏显示修改的单元格数及用时
+        :param title: 出错时提示框的标题
+        :param edit: 执行修改的函数，返回修改的单元格数
+        :return:
+        """
+        _start = time.perf_counter()
+        try:
+            _count = edit()
+        except BulkError as e:
+            QMessageBox.warning(self, title, str(e))
+            return
+        self.statusBar().showMessage('已修改 %d 个单元格（%d ms）' % (_count, (time.perf_counter() - _start) * 1000),
+                                     5000)
+
+    def __columnNames(self):
+        _store = self.csv_editor.model.store
+        return [_store.headerValue(column) or str(column + 1) for column in range(_store.columnCount)]
+
+    @QtCore.Slot()
+    def replaceText(self):
+        _editor = self.csv_editor
+        _store = _editor.model.store
+        _dialog = ReplaceDialog(self.__columnNames(), _editor.hasSelection, self)
+        if _dialog.exec() != ReplaceDialog.Accepted:
+            return
+        _scope = _dialog.scope
+        _columns = None if _scope == SCOPE_SELECTION else \
+            list(range(_store.columnCount)) if _scope == SCOPE_ALL else [_scope]
+        self.__bulkEdit('查找替换', lambda: _editor.replaceText(
+            _dialog.findEdit.text(), _dialog.replaceEdit.text(), _dialog.regexCheck.isChecked(),
+            _dialog.caseCheck.isChecked(), _columns))
+
+    @QtCore.Slot()
+    def fillDown(self):
+        self.__bulkEdit('向下填充', self.csv_editor.fillDown)
+
+    @QtCore.Slot()
+    def transformText(self):
+        _name = self.sender().data()
+        self.__bulkEdit('文本变换', lambda: self.csv_editor.transformText(_name))
+
+    @QtCore.Slot()
+    def addDerivedColumn(self):
+        _dialog = DerivedColumnDialog(self)
+        if _dialog.exec() != DerivedColumnDialog.Accepted:
+            return
+        self.__bulkEdit('添加派生列', lambda: self.csv_editor.addDerivedColumn(
+            _dialog.nameEdit.text(), _dialog.expressionEdit.text()))
+
+    @QtCore.Slot()
+    def insertRow(self):
+        self.__editRows('插入行', self.csv_editor.insertRows, '已插入 %d 行')
+
+    @QtCore.Slot()
+    def deleteRows(self):
+        self.__editRows('删除行', self.csv_editor.deleteRows, '已删除 %d 行')
+
+    def __editRows(self, title, edit, message):
+        try:
+            _count = edit()
+        except BulkError as e:
+            QMessageBox.warning(self, title, str(e))
+            return
+        if _count:
+            self.statusBar().showMessage(message % _count, 5000)
+
+    @QtCore.Slot()
+    def sortRows(self):
+        _editor = self.csv_editor
+        _dialog = SortDialog(self.__columnNames(), _editor.model.sortKeys, parent=self)
+        if _dialog.exec() != SortDialog.Accepted:
+            return
+        _start = time.perf_counter()
+        try:
+            _editor.sortBy(_dialog.keys)
+        except SortError as e:
+            QMessageBox.warning(self, '排序', str(e))
+            return
+        self.statusBar().showMessage('排序用时 %d ms' % ((time.perf_counter() - _start) * 1000), 5000)
+
+    @QtCore.Slot()
+    def groupBy(self):
+        _editor = self.csv_editor
+        _dialog = GroupByDialog(self.__columnNames(), self)
+        if _dialog.exec() != GroupByDialog.Accepted or not _dialog.columns:
+            return
+        try:
+            _header, _columns = _editor.groupBy(_dialog.columns, _dialog.aggregates)
+        except SortError as e:
+            QMessageBox.warning(self, '分组汇总', str(e))
+            return
+        # 结果窗口不阻塞主窗口，双击一组时在对应的标签页中选中该组的行
+        _result = GroupResultDialog(_header, _columns, self)
+        _result.setAttribute(Qt.WA_DeleteOnClose)
+        _result.groupActivated.connect(lambda group: self.__selectGroup(_editor, group))
+        _result.show()
+
+    def __selectGroup(self, editor, group):
+        if self.tabs.indexOf(editor) < 0:
+            return
+        self.tabs.setCurrentWidget(editor)
+        if not editor.selectGroup(group):
+            self.statusBar().showMessage('表格的顺序或内容已改变，请重新分组', 5000)
+
+    @QtCore.Slot()
+    def saveSorted(self):
+        if self.__checkLoading('排序后另存为'):
+            return
+        _dialog = SortDialog(self.__columnNames(), self.csv_editor.model.sortKeys, '排序后另存为', self)
+        if _dialog.exec() != SortDialog.Accepted:
+            return
+        file_name_list = QFileDialog.getSaveFileName(self, '保存文件', Config.savePath, filter=self.__fileFilter)
+        if not file_name_list or not file_name_list[0]:
+            return
+        _start = time.perf_counter()
+        try:
+            self.csv_editor.saveSorted(file_name_list[0], _dialog.keys, withHeader=True)
+        except (SortError, OSError) as e:
+            QMessageBox.warning(self, '排序后另存为', str(e))
+            return
+        Config.savePath = QtCore.QFileInfo(file_name_list[0]).path()
+        Config.changed()
+        self.statusBar().showMessage('保存成功，用时 %d ms' % ((time.perf_counter() - _start) * 1000), 5000)
+
+    @QtCore.Slot()
+    def validateFile(self):
+        _editor = self.csv_editor
+        if not _editor.opened:
+            return
+        if _editor.loading:
+            QMessageBox.warning(self, '校验文件', '文件正在加载，请稍后再校验')
+            return
+        if tableFormatForPath(_editor.file) is not None:
+            QMessageBox.warning(self, '校验文件', 'Parquet/Arrow文件按列存储，不需要结构校验')
+            return
+        _header = _editor.model.store.header if _editor.withHeader else None
+        _dialog = LintDialog(self.__columnNames(), _header, self)
+        if _dialog.exec() != LintDialog.Accepted:
+            return
+        if self.lintDock is None:
+            self.lintDock = LintDock(self)
+            self.lintDock.setFeatures(LintDock.DockWidgetMovable | LintDock.DockWidgetFloatable |
+                                      LintDock.DockWidgetClosable)
+            self.lintDock.issueActivated.connect(self.__showIssue)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.lintDock)
+        self.lintDock.setVisible(True)
+        self.lintDock.start(_editor, _dialog.keys, _dialog.types)
+
+    @QtCore.Slot(object, int, int)
+    def __showIssue(self, editor, row, column):
+        # 定位到问题所在的单元格（切换到校验的文件所在的标签页）
+        if self.tabs.indexOf(editor) < 0:
+            return
+        self.tabs.setCurrentWidget(editor)
+        if not editor.showCell(row, None if column < 0 else column):
+            self.statusBar().showMessage('第 %d 行不在当前表格中（已被筛选或文件已改变）' % (row + 1), 5000)
+
+    @QtCore.Slot()
+    def profiling(self):
+        _enabled = self.sender().isChecked()
+        Profiler.setEnabled(_enabled)
+        self.__showProfileDock(_enabled)
+
+    @QtCore.Slot()
+    def columnStats(self):
+        self.__showStatsDock(self.sender().isChecked())
+
+    @QtCore.Slot(str)
+    def selectionSummary(self, text):
+        # 只显示当前标签页选中区域的汇总
+        if self.sender() is self.csv_editor:
+            self.selectionLabel.setText(text)
+
+    @QtCore.Slot()
+    def parseCache(self):
+        Config.parseCache = int(self.sender().isChecked())
+        Config.changed()
+        self.__cache.enabled = bool(Config.parseCache)
+
+    @QtCore.Slot()
+    def followFile(self):
+        self.csv_editor.setFollow(self.sender().isChecked())
+
+    @QtCore.Slot()
+    def showModified(self):
+        self.__highlightModified = self.sender().isChecked()
+        for editor in self.__editors():
+            editor.setHighlightModified(self.__highlightModified)
+
+    @QtCore.Slot('qint64', 'qint64', 'qint64')
+    def loadProgress(self, bytesRead, bytesTotal, rowsParsed):
+        """
+        后台加载进度
+        :param bytesRead: 已读字节数
+        :param bytesTotal: 文件总字节数
+        :param rowsParsed: 已解析行数
+        :return:
+        """
+        # 只显示当前标签页的进度
+        if self.sender() is not self.csv_editor:
+            return
+        self.loadProgressBar.setVisible(True)
+        self.loadProgressBar.setValue(int(bytesRead * 1000 / bytesTotal) if bytesTotal else 1000)
+        self.loadLabel.setText('已加载 %d 行' % rowsParsed)
+        if self.__startTime is not None and self.csv_editor.model.rowCount():
+            QtCore.QTimer.singleShot(0, self.__reportStartup)
+
+    @QtCore.Slot(bool)
+    def loadFinished(self, ok):
+        if self.__startTime is not None:
+            QtCore.QTimer.singleShot(0, self.__reportStartup)
+        if self.sender() is self.csv_editor:
+            self.__updateStatus()
+            if not ok:
+                self.loadLabel.setText('')
+        # 新加载的数据可能使总内存超出预算
+        self.__enforceBudget()
+
+    @QtCore.Slot()
+    def __reportStartup(self):
+        """
+        第一屏显示后在状态栏显示启动用时（打开入参文件时为显示第一批数据的用时）
+        :return:
+        """
+        if self.__startTime is None:
+            return
+        _elapsed = (time.perf_counter() - self.__startTime) * 1000
+        self.__startTime = None
+        self.statusBar().showMessage('启动用时 %d ms' % _elapsed, 5000)
+        Profiler.record('startup', _elapsed)
+
+    @QtCore.Slot(str)
+    def loadFailed(self, message):
+        _editor = self.sender()
+        QMessageBox.critical(self, '打开文件', '%s 加载失败：%s' % (QFileInfo(_editor.file).fileName(), message))
+        self.closeTab(self.tabs.indexOf(_editor))
+
+    @QtCore.Slot()
+    def setEngine(self):
+        # 下次加载文件时生效
+        Config.engine = self.sender().text()
+        Config.changed()
 
     @QtCore.Slot()
     def setTheme(self):
         _theme = self.sender().text()
         Config.theme = _theme
-        if _theme == 'None':
-            QtWidgets.QApplication.instance().setStyleSheet("")
-        else:
-            apply_stylesheet(QtWidgets.QApplication.instance(), _theme + '.xml')
+        Config.changed()
+        applyTheme(QtWidgets.QApplication.instance(), _theme, Config.cacheDir)
 
     @QtCore.Slot()
     def fileDroped(self, file: str):
-        # 判断当前是否有文件打开.若打开的文件相同，则不处理
-        if self.csv_editor.opened:
-            if self.csv_editor.file == file:
-                return
-            btn = QMessageBox.warning(self, '打开文件', '是否关闭当前文件？', QMessageBox.Ok | QMessageBox.No)
-            if btn == QMessageBox.Ok:
-                self.closeFile()
-            else:
-                return
-
-        # 打开文件
-        self.csv_editor.loadFile(file, withHeader=self.__withHeader)
-        self.__setTitle(file)
-        Config.openPath = QtCore.QFileInfo(file).path()
+        # 拖放的文件在新标签页中打开，已打开的文件切换到其标签页
+        self.__openFile(file)
 
     def changeEvent(self, event):
         _type = event.type()
@@ -198,31 +832,41 @@ class MainForm(QtWidgets.QMainWindow):
             _maximized = 1 if _state == Qt.WindowMaximized else 0
             if Config.maximized != _maximized:
                 Config.maximized = _maximized
-                Config.writeConfig()
+                Config.changed()
 
     def resizeEvent(self, event):
         _size = event.size()
         Config.size[0] = _size.width()
         Config.size[1] = _size.height()
+        Config.changed()
 
     def moveEvent(self, event):
         _pos = event.pos()
         Config.position[0] = _pos.x()
         Config.position[1] = _pos.y()
+        Config.changed()
 
     def closeEvent(self, event):
+        # 有修改的标签页（包括换出到磁盘的）逐个提示保存，取消或保存失败时不退出
+        for editor in self.__editors():
+            if not self.__confirmClose(editor):
+                event.ignore()
+                return
+        # 再关闭各标签页的文件，取消并等待后台线程（加载、筛选、统计、复制）退出，
+        # 否则窗口销毁时线程仍在运行，进程异常终止；最后才删除换出文件的目录
+        for editor in self.__editors():
+            editor.closeFile()
+            if self.lintDock is not None:
+                self.lintDock.forgetEditor(editor)
         Config.writeConfig()
+        self.__cache.close()
 
     def focusInEvent(self, event) -> None:
         self.__focusIn = True
-        if self.__csvChanged:
-            self.__csvChanged = False
-            btn = QMessageBox.warning(self, '重新加载', '源文件内容改变，是否重新打开文件？', QMessageBox.Ok | QMessageBox.No)
-            if btn == QMessageBox.Ok:
-                self.csv_editor.loadFile(self.csv_editor.file, withHeader=True)
+        _editor = self.csv_editor
+        if _editor in self.__changedEditors:
+            self.__changedEditors.discard(_editor)
+            self.__promptReload(_editor)
 
     def focusOutEvent(self, event) -> None:
         self.__focusIn = False
-
-    def writeConfigTimer(self) -> None:
-        Config.writeConfig()
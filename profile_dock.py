@@ -0,0 +1,100 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : profile_dock.py
+@Desc    : 性能统计停靠窗口：定时刷新各项计时的次数、平均值、分位数及计数器
+@Author  : qdu
+@Date    : 2026/10/17 20:50
+"""
+
+from PySide6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, \
+    QPushButton, QHeaderView, QFileDialog, QMessageBox
+from PySide6.QtCore import Qt, QTimer, Slot
+from csv_profile import Profiler
+
+
+class ProfileDock(QDockWidget):
+    """
+    显示Profiler的统计结果，只在可见时刷新
+    """
+
+    __headers = ['名称', '次数', '总计', '平均', 'p50', 'p95', '最大']
+    __refreshInterval = 500     # 刷新间隔（毫秒）
+
+    def __init__(self, parent=None):
+        super().__init__('性能统计', parent)
+        self.setObjectName('profileDock')
+        self.__setupUi()
+        self.__timer = QTimer(self)
+        self.__timer.setInterval(self.__refreshInterval)
+        self.__timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.__visibilityChanged)
+
+    def __setupUi(self):
+        self.table = QTableWidget(0, len(self.__headers))
+        self.table.setHorizontalHeaderLabels(self.__headers)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setToolTip('计时单位为毫秒；view.dataPerFrame为每帧调用data()的次数')
+        _resetButton = QPushButton('重置')
+        _resetButton.clicked.connect(self.reset)
+        _exportButton = QPushButton('导出...')
+        _exportButton.clicked.connect(self.export)
+        _buttons = QHBoxLayout()
+        _buttons.addStretch()
+        _buttons.addWidget(_resetButton)
+        _buttons.addWidget(_exportButton)
+        _widget = QWidget()
+        _layout = QVBoxLayout(_widget)
+        _layout.setContentsMargins(0, 0, 0, 0)
+        _layout.addWidget(self.table)
+        _layout.addLayout(_buttons)
+        self.setWidget(_widget)
+
+    @Slot(bool)
+    def __visibilityChanged(self, visible):
+        if visible:
+            self.refresh()
+            self.__timer.start()
+        else:
+            self.__timer.stop()
+
+    @Slot()
+    def refresh(self):
+        """
+        用当前的统计结果更新表格
+        :return: None
+        """
+        stats, counters = Profiler.snapshot()
+        rows = [(name, count) + tuple('%.2f' % value for value in values)
+                for name, count, *values in stats]
+        rows += [(name, count, '', '', '', '', '') for name, count in sorted(counters.items())]
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                item = QTableWidgetItem(str(value))
+                if c:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+
+    @Slot()
+    def reset(self):
+        Profiler.reset()
+        self.refresh()
+
+    @Slot()
+    def export(self):
+        """
+        导出本次会话的统计：Chrome trace（.json）或cProfile（.prof）
+        :return: None
+        """
+        path, _ = QFileDialog.getSaveFileName(self, '导出性能统计', 'csveditor-trace.json',
+                                              'Chrome Trace (*.json);;cProfile (*.prof)')
+        if not path:
+            return
+        try:
+            Profiler.dump(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, '导出性能统计', str(e))
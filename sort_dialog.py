@@ -0,0 +1,183 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : sort_dialog.py
+@Desc    : 排序与分组的对话框：多列排序条件、分组汇总的设置及结果
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+from PySide6.QtCore import Signal, Qt
+from PySide6.QtWidgets import QDialog, QFormLayout, QVBoxLayout, QHBoxLayout, QComboBox, QDialogButtonBox, \
+    QListWidget, QListWidgetItem, QCheckBox, QTableView, QPushButton, QLabel, QFileDialog, QMessageBox, QAbstractItemView
+from csv_model import CsvTableModel
+from csv_store import ColumnStore
+from csv_writer import saveStore
+from csv_sort import AGGREGATES
+
+
+class SortDialog(QDialog):
+    """
+    多列排序：依次按“排序依据”“然后依据”比较
+    """
+
+    __levels = 3
+
+    def __init__(self, columnNames, keys=None, title='排序', parent=None):
+        """
+        :param columnNames: 各列的名称
+        :param keys: 当前的排序条件 [(列号, 是否降序)]
+        :param title: 窗口标题
+        :param parent:
+        """
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        keys = list(keys or [])
+        self.__combos = []
+        _layout = QFormLayout(self)
+        for level in range(self.__levels):
+            _columnCombo = QComboBox()
+            if level:
+                _columnCombo.addItem('（无）', -1)
+            for column, name in enumerate(columnNames):
+                _columnCombo.addItem(name, column)
+            _orderCombo = QComboBox()
+            _orderCombo.addItem('升序', False)
+            _orderCombo.addItem('降序', True)
+            if level < len(keys):
+                _columnCombo.setCurrentIndex(_columnCombo.findData(keys[level][0]))
+                _orderCombo.setCurrentIndex(_orderCombo.findData(keys[level][1]))
+            _row = QHBoxLayout()
+            _row.addWidget(_columnCombo, 1)
+            _row.addWidget(_orderCombo)
+            _layout.addRow('排序依据' if level == 0 else '然后依据', _row)
+            self.__combos.append((_columnCombo, _orderCombo))
+        _buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        _buttons.accepted.connect(self.accept)
+        _buttons.rejected.connect(self.reject)
+        _layout.addRow(_buttons)
+
+    @property
+    def keys(self):
+        """
+        排序条件（同一列只取第一次）
+        :return: [(列号, 是否降序)]
+        """
+        keys = []
+        for columnCombo, orderCombo in self.__combos:
+            column = columnCombo.currentData()
+            if column is not None and column >= 0 and column not in [c for c, _ in keys]:
+                keys.append((column, orderCombo.currentData()))
+        return keys
+
+
+class GroupByDialog(QDialog):
+    """
+    分组汇总：选择分组的列、汇总的列及汇总方式
+    """
+
+    def __init__(self, columnNames, parent=None):
+        """
+        :param columnNames: 各列的名称
+        :param parent:
+        """
+        super().__init__(parent)
+        self.setWindowTitle('分组汇总')
+        self.groupList = self.__columnList(columnNames)
+        self.valueList = self.__columnList(columnNames)
+        self.functionChecks = []
+        _functions = QHBoxLayout()
+        for function in AGGREGATES:
+            _check = QCheckBox(function)
+            _check.setChecked(function in ('sum', 'mean'))
+            _functions.addWidget(_check)
+            self.functionChecks.append(_check)
+        _buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        _buttons.accepted.connect(self.accept)
+        _buttons.rejected.connect(self.reject)
+        _lists = QHBoxLayout()
+        for label, widget in [('分组的列', self.groupList), ('汇总的列', self.valueList)]:
+            _column = QVBoxLayout()
+            _column.addWidget(QLabel(label))
+            _column.addWidget(widget)
+            _lists.addLayout(_column)
+        _layout = QVBoxLayout(self)
+        _layout.addLayout(_lists)
+        _layout.addLayout(_functions)
+        _layout.addWidget(_buttons)
+
+    @staticmethod
+    def __columnList(columnNames):
+        _list = QListWidget()
+        for column, name in enumerate(columnNames):
+            _item = QListWidgetItem(name, _list)
+            _item.setData(Qt.UserRole, column)
+            _item.setCheckState(Qt.Unchecked)
+        return _list
+
+    @staticmethod
+    def __checked(widget):
+        return [widget.item(i).data(Qt.UserRole) for i in range(widget.count())
+                if widget.item(i).checkState() == Qt.Checked]
+
+    @property
+    def columns(self):
+        """
+        分组的列
+        :return: 列号列表
+        """
+        return self.__checked(self.groupList)
+
+    @property
+    def aggregates(self):
+        """
+        汇总的列及方式
+        :return: [(列号, 汇总名称)]
+        """
+        functions = [check.text() for check in self.functionChecks if check.isChecked()]
+        return [(column, function) for column in self.__checked(self.valueList) for function in functions]
+
+
+class GroupResultDialog(QDialog):
+    """
+    分组汇总的结果：每组一行，可以排序、另存为；双击一行选中表格中该组的行
+    """
+
+    # 信号
+    groupActivated = Signal(int)        # 双击的组号
+
+    def __init__(self, header, columns, parent=None):
+        """
+        :param header: 列头
+        :param columns: 各列的字符串数组
+        :param parent:
+        """
+        super().__init__(parent)
+        self.setWindowTitle('分组汇总（%d 组）' % (len(columns[0]) if columns else 0))
+        self.store = ColumnStore()
+        self.store.setHeader(header)
+        self.store.appendRows([list(row) for row in zip(*[column.tolist() for column in columns])])
+        self.model = CsvTableModel(self)
+        self.model.setStore(self.store)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.doubleClicked.connect(lambda index: self.groupActivated.emit(self.model.dataRow(index.row())))
+        _saveButton = QPushButton('另存为 ...')
+        _saveButton.clicked.connect(self.__save)
+        _buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        _buttons.addButton(_saveButton, QDialogButtonBox.ActionRole)
+        _buttons.rejected.connect(self.reject)
+        _layout = QVBoxLayout(self)
+        _layout.addWidget(self.table)
+        _layout.addWidget(_buttons)
+        self.resize(720, 480)
+
+    def __save(self):
+        _path, _ = QFileDialog.getSaveFileName(self, '保存分组汇总', '', filter='CSV File (*.csv)')
+        if _path:
+            saveStore(self.store, _path, withHeader=True)
+            QMessageBox.information(self, '另存为', '保存成功')
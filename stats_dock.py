@@ -0,0 +1,94 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : stats_dock.py
+@Desc    : 列统计停靠窗口：显示当前标签页各列的计数、空值、不同值、最值、平均值、分位数及常见值
+@Author  : qdu
+@Date    : 2026/10/17 23:40
+"""
+
+from PySide6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QLabel
+from PySide6.QtCore import Qt, Slot
+
+# (列头, summary的键)
+_COLUMNS = [
+    ('列', 'name'), ('类型', 'kind'), ('计数', 'count'), ('空值', 'nulls'), ('不同值', 'distinct'),
+    ('最小', 'min'), ('最大', 'max'), ('平均', 'mean'), ('p25', 'p25'), ('p50', 'p50'), ('p75', 'p75'),
+    ('常见值', 'top'),
+]
+_RIGHT_ALIGNED = {'count', 'nulls', 'distinct', 'min', 'max', 'mean', 'p25', 'p50', 'p75'}
+
+
+class StatsDock(QDockWidget):
+    """
+    显示编辑器的列统计，统计更新时刷新（不可见时不刷新）
+    """
+
+    __editor = None     # 显示统计的编辑器
+
+    def __init__(self, parent=None):
+        super().__init__('列统计', parent)
+        self.setObjectName('statsDock')
+        self.__setupUi()
+        self.visibilityChanged.connect(self.__visibilityChanged)
+
+    def __setupUi(self):
+        self.table = QTableWidget(0, len(_COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _ in _COLUMNS])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setToolTip('不同值为HyperLogLog估算，分位数为t-digest估算；修改单元格后为近似值')
+        self.statusLabel = QLabel()
+        _widget = QWidget()
+        _layout = QVBoxLayout(_widget)
+        _layout.setContentsMargins(0, 0, 0, 0)
+        _layout.addWidget(self.table)
+        _layout.addWidget(self.statusLabel)
+        self.setWidget(_widget)
+
+    def setEditor(self, editor):
+        """
+        切换显示统计的编辑器
+        :param editor: CsvEditor
+        :return: None
+        """
+        if self.__editor is not None:
+            self.__editor.statsChanged.disconnect(self.refresh)
+        self.__editor = editor
+        if editor is not None:
+            editor.statsChanged.connect(self.refresh)
+        self.refresh()
+
+    @Slot(bool)
+    def __visibilityChanged(self, visible):
+        if visible:
+            self.refresh()
+
+    @Slot()
+    def refresh(self):
+        """
+        用编辑器当前的统计结果更新表格
+        :return: None
+        """
+        if not self.isVisible():
+            return
+        editor = self.__editor
+        rows = editor.columnStats() if editor is not None else []
+        self.table.setRowCount(len(rows))
+        for r, (name, summary) in enumerate(rows):
+            summary = dict(summary, name=name)
+            for c, (_, key) in enumerate(_COLUMNS):
+                item = QTableWidgetItem(summary.get(key, ''))
+                if key in _RIGHT_ALIGNED:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+        if editor is None or not editor.opened:
+            self.statusLabel.setText('')
+        elif not editor.model.inMemory:
+            self.statusLabel.setText('延迟加载的文件不统计')
+        elif editor.statsBusy:
+            self.statusLabel.setText('统计中...')
+        else:
+            self.statusLabel.setText('')
@@ -0,0 +1,9 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : __init__.py
+@Desc    : 回归测试（python -m pytest -q 或 python -m unittest discover -s tests -t .）
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
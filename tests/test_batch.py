@@ -0,0 +1,80 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : test_batch.py
+@Desc    : 批处理模式：目标文件的扩展名为.parquet/.arrow/.feather时保存为表格文件，而不是csv文本
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from csv_batch import convertFile
+
+_CSV = 'id,name,price\n3,c,1.5\n1,a,2\n2,,0.25\n'
+
+
+class TableTargetTest(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest('pyarrow未安装')
+        self.dir = tempfile.mkdtemp()
+        self.source = self.path('s.csv', _CSV)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def path(self, name, text=None):
+        path = os.path.join(self.dir, name)
+        if text is not None:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+        return path
+
+    def read(self, path):
+        import pyarrow.ipc
+        import pyarrow.parquet
+        if path.endswith('.parquet'):
+            return pyarrow.parquet.read_table(path)
+        with pyarrow.ipc.open_file(path) as reader:
+            return reader.read_all()
+
+    def test_formats(self):
+        for name in ('t.parquet', 't.arrow', 't.feather'):
+            target = self.path(name)
+            stats = convertFile(self.source, target, sort='id')
+            self.assertEqual(stats['rowsWritten'], 3)
+            table = self.read(target)
+            self.assertEqual(table.column_names, ['id', 'name', 'price'])
+            self.assertEqual(table.column('id').to_pylist(), ['1', '2', '3'])
+            self.assertEqual(table.column('name').to_pylist(), ['a', '', 'c'])
+
+    def test_columns_without_header(self):
+        source = self.path('n.csv', '1,a\n2\n3,c\n')
+        target = self.path('n.parquet')
+        convertFile(source, target, withHeader=False)
+        table = self.read(target)
+        self.assertEqual(table.column_names, ['column1', 'column2'])
+        self.assertEqual(table.column('column2').to_pylist(), ['a', '', 'c'])
+        convertFile(self.source, target, columns=['price', '#1'], query='price > 1')
+        table = self.read(target)
+        self.assertEqual(table.column_names, ['price', 'id'])
+        self.assertEqual(table.column('id').to_pylist(), ['3', '1'])
+
+    def test_round_trip(self):
+        target = self.path('t.parquet')
+        convertFile(self.source, target)
+        back = self.path('back.csv')
+        convertFile(target, back)
+        with open(back, encoding='utf-8', newline='') as f:
+            self.assertEqual(f.read(), _CSV.replace('\n', '\r\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
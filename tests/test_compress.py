@@ -0,0 +1,102 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : test_compress.py
+@Desc    : 截断的压缩文件：读取时报告OSError，后台加载发出失败信号，不把部分数据当作完整的表格
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import contextlib
+import gzip
+import io
+import json
+import lzma
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtCore import QCoreApplication
+from PySide6.QtWidgets import QApplication
+import csv_batch
+import csv_lint
+from csv_compress import openInput
+from csv_editor import CsvEditor
+
+_app = QApplication.instance() or QApplication([])
+
+_ROWS = b'id,name\n' + b''.join(b'%d,name%d\n' % (i, i) for i in range(200000))
+
+
+def _zstd(data):
+    import zstandard
+    return zstandard.ZstdCompressor().compress(data)
+
+
+class TruncatedInputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def truncated(self, name, compress):
+        data = compress(_ROWS)
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data[:len(data) // 3])
+        return path
+
+    def assertReadFails(self, path):
+        for background in (True, False):
+            stream, _ = openInput(path, background=background)
+            with stream, self.assertRaises(OSError):
+                while stream.read(1 << 16):
+                    pass
+
+    def test_gzip(self):
+        self.assertReadFails(self.truncated('t.csv.gz', gzip.compress))
+
+    def test_xz(self):
+        self.assertReadFails(self.truncated('t.csv.xz', lzma.compress))
+
+    def test_zstd(self):
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest('zstandard未安装')
+        self.assertReadFails(self.truncated('t.csv.zst', _zstd))
+
+    def test_editor_load(self):
+        path = self.truncated('t.csv.gz', gzip.compress)
+        editor = CsvEditor()
+        self.assertRaises(OSError, editor.loadFile, path, True)
+        events = []
+        editor.loadFailed.connect(lambda message: events.append('failed'))
+        editor.loadFinished.connect(lambda ok: events.append(ok))
+        editor.loadFile(path, True, background=True)
+        deadline = time.perf_counter() + 30
+        while editor.loading and time.perf_counter() < deadline:
+            QCoreApplication.processEvents()
+            time.sleep(0.002)
+        self.assertEqual(events, ['failed', False])
+        editor.closeFile()
+        editor.deleteLater()
+
+    def test_command_line(self):
+        path = self.truncated('t.csv.gz', gzip.compress)
+        for main, argv in ((csv_lint.main, [path]), (csv_batch.main, [path, os.path.join(self.dir, 'out.csv')])):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(main(argv), 1)
+            self.assertIn('压缩数据损坏', json.loads(out.getvalue())['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
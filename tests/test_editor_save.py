@@ -0,0 +1,66 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : test_editor_save.py
+@Desc    : 保存延迟加载的文件后重新建立索引时，撤销记录的处理
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtWidgets import QApplication
+from csv_editor import CsvEditor
+
+_app = QApplication.instance() or QApplication([])
+
+
+class LazySaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.dir, 'source.csv')
+        with open(self.source, 'w', newline='') as f:
+            f.write('id,name\n' + ''.join('%d,n%d\n' % (i, i) for i in range(100)))
+        self.editor = CsvEditor()
+        self.editor.loadFile(self.source, True, lazy=True)
+        self.model = self.editor.model
+
+    def tearDown(self):
+        self.editor.closeFile()
+        self.editor.deleteLater()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_undo_cell_edit_after_save_as(self):
+        self.model.setData(self.model.index(3, 1), 'edited')
+        target = os.path.join(self.dir, 'target.csv')
+        self.editor.saveFile(target, withHeader=True)
+        self.assertTrue(self.editor.lazy)
+        self.assertEqual(self.editor.file, target)
+        self.assertFalse(self.editor.modified)
+        self.assertTrue(self.editor.undo())
+        self.assertEqual(self.model.data(self.model.index(3, 1)), 'n3')
+        self.assertTrue(self.editor.modified)
+        self.assertTrue(self.editor.redo())
+        self.assertEqual(self.model.data(self.model.index(3, 1)), 'edited')
+        self.assertFalse(self.editor.modified)
+
+    def test_row_edits_clear_undo_after_save_as(self):
+        # 插入行的步骤引用旧文件的行布局，在新文件上无法撤销，撤销记录清空
+        self.editor.table.setCurrentIndex(self.model.index(5, 0))
+        self.assertEqual(self.editor.insertRows(), 1)
+        target = os.path.join(self.dir, 'target.csv')
+        self.editor.saveFile(target, withHeader=True)
+        self.assertFalse(self.editor.undo())
+        self.assertEqual(self.model.rowCount(), 101)
+        self.assertEqual(self.model.data(self.model.index(6, 0)), '5')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : test_lazy_store.py
+@Desc    : 延迟加载的数据保存：源文件最后一行没有换行符时，原样复制的部分之后写入的行另起一行
+@Author  : qdu
+@Date    : 2026/10/17 23:59
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from csv_lazy import LazyStore
+from csv_parser import FileFormat
+
+
+class UnterminatedSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def save(self, data, change, stride=64):
+        path = os.path.join(self.dir, 's.csv')
+        with open(path, 'wb') as f:
+            f.write(data)
+        store = LazyStore(path, True, FileFormat('utf-8', ',', '"', True), stride=stride)
+        try:
+            change(store)
+            out = io.BytesIO()
+            store.writeTo(out, True)
+        finally:
+            store.close()
+        return out.getvalue()
+
+    def test_append(self):
+        def append(store):
+            store.insertRows(store.rowCount, 1)
+            store.setValue(store.rowCount - 1, 0, 'x')
+        for stride in (1, 64):
+            self.assertEqual(self.save(b'h1,h2\n1,2\n3,4', append, stride), b'h1,h2\n1,2\n3,4\nx,\n')
+            self.assertEqual(self.save(b'h1,h2\r\n1,2\r\n3,4', append, stride), b'h1,h2\r\n1,2\r\n3,4\r\nx,\r\n')
+
+    def test_edit_last_row(self):
+        for stride in (1, 64):
+            self.assertEqual(self.save(b'h1,h2\n1,2\n3,4', lambda store: store.setValue(1, 1, '9'), stride),
+                             b'h1,h2\n1,2\n3,9\n')
+
+    def test_unchanged(self):
+        # 没有修改的部分按字节原样复制，不补换行符
+        self.assertEqual(self.save(b'h1,h2\n1,2\n3,4', lambda store: store.deleteRows(0, 1), 1), b'h1,h2\n3,4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding:UTF-8 -*-
+
+"""
+@Project : CsvEditor
+@File    : theme.py
+@Desc    : 主题：按需导入qt_material，生成的样式表缓存在磁盘上，启动时不需要重新生成
+@Author  : qdu
+@Date    : 2026/10/17 21:30
+"""
+
+import importlib.util
+import json
+import os
+from PySide6.QtCore import QDir
+from PySide6.QtGui import QColor, QFontDatabase, QGuiApplication, QPalette
+
+THEME_NONE = 'None'         # 不使用主题
+_CACHE_VERSION = 1          # 缓存格式变化时递增
+
+
+def listThemes():
+    """
+    qt_material的所有主题（第一次调用时导入qt_material）
+    :return: 主题名列表，第一个为None
+    """
+    from qt_material import list_themes
+    return [THEME_NONE] + [theme[:-4] for theme in list_themes()]
+
+
+def applyTheme(app, theme, cacheDir=None):
+    """
+    应用主题：优先使用缓存的样式表，缓存不存在或已过期时用qt_material生成并写入缓存
+    :param app: QApplication
+    :param theme: 主题名，None/空: 不使用主题
+    :param cacheDir: 缓存目录，None: 不缓存
+    :return: None
+    """
+    if not theme or theme == THEME_NONE:
+        app.setStyleSheet('')
+        return
+    cachePath = os.path.join(cacheDir, 'theme-%s.json' % theme) if cacheDir else None
+    cached = _readCache(cachePath)
+    if cached is None:
+        cached = _buildTheme(theme)
+        if cached is None:
+            return
+        _writeCache(cachePath, cached)
+
+    # 与qt_material.apply_stylesheet相同的副作用：Fusion风格、字体、图标搜索路径、文字颜色
+    app.setStyle('Fusion')
+    for font in cached['fonts']:
+        QFontDatabase.addApplicationFont(font)
+    for prefix, paths in cached['searchPaths'].items():
+        for path in paths:
+            QDir.addSearchPath(prefix, path)
+    palette = QGuiApplication.palette()
+    color = cached['primaryColor']
+    palette.setColor(QPalette.ColorRole.Text, QColor(*[int(color[i:i + 2], 16) for i in range(1, 6, 2)] + [92]))
+    QGuiApplication.setPalette(palette)
+    app.setStyleSheet(cached['stylesheet'])
+
+
+def _source():
+    # qt_material的位置和修改时间，升级qt_material后缓存失效（不导入qt_material）
+    spec = importlib.util.find_spec('qt_material')
+    if spec is None or not spec.origin:
+        return None
+    return [spec.origin, os.stat(spec.origin).st_mtime]
+
+
+def _buildTheme(theme):
+    """
+    用qt_material生成样式表，同时记录应用样式表需要的字体和图标路径
+    :return: 缓存的内容，主题不存在时为None
+    """
+    import qt_material
+    stylesheet = qt_material.build_stylesheet('%s.xml' % theme)
+    if stylesheet is None:
+        return None
+    fontDir = os.path.join(os.path.dirname(qt_material.__file__), 'fonts', 'roboto')
+    return {
+        'version': _CACHE_VERSION,
+        'source': _source(),
+        'stylesheet': stylesheet,
+        'fonts': [os.path.join(fontDir, name) for name in sorted(os.listdir(fontDir)) if name.endswith('.ttf')],
+        'searchPaths': {prefix: QDir.searchPaths(prefix) for prefix in ('icon', 'qt_material')},
+        'primaryColor': qt_material.get_theme('%s.xml' % theme)['primaryColor'],
+    }
+
+
+def _readCache(path):
+    # 缓存的格式、qt_material版本不一致或引用的文件已被删除时视为无效
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != _CACHE_VERSION or cached.get('source') != _source():
+        return None
+    paths = cached['fonts'] + [path for paths in cached['searchPaths'].values() for path in paths]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return cached
+
+
+def _writeCache(path, cached):
+    # 缓存写入失败（例如目录不可写）不影响使用
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(cached, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass